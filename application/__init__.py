@@ -16,6 +16,9 @@ def create_app():
 
     Session(app)
 
+    from application.util.http_metrics import install_http_metrics
+    install_http_metrics(app)
+
     from application.main import main_bp, page_not_found, server_error
     from application.image_reference import image_reference_bp
     from application.image_review import image_review_bp
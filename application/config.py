@@ -13,6 +13,11 @@ class Config:
     SESSION_PERMANENT = False
     TATOR_URL = 'https://cloud.tator.io'
     TATOR_PROJECT_ID = 26
+    TATOR_FETCH_WORKERS = 8  # max concurrent section/media-batch localization requests per page load
+    TATOR_COMPACT_LOCALIZATIONS = True  # stream-decode localization pages, keeping only the fields the app reads
+    TATOR_INCREMENTAL_SYNC = True  # QA/QC checks only download localizations changed since the last check
+    TATOR_IMAGE_CACHE_MAX_BYTES = 1024 * 1024 * 1024  # on-disk LRU for proxied frames and localization images
+    PHYLOGENY_NO_MATCH_TTL = 7 * 24 * 60 * 60  # seconds before a name WoRMS/VARS KB had no match for is looked up again
     VARS_ANNOSAURUS_URL = f'{HURLSTOR_URL}/anno/v1'
     VARS_KNOWLEDGE_BASE_URL = f'{HURLSTOR_URL}/kb/v1'
     VARS_VAMPIRE_SQUID_URL = f'{HURLSTOR_URL}/vam/v1'
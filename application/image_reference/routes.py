@@ -2,6 +2,7 @@ import requests
 from flask import current_app, flash, render_template, redirect, request
 
 from . import image_reference_bp
+from application.image_review.review_record_cache import ReviewRecordCache
 
 
 @image_reference_bp.get('')
@@ -45,6 +46,7 @@ def add_image_reference():
                 'attracted': request.form.get('attracted'),
             },
         )
+    ReviewRecordCache.default().invalidate()  # image review pages show which records are image references
     return res.json(), res.status_code
 
 
@@ -54,6 +56,7 @@ def refresh_image_reference(image_reference_id):
         url=f'{current_app.config.get("DARC_REVIEW_URL")}/image-reference/refresh/{image_reference_id}',
         headers=current_app.config.get('DARC_REVIEW_HEADERS'),
     )
+    ReviewRecordCache.default().invalidate()
     return res.json(), res.status_code
 
 
@@ -75,4 +78,5 @@ def delete_image_reference():
             'tentative_id': request.values.get('tentative_id'),
         },
     )
+    ReviewRecordCache.default().invalidate()
     return res.json(), res.status_code
@@ -9,10 +9,12 @@ from json import JSONDecodeError
 
 from flask import current_app
 
+from application.util.compact_record import CompactRecord
 from application.util.functions import format_annotator, parse_datetime
 from application.util.constants import TERM_RED, TERM_NORMAL
 from application.util.phylogeny_cache import PhylogenyCache
-from application.tator.tator_rest_client import TatorRestClient
+from application.tator.tator_annotator_cache import TatorAnnotatorCache
+from application.tator.tator_client_registry import get_tator_client
 
 
 class CommentProcessor:
@@ -24,7 +26,7 @@ class CommentProcessor:
         self.comments = comments
         self.annosaurus_url = annosaurus_url
         self.vars_kb_url = vars_kb_url
-        self.tator_client = TatorRestClient(tator_url, tator_token) if tator_token else None
+        self.tator_client = get_tator_client(tator_url, tator_token) if tator_token else None
         self.distilled_records = []
         self.missing_records = []
         self.no_match_records = set()
@@ -50,6 +52,16 @@ class CommentProcessor:
                 chunk = list(media_ids)[i:i + 300]
                 localizations += self.tator_client.get_localizations(current_app.config.get('TATOR_PROJECT_ID'), media_ids=chunk)
 
+        # names for tator comments saved without an annotator, resolved in one batch
+        tator_annotators = {}
+        if self.tator_client:
+            tator_annotators = TatorAnnotatorCache.default().get_names(self.tator_client, [
+                localization['created_by'] for localization in localizations
+                if localization['elemental_id'] in self.comments
+                and not self.comments[localization['elemental_id']].get('annotator')
+                and localization.get('created_by') is not None
+            ])
+
         # fetch all VARS annotations in parallel
         vars_uuids = [comment for comment in self.comments if self.is_vars_annotation(comment)]
         vars_annotations = {}
@@ -141,7 +153,10 @@ class CommentProcessor:
                     comment_dict['media_id'] = annotation['media']
                     comment_dict['frame'] = annotation['frame']
                     comment_dict['recorded_timestamp'] = parse_datetime(annotation['recorded_timestamp']).strftime('%d %b %y %H:%M:%S UTC') if 'recorded_timestamp' in annotation.keys() else None
-                    comment_dict['annotator'] = format_annotator(annotation['observer']) if 'observer' in annotation.keys() else self.comments[comment]['annotator']
+                    if 'observer' in annotation.keys():
+                        comment_dict['annotator'] = format_annotator(annotation['observer'])
+                    else:
+                        comment_dict['annotator'] = self.comments[comment].get('annotator') or tator_annotators.get(annotation.get('created_by'))
                     if annotation.get('attributes'):
                         comment_dict['attracted'] = annotation['attributes'].get('Attracted')
                         comment_dict['frame_url'] = f'/tator/frame/{annotation["media"]}/{annotation["frame"]}'
@@ -156,7 +171,8 @@ class CommentProcessor:
                 else:
                     comment_dict['all_localizations'] = [{}]
             if concept_name and concept_name not in self.phylogeny.data and concept_name not in self.no_match_records:
-                self.phylogeny.fetch_worms(concept_name)
+                if not self.phylogeny.fetch_worms(concept_name):
+                    self.no_match_records.add(concept_name)
             if concept_name in self.phylogeny.data:
                 for key in self.phylogeny.data[concept_name].keys():
                     # split to account for worms 'Phylum (Division)' case
@@ -164,51 +180,7 @@ class CommentProcessor:
             formatted_comments.append(comment_dict)
 
         # add to dataframe for sorting
-        annotation_df = pd.DataFrame(formatted_comments, columns=[
-            'observation_uuid',
-            'concept',
-            'scientific_name',
-            'associations',
-            'all_localizations',
-            'attracted',
-            'categorical_abundance',
-            'identification_remarks',
-            'identified_by',
-            'notes',
-            'qualifier',
-            'reason',
-            'morphospecies',
-            'tentative_id',
-            'identity_certainty',
-            'identity_reference',
-            'guide_photo',
-            'good_image',
-            'media_id',
-            'frame',
-            'comment',
-            'image_url',
-            'frame_url',
-            'video_url',
-            'upon',
-            'recorded_timestamp',
-            'video_sequence_name',
-            'annotator',
-            'depth',
-            'phylum',
-            'subphylum',
-            'superclass',
-            'class',
-            'subclass',
-            'superorder',
-            'order',
-            'suborder',
-            'infraorder',
-            'superfamily',
-            'family',
-            'subfamily',
-            'genus',
-            'species'
-        ])
+        annotation_df = pd.DataFrame(formatted_comments, columns=list(CommentRecord.FIELDS))
         annotation_df = annotation_df.sort_values(by=[
             'phylum',
             'subphylum',
@@ -232,11 +204,10 @@ class CommentProcessor:
         annotation_df = annotation_df.replace({pd.NA: None, np.nan: None})
         temp_record_list = annotation_df.to_dict(orient='records')
         for record in temp_record_list:
-            anno_dict = {}
-            for key, value in record.items():
-                if value is not None:
-                    anno_dict[key] = value
-            self.distilled_records.append(anno_dict)
+            self.distilled_records.append(CommentRecord.from_values(
+                record.values(),
+                [value is not None for value in record.values()],
+            ))
         print('processed!')
         self.phylogeny.save()
 
@@ -250,3 +221,24 @@ class CommentProcessor:
             return uuid, res.json()
         except JSONDecodeError:
             return uuid, None
+
+
+class CommentRecord(CompactRecord):
+    """One commented VARS annotation or Tator localization in CommentProcessor.distilled_records."""
+
+    __slots__ = ()
+
+    FIELDS = (
+        'observation_uuid', 'concept', 'scientific_name', 'associations', 'all_localizations', 'attracted',
+        'categorical_abundance', 'identification_remarks', 'identified_by', 'notes', 'qualifier', 'reason',
+        'morphospecies', 'tentative_id', 'identity_certainty', 'identity_reference', 'guide_photo', 'good_image',
+        'media_id', 'frame', 'comment', 'image_url', 'frame_url', 'video_url', 'upon', 'recorded_timestamp',
+        'video_sequence_name', 'annotator', 'depth', 'phylum', 'subphylum', 'superclass', 'class', 'subclass',
+        'superorder', 'order', 'suborder', 'infraorder', 'superfamily', 'family', 'subfamily', 'genus', 'species',
+    )
+    INTERNED_FIELDS = frozenset((
+        'concept', 'scientific_name', 'attracted', 'categorical_abundance', 'identified_by', 'qualifier', 'reason',
+        'morphospecies', 'tentative_id', 'identity_certainty', 'upon', 'video_sequence_name', 'annotator', 'phylum',
+        'subphylum', 'superclass', 'class', 'subclass', 'superorder', 'order', 'suborder', 'infraorder', 'superfamily',
+        'family', 'subfamily', 'genus', 'species',
+    ))
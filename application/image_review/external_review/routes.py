@@ -2,6 +2,7 @@
 Endpoints related to external reviewers.
 
 /image-review/external-review [GET]
+/image-review/external-review/annotations [GET]
 /image-review/external-review/annotation [POST, DELETE]
 /image-review/external-review/reviewer-list [GET]
 /image-review/external-review/reviewer [POST]
@@ -18,15 +19,16 @@ from flask import current_app, flash, redirect, render_template, request, sessio
 from . import external_review_bp
 from application.vars.annosaurus import Annosaurus
 from application.image_review.external_review.comment_processor import CommentProcessor
+from application.image_review.review_query import drop_record_set, flatten_associations, get_record_set, review_page
+from application.image_review.review_record_cache import ReviewRecordCache
+from application.tator.tator_record_cache import TatorRecordCache
+
+SOURCE_ARGS = ('reviewer', 'read', 'unread')
 
 
 # displays comments in the external review db
 @external_review_bp.get('')
 def get_external_review():
-    comments = []
-    unread_comments = 0
-    read_comments = 0
-    total_comments = 0
     if 'tator_token' in session.keys():
         # verify we're logged in
         try:
@@ -37,6 +39,33 @@ def get_external_review():
         except tator.openapi.tator_openapi.exceptions.ApiException:
             flash('Error connecting to Tator', 'danger')
             return redirect('/')
+    reviewer_str = f'({request.args.get("reviewer")})' if request.args.get('reviewer') else ''
+    drop_record_set('external-review', request.args, SOURCE_ARGS)  # a page load shows current records
+    data = {
+        'annotations_url': '/image-review/external-review/annotations',
+        'title': f'External Review {reviewer_str}',
+        'tab_title': f'External Review {reviewer_str}',
+        'concepts': session.get('vars_concepts', []),
+        'reviewers': session.get('reviewers', []),
+    }
+    return render_template('/image_review/image-review.html', data=data)
+
+
+# one page of the commented annotations for the external review page, filtered/sorted by the request args (see review_page)
+@external_review_bp.get('/annotations')
+def get_external_review_annotations():
+    try:
+        return review_page(get_record_set('external-review', request.args, SOURCE_ARGS, build_record_set), request.args)
+    except ValueError as e:
+        return {'error': str(e)}, 400
+
+
+def build_record_set() -> dict:
+    """Fetches the comments selected by the request args (reviewer, read/unread) and the annotations they're on."""
+    comments = []
+    unread_comments = 0
+    read_comments = 0
+    total_comments = 0
     try:
         print('Fetching external comments...', end='')
         sys.stdout.flush()
@@ -97,24 +126,17 @@ def get_external_review():
         tator_url=current_app.config.get('TATOR_URL'),
         tator_token=session.get('tator_token'),
     )
-    if len(comment_loader.distilled_records) < 1:
-        if request.args.get('unread'):
-            return render_template('errors/404.html', err='unread'), 404
-        return render_template('errors/404.html', err='comments'), 404
-    data = {
-        'annotations': comment_loader.distilled_records,
-        'title': f'External Review {"(" + request.args.get("reviewer") + ")" if request.args.get("reviewer") else ""}',
-        'tab_title': f'External Review {"(" + request.args.get("reviewer") + ")" if request.args.get("reviewer") else ""}',
-        'concepts': session.get('vars_concepts', []),
-        'reviewers': session.get('reviewers', []),
+    return {
+        'annotations': [flatten_associations(record) for record in comment_loader.distilled_records],
         'comments': comments,
-        'missing_records': comment_loader.missing_records,
-        'unread_comment_count': unread_comments,
-        'read_comment_count': read_comments,
-        'total_comment_count': total_comments,
-        'image_refs': image_refs,
+        'meta': {
+            'missing_records': comment_loader.missing_records,
+            'unread_comment_count': unread_comments,
+            'read_comment_count': read_comments,
+            'total_comment_count': total_comments,
+            'image_refs': image_refs,
+        },
     }
-    return render_template('/image_review/image-review.html', data=data)
 
 
 # adds an annotation for review/updates the reviewer for an annotation
@@ -148,6 +170,8 @@ def add_external_review():
                     attributes={'Notes': new_notes},
                 )
             )
+            TatorRecordCache.default().invalidate()
+        ReviewRecordCache.default().invalidate()  # the comment is part of every view's record set
         return {}, status_code
     data = {
         'uuid': request.values.get('observation_uuid'),
@@ -215,6 +239,7 @@ def delete_external_review():
                     attributes={'Notes': '|'.join(current_notes)},
                 )
             )
+            TatorRecordCache.default().invalidate()
         else:  # VARS annotation
             annosaurus = Annosaurus(current_app.config.get('VARS_ANNOSAURUS_URL'))
             annosaurus.update_annotation_comment(
@@ -222,6 +247,7 @@ def delete_external_review():
                 reviewers=[],
                 client_secret=current_app.config.get('ANNOSAURUS_CLIENT_SECRET')
             )
+        ReviewRecordCache.default().invalidate()
         return {}, 200
     return {}, 500
 
@@ -0,0 +1,237 @@
+"""
+Server-side filtering, sorting and cursor pagination for the image review pages.
+
+The image review pages used to embed every record in the HTML and filter, sort and paginate them in image-review.js.
+They now render a shell and fetch one page at a time from an /annotations endpoint, which builds the records once
+(see ReviewRecordCache) and applies the same filters and sorts the page exposes before slicing out the page.
+"""
+
+import base64
+import binascii
+import json
+import math
+
+from application.image_review.review_record_cache import ReviewRecordCache
+from application.tator.tator_type import TatorLocalizationType
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+# filter name (as used in the page's url hash) -> record key it matches against
+FILTER_FIELDS = {
+    'phylum': 'phylum',
+    'class': 'class',
+    'order': 'order',
+    'family': 'family',
+    'genus': 'genus',
+    'species': 'species',
+    'attracted': 'attracted',
+    'annotator': 'annotator',
+    'id_certainty': 'identity_certainty',
+    'comment': 'comment',
+    'concept': 'concept',
+    'identified_by': 'identified_by',
+    'morphospecies': 'morphospecies',
+    'notes': 'notes',
+    'qualifier': 'qualifier',
+    'reason': 'reason',
+    'tentative_id': 'tentative_id',
+    'scientific_name': 'scientific_name',
+}
+SPECIAL_FILTERS = ('video_sequence', 'deployment', 'guide_photo', 'good_image', 'localization_type')
+
+# sorting by a rank breaks ties by the ranks below it
+TAXON_SORT_RANKS = ('phylum', 'class', 'order', 'family', 'genus', 'species', 'tentative_id')
+NUMERIC_SORT_KEYS = ('depth', 'identity_reference')
+SORT_KEYS = {
+    'Timestamp': 'recorded_timestamp',
+    'ID Reference': 'identity_reference',
+}
+
+# VARS associations that the page shows (and filters/sorts on) as their own fields
+ASSOCIATION_TO_CONCEPT = ('guide-photo', 'upon')
+ASSOCIATION_LINK_VALUE = ('identity-certainty', 'identity-reference', 'comment')
+
+
+def flatten_associations(record):
+    """Copies a VARS annotation's guide photo, upon, ID certainty, ID reference and comment associations to fields."""
+    for association in record.get('associations') or []:
+        if association['link_name'] in ASSOCIATION_TO_CONCEPT:
+            record[association['link_name'].replace('-', '_')] = association.get('to_concept')
+        elif association['link_name'] in ASSOCIATION_LINK_VALUE:
+            record[association['link_name'].replace('-', '_')] = association.get('link_value')
+    return record
+
+
+def _clean_filter_value(filter_value: str) -> str:
+    return filter_value.lower().replace('%20', ' ').replace('%22', '"')
+
+
+def matches(record_value, filter_value: str) -> bool:
+    """
+    Case-insensitive match of a record value against a filter value: quoted values (e.g. "Porifera") must match
+    exactly, unquoted values match as a substring.
+    """
+    if record_value is None:
+        return False
+    record_value = str(record_value).lower()
+    filter_value = _clean_filter_value(filter_value)
+    if len(filter_value) > 2 and filter_value.startswith('"') and filter_value.endswith('"'):
+        return record_value == filter_value[1:-1]
+    return filter_value in record_value
+
+
+def _is_localization_type(record, is_box: bool) -> bool:
+    localizations = record.get('all_localizations')
+    if not localizations:
+        return False
+    if is_box:
+        return TatorLocalizationType.is_box(localizations[0]['type'])
+    return TatorLocalizationType.is_dot(localizations[0]['type'])
+
+
+def filter_records(records: list, filters: dict) -> list:
+    """Returns the records that match every filter (filter name -> value, see FILTER_FIELDS and SPECIAL_FILTERS)."""
+    for name, record_key in FILTER_FIELDS.items():
+        if filters.get(name):
+            records = [record for record in records if matches(record.get(record_key), filters[name])]
+    sequence = filters.get('video_sequence') or filters.get('deployment')
+    if sequence:
+        records = [record for record in records if matches(record.get('video_sequence_name'), sequence)]
+    if filters.get('guide_photo'):
+        if filters['guide_photo'].lower() == 'any':
+            records = [record for record in records if record.get('guide_photo')]
+        else:
+            records = [record for record in records if matches(record.get('guide_photo'), filters['guide_photo'])]
+    if filters.get('good_image'):
+        records = [record for record in records if record.get('good_image')]
+    if filters.get('localization_type'):
+        is_box = 'box' in filters['localization_type'].lower()
+        records = [record for record in records if _is_localization_type(record, is_box)]
+    return records
+
+
+def _number(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.inf
+
+
+def sort_records(records: list, sort: str) -> list:
+    """
+    Sorts records by one of the page's sort options ('Default' keeps the order they were built in). Records missing
+    the sort field go to the bottom.
+    """
+    sort = (sort or 'Default').replace('%20', ' ')
+    if sort == 'Default':
+        return list(records)
+    if sort == 'Timestamp':
+        # tator localizations have no recorded timestamp, order them by where they are in the video instead
+        records = sorted(records, key=lambda record: (record.get('media_id') or 0, record.get('frame') or 0))
+    key = SORT_KEYS.get(sort, sort.lower())
+    present = [record for record in records if record.get(key)]
+    missing = [record for record in records if not record.get(key)]
+    if key in NUMERIC_SORT_KEYS:
+        present.sort(key=lambda record: _number(record[key]))
+    elif key in TAXON_SORT_RANKS[:-2]:
+        ranks = TAXON_SORT_RANKS[TAXON_SORT_RANKS.index(key):]
+        present.sort(key=lambda record: tuple((not record.get(rank), str(record.get(rank) or '')) for rank in ranks))
+    else:
+        present.sort(key=lambda record: str(record[key]).lower())
+    return present + missing
+
+
+def encode_cursor(records: list, offset: int) -> str:
+    """Opaque cursor for the page starting at offset: the offset plus the uuid of the record just before it."""
+    cursor = {'offset': offset, 'after': records[offset - 1]['observation_uuid'] if offset > 0 else None}
+    return base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+
+
+def decode_cursor(records: list, cursor: str) -> int:
+    """
+    Offset of the page a cursor points at. The cursor resumes after the record it was made from, so records removed
+    or added earlier in the list since the previous page (e.g. a comment marked read) don't shift or skip records.
+    Raises ValueError for a malformed cursor.
+    """
+    try:
+        decoded = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        offset, after = int(decoded['offset']), decoded['after']
+    except (binascii.Error, json.JSONDecodeError, UnicodeDecodeError, KeyError, TypeError) as e:
+        raise ValueError(f'Invalid cursor: {cursor}') from e
+    if after is None or (0 < offset <= len(records) and records[offset - 1]['observation_uuid'] == after):
+        return offset
+    for index, record in enumerate(records):
+        if record['observation_uuid'] == after:
+            return index + 1
+    return offset
+
+
+def _json_value(value):
+    """Converts a record value for JSON: NaN (which pandas leaves in some fields) isn't valid JSON."""
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, list):
+        return [_json_value(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _json_value(item) for key, item in value.items()}
+    return value
+
+
+def get_record_set(view: str, args, source_args: tuple[str, ...], build, scope: str = None) -> dict:
+    """
+    The record set for a view from ReviewRecordCache, calling build() to make it on a miss or when the request has
+    refresh=true (sent by the page after it edits a record).
+
+    :param scope: Identifies the caller for views whose records depend on it (e.g. the Tator token), so one session's
+        records are never served to another.
+    """
+    cache = ReviewRecordCache.default()
+    key = cache.key(view, args, source_args, scope)
+    record_set = None if args.get('refresh') == 'true' else cache.get(key)
+    if record_set is None:
+        record_set = build()
+        cache.set(key, record_set)
+    return record_set
+
+
+def drop_record_set(view: str, args, source_args: tuple[str, ...], scope: str = None):
+    """Deletes the cached record set get_record_set would return, so the next request builds it (e.g. on page load)."""
+    cache = ReviewRecordCache.default()
+    cache.delete(cache.key(view, args, source_args, scope))
+
+
+def review_page(record_set: dict, args) -> dict:
+    """
+    One page of a record set as a JSON-ready dict, filtered and sorted by the request args.
+
+    Args: any of FILTER_FIELDS or SPECIAL_FILTERS, 'sort', 'limit', and either 'cursor' (from a previous response's
+    next_cursor/prev_cursor) or 'page' (1-based, for jumping to a page number). 'meta=true' adds the record set's meta
+    for the page header, which the page only needs with its first request. Raises ValueError for a bad cursor.
+    """
+    limit = min(max(args.get('limit', DEFAULT_PAGE_SIZE, type=int) or DEFAULT_PAGE_SIZE, 1), MAX_PAGE_SIZE)
+    filters = {name: args.get(name) for name in (*FILTER_FIELDS, *SPECIAL_FILTERS) if args.get(name)}
+    records = sort_records(filter_records(record_set['annotations'], filters), args.get('sort'))
+    total = len(records)
+    if args.get('cursor'):
+        offset = decode_cursor(records, args['cursor'])
+    else:
+        offset = ((args.get('page', 1, type=int) or 1) - 1) * limit
+    offset = min(max(offset, 0), total)
+    page = records[offset:offset + limit]
+    comments = record_set.get('comments') or {}
+    response = {
+        'annotations': [_json_value(dict(record)) for record in page],
+        'comments': {
+            record['observation_uuid']: comments[record['observation_uuid']]
+            for record in page if record['observation_uuid'] in comments
+        },
+        'total': total,
+        'page': offset // limit + 1,
+        'page_count': math.ceil(total / limit),
+        'next_cursor': encode_cursor(records, offset + limit) if offset + limit < total else None,
+        'prev_cursor': encode_cursor(records, max(offset - limit, 0)) if offset > 0 else None,
+    }
+    if args.get('meta') == 'true':
+        response['meta'] = record_set.get('meta', {})
+    return response
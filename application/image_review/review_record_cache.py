@@ -0,0 +1,65 @@
+import hashlib
+import os
+
+from cachelib import BaseCache, FileSystemCache
+
+CACHE_DIR = os.path.join('cache', 'image_review')
+RECORD_SET_TTL = 60 * 60  # long enough to page through a deployment, edits and page loads rebuild it sooner
+MAX_ENTRIES = 50
+GENERATION_KEY = 'generation'
+
+
+class ReviewRecordCache:
+    """
+    The record sets behind the paginated image review endpoints, so paging, filtering and sorting through a deployment
+    reads the records that were built for its first page instead of fetching and processing them again per request.
+
+    A record set is a dict with the page's 'annotations' (in default order), the external review 'comments' keyed by
+    observation uuid, and 'meta' for the page header (title, deployments, comment counts, etc). Entries are keyed by
+    the view and the request args that select its records (e.g. project and sections), not by filter, sort or page, plus
+    a scope for views whose records depend on who is asking (the Tator token). Keys also include a generation counter
+    that invalidate() bumps, which the edit routes call so every cached record set is dropped in one write, and the
+    page routes delete their record set so a full page load always builds fresh records.
+    """
+
+    _default = None
+
+    def __init__(self, backend: BaseCache = None):
+        self._backend = backend or FileSystemCache(cache_dir=CACHE_DIR, threshold=MAX_ENTRIES, default_timeout=0)
+
+    @classmethod
+    def default(cls) -> 'ReviewRecordCache':
+        """Process-wide cache under cache/image_review."""
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    def key(self, view: str, args, source_args: tuple[str, ...], scope: str = None) -> str:
+        """
+        Key for the records a view selects with source_args from the request args (a werkzeug MultiDict), for the
+        caller identified by scope (if the records depend on it).
+        """
+        digest = hashlib.sha256(view.encode())
+        for arg in source_args:
+            digest.update(repr((arg, args.getlist(arg))).encode())
+        digest.update(repr(('scope', scope)).encode())
+        return f'{view}:{self.generation()}:{digest.hexdigest()}'
+
+    def get(self, key: str) -> dict | None:
+        return self._backend.get(key)
+
+    def set(self, key: str, record_set: dict):
+        self._backend.set(key, record_set, timeout=RECORD_SET_TTL)
+
+    def delete(self, key: str):
+        self._backend.delete(key)
+
+    def generation(self) -> int:
+        return self._backend.get(GENERATION_KEY) or 0
+
+    def invalidate(self):
+        """Drops every cached record set (e.g. after an annotation or comment was edited)."""
+        self._backend.set(GENERATION_KEY, self.generation() + 1, timeout=0)
+
+    def clear(self):
+        self._backend.clear()
@@ -9,6 +9,10 @@ import * as Icons from '../../static/js/icons.js';
 const guidePhotoVals = ['1 best', '2 good', '3 okay', ''];
 const sequences = [];
 
+// the image review pages fetch their annotations a page at a time from annotationsUrl (filtered and sorted by the
+// server), the qaqc pages embed all of their annotations and filter/sort/paginate them here
+const serverPaginated = typeof annotationsUrl !== 'undefined';
+
 for (const annotation of annotations) {
     if (!annotation.associations) {
         continue;
@@ -28,6 +32,15 @@ let paginationLimit = 25;
 let annotationsToDisplay = [...annotations];
 let filterTatorCtdNotes = false; // this is just here for tator qaqc
 
+// server pagination state
+let loadedQuery = null; // filters/sort/page/limit of the annotations that are loaded
+let latestRequest = 0;
+let nextCursor = null;
+let prevCursor = null;
+let pendingCursor = null; // {page, cursor} for the page the prev/next buttons are going to
+let staleRecords = false; // set after a record on the page is edited so the server rebuilds its records
+let metaLoaded = false;
+
 const getPaginationNumbers = () => {
     $('#pagination-numbers').empty();
     for (let i = 1; i <= pageCount; i++) {
@@ -63,18 +76,33 @@ const handleActivePageNumber = () => {
 };
 
 const setCurrentPage = (pageNum) => {
-    const prevRange = (pageNum - 1) * paginationLimit;
-    const currRange = pageNum * paginationLimit;
     const prevHash = window.location.hash.substring(0, window.location.hash.indexOf('pg='));
-    const prevPage = currentPage;
 
-    saveScrollPosition(prevPage);
+    saveScrollPosition(currentPage);
+
+    if (serverPaginated) {
+        // the page is fetched when the hash changes (see updateHash)
+        if (pageNum === currentPage + 1 && nextCursor) {
+            pendingCursor = { page: pageNum, cursor: nextCursor };
+        } else if (pageNum === currentPage - 1 && prevCursor) {
+            pendingCursor = { page: pageNum, cursor: prevCursor };
+        }
+        location.hash = prevHash.length > 1 ? `${prevHash}pg=${pageNum}` : `#pg=${pageNum}`;
+        return;
+    }
 
     currentPage = pageNum;
     location.hash = prevHash.length > 1 ? `${prevHash}pg=${pageNum}` : `#pg=${pageNum}`;
 
     handleActivePageNumber();
     handlePageButtonsStatus();
+    renderPage();
+};
+
+// renders the current page of annotationsToDisplay (which is only the current page when paginated by the server)
+const renderPage = () => {
+    const prevRange = serverPaginated ? 0 : (currentPage - 1) * paginationLimit;
+    const currRange = prevRange + Number(paginationLimit);
 
     $('#annotationTable tbody').remove();
     $('#annotationTable').append('<tbody class="text-start"></tbody>');
@@ -266,8 +294,14 @@ export function updateHash() {
     const hash = url.hash.slice(1);
     const filterPairs = hash.split('&');
     const filter = {};
+    let sort = 'Default';
+
+    if (serverPaginated && !hash.includes('pg=')) {
+        location.replace(`#sort=Default&pg=1`); // fetches the first page when the hash changes
+        return;
+    }
 
-    annotationsToDisplay = [...annotations];
+    annotationsToDisplay = serverPaginated ? annotations : [...annotations];
 
     filterPairs.pop(); // pop page number
 
@@ -276,6 +310,9 @@ export function updateHash() {
         const value = pair.split('=')[1];
         if (key !== 'sort') {
             filter[key] = value;
+        } else if (serverPaginated) {
+            sort = value;
+            $('#sortSelect').val(value.replaceAll('%20', ' '));
         } else {
             sortBy(value);
         }
@@ -349,6 +386,11 @@ export function updateHash() {
     `);
     autocomplete($('#imageFilterEntry'), allConcepts);
 
+    if (serverPaginated) {
+        fetchPage(filter, sort);
+        return;
+    }
+
     annotationsToDisplay = applyFilters(annotationsToDisplay, filter, filterTatorCtdNotes);
 
     if (!annotationsToDisplay.length) {
@@ -374,6 +416,125 @@ export function updateHash() {
     $('#totalPageNumBottom').html(pageCount);
 }
 
+// fetches the page in the hash from the server, or re-renders it if it's already loaded (e.g. after an edit)
+async function fetchPage(filter, sort) {
+    const hash = window.location.hash;
+    const pageNum = parseInt(hash.slice(hash.indexOf('pg=') + 3)) || 1;
+    const params = new URLSearchParams(window.location.search);
+    for (const [key, value] of Object.entries(filter)) {
+        params.set(key, value);
+    }
+    params.set('sort', sort);
+    params.set('limit', paginationLimit);
+    const query = `${params.toString()}&pg=${pageNum}`;
+
+    if (query === loadedQuery) {
+        // a record on this page was changed here, show the change now and get fresh records on the next fetch
+        staleRecords = true;
+        renderPage();
+        return;
+    }
+
+    if (pendingCursor?.page === pageNum) {
+        params.set('cursor', pendingCursor.cursor);
+    } else {
+        params.set('page', pageNum);
+    }
+    pendingCursor = null;
+    if (staleRecords) {
+        params.set('refresh', 'true');
+    }
+    if (!metaLoaded) {
+        params.set('meta', 'true');
+    }
+
+    const thisRequest = ++latestRequest;
+    $('#load-overlay').removeClass('loader-bg-hidden');
+    $('#load-overlay').addClass('loader-bg');
+    const res = await fetch(`${annotationsUrl}?${params.toString()}`);
+    const json = await res.json().catch(() => ({}));
+    if (thisRequest !== latestRequest) {
+        return; // the hash changed again while this page was loading
+    }
+    $('#load-overlay').addClass('loader-bg-hidden');
+    $('#load-overlay').removeClass('loader-bg');
+    if (!res.ok) {
+        updateFlashMessages(json.error || 'Unable to load annotations - please try again', 'danger');
+        return;
+    }
+
+    loadedQuery = query;
+    staleRecords = false;
+    if (json.meta) {
+        applyMeta(json.meta);
+        metaLoaded = true;
+    }
+    annotations.splice(0, annotations.length, ...json.annotations);
+    Object.assign(comments, json.comments);
+    nextCursor = json.next_cursor;
+    prevCursor = json.prev_cursor;
+    currentPage = json.page;
+    pageCount = json.page_count;
+
+    if (!json.total) {
+        $('#404').show();
+    } else {
+        $('#404').hide();
+    }
+
+    getPaginationNumbers();
+    handlePageButtonsStatus();
+    renderPage();
+
+    $('#annotationCount').html(json.total);
+    $('#annotationCountBottom').html(json.total);
+    $('#totalPageNum').html(pageCount);
+    $('#totalPageNumBottom').html(pageCount);
+}
+
+// fills in the page header from the meta the server sends with the first page
+function applyMeta(meta) {
+    if (meta.title) {
+        $('#title').html(meta.title);
+    }
+    if (meta.tab_title) {
+        document.title = `${meta.tab_title} | DARC Image Review`;
+    }
+    if (meta.deployments) {
+        $('#sequenceList').html(meta.deployments);
+    }
+    if (meta.highest_id_ref) {
+        $('#editIdRef').attr('placeholder', `Current highest ID reference: ${meta.highest_id_ref}`);
+    }
+    if (meta.image_refs) {
+        imageReferences = meta.image_refs;
+    }
+    if (meta.total_comment_count !== undefined) {
+        $('#totalCommentCount').html(meta.total_comment_count);
+        $('#unreadCommentCount').html(meta.unread_comment_count);
+        $('#readCommentCount').html(meta.read_comment_count);
+    }
+    if (meta.comments_unavailable) {
+        updateFlashMessages('Unable to load comments from the external review server - comments are not shown', 'warning');
+    }
+    if (meta.missing_records?.length) {
+        missingRecords = meta.missing_records;
+        showMissingRecords();
+    }
+}
+
+function showMissingRecords() {
+    $('#missingRecordTable').find('tbody').append(missingRecords.map((record) =>
+        `<tr>
+            <td>${record.sequence}</td>
+            <td>${record.timestamp}</td>
+            <td>${record.annotator}</td>
+            <td><a href="${record.image_url}" target="_blank" class="aquaLink" style="font-weight: 600;">Link</a></td>
+        </tr>`
+    ));
+    $('#missingRecordsModal').modal('show');
+}
+
 function applyFilters(annotationList, filterObj, filterCtdNotes) {
     const filterMap = {
         phylum: 'phylum',
@@ -703,6 +864,16 @@ document.addEventListener('DOMContentLoaded', function(event) {
 
     $('#paginationSelect').on('change', () => {
         paginationLimit = $('#paginationSelect').val();
+        if (serverPaginated) {
+            const pageOneHash = `${window.location.hash.substring(0, window.location.hash.indexOf('pg='))}pg=1`;
+            saveScrollPosition(currentPage);
+            if (window.location.hash === pageOneHash) {
+                updateHash();
+            } else {
+                location.hash = pageOneHash;
+            }
+            return;
+        }
         pageCount = Math.ceil(annotationsToDisplay.length / paginationLimit);
         getPaginationNumbers();
         setCurrentPage(1);
@@ -740,15 +911,7 @@ $(document).ready(()=> {
         $('[data-toggle="tooltip"]').tooltip('dispose');
     });
     if (missingRecords?.length) {
-        $('#missingRecordTable').find('tbody').append(missingRecords.map((record) =>
-            `<tr>
-                <td>${record.sequence}</td>
-                <td>${record.timestamp}</td>
-                <td>${record.annotator}</td>
-                <td><a href="${record.image_url}" target="_blank" class="aquaLink" style="font-weight: 600;">Link</a></td>
-            </tr>`
-        ));
-        $('#missingRecordsModal').modal('show');
+        showMissingRecords();
     }
 
     $('#editVarsAnnotationModal').on('show.bs.modal', function (e) {
@@ -812,6 +975,7 @@ $(document).ready(()=> {
         $(this).find('#editLocalizationIdType').val(JSON.stringify(localization.all_localizations.map((loc) => {
             return { elemental_id: loc.elemental_id, version: loc.version, type: loc.type };
         })));
+        $(this).find('#editLocalizationProject').val(new URLSearchParams(window.location.search).get('project') ?? '');
         $(this).find('#baseUuid').val(localization.observation_uuid);
     });
 });
@@ -6,6 +6,8 @@ import * as Icons from '../../static/js/icons.js';
 export const tatorLocalizationRow = (localization, externalComment) => {
     const previewFrameUrl = localization.frame_url ? `${localization.frame_url}?preview=true` : localization.image_url;
     let localizationBoxId = null;
+    let localizationBoxVersion = null;
+    let localizationBoxGeometry = null;
     let imageRefKey = localization.scientific_name;
     let scientificTentative = localization.scientific_name;
     if (localization.tentative_id) {
@@ -21,6 +23,8 @@ export const tatorLocalizationRow = (localization, externalComment) => {
     for (const loco of localization.all_localizations) {
         if (TatorLocalizationType.isBox(loco.type)) {
             localizationBoxId = loco.id;
+            localizationBoxVersion = loco.version;
+            localizationBoxGeometry = [...loco.points, ...loco.dimensions].join(',');
             break;
         }
     }
@@ -267,7 +271,7 @@ export const tatorLocalizationRow = (localization, externalComment) => {
                                         return `<span
                                                     class="position-absolute tator-box"
                                                     style="top: ${loco.points[1] * 100}%; left: ${loco.points[0] * 100}%; width: ${loco.dimensions[0] * 100}%; height: ${loco.dimensions[1] * 100}%;"
-                                                    onmouseover="mouseOver('${localization.observation_uuid}', '${localizationBoxId}')"
+                                                    onmouseover="mouseOver('${localization.observation_uuid}', '${localizationBoxId}', '${localizationBoxVersion}', '${localizationBoxGeometry}')"
                                                 ></span>`;
                                     }
                                     return `<span class="position-absolute tator-dot" style="top: ${loco.points[1] * 100}%; left: ${loco.points[0] * 100}%;"></span>`;
@@ -379,6 +383,10 @@ export const tatorLocalizationRow = (localization, externalComment) => {
 
 async function updateGoodImage(localization_elemental_ids, version, checked) {
     const formData = new FormData();
+    const project = new URLSearchParams(window.location.search).get('project');
+    if (project) {
+        formData.append('project', project);
+    }
     formData.append('version', version);
     for (const elemental_id of JSON.parse(localization_elemental_ids.replaceAll('*', '"'))) {
         formData.append('localization_elemental_ids', elemental_id);
@@ -397,11 +405,11 @@ async function updateGoodImage(localization_elemental_ids, version, checked) {
 
 window.updateGoodImage = updateGoodImage;
 
-function mouseOver(uuid, boxId) {
+function mouseOver(uuid, boxId, boxVersion, boxGeometry) {
     if (boxId === 'null') return;
 
     const mainImage = $(`#${uuid}_img`);
-    const newImageUrl = `/tator/localization-image/${boxId}`;
+    const newImageUrl = `/tator/localization-image/${boxId}?version=${boxVersion}&box=${boxGeometry}`;
     const newImage = new Image();
 
     $(`#${uuid}_loading`).show();
@@ -1,17 +1,21 @@
 """
-Tator-specific image review endpoint.
+Tator-specific image review endpoints.
 
 /image-review/tator [GET]
+/image-review/tator/annotations [GET]
 """
-import json
-
 import tator
 import requests
 from flask import current_app, flash, render_template, redirect, request, session
 
 from . import tator_image_review_bp
+from application.image_review.review_query import drop_record_set, get_record_set, review_page
+from application.qaqc.tator.util import upstream_error_message
+from application.util.http_metrics import upstream_session
 from application.tator.tator_localization_processor import TatorLocalizationProcessor
 
+SOURCE_ARGS = ('project', 'section', 'media_id')
+
 
 # view all Tator annotations (localizations) in a specified project & section
 @tator_image_review_bp.get('')
@@ -21,43 +25,71 @@ def tator_image_review():
     if not request.args.get('project') or not request.args.getlist('section'):
         flash('Please select a project and a section', 'info')
         return redirect('/')
+    drop_record_set('tator', request.args, SOURCE_ARGS, session['tator_token'])  # a page load shows current records
+    data = {
+        'annotations_url': '/image-review/tator/annotations',
+        'concepts': session.get('vars_concepts', []),
+        'reviewers': session.get('reviewers', []),
+    }
+    return render_template('image_review/image-review.html', data=data)
+
+
+# one page of the localizations for the image review page, filtered/sorted by the request args (see review_page)
+@tator_image_review_bp.get('/annotations')
+def tator_image_review_annotations():
+    if 'tator_token' not in session.keys():
+        return {'error': 'Not logged in to Tator'}, 401
+    if not request.args.get('project') or not request.args.getlist('section'):
+        return {'error': 'project and section are required'}, 400
+    try:
+        record_set = get_record_set('tator', request.args, SOURCE_ARGS, build_record_set, session['tator_token'])
+        return review_page(record_set, request.args)
+    except ValueError as e:
+        return {'error': str(e)}, 400
+    except tator.openapi.tator_openapi.exceptions.ApiException as e:
+        return {'error': upstream_error_message(e)}, 400
+
+
+def build_record_set() -> dict:
+    """Fetches and processes the localizations for the request's project & sections (or media)."""
     project_id = int(request.args.get('project'))
     section_ids = request.args.getlist('section')
     media_ids = request.args.getlist('media_id')
-    try:
-        api = tator.get_api(
-            host=current_app.config.get('TATOR_URL'),
-            token=session['tator_token'],
-        )
-        localization_processor = TatorLocalizationProcessor(
-            project_id=project_id,
-            section_ids=section_ids,
-            tator_url=current_app.config.get('TATOR_URL'),
-            media_list=[{'id': int(mid)} for mid in media_ids] if media_ids else None,
-        )
-        localization_processor.fetch_localizations()
-        localization_processor.process_records()
-    except tator.openapi.tator_openapi.exceptions.ApiException as e:
-        flash(json.loads(e.body)['message'], 'danger')
-        return redirect('/')
+    api = tator.get_api(
+        host=current_app.config.get('TATOR_URL'),
+        token=session['tator_token'],
+    )
+    localization_processor = TatorLocalizationProcessor(
+        project_id=project_id,
+        section_ids=section_ids,
+        tator_url=current_app.config.get('TATOR_URL'),
+        media_list=[{'id': int(mid)} for mid in media_ids] if media_ids else None,
+    )
+    localization_processor.fetch_localizations(
+        max_workers=current_app.config.get('TATOR_FETCH_WORKERS'),
+        compact=current_app.config.get('TATOR_COMPACT_LOCALIZATIONS'),
+    )
+    localization_processor.process_records()
     comments = {}
     image_refs = {}
+    comments_unavailable = False
     # get comments and image ref list from external review db
     try:
         for section in localization_processor.sections:
-            comment_res = requests.get(
+            comment_res = upstream_session.get(
                     url=f'{current_app.config.get("DARC_REVIEW_URL")}/comment/sequence/{section.deployment_name.replace("-", "_")}',
                     headers=current_app.config.get('DARC_REVIEW_HEADERS'),
             )
             if comment_res.status_code != 200:
                 raise requests.exceptions.ConnectionError
             comments |= comment_res.json()  # merge dicts
-        image_ref_res = requests.get(f'{current_app.config.get("DARC_REVIEW_URL")}/image-reference/quick')
+        image_ref_res = upstream_session.get(f'{current_app.config.get("DARC_REVIEW_URL")}/image-reference/quick')
         if image_ref_res.status_code != 200:
             raise requests.exceptions.ConnectionError
         image_refs = image_ref_res.json()
     except requests.exceptions.ConnectionError:
-        print('\nERROR: unable to connect to external review server\n')
+        current_app.logger.warning('Unable to get comments and image references from the external review server')
+        comments_unavailable = True
     expedition_name = localization_processor.sections[0].expedition_name
     if media_ids:
         media_list = api.get_media_list(project_id, media_id=[int(mid) for mid in media_ids])
@@ -67,14 +99,14 @@ def tator_image_review():
     else:
         deployments_str = ', '.join([section.deployment_name for section in localization_processor.sections])
         tab_title = localization_processor.sections[0].deployment_name if len(localization_processor.sections) == 1 else expedition_name
-    data = {
+    return {
         'annotations': localization_processor.final_records,
-        'title': expedition_name,
-        'tab_title': tab_title,
-        'deployments': deployments_str,
-        'concepts': session.get('vars_concepts', []),
-        'reviewers': session.get('reviewers', []),
         'comments': comments,
-        'image_refs': image_refs,
+        'meta': {
+            'title': expedition_name,
+            'tab_title': tab_title,
+            'deployments': deployments_str,
+            'image_refs': image_refs,
+            'comments_unavailable': comments_unavailable,
+        },
     }
-    return render_template('image_review/image-review.html', data=data)
@@ -1,19 +1,51 @@
 """
-VARS-specific image review endpoint.
+VARS-specific image review endpoints.
 
 /image-review/vars [GET]
+/image-review/vars/annotations [GET]
 """
 
 import requests
 from flask import current_app, request, render_template, session
 
 from . import vars_image_review_bp
+from application.image_review.review_query import drop_record_set, flatten_associations, get_record_set, review_page
 from application.vars.vars_annotation_processor import VarsAnnotationProcessor
 
+SOURCE_ARGS = ('sequence',)
+
 
 # view VARS annotations with images in a specified dive (or dives)
 @vars_image_review_bp.get('')
 def view_images():
+    sequences = request.args.getlist('sequence')
+    if not sequences or any(sequence not in session.get('vars_video_sequences', []) for sequence in sequences):
+        return render_template('errors/404.html', err='dive'), 404
+    drop_record_set('vars', request.args, SOURCE_ARGS)  # a page load shows current records
+    data = {
+        'annotations_url': '/image-review/vars/annotations',
+        'title': ' '.join(sequences[0].split()[:-1]),
+        'tab_title': sequences[0] if len(sequences) == 1 else f'{sequences[0]} - {sequences[-1].split(" ")[-1]}',
+        'concepts': session.get('vars_concepts', []),
+        'reviewers': session.get('reviewers', []),
+    }
+    return render_template('image_review/image-review.html', data=data)
+
+
+# one page of the annotations for the image review page, filtered/sorted by the request args (see review_page)
+@vars_image_review_bp.get('/annotations')
+def view_images_annotations():
+    sequences = request.args.getlist('sequence')
+    if not sequences or any(sequence not in session.get('vars_video_sequences', []) for sequence in sequences):
+        return {'error': 'Dive not found'}, 404
+    try:
+        return review_page(get_record_set('vars', request.args, SOURCE_ARGS, build_record_set), request.args)
+    except ValueError as e:
+        return {'error': str(e)}, 400
+
+
+def build_record_set() -> dict:
+    """Fetches and processes the annotations with images in the request's sequences."""
     comments = {}
     sequences = request.args.getlist('sequence')
     # get comments from external review db
@@ -24,8 +56,6 @@ def view_images():
                     headers=current_app.config.get('DARC_REVIEW_HEADERS'),
             ) as res:
                 comments = comments | res.json()  # merge dicts
-            if sequence not in session.get('vars_video_sequences', []):
-                return render_template('errors/404.html', err='dive'), 404
     except requests.exceptions.ConnectionError:
         print('\nERROR: unable to connect to external review server\n')
     # get images in sequence
@@ -36,15 +66,11 @@ def view_images():
         vars_vam_url=current_app.config.get('VARS_VAMPIRE_SQUID_URL'),
     )
     image_loader.process_sequences()
-    if len(image_loader.final_records) < 1:
-        return render_template('errors/404.html', err='pics'), 404
-    data = {
-        'annotations': image_loader.final_records,
-        'highest_id_ref': image_loader.highest_id_ref,
-        'title': image_loader.vessel_name,
-        'tab_title': sequences[0] if len(sequences) == 1 else f'{sequences[0]} - {sequences[-1].split(" ")[-1]}',
-        'concepts': session.get('vars_concepts', []),
-        'reviewers': session.get('reviewers', []),
+    return {
+        'annotations': [flatten_associations(record) for record in image_loader.final_records],
         'comments': comments,
+        'meta': {
+            'title': image_loader.vessel_name,
+            'highest_id_ref': image_loader.highest_id_ref,
+        },
     }
-    return render_template('image_review/image-review.html', data=data)
@@ -5,9 +5,11 @@ import requests
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from json import JSONDecodeError
 
-from flask import Blueprint, current_app, flash, render_template, request, session
+from flask import Blueprint, Response, current_app, flash, render_template, request, session
 
 from application.util.constants import TERM_NORMAL, TERM_RED
+from application.util.http_metrics import HttpMetrics
+from application.util.phylogeny_store import PhylogenyStore
 
 
 main_bp = Blueprint('main_bp', __name__)
@@ -104,6 +106,24 @@ def video():
     return render_template('video.html', data=data), 200
 
 
+# upstream HTTP metrics (Tator, VARS, WoRMS, DARC review server) in Prometheus text format
+@main_bp.get('/metrics')
+def metrics():
+    return Response(HttpMetrics.default().prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# upstream HTTP metrics as JSON
+@main_bp.get('/metrics/json')
+def metrics_json():
+    return {'endpoints': HttpMetrics.default().snapshot()}, 200
+
+
+# forget the names WoRMS/VARS KB had no match for (all of them, or just ?name=) so they're looked up again
+@main_bp.delete('/phylogeny/no-match')
+def purge_phylogeny_no_matches():
+    return {'purged': PhylogenyStore.default().purge_no_matches(request.args.get('name'))}, 200
+
+
 def page_not_found(e):
     return render_template('errors/404.html', err=''), 404
 
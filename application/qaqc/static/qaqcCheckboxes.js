@@ -1,4 +1,5 @@
 import * as Icons from '../../static/js/icons.js';
+import { formattedNumber } from '../../static/js/util/formattedNumber.js';
 
 /** Returns the appropriate checkbox svg based on the number passed in (0 = not done, 1 = in progress, 2 = complete) */
 export function updateCheckbox(num) {
@@ -31,3 +32,29 @@ export function getCheckboxName(checklistItem) {
         .map((word, index) => index > 0 ? word.charAt(0).toUpperCase() + word.slice(1) : word)
         .join('') + 'Checkbox';
 }
+
+/**
+ * Fetches the number of records each check flags (one request for every check, see /check-counts) and shows it next
+ * to the check's link in the checklist table. Links are matched to counts by the check name in their href.
+ */
+export async function showCheckCounts(countsUrl) {
+    let counts;
+    try {
+        const res = await fetch(countsUrl);
+        if (!res.ok) {
+            return;
+        }
+        counts = await res.json();
+    } catch (error) {
+        console.error('Unable to get check counts', error);
+        return;
+    }
+    $('#checklistTable a').each((index, anchor) => {
+        const check = new URL(anchor.href, window.location.origin).pathname.split('/').pop();
+        if (!(check in counts)) {
+            return;
+        }
+        const count = counts[check];
+        $(anchor).after(`<span class="small ms-2 ${count ? 'text-danger' : 'text-secondary'}">(${formattedNumber(count)} ${count === 1 ? 'problem' : 'problems'})</span>`);
+    });
+}
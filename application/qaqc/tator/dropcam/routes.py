@@ -2,6 +2,7 @@
 Dropcam (dscm) QA/QC endpoints
 
 /qaqc/tator/dropcam/checklist [GET, PATCH]
+/qaqc/tator/dropcam/check-counts [GET]
 /qaqc/tator/dropcam/check/<check> [GET]
 /qaqc/tator/dropcam/attracted-list [GET]
 /qaqc/tator/dropcam/attracted [POST]
@@ -10,13 +11,21 @@ Dropcam (dscm) QA/QC endpoints
 from io import BytesIO
 
 import requests
+import tator
 from flask import current_app, flash, redirect, render_template, request, send_file, session
 
 from . import dropcam_qaqc_bp
 from application.tator.tator_dropcam_qaqc_processor import TatorDropcamQaqcProcessor
-from application.tator.tator_type import TatorLocalizationType
+from application.tator.tator_client_registry import get_tator_client
 from application.tator.tator_rest_client import TatorRestClient
-from application.qaqc.tator.util import init_tator_api, get_comments_and_image_refs
+from application.util.http_metrics import upstream_session
+from application.qaqc.tator.util import (
+    count_localizations,
+    get_comments_and_image_refs,
+    get_image_refs,
+    init_tator_api,
+    upstream_error_message,
+)
 
 
 # TODO cache this or at least call on different threads
@@ -41,15 +50,13 @@ def dropcam_qaqc_checklist():
     if not project_id or not section_ids:
         flash('Please select a project and section', 'info')
         return redirect('/')
-    tator_client = TatorRestClient(current_app.config.get('TATOR_URL'), session['tator_token'])
+    tator_client = get_tator_client(current_app.config.get('TATOR_URL'), session['tator_token'])
     _, deployment_names, expedition_name = _get_deployment_info(
         tator_client=tator_client,
         project_id=project_id,
         section_ids=section_ids,
     )
-    localizations = []
-    individual_count = 0
-    with requests.get(
+    with upstream_session.get(
             url=f'{current_app.config.get("DARC_REVIEW_URL")}/qaqc-checklist/tator-dropcam/{"&".join(deployment_names)}',
             headers=current_app.config.get('DARC_REVIEW_HEADERS'),
     ) as checklist_res:
@@ -58,26 +65,16 @@ def dropcam_qaqc_checklist():
         else:
             print('ERROR: Unable to get QAQC checklist from external review server')
             checklist = {}
-    for section_id in section_ids:
-        localizations += tator_client.get_localizations(project_id, section_id=int(section_id))
-    for localization in localizations:
-        if TatorLocalizationType.is_dot(localization['type']):
-            individual_count += 1
-            if localization['attributes'].get('Categorical Abundance', '--') != '--':
-                match localization['attributes']['Categorical Abundance']:
-                    case '20-49':
-                        individual_count += 35
-                    case '50-99':
-                        individual_count += 75
-                    case '100-999':
-                        individual_count += 500
-                    case '1000+':
-                        individual_count += 1000
+    localization_count, individual_count = count_localizations(
+        page
+        for section_id in section_ids
+        for page in tator_client.iter_localizations(project_id, section_id=int(section_id))
+    )
     data = {
         'title': expedition_name,
         'tab_title': deployment_names[0] if len(deployment_names) == 1 else expedition_name,
         'deployment_names': deployment_names,
-        'localization_count': len(localizations),
+        'localization_count': localization_count,
         'individual_count': individual_count,
         'checklist': checklist,
     }
@@ -92,7 +89,7 @@ def patch_dropcam_qaqc_checklist():
     if not deployments:
         return {}, 400
     req_json.pop('deployments')
-    res = requests.patch(
+    res = upstream_session.patch(
         url=f'{current_app.config.get("DARC_REVIEW_URL")}/qaqc-checklist/tator-dropcam/{deployments}',
         headers=current_app.config.get('DARC_REVIEW_HEADERS'),
         json=req_json,
@@ -100,6 +97,43 @@ def patch_dropcam_qaqc_checklist():
     return res.json(), res.status_code
 
 
+# number of records each checklist check flags, from one fetch and one pass over the localizations
+@dropcam_qaqc_bp.get('/check-counts')
+def dropcam_qaqc_check_counts():
+    project_id = request.args.get('project', type=int)
+    section_ids = request.args.getlist('section')
+    if 'tator_token' not in session.keys():
+        return {'error': 'Not logged in to Tator'}, 401
+    if not project_id or not section_ids:
+        return {'error': 'project and section are required'}, 400
+    image_refs = get_image_refs()
+    try:
+        attracted_res = upstream_session.get(
+            url=f'{current_app.config.get("DARC_REVIEW_URL")}/attracted',
+            headers=current_app.config.get('DARC_REVIEW_HEADERS'),
+        )
+        attracted_res.raise_for_status()
+        attracted_concepts = attracted_res.json()
+        qaqc_annos = TatorDropcamQaqcProcessor(
+            project_id=project_id,
+            section_ids=section_ids,
+            darc_review_url=current_app.config.get('DARC_REVIEW_URL'),
+            tator_url=current_app.config.get('TATOR_URL'),
+        )
+        qaqc_annos.fetch_localizations(
+            max_workers=current_app.config.get('TATOR_FETCH_WORKERS'),
+            compact=current_app.config.get('TATOR_COMPACT_LOCALIZATIONS'),
+            incremental=current_app.config.get('TATOR_INCREMENTAL_SYNC'),
+        )
+        return qaqc_annos.checklist_counts(attracted_dict=attracted_concepts, image_refs=image_refs or None)
+    except ValueError as e:
+        return {'error': str(e)}, 400
+    except requests.exceptions.RequestException as e:
+        return {'error': upstream_error_message(e)}, 400
+    except tator.openapi.tator_openapi.exceptions.ApiException as e:
+        return {'error': upstream_error_message(e)}, 400
+
+
 # individual qaqc checks
 @dropcam_qaqc_bp.get('/check/<check>')
 def dropcam_qaqc(check):
@@ -111,7 +145,7 @@ def dropcam_qaqc(check):
     tator_api, err = init_tator_api()
     if err:
         return err
-    tator_client = TatorRestClient(current_app.config.get('TATOR_URL'), session['tator_token'])
+    tator_client = get_tator_client(current_app.config.get('TATOR_URL'), session['tator_token'])
     media_list, deployment_names, expedition_name = _get_deployment_info(
         tator_client=tator_client,
         project_id=project_id,
@@ -146,7 +180,11 @@ def dropcam_qaqc(check):
         darc_review_url=current_app.config.get('DARC_REVIEW_URL'),
         tator_url=current_app.config.get('TATOR_URL'),
     )
-    qaqc_annos.fetch_localizations()
+    qaqc_annos.fetch_localizations(
+        max_workers=current_app.config.get('TATOR_FETCH_WORKERS'),
+        compact=current_app.config.get('TATOR_COMPACT_LOCALIZATIONS'),
+        incremental=current_app.config.get('TATOR_INCREMENTAL_SYNC'),
+    )
     match check:
         case 'names-accepted':
             qaqc_annos.check_names_accepted()
@@ -159,7 +197,7 @@ def dropcam_qaqc(check):
             qaqc_annos.check_stet_reason()
             data['page_title'] = 'Records with a qualifier of \'stet\' missing \'Reason\''
         case 'attracted-not-attracted':
-            attracted_concepts = requests.get(url=f'{current_app.config.get("DARC_REVIEW_URL")}/attracted').json()
+            attracted_concepts = upstream_session.get(url=f'{current_app.config.get("DARC_REVIEW_URL")}/attracted').json()
             qaqc_annos.check_attracted_not_attracted(attracted_concepts)
             data['page_title'] = 'Attracted/not attracted match expected taxa list'
             data['subtitle'] = '(also flags records with taxa that can be either)'
@@ -191,12 +229,12 @@ def dropcam_qaqc(check):
         case 'unique-taxa':
             qaqc_annos.get_unique_taxa()
             data['page_title'] = 'All unique taxa'
-            data['unique_taxa'] = qaqc_annos.final_records
+            data['unique_taxa'] = qaqc_annos.format_times(qaqc_annos.final_records)
             return render_template('qaqc/tator/qaqc-tables.html', data=data)
         case 'summary':
             qaqc_annos.get_summary()
             data['page_title'] = 'Summary'
-            data['annotations'] = qaqc_annos.final_records
+            data['annotations'] = qaqc_annos.format_times(qaqc_annos.final_records)
             data['media_id_names'] = {media['id']: media['name'] for media in media_list}
             return render_template('qaqc/tator/qaqc-tables.html', data=data)
         case 'max-n':
@@ -223,14 +261,14 @@ def dropcam_qaqc(check):
 # view list of saved attracted/non-attracted taxa
 @dropcam_qaqc_bp.get('/attracted-list')
 def attracted_list():
-    res = requests.get(url=f'{current_app.config.get("DARC_REVIEW_URL")}/attracted')
+    res = upstream_session.get(url=f'{current_app.config.get("DARC_REVIEW_URL")}/attracted')
     return render_template('qaqc/tator/dropcam/attracted-list.html', attracted_concepts=res.json()), 200
 
 
 # add a new concept to the attracted collection
 @dropcam_qaqc_bp.post('/attracted')
 def add_attracted():
-    res = requests.post(
+    res = upstream_session.post(
         url=f'{current_app.config.get("DARC_REVIEW_URL")}/attracted',
         headers=current_app.config.get('DARC_REVIEW_HEADERS'),
         data={
@@ -248,7 +286,7 @@ def add_attracted():
 # update an existing attracted concept
 @dropcam_qaqc_bp.patch('/attracted/<concept>')
 def update_attracted(concept):
-    res = requests.patch(
+    res = upstream_session.patch(
         url=f'{current_app.config.get("DARC_REVIEW_URL")}/attracted/{concept}',
         headers=current_app.config.get('DARC_REVIEW_HEADERS'),
         data={'attracted': request.values.get('attracted')},
@@ -261,7 +299,7 @@ def update_attracted(concept):
 # delete an attracted concept
 @dropcam_qaqc_bp.delete('/attracted/<concept>')
 def delete_attracted(concept):
-    res = requests.delete(
+    res = upstream_session.delete(
         url=f'{current_app.config.get("DARC_REVIEW_URL")}/attracted/{concept}',
         headers=current_app.config.get('DARC_REVIEW_HEADERS'),
     )
@@ -1,4 +1,4 @@
-import { getCheckboxName, updateCheckbox, updateTaskCount } from '../../../static/qaqcCheckboxes.js';
+import { getCheckboxName, showCheckCounts, updateCheckbox, updateTaskCount } from '../../../static/qaqcCheckboxes.js';
 import { formattedNumber } from '../../../../static/js/util/formattedNumber.js';
 
 function showLoader() {
@@ -84,6 +84,10 @@ document.addEventListener('DOMContentLoaded',  (event) => {
     $('#tofaAnchor').attr('href', `/qaqc/tator/dropcam/check/tofa?${urlParams}`);
     $('#tofaAnchor').on('click', () => showLoader());
     $('#imageGuideAnchor').attr('href', `/qaqc/tator/dropcam/check/image-guide?${urlParams}`);
+
+    if (localizationCount) {
+        showCheckCounts(`/qaqc/tator/dropcam/check-counts?${urlParams}`);
+    }
 });
 
 // get rid of loading screen if back button is pressed (mozilla)
@@ -2,18 +2,21 @@
 Sub exploratory/transect QA/QC endpoints
 
 /qaqc/tator/sub/checklist [GET, PATCH]
+/qaqc/tator/sub/check-counts [GET]
 /qaqc/tator/sub/check/<check> [GET]
 """
 from io import BytesIO
 
 import requests
+import tator
 from flask import current_app, flash, redirect, render_template, request, session, send_file
 
 from application.tator.tator_sub_qaqc_processor import TatorSubQaqcProcessor
 from . import sub_qaqc_bp
+from application.tator.tator_client_registry import get_tator_client
 from application.tator.tator_rest_client import TatorRestClient
-from application.tator.tator_type import TatorLocalizationType
-from application.qaqc.tator.util import init_tator_api, get_comments_and_image_refs
+from application.util.http_metrics import upstream_session
+from application.qaqc.tator.util import count_localizations, init_tator_api, get_comments_and_image_refs, upstream_error_message
 
 
 # TODO cache this or at least call on different threads
@@ -52,38 +55,30 @@ def sub_qaqc_checklist():
         flash('Please select a project and section', 'info')
         return redirect('/')
     media_ids = request.args.getlist('media_id')
-    tator_client = TatorRestClient(current_app.config.get('TATOR_URL'), session['tator_token'])
+    tator_client = get_tator_client(current_app.config.get('TATOR_URL'), session['tator_token'])
     media_list, deployment_names, expedition_name, sub_type = _get_deployment_info(
         tator_client=tator_client,
         project_id=project_id,
         section_ids=section_ids,
         media_ids=media_ids,
     )
-    localizations = []
     if media_ids:
         deployment_list = [media['name'] for media in media_list]
         media_ids_for_fetch = [media['id'] for media in media_list]
-        for i in range(0, len(media_ids_for_fetch), 50):
-            localizations += tator_client.get_localizations(project_id, media_ids=media_ids_for_fetch[i:i + 50])
+        localization_pages = (
+            page
+            for i in range(0, len(media_ids_for_fetch), 50)
+            for page in tator_client.iter_localizations(project_id, media_ids=media_ids_for_fetch[i:i + 50])
+        )
     else:
         deployment_list = deployment_names
-        for section_id in section_ids:
-            localizations += tator_client.get_localizations(project_id, section_id=int(section_id))
-    individual_count = 0
-    for localization in localizations:
-        if TatorLocalizationType.is_dot(localization['type']):
-            individual_count += 1
-            if localization['attributes'].get('Categorical Abundance', '--') != '--':
-                match localization['attributes']['Categorical Abundance']:
-                    case '20-49':
-                        individual_count += 35
-                    case '50-99':
-                        individual_count += 75
-                    case '100-999':
-                        individual_count += 500
-                    case '1000+':
-                        individual_count += 1000
-    with requests.get(
+        localization_pages = (
+            page
+            for section_id in section_ids
+            for page in tator_client.iter_localizations(project_id, section_id=int(section_id))
+        )
+    localization_count, individual_count = count_localizations(localization_pages)
+    with upstream_session.get(
             url=f'{current_app.config.get("DARC_REVIEW_URL")}/qaqc-checklist/tator-sub/{"&".join(media_ids or section_ids)}',
             headers=current_app.config.get('DARC_REVIEW_HEADERS'),
     ) as checklist_res:
@@ -97,7 +92,7 @@ def sub_qaqc_checklist():
         'title': expedition_name + title_suffix,
         'tab_title': (deployment_list[0] if len(deployment_list) == 1 else expedition_name) + title_suffix,
         'deployment_list': deployment_list,
-        'localization_count': len(localizations),
+        'localization_count': localization_count,
         'individual_count': individual_count,
         'checklist': checklist,
     }
@@ -113,13 +108,48 @@ def patch_sub_qaqc_checklist():
         return {'error': 'Section IDs or media IDs are required'}, 400
     req_json.pop('sectionIds')
     req_json.pop('mediaIds')
-    res = requests.patch(
+    res = upstream_session.patch(
         url=f'{current_app.config.get("DARC_REVIEW_URL")}/qaqc-checklist/tator-sub/{media_ids or section_ids}',
         headers=current_app.config.get('DARC_REVIEW_HEADERS'),
         json=req_json,
     )
     return res.json(), res.status_code
 
+
+# number of records each checklist check flags, from one fetch and one pass over the localizations
+@sub_qaqc_bp.get('/check-counts')
+def sub_qaqc_check_counts():
+    project_id = request.args.get('project', type=int)
+    section_ids = request.args.getlist('section')
+    media_ids = request.args.getlist('media_id')
+    if 'tator_token' not in session.keys():
+        return {'error': 'Not logged in to Tator'}, 401
+    if not project_id or not section_ids:
+        return {'error': 'project and section are required'}, 400
+    tator_client = get_tator_client(current_app.config.get('TATOR_URL'), session['tator_token'])
+    try:
+        media_list = [tator_client.get_media_by_id(int(media_id)) for media_id in media_ids]
+        qaqc_annos = TatorSubQaqcProcessor(
+            project_id=project_id,
+            section_ids=section_ids,
+            media_list=media_list or None,
+            darc_review_url=current_app.config.get('DARC_REVIEW_URL'),
+            tator_url=current_app.config.get('TATOR_URL'),
+        )
+        qaqc_annos.fetch_localizations(
+            max_workers=current_app.config.get('TATOR_FETCH_WORKERS'),
+            compact=current_app.config.get('TATOR_COMPACT_LOCALIZATIONS'),
+            incremental=current_app.config.get('TATOR_INCREMENTAL_SYNC'),
+        )
+        return qaqc_annos.checklist_counts()
+    except ValueError as e:
+        return {'error': str(e)}, 400
+    except requests.exceptions.RequestException as e:
+        return {'error': upstream_error_message(e)}, 400
+    except tator.openapi.tator_openapi.exceptions.ApiException as e:
+        return {'error': upstream_error_message(e)}, 400
+
+
 # individual qaqc checks
 @sub_qaqc_bp.get('/check/<check>')
 def sub_qaqc(check):
@@ -132,7 +162,7 @@ def sub_qaqc(check):
     tator_api, err = init_tator_api()
     if err:
         return err
-    tator_client = TatorRestClient(current_app.config.get('TATOR_URL'), session['tator_token'])
+    tator_client = get_tator_client(current_app.config.get('TATOR_URL'), session['tator_token'])
     media_list, deployment_names, expedition_name, sub_type = _get_deployment_info(
         tator_client=tator_client,
         project_id=project_id,
@@ -173,7 +203,11 @@ def sub_qaqc(check):
         darc_review_url=current_app.config.get('DARC_REVIEW_URL'),
         tator_url=current_app.config.get('TATOR_URL'),
     )
-    qaqc_annos.fetch_localizations()
+    qaqc_annos.fetch_localizations(
+        max_workers=current_app.config.get('TATOR_FETCH_WORKERS'),
+        compact=current_app.config.get('TATOR_COMPACT_LOCALIZATIONS'),
+        incremental=current_app.config.get('TATOR_INCREMENTAL_SYNC'),
+    )
     match check:
         case 'names-accepted':
             qaqc_annos.check_names_accepted()
@@ -226,7 +260,7 @@ def sub_qaqc(check):
         case 'summary':
             qaqc_annos.get_summary()
             data['page_title'] = 'Summary'
-            data['annotations'] = qaqc_annos.final_records
+            data['annotations'] = qaqc_annos.format_times(qaqc_annos.final_records)
             data['media_id_names'] = {media['id']: media['name'] for media in media_list}
             return render_template('qaqc/tator/qaqc-tables.html', data=data)
         case 'image-guide':
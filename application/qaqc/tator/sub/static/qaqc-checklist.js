@@ -1,4 +1,4 @@
-import { getCheckboxName, updateCheckbox, updateTaskCount } from '../../../static/qaqcCheckboxes.js';
+import { getCheckboxName, showCheckCounts, updateCheckbox, updateTaskCount } from '../../../static/qaqcCheckboxes.js';
 import { formattedNumber } from '../../../../static/js/util/formattedNumber.js';
 
 function showLoader() {
@@ -88,6 +88,10 @@ document.addEventListener('DOMContentLoaded', (event) => {
     $('#summaryAnchor').attr('href', `${qaqcCheckRoute}/summary?${urlParams}`);
     $('#summaryAnchor').on('click', () => showLoader());
     $('#imageGuideAnchor').attr('href', `${qaqcCheckRoute}/image-guide?${urlParams}`);
+
+    if (localizationCount) {
+        showCheckCounts(`/qaqc/tator/sub/check-counts?${urlParams}`);
+    }
 });
 
 // get rid of loading screen if back button is pressed (mozilla)
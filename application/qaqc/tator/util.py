@@ -1,9 +1,13 @@
 import json
+from collections.abc import Iterable
 
 import tator
 import requests
 from flask import current_app, flash, redirect, session
 
+from application.tator.tator_type import TatorLocalizationType
+from application.util.http_metrics import upstream_session
+
 
 def init_tator_api():
     if 'tator_token' not in session:
@@ -20,6 +24,19 @@ def init_tator_api():
         return None, redirect('/')
 
 
+def upstream_error_message(e: Exception) -> str:
+    """
+    The message from an error response's body ({"message": ...}, as Tator sends it), or else the error itself. Takes
+    requests errors and the tator client's ApiException.
+    """
+    try:
+        if getattr(e, 'body', None):  # ApiException
+            return json.loads(e.body)['message']
+        return e.response.json()['message']
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return str(e)
+
+
 # TODO - either update review server to allow batch requests by sequence, or use threading to make this faster
 def get_comments_and_image_refs(deployment_names: list[str]) -> tuple[dict, dict]:
     comments = {}
@@ -27,17 +44,55 @@ def get_comments_and_image_refs(deployment_names: list[str]) -> tuple[dict, dict
     try:
         for deployment in deployment_names:
             print(f'Getting comments for deployment {deployment}...')
-            comment_res = requests.get(
+            comment_res = upstream_session.get(
                 url=f'{current_app.config.get("DARC_REVIEW_URL")}/comment/sequence/{deployment}',
                 headers=current_app.config.get('DARC_REVIEW_HEADERS'),
             )
             if comment_res.status_code != 200:
                 raise requests.exceptions.ConnectionError
             comments |= comment_res.json()
-        image_ref_res = requests.get(f'{current_app.config.get("DARC_REVIEW_URL")}/image-reference/quick')
-        if image_ref_res.status_code != 200:
-            raise requests.exceptions.ConnectionError
-        image_refs = image_ref_res.json()
+        image_refs = _fetch_image_refs()
     except requests.exceptions.ConnectionError:
         print('\nERROR: unable to connect to external review server\n')
     return comments, image_refs
+
+
+def get_image_refs() -> dict:
+    """The image references from the external review server, without any comments ({} if it can't be reached)."""
+    try:
+        return _fetch_image_refs()
+    except requests.exceptions.ConnectionError:
+        print('\nERROR: unable to connect to external review server\n')
+        return {}
+
+
+def _fetch_image_refs() -> dict:
+    image_ref_res = upstream_session.get(f'{current_app.config.get("DARC_REVIEW_URL")}/image-reference/quick')
+    if image_ref_res.status_code != 200:
+        raise requests.exceptions.ConnectionError
+    return image_ref_res.json()
+
+
+def count_localizations(localization_pages: Iterable[list[dict]]) -> tuple[int, int]:
+    """
+    Returns (localization count, individual count) for the checklist header. Consumes localizations page by page so
+    the caller never needs to hold an entire deployment in memory just to count it.
+    """
+    localization_count = 0
+    individual_count = 0
+    for page in localization_pages:
+        localization_count += len(page)
+        for localization in page:
+            if TatorLocalizationType.is_dot(localization['type']):
+                individual_count += 1
+                if localization['attributes'].get('Categorical Abundance', '--') != '--':
+                    match localization['attributes']['Categorical Abundance']:
+                        case '20-49':
+                            individual_count += 35
+                        case '50-99':
+                            individual_count += 75
+                        case '100-999':
+                            individual_count += 500
+                        case '1000+':
+                            individual_count += 1000
+    return localization_count, individual_count
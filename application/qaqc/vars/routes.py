@@ -8,12 +8,12 @@ VARS-specific QA/QC endpoints
 
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
-import requests
 from flask import current_app, render_template, request, session
 
 from . import vars_qaqc_bp
 from application.vars.vars_qaqc_processor import VarsQaqcProcessor
 from application.util.constants import TERM_NORMAL, TERM_RED
+from application.util.http_metrics import upstream_session
 
 
 # qaqc checklist page for vars
@@ -26,7 +26,7 @@ def vars_qaqc_checklist():
         'true_localizations': 0,  # number of bounding box associations in dive
         'group_localizations': 0,  # number of annotations marked 'group: localization'
     }
-    with requests.get(
+    with upstream_session.get(
             url=f'{current_app.config.get("DARC_REVIEW_URL")}/qaqc-checklist/vars/{"&".join(request.args.getlist("sequence"))}',
             headers=current_app.config.get('DARC_REVIEW_HEADERS'),
     ) as checklist_res:
@@ -59,7 +59,7 @@ def get_sequence_counts(sequence_name, vars_dive_url):
     sequence_individuals = 0
     sequence_true_localizations = 0
     sequence_group_localizations = 0
-    res = requests.get(f'{vars_dive_url}/query/dive/{sequence_name.replace(" ", "%20")}')
+    res = upstream_session.get(f'{vars_dive_url}/query/dive/{sequence_name.replace(" ", "%20")}')
     if res.status_code != 200:
         print(res.text)
         print(f'{TERM_RED}Failed to fetch annotations for sequence {sequence_name}{TERM_NORMAL}')
@@ -122,7 +122,7 @@ def patch_vars_qaqc_checklist():
     if not sequences:
         return {}, 400
     req_json.pop('sequences')
-    res = requests.patch(
+    res = upstream_session.patch(
         url=f'{current_app.config.get("DARC_REVIEW_URL")}/qaqc-checklist/vars/{sequences}',
         headers=current_app.config.get('DARC_REVIEW_HEADERS'),
         json=req_json,
@@ -0,0 +1,350 @@
+import asyncio
+import threading
+from collections.abc import AsyncIterator, Collection
+from email.utils import parsedate_to_datetime
+from time import perf_counter, time
+
+import httpx
+import requests
+
+from application.tator.tator_json_stream import iter_json_array, select_fields
+from application.tator.tator_metadata_cache import MEDIA_TTL, SECTION_TTL, USER_TTL, TatorMetadataCache
+from application.tator.tator_rest_client import (
+    DEFAULT_POOL_MAXSIZE,
+    DEFAULT_TIMEOUT,
+    LOCALIZATION_PAGE_SIZE,
+    RETRYABLE_STATUS_CODES,
+    TatorRestClient,
+    token_hash,
+)
+from application.util.http_metrics import HttpMetrics
+
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 1
+BACKOFF_MAX = 120  # seconds, urllib3's cap
+RETRY_AFTER_STATUS_CODES = frozenset({413, 429, 503})  # statuses whose Retry-After header urllib3 honors
+LOOP_THREAD_NAME = 'tator-async'
+
+
+class AsyncTatorRestClient:
+    """
+    asyncio counterpart of TatorRestClient, for callers that fan out many Tator requests at once (e.g. every frame in
+    an image guide) without an OS thread per request.
+
+    Every request goes through one httpx.AsyncClient, so keep-alive connections are pooled across all coroutines, and
+    at most ``max_concurrency`` requests are in flight at a time no matter how many coroutines are waiting. Requests
+    are retried like TatorRestClient's urllib3 policy: up to 3 retries of connection errors, read errors and 5xx
+    responses, sleeping 0, 2 and 4 seconds (or the server's Retry-After) in between, with the same timeouts. Errors are
+    raised as the same ``requests`` exceptions TatorRestClient raises, so existing ``except`` clauses keep working.
+
+    Section, media and user lookups share TatorRestClient's TatorMetadataCache. Use from a single event loop; Flask
+    routes and other synchronous code should go through SyncTatorRestClient.
+    """
+
+    def __init__(
+        self,
+        tator_url: str,
+        token: str,
+        max_concurrency: int = DEFAULT_POOL_MAXSIZE,
+        metadata_cache: TatorMetadataCache = None,
+        transport: httpx.AsyncBaseTransport = None,
+    ):
+        self.base_url = tator_url
+        self._headers = {
+            'Content-Type': 'application/json',
+            'Authorization': f'Token {token}',
+        }
+        self._token_hash = token_hash(token)
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+            timeout=httpx.Timeout(DEFAULT_TIMEOUT[1], connect=DEFAULT_TIMEOUT[0]),
+            transport=transport,
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._metadata_cache = metadata_cache or TatorMetadataCache.default()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Closes the pooled keep-alive connections."""
+        await self._client.aclose()
+
+    async def get_localizations(self, project_id: int, section_id: int = None, media_ids: list[int] = None) -> list:
+        return [
+            localization
+            async for page in self.iter_localizations(project_id, section_id=section_id, media_ids=media_ids)
+            for localization in page
+        ]
+
+    async def iter_localizations(
+        self,
+        project_id: int,
+        section_id: int = None,
+        media_ids: list[int] = None,
+        page_size: int = LOCALIZATION_PAGE_SIZE,
+        fields: Collection[str] = None,
+        modified_since: str = None,
+    ) -> AsyncIterator[list[dict]]:
+        """
+        Yields localizations one page at a time, walking pages with Tator's ``after`` cursor like
+        TatorRestClient.iter_localizations. If fields is given, each localization is cut down to just those top-level
+        keys (plus ``id``) as the page is decoded.
+        """
+        if fields is not None:
+            fields = ('id', *(field for field in fields if field != 'id'))
+        if media_ids is not None:
+            url = f'{self.base_url}/rest/Localizations/{project_id}?media_id={",".join(str(m) for m in media_ids)}'
+        elif section_id is not None:
+            url = f'{self.base_url}/rest/Localizations/{project_id}?section={section_id}'
+        else:
+            raise ValueError('Must provide either section or media_id')
+        after = None
+        while True:
+            params = {'stop': page_size}
+            if after is not None:
+                params['after'] = after
+            if modified_since is not None:
+                params['attribute_gte'] = f'$modified_datetime::{modified_since}'
+                params['show_deleted'] = 1
+            res = await self._get(url, params=params)
+            self._raise_for_status(res)
+            if fields is None:
+                page = res.json()
+            else:
+                page = [select_fields(localization, fields) for localization in iter_json_array([res.content])]
+            if page:
+                yield page
+            if len(page) < page_size:
+                return
+            after = page[-1]['id']
+
+    async def get_section_by_id(self, section_id: int) -> dict:
+        url = f'{self.base_url}/rest/Section/{section_id}'
+        return await self._get_cached_json(self._cache_key('section', section_id), url, ttl=SECTION_TTL)
+
+    async def get_medias_for_sections(self, project_id: int, section_ids: list[int]) -> list:
+        url = f'{self.base_url}/rest/Medias/{project_id}?multi_section={",".join([str(s) for s in section_ids])}'
+        key = self._cache_key(
+            'medias', project_id, ','.join(str(s) for s in sorted(section_ids)), self._metadata_cache.media_generation(),
+        )
+        return await self._get_cached_json(key, url, ttl=MEDIA_TTL)
+
+    async def get_media_by_id(self, media_id: int) -> dict:
+        url = f'{self.base_url}/rest/Media/{media_id}'
+        key = self._cache_key('media', media_id, self._metadata_cache.media_generation())
+        return await self._get_cached_json(key, url, ttl=MEDIA_TTL)
+
+    async def get_substrates(
+        self,
+        project_id: int,
+        section_ids: list[int] = None,
+        media_list: list[dict] = None,
+    ) -> list[dict]:
+        """Returns substrates grouped by media ID, sorted by timestamp."""
+        if section_ids is None and media_list is None:
+            raise ValueError('Must provide either section_ids or media_ids')
+        if media_list is None:
+            media_list = await self.get_medias_for_sections(project_id, section_ids)
+        states = await self.get_states(project_id, [media['id'] for media in media_list])
+        return TatorRestClient._group_substrates(states, media_list)
+
+    async def get_states(self, project_id: int, media_ids: list[int]) -> list[dict]:
+        res = await self._get(f'{self.base_url}/rest/States/{project_id}?media_id={",".join([str(m) for m in media_ids])}')
+        self._raise_for_status(res)
+        return res.json()
+
+    async def get_user(self, user_id: int) -> dict:
+        url = f'{self.base_url}/rest/User/{user_id}'
+        return await self._get_cached_json(self._cache_key('user', user_id), url, ttl=USER_TTL)
+
+    async def get_frame(self, media_id: int, frame: int = None, quality: int = None) -> bytes:
+        params = {}
+        if frame is not None:
+            params['frames'] = frame
+        if quality is not None:
+            params['quality'] = quality
+        res = await self._get(f'{self.base_url}/rest/GetFrame/{media_id}', params=params)
+        self._raise_for_status(res)
+        return res.content
+
+    async def get_localization_graphic(self, localization_id: int) -> bytes:
+        res = await self._get(f'{self.base_url}/rest/LocalizationGraphic/{localization_id}')
+        self._raise_for_status(res)
+        return res.content
+
+    def _cache_key(self, kind: str, *parts) -> str:
+        """Metadata cache key, scoped to this client's token so one token never reads what only another may see."""
+        return ':'.join((kind, self.base_url, self._token_hash, *(str(part) for part in parts)))
+
+    async def _get_cached_json(self, key: str, url: str, ttl: int):
+        """GETs url through the metadata cache, revalidating stale entries like TatorRestClient._get_cached_json."""
+        entry = self._metadata_cache.get(key)
+        if entry is not None and TatorMetadataCache.is_fresh(entry, ttl):
+            return entry['body']
+        headers = None
+        if entry is not None:
+            headers = {**self._headers, **TatorMetadataCache.validators(entry)}
+        res = await self._get(url, headers=headers)
+        if entry is not None and res.status_code == 304:
+            self._metadata_cache.touch(key, entry)
+            return entry['body']
+        self._raise_for_status(res)
+        body = res.json()
+        self._metadata_cache.set(
+            key,
+            body,
+            etag=res.headers.get('ETag'),
+            last_modified=res.headers.get('Last-Modified'),
+        )
+        return body
+
+    async def _get(self, url: str, params: dict = None, headers: dict = None) -> httpx.Response:
+        """
+        GETs url with the retry policy described on the class, holding one of the ``max_concurrency`` slots for the
+        whole request (retries and backoff included). The body is read before returning.
+        """
+        # merged rather than passed as params=, which would replace the query already in url (e.g. ?section=)
+        request = self._client.build_request(
+            'GET', httpx.URL(url).copy_merge_params(params or {}), headers=headers or self._headers,
+        )
+        retries = 0
+        start = perf_counter()
+        async with self._semaphore:
+            while True:
+                res = None
+                try:
+                    res = await self._client.send(request)
+                except httpx.TransportError as e:
+                    if retries == MAX_RETRIES:
+                        HttpMetrics.default().record('GET', str(request.url), 'error', perf_counter() - start)
+                        raise self._as_requests_error(e) from e
+                else:
+                    if res.status_code not in RETRYABLE_STATUS_CODES:
+                        HttpMetrics.default().record(
+                            'GET', str(request.url), res.status_code, perf_counter() - start, len(res.content), retries,
+                        )
+                        return res
+                    if retries == MAX_RETRIES:
+                        HttpMetrics.default().record(
+                            'GET', str(request.url), res.status_code, perf_counter() - start, len(res.content), retries,
+                        )
+                        raise requests.exceptions.RetryError(
+                            f'Max retries exceeded with url: {request.url} (too many {res.status_code} error responses)',
+                            response=res,
+                        )
+                retries += 1
+                await asyncio.sleep(self._retry_delay(retries, res))
+
+    @staticmethod
+    def _retry_delay(retries: int, res: httpx.Response | None) -> float:
+        """Seconds to wait before retry number ``retries``, as urllib3's Retry(backoff_factor=1) would."""
+        if res is not None and res.status_code in RETRY_AFTER_STATUS_CODES and res.headers.get('Retry-After'):
+            retry_after = res.headers['Retry-After'].strip()
+            if retry_after.isdigit():
+                return float(retry_after)
+            try:
+                return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time())
+            except (TypeError, ValueError):
+                pass
+        if retries <= 1:
+            return 0.0
+        return float(min(BACKOFF_MAX, BACKOFF_FACTOR * 2 ** (retries - 1)))
+
+    @staticmethod
+    def _raise_for_status(res: httpx.Response):
+        """Raises requests.HTTPError for 4xx/5xx responses, like requests.Response.raise_for_status."""
+        if res.status_code >= 400:
+            kind = 'Client' if res.status_code < 500 else 'Server'
+            raise requests.exceptions.HTTPError(
+                f'{res.status_code} {kind} Error: {res.reason_phrase} for url: {res.url}',
+                response=res,
+            )
+
+    @staticmethod
+    def _as_requests_error(e: httpx.TransportError) -> requests.exceptions.RequestException:
+        if isinstance(e, httpx.ConnectTimeout):
+            return requests.exceptions.ConnectTimeout(str(e))
+        if isinstance(e, httpx.TimeoutException):
+            return requests.exceptions.ReadTimeout(str(e))
+        if isinstance(e, httpx.NetworkError):
+            return requests.exceptions.ConnectionError(str(e))
+        return requests.exceptions.RequestException(str(e))
+
+
+class SyncTatorRestClient:
+    """
+    Blocking facade over AsyncTatorRestClient with TatorRestClient's method names, so synchronous code (Flask routes,
+    processors) can use it unchanged, or hand a batch of coroutines to ``gather`` to run them concurrently:
+
+        client = SyncTatorRestClient(tator_url, token)
+        sections = client.gather(*(client.async_client.get_section_by_id(section_id) for section_id in section_ids))
+
+    Coroutines run on one process-wide event loop in a background thread, so calling from a thread that already runs
+    an event loop is fine (asyncio.run would fail there), and the async client's connection pool outlives each call.
+    """
+
+    _loop = None
+    _loop_lock = threading.Lock()
+
+    def __init__(self, tator_url: str, token: str, max_concurrency: int = DEFAULT_POOL_MAXSIZE, **kwargs):
+        self.async_client = AsyncTatorRestClient(tator_url, token, max_concurrency=max_concurrency, **kwargs)
+        self.base_url = tator_url
+
+    @classmethod
+    def _event_loop(cls) -> asyncio.AbstractEventLoop:
+        with cls._loop_lock:
+            if cls._loop is None:
+                cls._loop = asyncio.new_event_loop()
+                threading.Thread(target=cls._loop.run_forever, name=LOOP_THREAD_NAME, daemon=True).start()
+            return cls._loop
+
+    def run(self, awaitable):
+        """Runs a single coroutine on the background loop and returns its result (or raises its exception)."""
+        loop = self._event_loop()
+        if threading.current_thread().name == LOOP_THREAD_NAME:
+            raise RuntimeError('SyncTatorRestClient cannot block its own event loop, await async_client instead')
+        return asyncio.run_coroutine_threadsafe(self._await(awaitable), loop).result()
+
+    def gather(self, *awaitables, return_exceptions: bool = False) -> list:
+        """Runs the given coroutines concurrently and returns their results in argument order."""
+        async def _gather():
+            return await asyncio.gather(*awaitables, return_exceptions=return_exceptions)
+        return self.run(_gather())
+
+    @staticmethod
+    async def _await(awaitable):
+        return await awaitable
+
+    def close(self):
+        self.run(self.async_client.close())
+
+    def get_localizations(self, project_id: int, section_id: int = None, media_ids: list[int] = None) -> list:
+        return self.run(self.async_client.get_localizations(project_id, section_id=section_id, media_ids=media_ids))
+
+    def get_section_by_id(self, section_id: int) -> dict:
+        return self.run(self.async_client.get_section_by_id(section_id))
+
+    def get_medias_for_sections(self, project_id: int, section_ids: list[int]) -> list:
+        return self.run(self.async_client.get_medias_for_sections(project_id, section_ids))
+
+    def get_media_by_id(self, media_id: int) -> dict:
+        return self.run(self.async_client.get_media_by_id(media_id))
+
+    def get_substrates(self, project_id: int, section_ids: list[int] = None, media_list: list[dict] = None) -> list[dict]:
+        return self.run(self.async_client.get_substrates(project_id, section_ids=section_ids, media_list=media_list))
+
+    def get_states(self, project_id: int, media_ids: list[int]) -> list[dict]:
+        return self.run(self.async_client.get_states(project_id, media_ids))
+
+    def get_user(self, user_id: int) -> dict:
+        return self.run(self.async_client.get_user(user_id))
+
+    def get_frame(self, media_id: int, frame: int = None, quality: int = None) -> bytes:
+        return self.run(self.async_client.get_frame(media_id, frame=frame, quality=quality))
+
+    def get_localization_graphic(self, localization_id: int) -> bytes:
+        return self.run(self.async_client.get_localization_graphic(localization_id))
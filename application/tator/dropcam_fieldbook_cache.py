@@ -0,0 +1,93 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from cachelib import BaseCache, FileSystemCache
+
+from application.util.constants import TERM_RED, TERM_NORMAL
+from application.util.http_metrics import upstream_session
+
+CACHE_DIR = os.path.join('cache', 'dropcam_fieldbook')
+FIELDBOOK_TTL = 60 * 60  # fieldbooks get corrected now and then, but not while someone is clicking through checks
+FIELDBOOK_FETCH_WORKERS = 4
+MAX_ENTRIES = 500
+
+
+def normalize_deployment_name(deployment_name: str) -> str:
+    """Section names use dashes where the fieldbook uses underscores (e.g. DOEX0087_NIU-dscm-02)."""
+    return deployment_name.replace('-', '_')
+
+
+class DropcamFieldbookCache:
+    """
+    Dropcam fieldbook deployments (lat/long, depth, bait type) from the DARC review server, shared across requests.
+
+    Each section's fieldbook is stored as {normalized deployment name: deployment}, so a localization's deployment is a
+    dict lookup instead of a scan over the expedition's deployments. Entries expire after FIELDBOOK_TTL; refresh()
+    drops them early (e.g. right after fixing the fieldbook). Failed fetches are not cached.
+    """
+
+    _default = None
+
+    def __init__(self, backend: BaseCache = None):
+        self._backend = backend or FileSystemCache(cache_dir=CACHE_DIR, threshold=MAX_ENTRIES, default_timeout=0)
+
+    @classmethod
+    def default(cls) -> 'DropcamFieldbookCache':
+        """Process-wide cache under cache/dropcam_fieldbook."""
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    def get_deployments(
+        self,
+        darc_review_url: str,
+        section_ids: list[str],
+        max_workers: int = FIELDBOOK_FETCH_WORKERS,
+    ) -> dict[str, dict[str, dict]]:
+        """
+        Returns {section_id: {normalized deployment name: deployment}} for the given sections, fetching the ones that
+        aren't cached concurrently. Sections whose fieldbook couldn't be fetched are left out.
+        """
+        fieldbooks = {}
+        missing_section_ids = []
+        for section_id in dict.fromkeys(section_ids):
+            deployments = self._backend.get(self._key(darc_review_url, section_id))
+            if deployments is None:
+                missing_section_ids.append(section_id)
+            else:
+                fieldbooks[section_id] = deployments
+        if missing_section_ids:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(missing_section_ids)))) as executor:
+                fetched = executor.map(lambda section_id: self._fetch(darc_review_url, section_id), missing_section_ids)
+                for section_id, deployments in zip(missing_section_ids, fetched):
+                    if deployments is None:
+                        continue
+                    self._backend.set(self._key(darc_review_url, section_id), deployments, timeout=FIELDBOOK_TTL)
+                    fieldbooks[section_id] = deployments
+        return fieldbooks
+
+    @staticmethod
+    def _fetch(darc_review_url: str, section_id: str) -> dict[str, dict] | None:
+        fieldbook_res = upstream_session.get(
+            url=f'{darc_review_url}/dropcam-fieldbook/{section_id}',
+            headers={'API-Key': os.environ.get('DARC_REVIEW_API_KEY')},
+        )
+        if fieldbook_res.status_code != 200:
+            print(f'{TERM_RED}Error fetching expedition fieldbook.{TERM_NORMAL}')
+            print(fieldbook_res.text)
+            return None
+        return {
+            normalize_deployment_name(deployment['deployment_name']): deployment
+            for deployment in fieldbook_res.json()['deployments']
+        }
+
+    def refresh(self, darc_review_url: str = None, section_id: str = None):
+        """Drops one section's cached fieldbook, or every cached fieldbook if no section is given."""
+        if section_id is None:
+            self._backend.clear()
+        else:
+            self._backend.delete(self._key(darc_review_url, section_id))
+
+    @staticmethod
+    def _key(darc_review_url: str, section_id: str) -> str:
+        return f'fieldbook:{darc_review_url}:{section_id}'
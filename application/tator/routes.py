@@ -7,8 +7,10 @@ General endpoints for Tator that are used throughout the application.
 /tator/projects [GET]
 /tator/sections?project=<project_id> [GET]
 /tator/refresh-sections [GET]
+/tator/metadata-cache [DELETE]
+/tator/dropcam-fieldbook-cache?section=<section_id> [DELETE]
 /tator/frame/<media_id>/<frame> [GET]
-/tator/localization-image/<localization_id> [GET]
+/tator/localization-image/<localization_id>?version=<version>&box=<x,y,width,height> [GET]
 /tator/localization [PATCH]
 /tator/localization/good-image [PATCH]
 """
@@ -17,12 +19,23 @@ import json
 
 import tator
 import requests
-from flask import current_app, request, session, Response
+from flask import current_app, request, session, send_file, Response
 
 from . import tator_bp
 from ..util.constants import TERM_YELLOW, TERM_RED, TERM_NORMAL
+from application.image_review.review_record_cache import ReviewRecordCache
+from application.tator.dropcam_fieldbook_cache import DropcamFieldbookCache
+from application.tator.tator_image_cache import TatorImageCache
+from application.tator.tator_metadata_cache import TatorMetadataCache
+from application.tator.tator_record_cache import TatorRecordCache
 from application.tator.tator_type import TatorLocalizationType
-from application.tator.tator_rest_client import TatorRestClient
+from application.tator.tator_client_registry import TatorClientRegistry, get_tator_client
+from application.tator.tator_localization_updater import update_localizations
+from application.tator.tator_rest_client import TatorRestClient, token_hash
+
+FRAME_MAX_AGE = 60 * 60 * 24 * 365             # a frame of a video never changes
+LOCALIZATION_IMAGE_MAX_AGE = 60 * 60 * 24 * 7  # keyed by box geometry, so a moved or resized box gets a new crop
+IMAGE_CHUNK_SIZE = 64 * 1024
 
 
 # log in to tator (get token from tator)
@@ -34,6 +47,8 @@ def tator_login():
             username=request.values.get('username'),
             password=request.values.get('password'),
         )
+        if 'tator_token' in session:
+            TatorClientRegistry.default().evict(session['tator_token'])  # refreshing the token invalidates the old one
         session['tator_token'] = token
         return {'username': request.values.get('username')}, 200
     except requests.HTTPError as e:
@@ -59,7 +74,23 @@ def check_tator_token():
 # clears stored tator token
 @tator_bp.get('/logout')
 def tator_logout():
-    session.pop('tator_token', None)
+    token = session.pop('tator_token', None)
+    if token:
+        TatorClientRegistry.default().evict(token)
+    return {}, 200
+
+
+# drop all cached Tator section/media/user metadata (e.g. after editing media attributes outside the app)
+@tator_bp.delete('/metadata-cache')
+def clear_tator_metadata_cache():
+    TatorMetadataCache.default().clear()
+    return {}, 200
+
+
+# drop cached dropcam fieldbooks (all of them, or just one section's) so the next check refetches from the review server
+@tator_bp.delete('/dropcam-fieldbook-cache')
+def clear_dropcam_fieldbook_cache():
+    DropcamFieldbookCache.default().refresh(current_app.config.get('DARC_REVIEW_URL'), request.args.get('section'))
     return {}, 200
 
 
@@ -149,7 +180,7 @@ def section_media():
     section_ids = request.values.getlist('section')
     if not project_id or not section_ids:
         return {'error': 'project and section are required'}, 400
-    tator_client = TatorRestClient(current_app.config.get('TATOR_URL'), session.get('tator_token'))
+    tator_client = get_tator_client(current_app.config.get('TATOR_URL'), session.get('tator_token'))
     try:
         media_list = tator_client.get_medias_for_sections(
             project_id=int(project_id),
@@ -168,10 +199,17 @@ def tator_frame(media_id, frame):
     token = session.get('tator_token') or request.args.get('token')
     if not token:
         return {}, 400
-    tator_client = TatorRestClient(current_app.config.get('TATOR_URL'), token)
     quality = 650 if request.values.get('preview') else None
-    image = tator_client.get_frame(int(media_id), frame=int(frame), quality=quality)
-    return Response(image, content_type='image/png'), 200
+    return _cached_image_response(
+        key=('frame', token_hash(token), int(media_id), int(frame), quality),
+        open_upstream=lambda: get_tator_client(current_app.config.get('TATOR_URL'), token).stream_frame(
+            int(media_id),
+            frame=int(frame),
+            quality=quality,
+        ),
+        max_age=FRAME_MAX_AGE,
+        immutable=True,
+    )
 
 
 # view tator localization image (cropped)
@@ -180,9 +218,53 @@ def tator_image(localization_id):
     token = session.get('tator_token') or request.values.get('token')
     if not token:
         return {}, 400
-    tator_client = TatorRestClient(current_app.config.get('TATOR_URL'), token)
-    image = tator_client.get_localization_graphic(int(localization_id))
-    return Response(image, content_type='image/png'), 200
+    return _cached_image_response(
+        key=(
+            'localization',
+            token_hash(token),
+            int(localization_id),
+            request.values.get('version'),
+            request.values.get('box'),
+        ),
+        open_upstream=lambda: get_tator_client(current_app.config.get('TATOR_URL'), token).stream_localization_graphic(
+            int(localization_id),
+        ),
+        max_age=LOCALIZATION_IMAGE_MAX_AGE,
+    )
+
+
+def _cached_image_response(key: tuple, open_upstream, max_age: int, immutable: bool = False) -> Response:
+    """
+    Serves a Tator image from the disk cache when we have it, otherwise streams it from Tator to the browser while
+    saving a copy. Either way the response carries an ETag and a long max-age, so the browser won't ask again. Keys
+    include the token's hash, so only a token Tator already served the image to gets it (or a 304) from the cache.
+    """
+    image_cache = TatorImageCache.default(current_app.config.get('TATOR_IMAGE_CACHE_MAX_BYTES'))
+    etag = image_cache.etag(key)
+    res = None
+    if path := image_cache.get(key):
+        try:
+            res = send_file(path, mimetype='image/png', etag=etag, max_age=max_age, conditional=True)
+        except FileNotFoundError:
+            pass  # evicted since get(), so fetch it again
+    if res is None and etag in request.if_none_match:
+        # the browser already has this exact image, even if we've since evicted it
+        res = Response(status=304)
+        res.set_etag(etag)
+    elif res is None:
+        upstream = open_upstream()
+        res = Response(
+            image_cache.write_through(key, upstream.iter_content(chunk_size=IMAGE_CHUNK_SIZE)),
+            content_type='image/png',
+        )
+        res.set_etag(etag)
+        res.call_on_close(upstream.close)
+    # tator images require a token, so keep them out of shared caches
+    res.cache_control.public = False
+    res.cache_control.private = True
+    res.cache_control.max_age = max_age
+    res.cache_control.immutable = immutable
+    return res
 
 
 # update tator localization
@@ -205,25 +287,32 @@ def update_tator_localization():
         attributes['Upon'] = upon
     if size := request.values.get('size'):
         attributes['Size'] = size
+    # boxes and dots get different attributes, so group by (version, attribute set) and send one bulk update each
+    groups = {}
+    for localization in localization_id_types:
+        is_dot = TatorLocalizationType.is_dot(localization['type'])
+        groups.setdefault((localization['version'], is_dot), []).append(localization['elemental_id'])
     try:
-        for localization in localization_id_types:
+        api = tator.get_api(
+            host=current_app.config.get('TATOR_URL'),
+            token=session.get('tator_token'),
+        )
+        for (version, is_dot), elemental_ids in groups.items():
             this_attributes = attributes.copy()
-            if TatorLocalizationType.is_dot(localization['type']):
+            if is_dot:
                 this_attributes['Categorical Abundance'] = request.values.get('categorical_abundance') if request.values.get('categorical_abundance') else '--'
-            api = tator.get_api(
-                host=current_app.config.get('TATOR_URL'),
-                token=session.get('tator_token'),
-            )
-            api.update_localization_by_elemental_id(
-                version=localization['version'],
-                elemental_id=localization['elemental_id'],
-                localization_update=tator.models.LocalizationUpdate(
-                    attributes=this_attributes,
-                )
+            update_localizations(
+                api=api,
+                project_id=request.values.get('project', type=int),
+                version=version,
+                elemental_ids=elemental_ids,
+                attributes=this_attributes,
             )
     except tator.openapi.tator_openapi.exceptions.ApiException as e:
         print(f'{TERM_RED}ERROR: Unable to update Tator localization:{TERM_NORMAL} {e.body}')
         return {}, 500
+    TatorRecordCache.default().invalidate()
+    ReviewRecordCache.default().invalidate()
     return {}, 200
 
 
@@ -233,20 +322,20 @@ def update_tator_localization_image():
     localization_elemental_ids = request.values.getlist('localization_elemental_ids')
     version = request.values.get('version')
     try:
-        for elemental_id in localization_elemental_ids:
-            api = tator.get_api(
+        update_localizations(
+            api=tator.get_api(
                 host=current_app.config.get('TATOR_URL'),
                 token=session.get('tator_token'),
-            )
-            api.update_localization_by_elemental_id(
-                version=version,
-                elemental_id=elemental_id,
-                localization_update=tator.models.LocalizationUpdate(
-                    attributes={
-                        'Good Image': True if request.values.get('good_image') == 'true' else False,
-                    },
-                )
-            )
+            ),
+            project_id=request.values.get('project', type=int),
+            version=version,
+            elemental_ids=localization_elemental_ids,
+            attributes={
+                'Good Image': True if request.values.get('good_image') == 'true' else False,
+            },
+        )
     except tator.openapi.tator_openapi.exceptions.ApiException:
         return {}, 500
+    TatorRecordCache.default().invalidate()
+    ReviewRecordCache.default().invalidate()
     return {}, 200
@@ -0,0 +1,58 @@
+import numpy as np
+
+# substrate attribute values that mean "not set"
+INVALID_SUBSTRATE_VALUES = {'--', '-', '', 'Not Set', 'None'}
+
+
+class SubstrateTimeline:
+    """
+    One media's substrate states (see TatorRestClient.get_substrates), sorted by frame. The state in effect at a frame
+    is the last one at or before it, so looking up any number of frames is a single searchsorted over the state frames.
+
+    Each state's usable values are lowercased once up front, so matching a localization's upon against the current
+    substrate is a set lookup (or a substring check over a handful of strings) instead of a walk over the state dict.
+    """
+
+    def __init__(self, entries: list[dict]):
+        self.entries = sorted(entries, key=lambda entry: entry['frame'])  # stable, so same-frame states keep their order
+        self.frames = np.array([entry['frame'] for entry in self.entries], dtype=np.int64)
+        # [(attribute, value, lowercase value)] per state, in attribute order
+        self._values = [
+            [
+                (key, val, val.lower()) for key, val in entry.items()
+                if key not in ('frame', 'timestamp') and isinstance(val, str) and val not in INVALID_SUBSTRATE_VALUES
+            ]
+            for entry in self.entries
+        ]
+        self._lowercase_values = [frozenset(lowercase for _, _, lowercase in values) for values in self._values]
+
+    @classmethod
+    def for_media(cls, media_substrates: list[dict]) -> dict[int, 'SubstrateTimeline']:
+        """{media_id: timeline} from TatorRestClient.get_substrates."""
+        return {substrate['media_id']: cls(substrate['substrates']) for substrate in media_substrates}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def indices_at(self, frames) -> np.ndarray:
+        """Index of the state in effect at each frame, or -1 where a frame comes before the first state."""
+        return np.searchsorted(self.frames, np.asarray(frames, dtype=np.int64), side='right') - 1
+
+    def substrate_at(self, frame: int) -> dict | None:
+        index = int(self.indices_at([frame])[0])
+        return self.entries[index] if index >= 0 else None
+
+    def matching_value(self, index: int, upon: str) -> tuple[str, str] | None:
+        """
+        Returns the (attribute, value) of state index that upon is a case-insensitive substring of, or None if there
+        isn't one (or index is -1).
+        """
+        if index < 0:
+            return None
+        upon = upon.lower()
+        if upon in self._lowercase_values[index]:
+            return next((key, val) for key, val, lowercase in self._values[index] if lowercase == upon)
+        for key, val, lowercase in self._values[index]:
+            if upon in lowercase:
+                return key, val
+        return None
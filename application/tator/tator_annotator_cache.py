@@ -0,0 +1,88 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from cachelib import BaseCache, FileSystemCache
+
+from application.tator.tator_metadata_cache import USER_TTL
+from application.tator.tator_rest_client import TatorRestClient
+from application.util.constants import TERM_RED, TERM_NORMAL
+
+CACHE_DIR = os.path.join('cache', 'tator_annotators')
+ANNOTATOR_FETCH_WORKERS = 8
+MAX_ENTRIES = 2000
+
+
+def unknown_annotator(user_id: int) -> str:
+    return f'Unknown annotator (#{user_id})'
+
+
+class TatorAnnotatorCache:
+    """
+    Annotator names ("First Last") by Tator user ID, shared by every session and processor.
+
+    get_names() resolves a whole batch of user IDs at once: cached names are read up front and the missing ones are
+    fetched concurrently, so processing never stops mid-loop to wait on Tator. Names are kept for USER_TTL. Users that
+    can't be fetched come back as "Unknown annotator (#id)" and are not cached, so they're retried next time.
+    """
+
+    _default = None
+
+    def __init__(self, backend: BaseCache = None):
+        self._backend = backend or FileSystemCache(cache_dir=CACHE_DIR, threshold=MAX_ENTRIES, default_timeout=0)
+
+    @classmethod
+    def default(cls) -> 'TatorAnnotatorCache':
+        """Process-wide cache under cache/tator_annotators."""
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    def get_names(
+        self,
+        tator_client: TatorRestClient,
+        user_ids,
+        max_workers: int = ANNOTATOR_FETCH_WORKERS,
+    ) -> dict[int, str]:
+        """Returns {user_id: annotator name} for every distinct user ID, fetching the uncached ones concurrently."""
+        names = {}
+        missing_user_ids = []
+        for user_id in dict.fromkeys(user_ids):
+            name = self._backend.get(self._key(tator_client.base_url, user_id))
+            if name is None:
+                missing_user_ids.append(user_id)
+            else:
+                names[user_id] = name
+        if missing_user_ids:
+            print(f'Fetching {len(missing_user_ids)} annotator name(s) from Tator...')
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(missing_user_ids)))) as executor:
+                fetched = executor.map(lambda user_id: self._fetch(tator_client, user_id), missing_user_ids)
+                for user_id, name in zip(missing_user_ids, fetched):
+                    if name is None:
+                        names[user_id] = unknown_annotator(user_id)
+                        continue
+                    self._backend.set(self._key(tator_client.base_url, user_id), name, timeout=USER_TTL)
+                    names[user_id] = name
+        return names
+
+    def get_name(self, tator_client: TatorRestClient, user_id: int) -> str:
+        return self.get_names(tator_client, [user_id])[user_id]
+
+    @staticmethod
+    def _fetch(tator_client: TatorRestClient, user_id: int) -> str | None:
+        try:
+            res_json = tator_client.get_user(user_id)
+        except requests.RequestException as e:
+            print(f'{TERM_RED}Error fetching annotator name for user ID {user_id}: {e}{TERM_NORMAL}')
+            return None
+        if 'first_name' not in res_json:
+            print(f'{TERM_RED}Error fetching annotator name for user ID {user_id}{TERM_NORMAL}')
+            return None
+        return f'{res_json["first_name"]} {res_json["last_name"]}'
+
+    def clear(self):
+        self._backend.clear()
+
+    @staticmethod
+    def _key(tator_url: str, user_id: int) -> str:
+        return f'annotator:{tator_url}:{user_id}'
@@ -4,7 +4,18 @@ import sys
 
 from application.tator.image_guide_presentation import ImageGuidePresentation
 from application.tator.tator_localization_processor import TatorLocalizationProcessor
-from application.tator.tator_type import TatorLocalizationType
+from application.tator.tator_qaqc_checks import (
+    MissingGoodImageCheck,
+    MissingQualifierCheck,
+    NamesAcceptedCheck,
+    NotesAndRemarksCheck,
+    QaqcCheck,
+    QaqcCheckResult,
+    ReExaminedCheck,
+    StetReasonCheck,
+    TatorQaqcCheckEngine,
+    TentativeIdMorphospeciesCheck,
+)
 
 
 class TatorBaseQaqcProcessor(TatorLocalizationProcessor, ABC):
@@ -28,51 +39,96 @@ class TatorBaseQaqcProcessor(TatorLocalizationProcessor, ABC):
             media_list=media_list,
         )
 
-    def check_names_accepted(self):
+    def checklist_checks(self, no_match_records: set) -> list[QaqcCheck]:
         """
-        Finds records with a scientific name or tentative ID that is not accepted in WoRMS
+        The checks the checklist shows problem counts for. Subclasses add their own.
+
+        :param no_match_records: Scientific names/tentative IDs that aren't accepted in WoRMS (see _unaccepted_names).
+        """
+        return [
+            NamesAcceptedCheck(no_match_records),
+            MissingQualifierCheck(),
+            StetReasonCheck(),
+            TentativeIdMorphospeciesCheck(),
+            NotesAndRemarksCheck(),
+            ReExaminedCheck(),
+            MissingGoodImageCheck(),
+        ]
+
+    def checklist_counts(self, **check_kwargs) -> dict[str, int]:
         """
-        print('Checking for accepted names...')
-        sys.stdout.flush()
-        checked = {}
+        Returns {check name: number of records flagged} for every checklist check, from one pass over the fetched
+        localizations (and one process_records, for the checks that need phylogeny). check_kwargs are passed on to
+        checklist_checks.
+        """
+        no_match_records = self._unaccepted_names()
+        results = self.run_checks(
+            self.checklist_checks(no_match_records, **check_kwargs),
+            no_match_records=no_match_records,
+        )
+        return {name: result.count for name, result in results.items()}
+
+    def run_checks(self, checks: list[QaqcCheck], **process_kwargs) -> dict[str, QaqcCheckResult]:
+        """
+        Runs every check over the fetched localizations in one pass, processing records once (with process_kwargs) if
+        any check needs them. Leaves the localizations as they were, so the caller can count or show any of the results.
+        """
+        engine = TatorQaqcCheckEngine(checks)
+        if engine.needs_records and not self.final_records:
+            self.process_records(**process_kwargs)
+        return engine.run(self._all_localizations(), self.final_records)
+
+    def _all_localizations(self) -> list[dict]:
+        return [localization for section in self.sections for localization in section.localizations]
+
+    def _apply_check(self, check: QaqcCheck, **process_kwargs):
+        """
+        Narrows the records to the ones a check flags, with their problems set: localization checks narrow each
+        section's localizations before processing, record checks filter the processed records.
+        """
+        if check.scope == QaqcCheck.RECORDS:
+            self.process_records(**process_kwargs)
+            result = TatorQaqcCheckEngine([check]).run([], self.final_records)[check.name]
+            self.final_records = result.items(self.final_records)
+            return
+        self._narrow_localizations(check)
+        self.process_records(**process_kwargs)
+
+    def _narrow_localizations(self, check: QaqcCheck):
+        """Keeps only the localizations a localization check flags in each section, and sets their problems."""
+        result = TatorQaqcCheckEngine([check]).run(self._all_localizations())[check.name]
+        flagged = dict(result.flagged)  # {index across all sections: problems}
+        index = 0
         for section in self.sections:
             records_of_interest = []
             for localization in section.localizations:
-                flag_record = False
-                scientific_name = localization['attributes'].get('Scientific Name')
-                tentative_id = localization['attributes'].get('Tentative ID')
-                if scientific_name not in checked.keys():
-                    if scientific_name in self.phylogeny.data:
-                        checked[scientific_name] = True
-                    else:
-                        if self.phylogeny.fetch_worms(scientific_name):
-                            checked[scientific_name] = True
-                        else:
-                            localization['problems'] = 'Scientific Name'
-                            checked[scientific_name] = False
-                            flag_record = True
-                elif not checked[scientific_name]:
-                    localization['problems'] = 'Scientific Name'
-                    flag_record = True
-                if tentative_id:
-                    if tentative_id not in checked.keys():
-                        if tentative_id in self.phylogeny.data:
-                            checked[tentative_id] = True
-                        else:
-                            if self.phylogeny.fetch_worms(tentative_id):
-                                checked[tentative_id] = True
-                            else:
-                                localization['problems'] = 'Tentative ID'
-                                checked[tentative_id] = False
-                                flag_record = True
-                    elif not checked[tentative_id]:
-                        localization['problems'] = 'Tentative ID' if 'problems' not in localization.keys() else 'Scientific Name, Tentative ID'
-                        flag_record = True
-                if flag_record:
+                if index in flagged:
+                    if flagged[index] is not None:
+                        localization['problems'] = flagged[index]
                     records_of_interest.append(localization)
-            print(f'Found {len(records_of_interest)} localizations with unaccepted names from {section.deployment_name}!')
+                index += 1
+            print(f'Found {len(records_of_interest)} localizations from {section.deployment_name}!')
             section.localizations = records_of_interest
-        self.process_records(no_match_records={key for key in checked.keys() if not checked[key]})  # don't try to fetch again for names we already know are unaccepted
+
+    def _unaccepted_names(self) -> set:
+        """Every scientific name and tentative ID that isn't accepted in WoRMS, with new names resolved concurrently."""
+        return self.phylogeny.prefetch_worms(
+            name
+            for section in self.sections
+            for localization in section.localizations
+            for name in (localization['attributes'].get('Scientific Name'), localization['attributes'].get('Tentative ID'))
+            if name
+        )
+
+    def check_names_accepted(self):
+        """
+        Finds records with a scientific name or tentative ID that is not accepted in WoRMS
+        """
+        print('Checking for accepted names...')
+        sys.stdout.flush()
+        no_match_records = self._unaccepted_names()
+        # don't try to fetch again for names we already know are unaccepted
+        self._apply_check(NamesAcceptedCheck(no_match_records), no_match_records=no_match_records)
 
     def check_missing_qualifier(self):
         """
@@ -80,69 +136,31 @@ class TatorBaseQaqcProcessor(TatorLocalizationProcessor, ABC):
         finds records that are classified to species but *do* have a qualifier set. This check needs to call
         process_records first to populate phylogeny.
         """
-        self.process_records()
-        actual_final_records = []
-        for record in self.final_records:
-            if not record.get('species') and record.get('qualifier', '--') == '--':
-                record['problems'] = 'Scientific Name, Qualifier'
-                actual_final_records.append(record)
-            elif record.get('species') and record.get('qualifier', '--') != '--':
-                record['problems'] = 'Scientific Name, Qualifier'
-                actual_final_records.append(record)
-        self.final_records = actual_final_records
+        self._apply_check(MissingQualifierCheck())
 
     def check_stet_reason(self):
         """
         Finds records that have a qualifier of 'stet' but no reason set.
         """
-        for section in self.sections:
-            records_of_interest = []
-            for localization in section.localizations:
-                if localization['attributes'].get('Qualifier') == 'stet.' \
-                        and localization['attributes'].get('Reason', '--') == '--':
-                    localization['problems'] = 'Qualifier, Reason'
-                    records_of_interest.append(localization)
-            section.localizations = records_of_interest
-        self.process_records()
+        self._apply_check(StetReasonCheck())
 
     def get_all_tentative_ids_and_morphospecies(self):
         """
         Finds every record with a tentative ID or morphospecies. Also checks whether or not the tentative ID is in the same
         phylogenetic group as the scientific name.
         """
-        no_match_records = set()
-        for section in self.sections:
-            records_of_interest = []
-            for localization in section.localizations:
-                tentative_id = localization['attributes'].get('Tentative ID')
-                morphospecies = localization['attributes'].get('Morphospecies')
-                is_record_of_interest = False
-                localization_problems = ''
-                if tentative_id and tentative_id not in ['--', '-', '']:
-                    is_record_of_interest = True
-                    localization_problems += 'Tentative ID'
-                if morphospecies and morphospecies not in ['--', '-', '']:
-                    is_record_of_interest = True
-                    localization_problems += ' Morphospecies'
-                if is_record_of_interest:
-                    records_of_interest.append(localization)
-                    localization['problems'] = localization_problems
-            section.localizations = records_of_interest
-        self.process_records()  # process first to make sure phylogeny is populated
+        self._narrow_localizations(TentativeIdMorphospeciesCheck())
+        # scientific names and tentative IDs are resolved together, before processing
+        no_match_records = self._unaccepted_names()
+        self.process_records(no_match_records=no_match_records)
         for localization in self.final_records:
             tentative_id = localization.get('tentative_id')
             if not tentative_id:
                 continue  # morphospecies-only record, no tentative ID phylogeny to check
+            if tentative_id in no_match_records or tentative_id not in self.phylogeny.data:
+                localization['problems'] += ' phylogeny no match'
+                continue
             phylogeny_match = False
-            if tentative_id not in self.phylogeny.data:
-                if tentative_id not in no_match_records:
-                    if not self.phylogeny.fetch_worms(tentative_id):
-                        no_match_records.add(tentative_id)
-                        localization['problems'] += ' phylogeny no match'
-                        continue
-                else:
-                    localization['problems'] += ' phylogeny no match'
-                    continue
             for value in self.phylogeny.data[tentative_id].values():
                 if value == localization['scientific_name']:
                     phylogeny_match = True
@@ -155,64 +173,19 @@ class TatorBaseQaqcProcessor(TatorLocalizationProcessor, ABC):
         """
         Finds every record with a note or remark.
         """
-        for section in self.sections:
-            records_of_interest = []
-            for localization in section.localizations:
-                notes = localization['attributes'].get('Notes')
-                id_remarks = localization['attributes'].get('IdentificationRemarks')
-                has_note = notes and notes not in ['--', '-', '']
-                has_remark = id_remarks and id_remarks not in ['--', '-', '']
-                if has_note and has_remark:
-                    localization['problems'] = 'Notes, ID Remarks'
-                    records_of_interest.append(localization)
-                elif has_note:
-                    localization['problems'] = 'Notes'
-                    records_of_interest.append(localization)
-                elif has_remark:
-                    localization['problems'] = 'ID Remarks'
-                    records_of_interest.append(localization)
-            section.localizations = records_of_interest
-        self.process_records()
+        self._apply_check(NotesAndRemarksCheck())
 
     def get_re_examined(self):
         """
         Finds all records that have a reason of "to be re-examined"
         """
-        for section in self.sections:
-            records_of_interest = []
-            for localization in section.localizations:
-                if localization['attributes'].get('Reason') == 'To be re-examined':
-                    records_of_interest.append(localization)
-            section.localizations = records_of_interest
-        self.process_records()
+        self._apply_check(ReExaminedCheck())
 
     def get_missing_good_image(self):
         """
         Finds all scientific name, tentative ID, and morphospecies combos that don't have a good image associated with them.
         """
-        taxa_image_map = {}
-        for section in self.sections:
-            for localization in section.localizations:
-                scientific_name = localization['attributes'].get('Scientific Name')
-                tentative_id = localization['attributes'].get('Tentative ID')
-                morphospecies = localization['attributes'].get('Morphospecies')
-                key = (scientific_name, tentative_id, morphospecies)
-                has_good_image = localization['attributes'].get('Good Image', False)
-                if key not in taxa_image_map:
-                    taxa_image_map[key] = has_good_image
-                else:
-                    taxa_image_map[key] = taxa_image_map[key] or has_good_image
-        for section in self.sections:
-            records_of_interest = []
-            for localization in section.localizations:
-                scientific_name = localization['attributes'].get('Scientific Name')
-                tentative_id = localization['attributes'].get('Tentative ID')
-                morphospecies = localization['attributes'].get('Morphospecies')
-                key = (scientific_name, tentative_id, morphospecies)
-                if taxa_image_map.get(key, False) is False and TatorLocalizationType.is_box(localization['type']):
-                    records_of_interest.append(localization)
-            section.localizations = records_of_interest
-        self.process_records()
+        self._apply_check(MissingGoodImageCheck())
 
     @abstractmethod
     def get_unique_taxa(self):
@@ -0,0 +1,58 @@
+import threading
+from collections import OrderedDict
+
+from application.tator.tator_rest_client import TatorRestClient
+
+MAX_CLIENTS = 32
+
+
+class TatorClientRegistry:
+    """
+    Hands out one long-lived TatorRestClient per (Tator URL, token), so routes and processors reuse the same
+    requests.Session (and its keep-alive connections to Tator) instead of paying a new TLS handshake per request.
+    Least recently used clients are closed once more than max_clients tokens are live; logging out evicts eagerly.
+    """
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, max_clients: int = MAX_CLIENTS):
+        self.max_clients = max_clients
+        self._clients: OrderedDict[tuple[str, str], TatorRestClient] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def default(cls) -> 'TatorClientRegistry':
+        """Process-wide registry."""
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    def get(self, tator_url: str, token: str) -> TatorRestClient:
+        key = (tator_url, token)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                return client
+            client = TatorRestClient(tator_url, token)
+            self._clients[key] = client
+            while len(self._clients) > self.max_clients:
+                _, evicted = self._clients.popitem(last=False)
+                evicted.close()
+            return client
+
+    def evict(self, token: str):
+        """Closes and forgets every client for the given token (e.g. on logout)."""
+        with self._lock:
+            for key in [key for key in self._clients if key[1] == token]:
+                self._clients.pop(key).close()
+
+    def __len__(self):
+        return len(self._clients)
+
+
+def get_tator_client(tator_url: str, token: str) -> TatorRestClient:
+    """Shortcut for TatorClientRegistry.default().get(...)."""
+    return TatorClientRegistry.default().get(tator_url, token)
@@ -5,6 +5,13 @@ import sys
 from flask import session
 
 from application.tator.tator_base_qaqc_processor import TatorBaseQaqcProcessor
+from application.tator.tator_qaqc_checks import (
+    AttractedCheck,
+    ExistsInImageReferencesCheck,
+    NonTargetNotAttractedCheck,
+    QaqcCheck,
+    SameNameQualifierCheck,
+)
 from application.util.constants import TERM_NORMAL, TERM_RED
 from application.tator.tator_type import TatorLocalizationType
 
@@ -24,91 +31,40 @@ class TatorDropcamQaqcProcessor(TatorBaseQaqcProcessor):
             tator_url=tator_url,
         )
 
+    def checklist_checks(self, no_match_records: set, attracted_dict: dict = None, image_refs: dict = None) -> list[QaqcCheck]:
+        checks = super().checklist_checks(no_match_records)
+        if attracted_dict is not None:
+            checks.append(AttractedCheck(attracted_dict))
+        if image_refs is not None:
+            checks.append(ExistsInImageReferencesCheck(image_refs))
+        checks.extend([SameNameQualifierCheck(), NonTargetNotAttractedCheck()])
+        return checks
+
     def check_attracted_not_attracted(self, attracted_dict: dict):
         """
         Finds all records that are marked as "attracted" but are saved as "not attracted" in the attracted_dict, and
         vice versa. Also flags all records with taxa that are marked as "attracted/not attracted" in the attracted_dict.
         """
-        for section in self.sections:
-            records_of_interest = []
-            for localization in section.localizations:
-                scientific_name = localization['attributes'].get('Scientific Name')
-                if scientific_name not in attracted_dict.keys() or attracted_dict[scientific_name] == 2:
-                    localization['problems'] = 'Scientific Name, Attracted'
-                    records_of_interest.append(localization)
-                elif localization['attributes'].get('Attracted') == 'Attracted' and attracted_dict[scientific_name] == 0:
-                    localization['problems'] = 'Scientific Name, Attracted'
-                    records_of_interest.append(localization)
-                elif localization['attributes'].get('Attracted') == 'Not Attracted' and attracted_dict[scientific_name] == 1:
-                    localization['problems'] = 'Scientific Name, Attracted'
-                    records_of_interest.append(localization)
-            section.localizations = records_of_interest
-        self.process_records()
+        self._apply_check(AttractedCheck(attracted_dict))
 
     def check_same_name_qualifier(self):
         """
         Finds records that have the same scientific name/tentative ID combo but a different qualifier.
         """
-        scientific_name_qualifiers = {}
-        problem_scientific_names = set()
-        for section in self.sections:
-            # first pass: build dict of scientific name/tentative ID combos and their qualifiers, add to problem set if mismatch
-            for localization in section.localizations:
-                scientific_name = f'{localization["attributes"].get("Scientific Name")}{" (" + localization["attributes"]["Tentative ID"] + "?)" if localization["attributes"].get("Tentative ID") else ""}'
-                if scientific_name not in scientific_name_qualifiers.keys():
-                    scientific_name_qualifiers[scientific_name] = localization['attributes'].get('Qualifier')
-                else:
-                    if scientific_name_qualifiers[scientific_name] != localization['attributes'].get('Qualifier'):
-                        problem_scientific_names.add(scientific_name)
-        for section in self.sections:
-            # second pass: add records with problem scientific names to records of interest
-            records_of_interest = []
-            for localization in section.localizations:
-                scientific_name = f'{localization["attributes"].get("Scientific Name")}{" (" + localization["attributes"]["Tentative ID"] + "?)" if localization["attributes"].get("Tentative ID") else ""}'
-                if scientific_name in problem_scientific_names:
-                    localization['problems'] = 'Scientific Name, Qualifier'
-                    records_of_interest.append(localization)
-            section.localizations = records_of_interest
-        self.process_records()
+        self._apply_check(SameNameQualifierCheck())
 
     def check_non_target_not_attracted(self):
         """
         Finds records that are marked as "non-target" but are marked as "attracted".
         """
-        for section in self.sections:
-            records_of_interest = []
-            for localization in section.localizations:
-                attracted = localization['attributes'].get('Attracted')
-                reason = localization['attributes'].get('Reason')
-                if 'Non-target' in reason and attracted != 'Not Attracted':
-                    localization['problems'] = 'Attracted, Reason'
-                    records_of_interest.append(localization)
-            section.localizations = records_of_interest
-        self.process_records()
+        self._apply_check(NonTargetNotAttractedCheck())
 
     def check_exists_in_image_references(self, image_refs: dict):
         """
         Finds records that do not exist in the image references db (combo scientific name, tentative ID,
         and morphospecies). Also flags records with both tentative ID and morphospecies set.
         """
-        for section in self.sections:
-            records_of_interest = []
-            for localization in section.localizations:
-                image_ref_key = localization['attributes'].get('Scientific Name')
-                tentative_id = localization['attributes'].get('Tentative ID')
-                morphospecies = localization['attributes'].get('Morphospecies')
-                if tentative_id and morphospecies:
-                    localization['problems'] = 'Tentative ID, Morphospecies'
-                    records_of_interest.append(localization)
-                    continue
-                if tentative_id and tentative_id != '':
-                    image_ref_key += f'~tid={tentative_id}'
-                if morphospecies and morphospecies != '':
-                    image_ref_key += f'~m={morphospecies}'
-                if image_ref_key not in image_refs:
-                    records_of_interest.append(localization)
-            section.localizations = records_of_interest
-        self.process_records()
+        self._apply_check(ExistsInImageReferencesCheck(image_refs))
 
     def get_unique_taxa(self):
         self.fetch_start_times()
@@ -137,8 +93,7 @@ class TatorDropcamQaqcProcessor(TatorBaseQaqcProcessor):
                     if not record.get('timestamp'):
                         continue
                     first_box = unique_taxa[key]['first_box']
-                    observed_timestamp = datetime.datetime.strptime(record['timestamp'], self.BOTTOM_TIME_FORMAT)
-                    if not first_box or observed_timestamp < datetime.datetime.strptime(first_box, self.BOTTOM_TIME_FORMAT):
+                    if not first_box or record['timestamp'] < first_box:
                         unique_taxa[key]['first_box'] = record['timestamp']
                         unique_taxa[key]['first_box_url'] = f'{self.tator_url}/{self.project_id}/annotation/{record["media_id"]}?frame={record["frame"]}&selected_entity={localization["elemental_id"]}'
                 elif TatorLocalizationType.is_dot(localization['type']):
@@ -146,8 +101,7 @@ class TatorDropcamQaqcProcessor(TatorBaseQaqcProcessor):
                     if not record.get('timestamp'):
                         continue
                     first_dot = unique_taxa[key]['first_dot']
-                    observed_timestamp = datetime.datetime.strptime(record['timestamp'], self.BOTTOM_TIME_FORMAT)
-                    if not first_dot or observed_timestamp < datetime.datetime.strptime(first_dot, self.BOTTOM_TIME_FORMAT):
+                    if not first_dot or record['timestamp'] < first_dot:
                         unique_taxa[key]['first_dot'] = record['timestamp']
                         unique_taxa[key]['first_dot_url'] = f'{self.tator_url}/{self.project_id}/annotation/{record["media_id"]}?frame={record["frame"]}&selected_entity={localization["elemental_id"]}'
         self.final_records = unique_taxa
@@ -218,7 +172,10 @@ class TatorDropcamQaqcProcessor(TatorBaseQaqcProcessor):
         deployment_taxa = {}
         unique_taxa = {}
         unique_taxa_first_seen = {}
-        section_id_indices = {section.section_id: index for index, section in enumerate(self.sections)}
+        section_bottom_times = {
+            section.section_id: datetime.datetime.strptime(section.bottom_time, self.BOTTOM_TIME_FORMAT)
+            for section in self.sections if section.bottom_time is not None
+        }
         bottom_time = None
         latest_timestamp = datetime.datetime.fromtimestamp(0)  # to find the duration of the deployment
         for record in self.final_records:
@@ -228,9 +185,8 @@ class TatorDropcamQaqcProcessor(TatorBaseQaqcProcessor):
             unique_name = f'{scientific_name}{tentative_id_suffix}{morphospecies_suffix}'
             if not record.get('timestamp'):
                 continue
-            observed_timestamp = datetime.datetime.strptime(record['timestamp'], self.BOTTOM_TIME_FORMAT)
-            this_section = self.sections[section_id_indices[record['section_id']]]
-            bottom_time = datetime.datetime.strptime(this_section.bottom_time, self.BOTTOM_TIME_FORMAT)
+            observed_timestamp = record['timestamp']
+            bottom_time = section_bottom_times[record['section_id']]
             if record.get('count', 0) < 1 or record.get('attracted') == 'Not Attracted':
                 continue
             if observed_timestamp > latest_timestamp:
@@ -0,0 +1,108 @@
+import hashlib
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Iterable, Iterator
+
+CACHE_DIR = Path('cache', 'tator_images')
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024  # 1 GiB
+
+
+class TatorImageCache:
+    """
+    Size-bounded on-disk LRU for images proxied from Tator (video frames and localization crops).
+
+    Each entry is one file named after a hash of its key, so lookups are a single stat. Recency is tracked with the
+    file's mtime, which is bumped on every hit; once the cache grows past max_bytes, the least recently used files are
+    deleted until it is back under the limit. Writes go to a temp file first and are renamed into place when complete,
+    so a half-downloaded image (e.g. the browser navigated away mid-stream) is never served.
+    """
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, cache_dir: Path = CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._size = None  # total bytes on disk, computed lazily on first write
+        self._lock = threading.Lock()
+
+    @classmethod
+    def default(cls, max_bytes: int = DEFAULT_MAX_BYTES) -> 'TatorImageCache':
+        """Process-wide cache under cache/tator_images."""
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls(max_bytes=max_bytes)
+            return cls._default
+
+    @staticmethod
+    def etag(key: tuple) -> str:
+        """
+        Images are immutable for a given key (a frame of a media at a quality, or a localization at a version), so
+        the ETag is derived from the key alone and can be checked without touching disk or Tator.
+        """
+        return hashlib.sha1(repr(key).encode()).hexdigest()
+
+    def path(self, key: tuple) -> Path:
+        return self.cache_dir / f'{self.etag(key)}.png'
+
+    def get(self, key: tuple) -> Path | None:
+        """Returns the path of the cached image for key (marking it recently used), or None on a miss."""
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def write_through(self, key: tuple, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """
+        Yields chunks as they arrive while copying them to disk. The entry is only added to the cache once every
+        chunk has been consumed; if the consumer stops early, the partial file is discarded.
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        size = 0
+        complete = False
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+                    yield chunk
+            os.replace(tmp_path, self.path(key))
+            complete = True
+        finally:
+            if not complete:
+                Path(tmp_path).unlink(missing_ok=True)
+        self._added(size)
+
+    def clear(self):
+        with self._lock:
+            for path in self.cache_dir.glob('*.png'):
+                path.unlink(missing_ok=True)
+            self._size = 0
+
+    def _added(self, size: int):
+        with self._lock:
+            if self._size is None:
+                self._size = sum(path.stat().st_size for path in self.cache_dir.glob('*.png'))
+            else:
+                self._size += size
+            if self._size <= self.max_bytes:
+                return
+            entries = []
+            for path in self.cache_dir.glob('*.png'):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+            entries.sort()
+            self._size = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if self._size <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                self._size -= size
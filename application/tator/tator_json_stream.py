@@ -0,0 +1,79 @@
+import codecs
+import json
+import re
+import sys
+from typing import Collection, Iterable, Iterator
+
+_skip_whitespace = re.compile(r'[ \t\n\r]*').match
+
+
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator:
+    """
+    Incrementally decodes a top-level JSON array from a stream of byte chunks (e.g. ``Response.iter_content()``),
+    yielding one element at a time. Only the element being decoded and the unread part of the current chunk are held
+    in memory, never the whole response body.
+    """
+    scan_once = json.JSONDecoder().scan_once
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    pos = 0
+    started = False
+    for chunk in _with_final(chunks):
+        final = chunk is None
+        buffer = buffer[pos:] + text_decoder.decode(b'' if final else chunk, final=final)
+        end_of_buffer = len(buffer)
+        pos = 0
+        while True:
+            pos = _skip_whitespace(buffer, pos).end()
+            if pos == end_of_buffer:
+                break
+            char = buffer[pos]
+            if not started:
+                if char != '[':
+                    raise json.JSONDecodeError('Expected a JSON array', buffer, pos)
+                started = True
+                pos += 1
+            elif char == ',':
+                pos += 1
+            elif char == ']':
+                return
+            else:
+                try:
+                    element, end = scan_once(buffer, pos)
+                except (StopIteration, json.JSONDecodeError) as e:
+                    if final:
+                        raise json.JSONDecodeError('Invalid JSON array element', buffer, pos) from e
+                    break  # element continues in the next chunk
+                if end == end_of_buffer and not final and isinstance(element, (int, float)):
+                    break  # a bare number could still be cut off, wait for the next chunk to be sure
+                yield element
+                pos = end
+    raise json.JSONDecodeError('Unterminated JSON array', buffer, pos)
+
+
+def _with_final(chunks: Iterable[bytes]) -> Iterator[bytes | None]:
+    for chunk in chunks:
+        if chunk:
+            yield chunk
+    yield None  # flush marker
+
+
+def select_fields(obj: dict, fields: Collection[str]) -> dict:
+    """
+    Returns a compact copy of obj with only the given top-level keys. The json module allocates a new string for every
+    key and value it decodes, so for thousands of near-identical localizations, keys and string attribute values (e.g.
+    the same scientific name over and over) are interned to share a single copy. Nested dicts (attributes) are kept
+    whole.
+    """
+    compact = {}
+    for field in fields:
+        if field not in obj:
+            continue
+        value = obj[field]
+        if isinstance(value, dict):
+            value = {
+                sys.intern(key): sys.intern(item) if isinstance(item, str) else item
+                for key, item in value.items()
+            }
+        compact[sys.intern(field)] = value
+    return compact
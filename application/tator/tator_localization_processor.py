@@ -1,14 +1,25 @@
 import datetime
+import hashlib
 import os
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
 import pandas as pd
 import requests
 import sys
 
 from flask import session
+from application.util.compact_record import CompactRecord
 from application.util.constants import TERM_RED, TERM_NORMAL, TERM_YELLOW
+from application.tator.dropcam_fieldbook_cache import DropcamFieldbookCache, normalize_deployment_name
+from application.tator.substrate_timeline import SubstrateTimeline
+from application.tator.tator_annotator_cache import TatorAnnotatorCache
 from application.tator.tator_type import TatorLocalizationType
 from application.util.phylogeny_cache import PhylogenyCache
+from application.util.phylogeny_store import PhylogenyStore
+from application.tator.tator_client_registry import get_tator_client
+from application.tator.tator_localization_store import TatorLocalizationStore
+from application.tator.tator_record_cache import TatorRecordCache
 from application.tator.tator_rest_client import TatorRestClient
 
 
@@ -19,6 +30,66 @@ class TatorLocalizationProcessor:
     """
 
     BOTTOM_TIME_FORMAT = '%Y-%m-%d %H:%M:%SZ'
+    # every top-level localization key read by process_records and the QA/QC checks (see fetch_localizations(compact=True))
+    LOCALIZATION_FIELDS = (
+        'id', 'elemental_id', 'version', 'type', 'media', 'master_section', 'frame',
+        'x', 'y', 'width', 'height', 'created_by', 'attributes', 'modified_datetime',
+    )
+    # {column: localization attribute} for attributes that are copied into the records as-is
+    ATTRIBUTE_COLUMNS = {
+        'attracted': 'Attracted',
+        'upon': 'Upon',
+        'size': 'Size',
+        'categorical_abundance': 'Categorical Abundance',
+        'identification_remarks': 'IdentificationRemarks',
+        'identified_by': 'Identified By',
+        'notes': 'Notes',
+        'qualifier': 'Qualifier',
+        'reason': 'Reason',
+        'morphospecies': 'Morphospecies',
+        'tentative_id': 'Tentative ID',
+        'do_temp_c': 'DO Temperature (celsius)',
+        'do_concentration_salin_comp_mol_L': 'DO Concentration Salin Comp (mol per L)',
+        'depth_m': 'Depth',
+    }
+    # {column: media/state attribute}
+    SUBSTRATE_COLUMNS = {
+        'primary_substrate': 'Primary Substrate',
+        'secondary_substrate': 'Secondary Substrate',
+        'bedforms': 'Bedforms',
+        'relief': 'Relief',
+        'substrate_notes': 'Substrate Notes',
+        'deployment_notes': 'Deployment Notes',
+    }
+    PHYLOGENY_COLUMNS = (
+        'phylum', 'class', 'subclass', 'order', 'suborder', 'family',
+        'subfamily', 'genus', 'subgenus', 'species', 'subspecies', 'aphia_id',
+    )
+    CATEGORICAL_ABUNDANCE_COUNTS = {'1-19': 10, '20-49': 35, '50-99': 75, '100-999': 500, '1000+': 1000}
+    # localizations that share all of these are merged into one record (e.g. dots marking individuals in a frame)
+    GROUP_COLUMNS = ['media_id', 'frame', 'scientific_name', 'tentative_id', 'morphospecies', 'upon', 'type']
+    UNIFORM_COLUMNS = [
+        'attracted', 'size', 'categorical_abundance', 'identification_remarks',
+        'identified_by', 'notes', 'qualifier', 'reason',
+    ]
+    # columns holding native datetimes/timedeltas until render time (see format_times)
+    TIME_COLUMNS = ('timestamp', 'camera_seafloor_arrival', 'animal_arrival')
+    # every column process_records builds, one value per box/dot
+    LOCALIZATION_COLUMNS = (
+        'elemental_id', 'section_id', 'timestamp', 'camera_seafloor_arrival', 'animal_arrival', 'all_localizations',
+        'type', 'video_sequence_name', 'scientific_name', 'count', 'attracted', 'upon', 'size', 'categorical_abundance',
+        'identification_remarks', 'identified_by', 'notes', 'qualifier', 'morphospecies', 'reason', 'tentative_id',
+        'good_image', 'annotator', 'frame', 'frame_url', 'media_id', 'problems', 'lat', 'long', 'depth_m', 'do_temp_c',
+        'do_concentration_salin_comp_mol_L', 'bait_type', *SUBSTRATE_COLUMNS, *PHYLOGENY_COLUMNS,
+    )
+    # final record keys, in order (observation_uuid is the elemental ID)
+    RECORD_COLUMNS = [
+        'observation_uuid', 'timestamp', 'camera_seafloor_arrival', 'animal_arrival', 'all_localizations', 'media_id',
+        'frame', 'frame_url', 'annotator', 'type', 'scientific_name', 'section_id', 'video_sequence_name', 'count',
+        'attracted', 'upon', 'size', 'categorical_abundance', 'identification_remarks', 'identified_by', 'notes',
+        'qualifier', 'reason', 'tentative_id', 'morphospecies', 'good_image', 'problems', 'lat', 'long', 'depth_m',
+        'do_temp_c', 'do_concentration_salin_comp_mol_L', 'bait_type', *SUBSTRATE_COLUMNS, *PHYLOGENY_COLUMNS,
+    ]
 
     def __init__(
         self,
@@ -31,35 +102,82 @@ class TatorLocalizationProcessor:
         self.project_id = project_id
         self.tator_url = tator_url
         self.darc_review_url = darc_review_url
-        self.tator_client = TatorRestClient(tator_url, session['tator_token'])
+        self.tator_client = get_tator_client(tator_url, session['tator_token'])
         self.sections = [Section(section_id, self.tator_client) for section_id in section_ids]
         self.final_records: list[dict]|dict = []  # final list formatted for review page
         self.phylogeny = PhylogenyCache()
         self.media_list = media_list
 
-    def fetch_localizations(self):
+    def fetch_localizations(self, max_workers: int = 1, compact: bool = False, incremental: bool = False):
+        """
+        Fetches localizations for every section (or, if a media list was given, every 50-media batch). With
+        max_workers > 1 the requests run concurrently on a bounded thread pool; results are merged in request order,
+        so each section's localizations come out in the same order as a sequential fetch. With compact=True,
+        responses are stream-decoded and only LOCALIZATION_FIELDS are kept for each localization. With
+        incremental=True, sections are synced through the local TatorLocalizationStore, so only localizations changed
+        since the last fetch are downloaded (media list fetches always download everything).
+        """
+        fields = {'fields': self.LOCALIZATION_FIELDS} if compact else {}
         print('Fetching localizations...')
         sys.stdout.flush()
-        if self.media_list:  # list of media, fetch by media IDs instead of section
-            section_map = {int(section.section_id): section for section in self.sections}
-            media_ids = [int(media['id']) for media in self.media_list]
-            for i in range(0, len(media_ids), 50):
-                batch = media_ids[i:i + 50]
-                for localization in self.tator_client.get_localizations(self.project_id, media_ids=batch):
-                    master_section = localization.get('master_section')
-                    section = section_map.get(master_section)
-                    if section is None:
-                        raise ValueError(
-                            f'Localization {localization.get("id")} has master_section {master_section}, which is '
-                            f'not among the requested sections {list(section_map.keys())}'
-                        )
-                    section.localizations.append(localization)
-            for section in self.sections:
-                print(f'Fetched {len(section.localizations)} localizations for {section.deployment_name}')
-        else:
-            for section in self.sections:
-                section.localizations = self.tator_client.get_localizations(self.project_id, section_id=int(section.section_id))
-                print(f'Fetched {len(section.localizations)} localizations for {section.deployment_name}')
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            if self.media_list:  # list of media, fetch by media IDs instead of section
+                section_map = {int(section.section_id): section for section in self.sections}
+                media_ids = [int(media['id']) for media in self.media_list]
+                batches = [media_ids[i:i + 50] for i in range(0, len(media_ids), 50)]
+                for batch_localizations in executor.map(lambda batch: self._fetch_localization_pages(media_ids=batch, **fields), batches):
+                    for localization in batch_localizations:
+                        master_section = localization.get('master_section')
+                        section = section_map.get(master_section)
+                        if section is None:
+                            raise ValueError(
+                                f'Localization {localization.get("id")} has master_section {master_section}, which is '
+                                f'not among the requested sections {list(section_map.keys())}'
+                            )
+                        section.localizations.append(localization)
+                for section in self.sections:
+                    print(f'Fetched {len(section.localizations)} localizations for {section.deployment_name}')
+            else:
+                if incremental:
+                    localization_store = TatorLocalizationStore.default()
+                    section_localizations = executor.map(
+                        lambda _section: localization_store.sync_section(
+                            self.tator_client,
+                            self.project_id,
+                            int(_section.section_id),
+                            **fields,
+                        ),
+                        self.sections,
+                    )
+                else:
+                    section_localizations = executor.map(
+                        lambda _section: self._fetch_localization_pages(section_id=int(_section.section_id), **fields),
+                        self.sections,
+                    )
+                for section, localizations in zip(self.sections, section_localizations):
+                    section.localizations = localizations
+                    print(f'Fetched {len(section.localizations)} localizations for {section.deployment_name}')
+
+    @classmethod
+    def record_key(cls, localization: dict) -> tuple:
+        """The GROUP_COLUMNS values of a fetched localization: localizations with the same key become one record."""
+        attributes = localization['attributes']
+        return (
+            localization['media'],
+            localization['frame'],
+            attributes.get('Scientific Name'),
+            attributes.get(cls.ATTRIBUTE_COLUMNS['tentative_id']),
+            attributes.get(cls.ATTRIBUTE_COLUMNS['morphospecies']),
+            attributes.get(cls.ATTRIBUTE_COLUMNS['upon']),
+            localization['type'],
+        )
+
+    def _fetch_localization_pages(self, **kwargs) -> list[dict]:
+        """Drains iter_localizations for one section (section_id=...) or one media batch (media_ids=...)."""
+        localizations = []
+        for page in self.tator_client.iter_localizations(self.project_id, **kwargs):
+            localizations.extend(page)
+        return localizations
 
     def process_records(
         self,
@@ -75,19 +193,18 @@ class TatorLocalizationProcessor:
         :param no_match_records: Set of scientific names that have already been attempted to match to WoRMS and have no
             match, to avoid redundant WoRMS API calls. This set will be updated with any new names that fail to match.
         :param get_timestamp: Whether to calculate observation timestamps based on localization frame and media start
-            time.
+            time. Times are left as datetimes/timedeltas; use format_times before rendering them.
         :param get_dropcam_fieldbook_data: Whether to fetch data (lat/long, depth, bait type) from the dropcam fieldbook
              on HURLSTOR and attach it to localizations.
         :param get_dropcam_substrates: Whether to fetch substrate information for dropcam deployments from media
             attributes. For dropcams, substrates are part of media attributes. We will fetch them inside this method.
-        :param sub_media_substrates: A mapping of media IDs to their substrate state timeline (a list of entries, each
-            with a 'frame' key), for sub dives where substrate changes over the course of a video. Substrates are
-            States; the caller is expected to fetch them and pass them in here.
+        :param sub_media_substrates: A mapping of media IDs to their SubstrateTimeline (or list of substrate state
+            entries, each with a 'frame' key), for sub dives where substrate changes over the course of a video.
+            Substrates are States; the caller is expected to fetch them and pass them in here.
         """
         print('Processing localizations...')
-        formatted_localizations = []
-        expedition_fieldbook = {}  # {section_id: deployments[]}
-        dropcam_substrate_cache = {}  # {media_id: substrate_dict}, populated internally as media are looked up
+        columns = {column: [] for column in self.LOCALIZATION_COLUMNS}  # one value per box/dot, across all sections
+        dropcam_substrate_cache = {}  # {media_id: substrate columns}, populated internally as media are looked up
         if 'media_fps' not in session:
             session['media_fps'] = {}
 
@@ -99,259 +216,209 @@ class TatorLocalizationProcessor:
         else:
             media_id_map = {}
 
+        sub_media_timelines = {  # {media_id: SubstrateTimeline}
+            media_id: substrates if isinstance(substrates, SubstrateTimeline) else SubstrateTimeline(substrates)
+            for media_id, substrates in (sub_media_substrates or {}).items()
+        }
+        if get_dropcam_fieldbook_data:
+            fieldbooks = DropcamFieldbookCache.default().get_deployments(
+                self.darc_review_url,
+                [section.section_id for section in self.sections],
+            )  # {section_id: {deployment name: deployment}}
+        else:
+            fieldbooks = {}
+
+        # same inputs -> same records, so repeat checks over the same deployments skip straight to the check itself
+        record_cache = TatorRecordCache.default()
+        fingerprint_inputs = {
+            'flags': (get_timestamp, get_dropcam_fieldbook_data, get_dropcam_substrates),
+            'media_id_map': media_id_map,
+            'sub_media_timelines': sub_media_timelines,
+            'fieldbooks': fieldbooks,
+        }
+        scientific_names = {
+            localization['attributes'].get('Scientific Name')
+            for section in self.sections
+            for localization in section.localizations
+            if TatorLocalizationType.is_box_or_dot(localization['type'])
+        }
+        cached_records = record_cache.get(record_cache.key(self._record_fingerprint(**fingerprint_inputs)))
+        if cached_records is not None:
+            # what prefetch_worms would have added, without it checking the phylogeny of every name
+            no_match_records.update(self.phylogeny.store.no_matches(PhylogenyStore.WORMS, [name for name in scientific_names if name]))
+            self.final_records.extend(cached_records)
+            print(f'Loaded {len(cached_records)} processed records from cache!')
+            return
+
+        # resolve every new name up front (concurrently), so the loop below only does in-memory lookups
+        self.phylogeny.prefetch_worms(
+            names=scientific_names,
+            no_match_records=no_match_records,
+            require_aphia_id=True,
+        )
+
+        annotators = TatorAnnotatorCache.default().get_names(  # {user_id: name}
+            self.tator_client,
+            (
+                localization['created_by']
+                for section in self.sections
+                for localization in section.localizations
+                if TatorLocalizationType.is_box_or_dot(localization['type'])
+            ),
+        )
+
         for section in self.sections:
             print(f'Processing localizations for {section.deployment_name}...', end='')
             sys.stdout.flush()
-            for localization in section.localizations:
-                if not TatorLocalizationType.is_box_or_dot(localization['type']):
-                    continue  # we only care about boxes and dots
-                attributes = localization['attributes']
-                scientific_name = attributes.get('Scientific Name')
-                cached_phylogeny = self.phylogeny.data.get(scientific_name)
-                media_id = localization['media']
-                if (cached_phylogeny is None or 'aphia_id' not in cached_phylogeny.keys())\
-                        and scientific_name not in no_match_records:
-                    if not self.phylogeny.fetch_worms(scientific_name):
-                        no_match_records.add(scientific_name)
-                localization_dict = {
-                    'elemental_id': localization['elemental_id'],
-                    'section_id': section.section_id,
-                    'all_localizations': {
+            localizations = [
+                localization for localization in section.localizations
+                if TatorLocalizationType.is_box_or_dot(localization['type'])  # we only care about boxes and dots
+            ]
+            if not localizations:
+                print('processed!')
+                continue
+            count = len(localizations)
+            attributes = [localization['attributes'] for localization in localizations]
+            scientific_names = [localization_attributes.get('Scientific Name') for localization_attributes in attributes]
+            section_columns = {
+                'elemental_id': [localization['elemental_id'] for localization in localizations],
+                'section_id': [section.section_id] * count,
+                'all_localizations': [
+                    {
                         'id': localization['id'],
                         'elemental_id': localization['elemental_id'],
                         'version': localization['version'],
                         'type': localization['type'],
                         'points': [round(localization['x'], 5), round(localization['y'], 5)],
                         'dimensions': [localization['width'], localization['height']] if TatorLocalizationType.is_box(localization['type']) else None,
-                    },
-                    'type': localization['type'],
-                    'video_sequence_name': section.deployment_name,
-                    'scientific_name': scientific_name,
-                    'count': 0 if TatorLocalizationType.is_box(localization['type']) else 1,
-                    'attracted': attributes.get('Attracted'),
-                    'upon': attributes.get('Upon'),
-                    'size': attributes.get('Size'),
-                    'categorical_abundance': attributes.get('Categorical Abundance'),
-                    'identification_remarks': attributes.get('IdentificationRemarks'),
-                    'identified_by': attributes.get('Identified By'),
-                    'notes': attributes.get('Notes'),
-                    'qualifier': attributes.get('Qualifier'),
-                    'reason': attributes.get('Reason'),
-                    'morphospecies': attributes.get('Morphospecies'),
-                    'tentative_id': attributes.get('Tentative ID'),
-                    'good_image': True if attributes.get('Good Image') else False,
-                    'annotator': self._get_annotator_name(localization['created_by']),
-                    'frame': localization['frame'],
-                    'frame_url': f'/tator/frame/{localization["media"]}/{localization["frame"]}',
-                    'media_id': media_id,
-                    'problems': localization['problems'] if 'problems' in localization.keys() else None,
-                    'do_temp_c': attributes.get('DO Temperature (celsius)'),
-                    'do_concentration_salin_comp_mol_L': attributes.get('DO Concentration Salin Comp (mol per L)'),
-                    'depth_m': attributes.get('Depth'),
-                }
-                if attributes.get('Position'):
-                    localization_dict['lat'] = round(attributes['Position'][1], 4)
-                    localization_dict['long'] = round(attributes['Position'][0], 4)
-                if localization_dict['categorical_abundance'] and localization_dict['categorical_abundance'] != '--':
-                    match localization_dict['categorical_abundance']:
-                        case '1-19':
-                            localization_dict['count'] = 10
-                        case '20-49':
-                            localization_dict['count'] = 35
-                        case '50-99':
-                            localization_dict['count'] = 75
-                        case '100-999':
-                            localization_dict['count'] = 500
-                        case '1000+':
-                            localization_dict['count'] = 1000
-                        case _:
-                            print(f'{TERM_RED}Unknown categorical abundance: {localization_dict["categorical_abundance"]}{TERM_NORMAL}')
-                if get_timestamp:
-                    if TatorLocalizationType.is_sub(localization_dict['type']):
-                        media = media_id_map[media_id]
-                        fps = media['fps'] or 30
-                        if media['attributes'].get('Start Time'):
-                            media_start_time = datetime.datetime.fromisoformat(media['attributes']['Start Time']).astimezone(datetime.timezone.utc)
-                            observation_timestamp = media_start_time + datetime.timedelta(seconds=localization['frame'] / fps)
-                            localization_dict['timestamp'] = observation_timestamp.strftime(self.BOTTOM_TIME_FORMAT)
-                        else:
-                            print(f'{TERM_RED}No start time found for media {media["name"]}. Cannot calculate timestamps.{TERM_NORMAL}')
+                    } for localization in localizations
+                ],
+                'type': [localization['type'] for localization in localizations],
+                'video_sequence_name': [section.deployment_name] * count,
+                'scientific_name': scientific_names,
+                'good_image': [bool(localization_attributes.get('Good Image')) for localization_attributes in attributes],
+                'annotator': [annotators[localization['created_by']] for localization in localizations],
+                'frame': [localization['frame'] for localization in localizations],
+                'frame_url': [f'/tator/frame/{localization["media"]}/{localization["frame"]}' for localization in localizations],
+                'media_id': [localization['media'] for localization in localizations],
+                'problems': [localization.get('problems') for localization in localizations],
+                'lat': [
+                    round(localization_attributes['Position'][1], 4) if localization_attributes.get('Position') else None
+                    for localization_attributes in attributes
+                ],
+                'long': [
+                    round(localization_attributes['Position'][0], 4) if localization_attributes.get('Position') else None
+                    for localization_attributes in attributes
+                ],
+            }
+            for column, attribute in self.ATTRIBUTE_COLUMNS.items():
+                section_columns[column] = [localization_attributes.get(attribute) for localization_attributes in attributes]
+            section_columns['count'] = [0 if TatorLocalizationType.is_box(localization_type) else 1 for localization_type in section_columns['type']]
+            for i, categorical_abundance in enumerate(section_columns['categorical_abundance']):
+                if categorical_abundance and categorical_abundance != '--':
+                    if categorical_abundance in self.CATEGORICAL_ABUNDANCE_COUNTS:
+                        section_columns['count'][i] = self.CATEGORICAL_ABUNDANCE_COUNTS[categorical_abundance]
                     else:
-                        if section.bottom_time is None:
-                            print(f'{TERM_RED}No Arrival time found for section {section.deployment_name}. Cannot calculate timestamps.{TERM_NORMAL}')
-                        else:
-                            media_fps = media_id_map[media_id]['fps'] or 30
-                            camera_bottom_arrival = datetime.datetime.strptime(section.bottom_time, self.BOTTOM_TIME_FORMAT).replace(tzinfo=datetime.timezone.utc)
-                            video_start_timestamp = datetime.datetime.fromisoformat(session['media_timestamps'][media_id]).astimezone(datetime.timezone.utc)
-                            observation_timestamp = video_start_timestamp + datetime.timedelta(seconds=localization['frame'] / media_fps)
-                            time_diff = observation_timestamp - camera_bottom_arrival
-                            localization_dict['timestamp'] = observation_timestamp.strftime(self.BOTTOM_TIME_FORMAT)
-                            localization_dict['camera_seafloor_arrival'] = camera_bottom_arrival.strftime(self.BOTTOM_TIME_FORMAT)
-                            localization_dict['animal_arrival'] = str(datetime.timedelta(
-                                days=time_diff.days,
-                                seconds=time_diff.seconds
-                            )) if observation_timestamp > camera_bottom_arrival else '00:00:00'
-                if get_dropcam_fieldbook_data:
-                    if not expedition_fieldbook.get(section.section_id):
-                        fieldbook_res = requests.get(
-                            url=f'{self.darc_review_url}/dropcam-fieldbook/{section.section_id}',
-                            headers={'API-Key': os.environ.get('DARC_REVIEW_API_KEY')},
-                        )
-                        if fieldbook_res.status_code == 200:
-                            expedition_fieldbook[section.section_id] = fieldbook_res.json()['deployments']
-                        else:
-                            print(f'{TERM_RED}Error fetching expedition fieldbook.{TERM_NORMAL}')
-                            print(fieldbook_res.text)
-                    deployment_name = section.deployment_name.replace('-', '_')  # for DOEX0087_NIU-dscm-02
-                    if section.section_id not in expedition_fieldbook.keys():
-                        print(f'{TERM_RED}No fieldbook data found for section {section.section_id}{TERM_NORMAL}')
-                        raise ValueError(f'No fieldbook data found for section {section.section_id}')
-                    deployment_ctd = next((x for x in expedition_fieldbook[section.section_id] if x['deployment_name'] == deployment_name), None)
-                    if deployment_ctd:
-                        localization_dict['lat'] = deployment_ctd['lat']
-                        localization_dict['long'] = deployment_ctd['long']
-                        localization_dict['bait_type'] = deployment_ctd['bait_type']
-                        localization_dict['depth_m'] = localization_dict['depth_m'] or deployment_ctd['depth_m']
-                if get_dropcam_substrates:
-                    substrates = dropcam_substrate_cache.get(media_id)
-                    if substrates is None:
-                        substrates = media_id_map[media_id]["attributes"]
-                        dropcam_substrate_cache[media_id] = substrates
-                    self._load_substrates(localization_dict, substrates)
-                elif sub_media_substrates:
-                    substrates = self._get_substrate_for_frame(
-                        substrate_entries=sub_media_substrates.get(media_id, []),
-                        localization=localization_dict,
-                    )
-                    if substrates:
-                        self._load_substrates(localization_dict, substrates)
+                        print(f'{TERM_RED}Unknown categorical abundance: {categorical_abundance}{TERM_NORMAL}')
+            if get_timestamp:
+                (
+                    section_columns['timestamp'],
+                    section_columns['camera_seafloor_arrival'],
+                    section_columns['animal_arrival'],
+                ) = self._get_observation_times(section, localizations, media_id_map)
+            if get_dropcam_fieldbook_data:
+                if section.section_id not in fieldbooks.keys():
+                    print(f'{TERM_RED}No fieldbook data found for section {section.section_id}{TERM_NORMAL}')
+                    raise ValueError(f'No fieldbook data found for section {section.section_id}')
+                deployment_ctd = fieldbooks[section.section_id].get(normalize_deployment_name(section.deployment_name))
+                if deployment_ctd:
+                    section_columns['lat'] = [deployment_ctd['lat']] * count
+                    section_columns['long'] = [deployment_ctd['long']] * count
+                    section_columns['bait_type'] = [deployment_ctd['bait_type']] * count
+                    section_columns['depth_m'] = [depth_m or deployment_ctd['depth_m'] for depth_m in section_columns['depth_m']]
+            substrate_rows = None  # [{substrate column: value} or None], one per localization
+            if get_dropcam_substrates:
+                substrate_rows = []
+                for localization in localizations:
+                    substrate_row = dropcam_substrate_cache.get(localization['media'])
+                    if substrate_row is None:
+                        substrate_row = dropcam_substrate_cache[localization['media']] = {}
+                        self._load_substrates(substrate_row, media_id_map[localization['media']]['attributes'])
+                    substrate_rows.append(substrate_row)
+            elif sub_media_timelines:
+                substrate_rows = [None] * count
+                media_rows = {}  # {media_id: [row]}
+                for i, localization in enumerate(localizations):
+                    media_rows.setdefault(localization['media'], []).append(i)
+                for media_id, rows in media_rows.items():
+                    timeline = sub_media_timelines.get(media_id) or SubstrateTimeline([])
+                    loaded_substrates = {}  # {state index: substrate columns}
+                    for i, state_index in zip(rows, timeline.indices_at([localizations[i]['frame'] for i in rows])):
+                        if state_index < 0:
+                            print(f'{TERM_YELLOW}No substrate state found for "{scientific_names[i]}" '
+                                  f'(media ID {media_id}){TERM_NORMAL}')
+                            continue
+                        if state_index not in loaded_substrates:
+                            loaded_substrates[state_index] = {}
+                            self._load_substrates(loaded_substrates[state_index], timeline.entries[state_index])
+                        substrate_rows[i] = loaded_substrates[state_index]
+            if substrate_rows is not None:
+                for column in self.SUBSTRATE_COLUMNS:
+                    section_columns[column] = [substrate_row and substrate_row[column] for substrate_row in substrate_rows]
+            phylogeny_rows = {}  # {scientific_name: {phylogeny column: value}}
+            for scientific_name in dict.fromkeys(scientific_names):
                 if scientific_name in self.phylogeny.data:
-                    for key in self.phylogeny.data[scientific_name].keys():
-                        # split to account for worms 'Phylum (Division)' case
-                        localization_dict[key.split(' ')[0]] = self.phylogeny.data[scientific_name][key]
-                formatted_localizations.append(localization_dict)
+                    # split to account for worms 'Phylum (Division)' case
+                    phylogeny_rows[scientific_name] = {key.split(' ')[0]: value for key, value in self.phylogeny.data[scientific_name].items()}
+            if phylogeny_rows:
+                for column in self.PHYLOGENY_COLUMNS:
+                    section_columns[column] = [phylogeny_rows.get(scientific_name, {}).get(column) for scientific_name in scientific_names]
+            for column, values in columns.items():
+                values.extend(section_columns.get(column) or [None] * count)
             print('processed!')
 
-        if not formatted_localizations:
+        if not columns['elemental_id']:
             print('no records to process!')
+            record_cache.set(record_cache.key(self._record_fingerprint(**fingerprint_inputs)), [])
             return
 
-        localization_df = pd.DataFrame(formatted_localizations, columns=[
-            'elemental_id',
-            'section_id',
-            'timestamp',
-            'camera_seafloor_arrival',
-            'animal_arrival',
-            'all_localizations',
-            'type',
-            'video_sequence_name',
-            'scientific_name',
-            'count',
-            'attracted',
-            'upon',
-            'size',
-            'categorical_abundance',
-            'identification_remarks',
-            'identified_by',
-            'notes',
-            'qualifier',
-            'morphospecies',
-            'reason',
-            'tentative_id',
-            'good_image',
-            'annotator',
-            'frame',
-            'frame_url',
-            'media_id',
-            'problems',
-            'lat',
-            'long',
-            'depth_m',
-            'do_temp_c',
-            'do_concentration_salin_comp_mol_L',
-            'bait_type',
-            'primary_substrate',
-            'secondary_substrate',
-            'bedforms',
-            'relief',
-            'substrate_notes',
-            'deployment_notes',
-            'phylum',
-            'class',
-            'subclass',
-            'order',
-            'suborder',
-            'family',
-            'subfamily',
-            'genus',
-            'subgenus',
-            'species',
-            'subspecies',
-            'aphia_id',
-        ])
+        localization_df = pd.DataFrame({
+            # object dtype so the records keep plain datetimes instead of pandas Timestamps
+            column: pd.Series(values, dtype=object) if column in self.TIME_COLUMNS else values
+            for column, values in columns.items()
+        })
+        grouped = localization_df.groupby(self.GROUP_COLUMNS, dropna=False)
+        group_df = grouped[[
+            column for column in self.LOCALIZATION_COLUMNS
+            if column not in self.GROUP_COLUMNS and column not in ('all_localizations', 'count')
+        ]].first()
+        group_df['count'] = grouped['count'].sum()
 
-        def collect_localizations(items):
-            return [item for item in items]
+        # rows sorted by group (stable, so each group keeps its localizations in fetch order) and each group's slice
+        group_ids = grouped.ngroup().to_numpy()
+        row_order = np.argsort(group_ids, kind='stable')
+        group_starts = np.flatnonzero(np.diff(group_ids[row_order], prepend=-1))
+        group_ends = np.append(group_starts[1:], len(row_order))
+        group_df['all_localizations'] = pd.Series([
+            localizations.tolist()
+            for localizations in np.split(localization_df['all_localizations'].to_numpy()[row_order], group_starts[1:])
+        ], index=group_df.index, dtype=object)
 
-        def first_if_all_same(series):
-            return series.iloc[0] if len(series.unique()) == 1 else f'Non-uniform values across dots: {series.unique()}'.replace("'", '"')
+        # merged dots have to agree on these; where they don't, the record lists the conflicting values instead
+        distinct_counts = grouped[self.UNIFORM_COLUMNS].nunique(dropna=False)
+        for column in self.UNIFORM_COLUMNS:
+            non_uniform_groups = np.flatnonzero(distinct_counts[column].to_numpy() > 1)
+            if not len(non_uniform_groups):
+                continue
+            localization_values = localization_df[column].to_numpy()
+            group_values = group_df[column].to_numpy(dtype=object, copy=True)
+            for group_index in non_uniform_groups:
+                group_rows = row_order[group_starts[group_index]:group_ends[group_index]]
+                unique_values = pd.unique(localization_values[group_rows])
+                group_values[group_index] = f'Non-uniform values across dots: {unique_values}'.replace("'", '"')
+            group_df[column] = group_values
 
-        localization_df = localization_df.groupby([
-            'media_id',
-            'frame',
-            'scientific_name',
-            'tentative_id',
-            'morphospecies',
-            'upon',
-            'type',
-        ], dropna=False).agg({
-            'elemental_id': 'first',
-            'section_id': 'first',
-            'timestamp': 'first',
-            'camera_seafloor_arrival': 'first',
-            'animal_arrival': 'first',
-            'all_localizations': collect_localizations,
-            'count': 'sum',
-            'attracted': first_if_all_same,
-            'size': first_if_all_same,
-            'categorical_abundance': first_if_all_same,
-            'identification_remarks': first_if_all_same,
-            'identified_by': first_if_all_same,
-            'notes': first_if_all_same,
-            'qualifier': first_if_all_same,
-            'reason': first_if_all_same,
-            'good_image': 'first',
-            'video_sequence_name': 'first',
-            'annotator': 'first',
-            'frame_url': 'first',
-            'problems': 'first',
-            'lat': 'first',
-            'long': 'first',
-            'depth_m': 'first',
-            'do_temp_c': 'first',
-            'do_concentration_salin_comp_mol_L': 'first',
-            'bait_type': 'first',
-            'primary_substrate': 'first',
-            'secondary_substrate': 'first',
-            'bedforms': 'first',
-            'relief': 'first',
-            'substrate_notes': 'first',
-            'deployment_notes': 'first',
-            'phylum': 'first',
-            'class': 'first',
-            'subclass': 'first',
-            'order': 'first',
-            'suborder': 'first',
-            'family': 'first',
-            'subfamily': 'first',
-            'genus': 'first',
-            'subgenus': 'first',
-            'species': 'first',
-            'subspecies': 'first',
-            'aphia_id': 'first',
-        }).reset_index()
-
-        localization_df = localization_df.sort_values(by=[
+        group_df = group_df.reset_index().sort_values(by=[
             'phylum',
             'class',
             'subclass',
@@ -366,84 +433,124 @@ class TatorLocalizationProcessor:
             'media_id',
             'frame',
         ])
-
-        def is_populated(val):
-            if isinstance(val, (list, pd.Series)):
-                return pd.notnull(val).all()
-            return pd.notnull(val)
-
-        for index, row in localization_df.iterrows():
-            record = {
-                'observation_uuid': row['elemental_id'],
-                'timestamp': row['timestamp'],
-                'camera_seafloor_arrival': row['camera_seafloor_arrival'],
-                'animal_arrival': row['animal_arrival'],
-                'all_localizations': row['all_localizations'],
-                'media_id': row['media_id'],
-                'frame': row['frame'],
-                'frame_url': row['frame_url'],
-                'annotator': row['annotator'],
-                'type': row['type'],
-                'scientific_name': row['scientific_name'] if row['scientific_name'] != '' else '--',
-                'section_id': row['section_id'],
-                'video_sequence_name': row['video_sequence_name'],
-                'count': row['count'],
-                'attracted': row['attracted'],
-                'upon': row['upon'],
-                'size': row['size'],
-                'categorical_abundance': row['categorical_abundance'],
-                'identification_remarks': row['identification_remarks'],
-                'identified_by': row['identified_by'],
-                'notes': row['notes'],
-                'qualifier': row['qualifier'],
-                'reason': row['reason'],
-                'tentative_id': row['tentative_id'],
-                'morphospecies': row['morphospecies'],
-                'good_image': row['good_image'],
-                'problems': row['problems'],
-                'lat': row['lat'],
-                'long': row['long'],
-                'depth_m': row['depth_m'],
-                'do_temp_c': row['do_temp_c'],
-                'do_concentration_salin_comp_mol_L': row['do_concentration_salin_comp_mol_L'],
-                'bait_type': row['bait_type'],
-                'primary_substrate': row['primary_substrate'],
-                'secondary_substrate': row['secondary_substrate'],
-                'bedforms': row['bedforms'],
-                'relief': row['relief'],
-                'substrate_notes': row['substrate_notes'],
-                'deployment_notes': row['deployment_notes'],
-                'phylum': row['phylum'],
-                'class': row['class'],
-                'subclass': row['subclass'],
-                'order': row['order'],
-                'suborder': row['suborder'],
-                'family': row['family'],
-                'subfamily': row['subfamily'],
-                'genus': row['genus'],
-                'subgenus': row['subgenus'],
-                'species': row['species'],
-                'subspecies': row['subspecies'],
-                'aphia_id': row['aphia_id'],
-            }
-            self.final_records.append({key: val for key, val in record.items() if is_populated(val)})
+        group_df['scientific_name'] = group_df['scientific_name'].where(group_df['scientific_name'] != '', '--')
+        group_df = group_df.rename(columns={'elemental_id': 'observation_uuid'})[self.RECORD_COLUMNS]
+        populated = group_df.notna().to_numpy()
+        records = [
+            TatorRecord.from_values(record.values(), record_populated)
+            for record, record_populated in zip(group_df.to_dict('records'), populated)
+        ]
+        # keyed on the phylogeny as prefetched, which is what the next call will find in the store
+        record_cache.set(record_cache.key(self._record_fingerprint(**fingerprint_inputs)), records)
+        self.final_records.extend(records)
         self.phylogeny.save()
         print('Done!')
 
-    def _get_annotator_name(self, user_id: int) -> str:
-        if 'tator_usernames' not in session.keys():
-            session['tator_usernames'] = {}
-        if user_id not in session['tator_usernames']:
-            print(f'Fetching annotator name for user ID {user_id} from Tator...')
-            res_json = self.tator_client.get_user(user_id)
-            if 'first_name' not in res_json:
-                print(f'{TERM_RED}Error fetching annotator name for user ID {user_id}{TERM_NORMAL}')
-                return f'Unknown annotator (#{user_id})'
-            annotator_name = f'{res_json["first_name"]} {res_json["last_name"]}'
-            print(f'Annotator name for user ID {user_id} is "{annotator_name}"')
-            session['tator_usernames'][user_id] = annotator_name
-            session.modified = True
-        return session['tator_usernames'][user_id]
+    def _record_fingerprint(
+        self,
+        flags: tuple,
+        media_id_map: dict,
+        sub_media_timelines: dict,
+        fieldbooks: dict,
+    ) -> 'hashlib._Hash':
+        """
+        Digest of everything process_records reads, for TatorRecordCache: the request, every localization's id,
+        version and modified_datetime (plus problems attached by a check), and the media, media start times,
+        substrates, fieldbook deployments and phylogeny the records are joined with. Annotator names are the one input
+        left out.
+        """
+        fingerprint = hashlib.sha256(repr((self.tator_url, self.project_id, self.darc_review_url, flags)).encode())
+        scientific_names = set()
+        for section in self.sections:
+            fingerprint.update(repr((section.section_id, section.deployment_name, section.bottom_time)).encode())
+            for localization in section.localizations:
+                fingerprint.update(repr((
+                    localization['id'],
+                    localization['version'],
+                    localization.get('modified_datetime'),
+                    localization.get('problems'),
+                )).encode())
+                scientific_names.add(localization['attributes'].get('Scientific Name'))
+        for media_id in sorted(media_id_map):
+            media = media_id_map[media_id]
+            fingerprint.update(repr((
+                media_id,
+                media.get('fps'),
+                media.get('attributes'),
+                session.get('media_timestamps', {}).get(media_id),
+            )).encode())
+        for media_id in sorted(sub_media_timelines):
+            fingerprint.update(repr((media_id, sub_media_timelines[media_id].entries)).encode())
+        for section_id in sorted(fieldbooks):
+            fingerprint.update(repr((section_id, fieldbooks[section_id])).encode())
+        for scientific_name in sorted(scientific_names, key=str):
+            fingerprint.update(repr((scientific_name, self.phylogeny.data.get(scientific_name))).encode())
+        return fingerprint
+
+    def _get_observation_times(self, section: 'Section', localizations: list[dict], media_id_map: dict) -> tuple[list, list, list]:
+        """
+        Returns (timestamp, camera seafloor arrival, animal arrival) lists for a section's localizations. Observation
+        timestamps are media start time + frame / fps, computed per media as a datetime64 array and floored to the
+        second. The seafloor arrival and time since arrival are only set for dropcams. Values are native datetimes and
+        timedeltas, or None where they can't be calculated.
+        """
+        count = len(localizations)
+        timestamps = np.full(count, np.datetime64('NaT'), dtype='datetime64[s]')
+        camera_seafloor_arrivals = np.full(count, np.datetime64('NaT'), dtype='datetime64[s]')
+        animal_arrivals = np.full(count, np.timedelta64('NaT'), dtype='timedelta64[us]')
+        frames = np.array([localization['frame'] for localization in localizations], dtype=np.float64)
+        media_rows = {}  # {(media_id, is_sub): [row]}
+        for i, localization in enumerate(localizations):
+            media_rows.setdefault((localization['media'], TatorLocalizationType.is_sub(localization['type'])), []).append(i)
+        camera_bottom_arrival = None
+        if section.bottom_time is not None:
+            camera_bottom_arrival = np.datetime64(datetime.datetime.strptime(section.bottom_time, self.BOTTOM_TIME_FORMAT), 's')
+        elif not all(is_sub for _, is_sub in media_rows):
+            print(f'{TERM_RED}No Arrival time found for section {section.deployment_name}. Cannot calculate timestamps.{TERM_NORMAL}')
+        for (media_id, is_sub), rows in media_rows.items():
+            media = media_id_map[media_id]
+            rows = np.array(rows)
+            if is_sub:
+                if not media['attributes'].get('Start Time'):
+                    print(f'{TERM_RED}No start time found for media {media["name"]}. Cannot calculate timestamps.{TERM_NORMAL}')
+                    continue
+                media_start_time = media['attributes']['Start Time']
+            else:
+                if camera_bottom_arrival is None:
+                    continue
+                media_start_time = session['media_timestamps'][media_id]
+            start = np.datetime64(
+                datetime.datetime.fromisoformat(media_start_time).astimezone(datetime.timezone.utc).replace(tzinfo=None),
+                'us',
+            )
+            offsets = np.round(frames[rows] / (media['fps'] or 30) * 1_000_000).astype(np.int64).astype('timedelta64[us]')
+            observation_timestamps = start + offsets
+            timestamps[rows] = observation_timestamps
+            if not is_sub:
+                camera_seafloor_arrivals[rows] = camera_bottom_arrival
+                animal_arrivals[rows] = np.maximum(observation_timestamps - camera_bottom_arrival, np.timedelta64(0, 'us'))
+        return timestamps.tolist(), camera_seafloor_arrivals.tolist(), animal_arrivals.tolist()
+
+    @classmethod
+    def format_times(cls, records: list[dict] | dict[str, dict]) -> list[dict] | dict[str, dict]:
+        """
+        Returns copies of records (a list, or a dict of records keyed by anything) with their datetimes formatted as
+        BOTTOM_TIME_FORMAT and their timedeltas (time since seafloor arrival) as H:MM:SS. The processors keep times
+        native so they can be compared directly; this is for handing records to a template.
+        """
+        def format_record(record: dict) -> dict:
+            formatted = {}
+            for key, val in record.items():
+                if isinstance(val, datetime.datetime):
+                    val = val.strftime(cls.BOTTOM_TIME_FORMAT)
+                elif isinstance(val, datetime.timedelta):
+                    val = str(datetime.timedelta(days=val.days, seconds=val.seconds)) if val > datetime.timedelta(0) else '00:00:00'
+                formatted[key] = val
+            return formatted
+
+        if isinstance(records, dict):
+            return {key: format_record(record) for key, record in records.items()}
+        return [format_record(record) for record in records]
 
     def _get_media_id_map(self) -> dict:
         print('Fetching media ID map...', end='')
@@ -459,31 +566,36 @@ class TatorLocalizationProcessor:
         print('fetched!')
         return media_id_map
 
-    @staticmethod
-    def _load_substrates(localization_dict: dict, substrate_dict: dict):
-        localization_dict['primary_substrate'] = substrate_dict.get('Primary Substrate')
-        localization_dict['secondary_substrate'] = substrate_dict.get('Secondary Substrate')
-        localization_dict['bedforms'] = substrate_dict.get('Bedforms')
-        localization_dict['relief'] = substrate_dict.get('Relief')
-        localization_dict['substrate_notes'] = substrate_dict.get('Substrate Notes')
-        localization_dict['deployment_notes'] = substrate_dict.get('Deployment Notes')
+    @classmethod
+    def _load_substrates(cls, localization_dict: dict, substrate_dict: dict):
+        for column, attribute in cls.SUBSTRATE_COLUMNS.items():
+            localization_dict[column] = substrate_dict.get(attribute)
 
     @staticmethod
     def _get_substrate_for_frame(substrate_entries: list[dict], localization: dict) -> dict:
         """
         Returns the substrate state at the given frame, or None if there is no substrate state at or before that frame.
         """
-        current_substrate = None
-        for substrate in substrate_entries:
-            if substrate['frame'] > localization['frame']:
-                break
-            current_substrate = substrate
+        current_substrate = SubstrateTimeline(substrate_entries).substrate_at(localization['frame'])
         if current_substrate is None:
             print(f'{TERM_YELLOW}No substrate state found for "{localization["scientific_name"]}" '
                   f'(media ID {localization["media_id"]}){TERM_NORMAL}')
         return current_substrate
 
 
+class TatorRecord(CompactRecord):
+    """One processed observation (a box, or a group of merged dots) in TatorLocalizationProcessor.final_records."""
+
+    __slots__ = ()
+
+    FIELDS = tuple(TatorLocalizationProcessor.RECORD_COLUMNS)
+    INTERNED_FIELDS = frozenset((
+        'annotator', 'scientific_name', 'section_id', 'video_sequence_name', 'attracted', 'upon', 'size',
+        'categorical_abundance', 'identified_by', 'qualifier', 'reason', 'tentative_id', 'morphospecies', 'bait_type',
+        *TatorLocalizationProcessor.SUBSTRATE_COLUMNS, *TatorLocalizationProcessor.PHYLOGENY_COLUMNS,
+    ))
+
+
 class Section:
     def __init__(self, section_id: str, tator_rest_client: TatorRestClient):
         section_data = tator_rest_client.get_section_by_id(int(section_id))
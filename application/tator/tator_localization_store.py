@@ -0,0 +1,98 @@
+import datetime
+import os
+from time import time
+from typing import Collection
+
+from cachelib import BaseCache, FileSystemCache
+
+from application.tator.tator_rest_client import TatorRestClient
+
+CACHE_DIR = os.path.join('cache', 'tator_localizations')
+MAX_SECTIONS = 500
+MAX_SYNC_AGE = 60 * 60 * 24  # re-download a section in full at least this often
+SYNC_FIELDS = ('elemental_id', 'version', 'modified_datetime', 'variant_deleted')  # needed to merge changes
+
+
+class TatorLocalizationStore:
+    """
+    Local copy of each section's localizations, so repeat fetches (e.g. clicking through QA/QC checks) only download
+    what changed in Tator since the last sync instead of the whole section.
+
+    Localizations are keyed by (elemental_id, version): an edit comes back from Tator as a newer mark of the same
+    elemental ID and replaces the stored one, and a deletion comes back with ``variant_deleted`` set and removes it. The
+    sync watermark is the newest ``modified_datetime`` seen, so it's on Tator's clock rather than ours. Once the last
+    full refresh is older than MAX_SYNC_AGE (or the requested fields change), the watermark is considered too old to
+    trust and the section is downloaded in full again, which bounds how long anything an incremental sync missed can
+    linger.
+    """
+
+    _default = None
+
+    def __init__(self, backend: BaseCache = None):
+        self._backend = backend or FileSystemCache(cache_dir=CACHE_DIR, threshold=MAX_SECTIONS, default_timeout=0)
+
+    @classmethod
+    def default(cls) -> 'TatorLocalizationStore':
+        """Process-wide store under cache/tator_localizations."""
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    def sync_section(
+        self,
+        tator_client: TatorRestClient,
+        project_id: int,
+        section_id: int,
+        fields: Collection[str] = None,
+    ) -> list[dict]:
+        """Brings the stored copy of a section up to date with Tator and returns its localizations, ordered by ID."""
+        if fields is not None:
+            fields = (*fields, *(field for field in SYNC_FIELDS if field not in fields))
+        key = f'section:{tator_client.base_url}:{project_id}:{section_id}'
+        entry = self._backend.get(key)
+        if self._needs_full_refresh(entry, fields):
+            localizations = {}
+            watermark = None
+            refreshed_at = time()
+            pages = tator_client.iter_localizations(project_id, section_id=section_id, fields=fields)
+        else:
+            localizations = entry['localizations']
+            watermark = entry['watermark']
+            refreshed_at = entry['refreshed_at']
+            pages = tator_client.iter_localizations(
+                project_id,
+                section_id=section_id,
+                fields=fields,
+                modified_since=watermark,
+            )
+        for page in pages:
+            for localization in page:
+                localization_key = (localization['elemental_id'], localization['version'])
+                if localization.get('variant_deleted'):
+                    localizations.pop(localization_key, None)
+                else:
+                    localizations[localization_key] = localization
+                modified = localization.get('modified_datetime')
+                if modified and (watermark is None or _parse(modified) > _parse(watermark)):
+                    watermark = modified
+        self._backend.set(key, {
+            'fields': fields,
+            'watermark': watermark,
+            'refreshed_at': refreshed_at,
+            'localizations': localizations,
+        }, timeout=0)
+        return sorted(localizations.values(), key=lambda localization: localization['id'])
+
+    @staticmethod
+    def _needs_full_refresh(entry: dict | None, fields: Collection[str] | None) -> bool:
+        if entry is None or entry['watermark'] is None or entry['fields'] != fields:
+            return True
+        return time() - entry['refreshed_at'] > MAX_SYNC_AGE
+
+    def clear(self):
+        self._backend.clear()
+
+
+def _parse(timestamp: str) -> datetime.datetime:
+    parsed = datetime.datetime.fromisoformat(timestamp)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=datetime.timezone.utc)
@@ -0,0 +1,54 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import tator
+
+from application.util.constants import TERM_YELLOW, TERM_NORMAL
+
+MAX_FALLBACK_WORKERS = 8
+
+
+def update_localizations(
+        api,
+        project_id: int | None,
+        version: int,
+        elemental_ids: list[str],
+        attributes: dict,
+        max_workers: int = MAX_FALLBACK_WORKERS,
+):
+    """
+    Sets the same attributes on every localization in elemental_ids with one bulk PATCH to Tator's project_id. If the
+    project isn't known or Tator rejects the bulk request (nothing is updated then), patches each localization by
+    elemental ID instead, at most max_workers at a time. Errors from the per-localization patches propagate.
+    """
+    if not elemental_ids:
+        return
+    if project_id is None:
+        _update_each(api, version, elemental_ids, attributes, max_workers)
+        return
+    try:
+        api.update_localization_list(
+            project=project_id,
+            version=[int(version)],
+            localization_bulk_update=tator.models.LocalizationBulkUpdate(
+                attributes=attributes,
+                elemental_ids=elemental_ids,
+            ),
+        )
+    except tator.openapi.tator_openapi.exceptions.ApiException as e:
+        print(f'{TERM_YELLOW}WARNING: Bulk localization update rejected ({e.status}), retrying individually{TERM_NORMAL}')
+        _update_each(api, version, elemental_ids, attributes, max_workers)
+
+
+def _update_each(api, version: int, elemental_ids: list[str], attributes: dict, max_workers: int):
+    """Patches each localization by elemental ID, at most max_workers at a time. The first error propagates."""
+    def update_one(elemental_id: str):
+        api.update_localization_by_elemental_id(
+            version=version,
+            elemental_id=elemental_id,
+            localization_update=tator.models.LocalizationUpdate(attributes=attributes),
+        )
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(elemental_ids)))) as executor:
+        # list() so the first failure is re-raised here
+        list(executor.map(update_one, elemental_ids))
+
@@ -0,0 +1,79 @@
+import os
+import threading
+from time import time
+
+from cachelib import BaseCache, FileSystemCache
+
+CACHE_DIR = os.path.join('cache', 'tator_metadata')
+SECTION_TTL = 60 * 60 * 24      # sections are effectively immutable once an expedition is uploaded
+MEDIA_TTL = 60 * 60             # media attributes (start time, arrival, substrates) get filled in by scripts
+USER_TTL = 60 * 60 * 24 * 7     # annotator names basically never change
+MAX_ENTRIES = 5000
+MEDIA_GENERATION_KEY = 'media_generation'
+
+
+class TatorMetadataCache:
+    """
+    Disk-backed cache for Tator metadata (sections, media, users) used by TatorRestClient.
+
+    Entries are kept past their TTL so that, when Tator sent an ETag or Last-Modified header, a stale entry can be
+    revalidated with a conditional request instead of downloaded again. Media and media list entries are keyed by a
+    generation counter, so invalidating media after a PATCH drops every cached copy, for every token, in one write.
+    """
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, backend: BaseCache = None, cache_dir: str = CACHE_DIR):
+        # default_timeout=0: never let cachelib expire entries, staleness is decided by the TTLs above
+        self._backend = backend or FileSystemCache(cache_dir=cache_dir, threshold=MAX_ENTRIES, default_timeout=0)
+
+    @classmethod
+    def default(cls) -> 'TatorMetadataCache':
+        """Process-wide cache shared by every TatorRestClient that isn't given one explicitly."""
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    def get(self, key: str) -> dict | None:
+        """Returns the cached entry ({body, fetched_at, etag, last_modified}) for key, fresh or stale."""
+        return self._backend.get(key)
+
+    def set(self, key: str, body, etag: str = None, last_modified: str = None):
+        self._backend.set(key, {
+            'body': body,
+            'fetched_at': time(),
+            'etag': etag,
+            'last_modified': last_modified,
+        }, timeout=0)
+
+    def touch(self, key: str, entry: dict):
+        """Marks a stale entry as fresh again after Tator confirmed it hasn't changed (304)."""
+        self._backend.set(key, {**entry, 'fetched_at': time()}, timeout=0)
+
+    def delete(self, key: str):
+        self._backend.delete(key)
+
+    def clear(self):
+        self._backend.clear()
+
+    def media_generation(self) -> int:
+        return self._backend.get(MEDIA_GENERATION_KEY) or 0
+
+    def bump_media_generation(self):
+        self._backend.set(MEDIA_GENERATION_KEY, self.media_generation() + 1, timeout=0)
+
+    @staticmethod
+    def is_fresh(entry: dict, ttl: int) -> bool:
+        return time() - entry['fetched_at'] < ttl
+
+    @staticmethod
+    def validators(entry: dict) -> dict:
+        """Conditional request headers for revalidating entry, if Tator gave us anything to validate with."""
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
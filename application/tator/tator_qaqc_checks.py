@@ -0,0 +1,349 @@
+"""
+The Tator QA/QC checks that flag records, and the engine that runs any number of them together.
+
+Each check looks at one localization (or, for checks that need phylogeny/ancillary data, one processed record) at a
+time; checks that compare localizations with each other (e.g. same name, different qualifier) aggregate as they go and
+resolve once everything has been seen. The engine feeds every check from one pass over one fetched set of
+localizations, so the checklist can count what every check flags without fetching and processing once per check.
+Checks never modify what they're given: the problems they find are returned alongside the flagged items.
+"""
+
+from abc import ABC, abstractmethod
+
+from application.tator.tator_localization_processor import TatorLocalizationProcessor
+from application.tator.tator_type import TatorLocalizationType
+
+EMPTY_VALUES = ('--', '-', '')
+
+
+class QaqcCheck(ABC):
+    """
+    A check that flags localizations (or records, if scope is RECORDS). The engine calls observe() with each item and
+    its index, then flagged() for the (index, problems) of each flagged item, in the order they were observed.
+
+    Subclasses implement check(), returning the item's problems (e.g. 'Qualifier, Reason'), True to flag the item
+    without naming a problem, or a falsy value to pass it. Checks that compare items with each other also override
+    observe() and flagged() to aggregate, and pass every item in check().
+    """
+
+    LOCALIZATIONS = 'localizations'
+    RECORDS = 'records'
+
+    name = ''
+    scope = LOCALIZATIONS
+
+    def __init__(self):
+        self._flagged = []
+
+    def observe(self, index: int, item: dict):
+        problems = self.check(item)
+        if problems:
+            self._flagged.append((index, None if problems is True else problems))
+
+    @abstractmethod
+    def check(self, item: dict) -> str | bool | None:
+        """The item's problems, True to flag it without naming one, or a falsy value to pass it."""
+
+    def flagged(self) -> list[tuple[int, str | None]]:
+        return self._flagged
+
+
+class QaqcCheckResult:
+    """What one check flagged: (index, problems) pairs into the items it was run on, and how many records that is."""
+
+    def __init__(self, name: str, flagged: list[tuple[int, str | None]], count: int):
+        self.name = name
+        self.flagged = flagged
+        self.count = count
+
+    def items(self, source: list) -> list:
+        """Copies of the flagged items from source (the list the check was run on), with their problems set."""
+        flagged_items = []
+        for index, problems in self.flagged:
+            item = type(source[index])(source[index])
+            if problems is not None:
+                item['problems'] = problems
+            flagged_items.append(item)
+        return flagged_items
+
+
+class TatorQaqcCheckEngine:
+    """Runs a set of checks together: one pass over the localizations, one over the processed records."""
+
+    def __init__(self, checks: list[QaqcCheck]):
+        self.checks = checks
+
+    @property
+    def needs_records(self) -> bool:
+        return any(check.scope == QaqcCheck.RECORDS for check in self.checks)
+
+    def run(self, localizations: list[dict], records: list[dict] = ()) -> dict[str, QaqcCheckResult]:
+        """
+        Returns {check name: QaqcCheckResult}. Counts are in records, as the check pages show them: localizations that
+        process_records would merge into one record (e.g. dots marking individuals in a frame) count once.
+        """
+        localization_checks = [check for check in self.checks if check.scope == QaqcCheck.LOCALIZATIONS]
+        record_checks = [check for check in self.checks if check.scope == QaqcCheck.RECORDS]
+        for index, localization in enumerate(localizations):
+            for check in localization_checks:
+                check.observe(index, localization)
+        for index, record in enumerate(records):
+            for check in record_checks:
+                check.observe(index, record)
+        results = {}
+        for check in localization_checks:
+            flagged = check.flagged()
+            count = len({
+                TatorLocalizationProcessor.record_key(localizations[index]) for index, _ in flagged
+                if TatorLocalizationType.is_box_or_dot(localizations[index]['type'])
+            })
+            results[check.name] = QaqcCheckResult(check.name, flagged, count)
+        for check in record_checks:
+            flagged = check.flagged()
+            results[check.name] = QaqcCheckResult(check.name, flagged, len(flagged))
+        return results
+
+
+class NamesAcceptedCheck(QaqcCheck):
+    """Scientific names or tentative IDs that aren't accepted in WoRMS."""
+
+    name = 'names-accepted'
+
+    def __init__(self, no_match_records: set):
+        super().__init__()
+        self.no_match_records = no_match_records
+
+    def check(self, localization: dict) -> str | None:
+        scientific_name_unaccepted = localization['attributes'].get('Scientific Name') in self.no_match_records
+        tentative_id = localization['attributes'].get('Tentative ID')
+        tentative_id_unaccepted = bool(tentative_id) and tentative_id in self.no_match_records
+        if scientific_name_unaccepted and tentative_id_unaccepted:
+            return 'Scientific Name, Tentative ID'
+        if scientific_name_unaccepted:
+            return 'Scientific Name'
+        if tentative_id_unaccepted:
+            return 'Tentative ID'
+        return None
+
+
+class MissingQualifierCheck(QaqcCheck):
+    """
+    Records classified higher than species without a qualifier, or classified to species with one (needs phylogeny,
+    so it checks processed records).
+    """
+
+    name = 'missing-qualifier'
+    scope = QaqcCheck.RECORDS
+
+    def check(self, record: dict) -> str | None:
+        has_qualifier = record.get('qualifier', '--') != '--'
+        if bool(record.get('species')) == has_qualifier:
+            return 'Scientific Name, Qualifier'
+        return None
+
+
+class StetReasonCheck(QaqcCheck):
+    """Qualifier of 'stet' but no reason."""
+
+    name = 'stet-missing-reason'
+
+    def check(self, localization: dict) -> str | None:
+        attributes = localization['attributes']
+        if attributes.get('Qualifier') == 'stet.' and attributes.get('Reason', '--') == '--':
+            return 'Qualifier, Reason'
+        return None
+
+
+class TentativeIdMorphospeciesCheck(QaqcCheck):
+    """Every localization with a tentative ID or morphospecies."""
+
+    name = 'all-tentative-ids'
+
+    def check(self, localization: dict) -> str | None:
+        tentative_id = localization['attributes'].get('Tentative ID')
+        morphospecies = localization['attributes'].get('Morphospecies')
+        problems = ''
+        if tentative_id and tentative_id not in EMPTY_VALUES:
+            problems += 'Tentative ID'
+        if morphospecies and morphospecies not in EMPTY_VALUES:
+            problems += ' Morphospecies'
+        return problems
+
+
+class NotesAndRemarksCheck(QaqcCheck):
+    """Every localization with a note or an identification remark."""
+
+    name = 'notes-and-remarks'
+
+    def check(self, localization: dict) -> str | None:
+        notes = localization['attributes'].get('Notes')
+        id_remarks = localization['attributes'].get('IdentificationRemarks')
+        has_note = notes and notes not in EMPTY_VALUES
+        has_remark = id_remarks and id_remarks not in EMPTY_VALUES
+        if has_note and has_remark:
+            return 'Notes, ID Remarks'
+        if has_note:
+            return 'Notes'
+        if has_remark:
+            return 'ID Remarks'
+        return None
+
+
+class ReExaminedCheck(QaqcCheck):
+    """Reason of 'To be re-examined'."""
+
+    name = 're-examined'
+
+    def check(self, localization: dict) -> bool:
+        return localization['attributes'].get('Reason') == 'To be re-examined'
+
+
+def _taxon_key(localization: dict) -> tuple:
+    attributes = localization['attributes']
+    return attributes.get('Scientific Name'), attributes.get('Tentative ID'), attributes.get('Morphospecies')
+
+
+class MissingGoodImageCheck(QaqcCheck):
+    """Boxes of every scientific name/tentative ID/morphospecies combo that has no good image anywhere."""
+
+    name = 'missing-good-image'
+
+    def __init__(self):
+        super().__init__()
+        self._has_good_image = {}  # {taxon key: bool}
+        self._boxes = []  # (index, taxon key)
+
+    def observe(self, index: int, localization: dict):
+        key = _taxon_key(localization)
+        self._has_good_image[key] = self._has_good_image.get(key, False) or localization['attributes'].get('Good Image', False)
+        if TatorLocalizationType.is_box(localization['type']):
+            self._boxes.append((index, key))
+
+    def check(self, localization: dict) -> None:
+        return None  # a localization is only flagged once the others with its name have been seen, see flagged()
+
+    def flagged(self) -> list[tuple[int, None]]:
+        return [(index, None) for index, key in self._boxes if self._has_good_image[key] is False]
+
+
+def _name_with_tentative_id(localization: dict) -> str:
+    attributes = localization['attributes']
+    return f'{attributes.get("Scientific Name")}{" (" + attributes["Tentative ID"] + "?)" if attributes.get("Tentative ID") else ""}'
+
+
+class SameNameQualifierCheck(QaqcCheck):
+    """Localizations whose scientific name/tentative ID combo appears with more than one qualifier."""
+
+    name = 'same-name-qualifier'
+
+    def __init__(self):
+        super().__init__()
+        self._qualifiers = {}  # {name: first qualifier seen}
+        self._problem_names = set()
+        self._names = []  # (index, name)
+
+    def observe(self, index: int, localization: dict):
+        name = _name_with_tentative_id(localization)
+        qualifier = localization['attributes'].get('Qualifier')
+        if name not in self._qualifiers:
+            self._qualifiers[name] = qualifier
+        elif self._qualifiers[name] != qualifier:
+            self._problem_names.add(name)
+        self._names.append((index, name))
+
+    def check(self, localization: dict) -> None:
+        return None  # a localization is only flagged once the others with its name have been seen, see flagged()
+
+    def flagged(self) -> list[tuple[int, str]]:
+        return [(index, 'Scientific Name, Qualifier') for index, name in self._names if name in self._problem_names]
+
+
+class AttractedCheck(QaqcCheck):
+    """
+    Attracted/not attracted that doesn't match the saved list of attracted taxa (0 = not attracted, 1 = attracted,
+    2 = either), and every localization of a taxon that's either or not on the list.
+    """
+
+    name = 'attracted-not-attracted'
+
+    def __init__(self, attracted_dict: dict):
+        super().__init__()
+        self.attracted_dict = attracted_dict
+
+    def check(self, localization: dict) -> str | None:
+        scientific_name = localization['attributes'].get('Scientific Name')
+        attracted = localization['attributes'].get('Attracted')
+        expected = self.attracted_dict.get(scientific_name, 2)
+        if expected == 2 or (attracted == 'Attracted' and expected == 0) or (attracted == 'Not Attracted' and expected == 1):
+            return 'Scientific Name, Attracted'
+        return None
+
+
+class NonTargetNotAttractedCheck(QaqcCheck):
+    """Reason of 'Non-target' but not marked 'Not Attracted'."""
+
+    name = 'non-target-not-attracted'
+
+    def check(self, localization: dict) -> str | None:
+        if 'Non-target' in (localization['attributes'].get('Reason') or '') \
+                and localization['attributes'].get('Attracted') != 'Not Attracted':
+            return 'Attracted, Reason'
+        return None
+
+
+class ExistsInImageReferencesCheck(QaqcCheck):
+    """
+    Scientific name/tentative ID/morphospecies combos that aren't in the image references, and localizations with both
+    a tentative ID and a morphospecies.
+    """
+
+    name = 'exists-in-image-references'
+
+    def __init__(self, image_refs: dict):
+        super().__init__()
+        self.image_refs = image_refs
+
+    def check(self, localization: dict) -> str | bool:
+        image_ref_key, tentative_id, morphospecies = _taxon_key(localization)
+        if tentative_id and morphospecies:
+            return 'Tentative ID, Morphospecies'
+        if tentative_id:
+            image_ref_key += f'~tid={tentative_id}'
+        if morphospecies:
+            image_ref_key += f'~m={morphospecies}'
+        return image_ref_key not in self.image_refs
+
+
+class MissingAncillaryDataCheck(QaqcCheck):
+    """Records missing depth, lat/long or temperature."""
+
+    name = 'missing-ancillary-data'
+    scope = QaqcCheck.RECORDS
+
+    def check(self, record: dict) -> bool:
+        return not all(record.get(key) for key in ('depth_m', 'lat', 'long', 'do_temp_c'))
+
+
+class MissingUponCheck(QaqcCheck):
+    """Records missing an upon, or upon water that aren't a fish."""
+
+    name = 'missing-upon'
+    scope = QaqcCheck.RECORDS
+
+    def check(self, record: dict) -> str | None:
+        upon = record.get('upon')
+        if not upon or upon in EMPTY_VALUES or ('water' in upon.lower() and record.get('phylum') != 'Chordata'):
+            return 'Upon'
+        return None
+
+
+class SuspiciousHostCheck(QaqcCheck):
+    """Records upon themselves (upon is the same as the scientific name)."""
+
+    name = 'suspicious-hosts'
+    scope = QaqcCheck.RECORDS
+
+    def check(self, record: dict) -> str | None:
+        if record['scientific_name'] == record.get('upon'):
+            return 'Scientific Name,Upon'
+        return None
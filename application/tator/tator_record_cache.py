@@ -0,0 +1,54 @@
+import hashlib
+import os
+
+from cachelib import BaseCache, FileSystemCache
+
+CACHE_DIR = os.path.join('cache', 'tator_records')
+RECORD_TTL = 60 * 60 * 24  # the key covers everything but annotator names, which basically never change
+MAX_ENTRIES = 100
+GENERATION_KEY = 'generation'
+
+
+class TatorRecordCache:
+    """
+    process_records output, so clicking through the QA/QC checks for the same deployments only processes their
+    localizations once.
+
+    Entries are keyed by a fingerprint of everything that went into the records: the request (project, sections,
+    processing flags) and the inputs themselves (localization IDs, versions and modified times, media attributes,
+    fieldbook deployments, substrates, phylogeny), so a change in Tator produces a new key rather than a stale hit. Keys
+    also include a generation counter that invalidate() bumps, which the edit routes call after changing a
+    localization so every cached record set is dropped in one write.
+    """
+
+    _default = None
+
+    def __init__(self, backend: BaseCache = None):
+        self._backend = backend or FileSystemCache(cache_dir=CACHE_DIR, threshold=MAX_ENTRIES, default_timeout=0)
+
+    @classmethod
+    def default(cls) -> 'TatorRecordCache':
+        """Process-wide cache under cache/tator_records."""
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    def key(self, fingerprint: 'hashlib._Hash') -> str:
+        return f'records:{self.generation()}:{fingerprint.hexdigest()}'
+
+    def get(self, key: str) -> list[dict] | None:
+        """Returns a fresh copy of the cached records for key, or None."""
+        return self._backend.get(key)
+
+    def set(self, key: str, records: list[dict]):
+        self._backend.set(key, records, timeout=RECORD_TTL)
+
+    def generation(self) -> int:
+        return self._backend.get(GENERATION_KEY) or 0
+
+    def invalidate(self):
+        """Drops every cached record set (e.g. after a localization was edited)."""
+        self._backend.set(GENERATION_KEY, self.generation() + 1, timeout=0)
+
+    def clear(self):
+        self._backend.clear()
@@ -1,30 +1,54 @@
+import hashlib
+from collections.abc import Collection, Iterator
+
 import requests
-from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+from application.tator.tator_json_stream import iter_json_array, select_fields
+from application.tator.tator_metadata_cache import MEDIA_TTL, SECTION_TTL, USER_TTL, TatorMetadataCache
 from application.tator.tator_type import TatorStateType
+from application.util.http_metrics import MetricsHTTPAdapter
 
 RETRYABLE_STATUS_CODES = frozenset({500, 502, 503, 504})
 DEFAULT_TIMEOUT = (10, 30)  # (connect, read) seconds
+DEFAULT_POOL_MAXSIZE = 10  # keep-alive connections kept per host (urllib3 default)
+LOCALIZATION_PAGE_SIZE = 5000
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+def token_hash(token: str) -> str:
+    """Digest of a Tator token, for keying cached Tator data to the token Tator let fetch it."""
+    return hashlib.sha256(token.encode()).hexdigest()
 
 
 class TatorRestClient:
     """
     Thin wrapper around the Tator REST API. Handles auth headers and URL construction.
     Use instead of raw requests calls to avoid repeating boilerplate.
+
+    Section, media, and user lookups are served from a TatorMetadataCache (the process-wide disk cache unless one is
+    passed in), so repeat page loads for the same deployment don't go back to Tator for metadata.
     """
 
-    def __init__(self, tator_url: str, token: str):
+    def __init__(
+        self,
+        tator_url: str,
+        token: str,
+        pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+        metadata_cache: TatorMetadataCache = None,
+    ):
         self.base_url = tator_url
         self._headers = {
             'Content-Type': 'application/json',
             'Authorization': f'Token {token}',
         }
-        self._session = self._build_session()
+        self._token_hash = token_hash(token)
+        self._session = self._build_session(pool_maxsize)
+        self._metadata_cache = metadata_cache or TatorMetadataCache.default()
 
     @staticmethod
-    def _build_session() -> requests.Session:
-        """Session that retries transient 5xx/connection/read errors with backoff."""
+    def _build_session(pool_maxsize: int = DEFAULT_POOL_MAXSIZE) -> requests.Session:
+        """Session that retries transient 5xx/connection/read errors with backoff, and records them in HttpMetrics."""
         session = requests.Session()
         retry = Retry(
             total=3,
@@ -34,11 +58,15 @@ class TatorRestClient:
             backoff_factor=1,
             status_forcelist=RETRYABLE_STATUS_CODES,
         )
-        adapter = HTTPAdapter(max_retries=retry)
+        adapter = MetricsHTTPAdapter(max_retries=retry, pool_maxsize=pool_maxsize)
         session.mount('https://', adapter)
         session.mount('http://', adapter)
         return session
 
+    def close(self):
+        """Closes the pooled keep-alive connections held by this client's session."""
+        self._session.close()
+
     @staticmethod
     def login(tator_url: str, username: str, password: str) -> str:
         """Returns a Tator API token for the given credentials, or raises HTTPError on failure."""
@@ -52,41 +80,114 @@ class TatorRestClient:
         return res.json()['token']
 
     def get_localizations(self, project_id: int, section_id: int = None, media_ids: list[int] = None) -> list:
+        return [
+            localization
+            for page in self.iter_localizations(project_id, section_id=section_id, media_ids=media_ids)
+            for localization in page
+        ]
+
+    def iter_localizations(
+        self,
+        project_id: int,
+        section_id: int = None,
+        media_ids: list[int] = None,
+        page_size: int = LOCALIZATION_PAGE_SIZE,
+        fields: Collection[str] = None,
+        modified_since: str = None,
+    ) -> Iterator[list[dict]]:
+        """
+        Yields localizations one page at a time, so callers never hold more than one page of the raw response in
+        memory. Pages are walked server-side with Tator's ``after`` cursor (the last localization ID of the previous
+        page), which stays cheap on large sections where ``start`` offsets would not.
+
+        If fields is given, each page is decoded incrementally off the wire and every localization is cut down to
+        just those top-level keys (plus ``id``), instead of materializing Tator's full response first.
+
+        If modified_since (an ISO 8601 datetime) is given, only localizations modified at or after that time are
+        returned, including deleted ones (``variant_deleted``), so a local copy can be brought up to date.
+        """
+        if fields is not None:
+            fields = ('id', *(field for field in fields if field != 'id'))
         if media_ids is not None:
             url = f'{self.base_url}/rest/Localizations/{project_id}?media_id={",".join(str(m) for m in media_ids)}'
         elif section_id is not None:
             url = f'{self.base_url}/rest/Localizations/{project_id}?section={section_id}'
         else:
             raise ValueError('Must provide either section or media_id')
-        res = self._session.get(url=url, headers=self._headers, timeout=DEFAULT_TIMEOUT)
-        res.raise_for_status()
-        return res.json()
+        after = None
+        while True:
+            params = {'stop': page_size}
+            if after is not None:
+                params['after'] = after
+            if modified_since is not None:
+                params['attribute_gte'] = f'$modified_datetime::{modified_since}'
+                params['show_deleted'] = 1
+            res = self._session.get(
+                url=url,
+                headers=self._headers,
+                params=params,
+                timeout=DEFAULT_TIMEOUT,
+                stream=fields is not None,
+            )
+            res.raise_for_status()
+            if fields is None:
+                page = res.json()
+            else:
+                try:
+                    page = [
+                        select_fields(localization, fields)
+                        for localization in iter_json_array(res.iter_content(chunk_size=JSON_CHUNK_SIZE))
+                    ]
+                finally:
+                    res.close()
+            if page:
+                yield page
+            if len(page) < page_size:
+                return
+            after = page[-1]['id']
 
     def get_section_by_id(self, section_id: int) -> dict:
         url = f'{self.base_url}/rest/Section/{section_id}'
-        res = self._session.get(url=url, headers=self._headers, timeout=DEFAULT_TIMEOUT)
-        res.raise_for_status()
-        return res.json()
+        return self._get_cached_json(self._cache_key('section', section_id), url, ttl=SECTION_TTL)
 
     def get_medias_for_sections(self, project_id: int, section_ids: list[int]) -> list:
         url = f'{self.base_url}/rest/Medias/{project_id}?multi_section={",".join([str(s) for s in section_ids])}'
-        res = self._session.get(url=url, headers=self._headers, timeout=DEFAULT_TIMEOUT)
-        res.raise_for_status()
-        return res.json()
+        key = self._cache_key(
+            'medias', project_id, ','.join(str(s) for s in sorted(section_ids)), self._metadata_cache.media_generation(),
+        )
+        return self._get_cached_json(key, url, ttl=MEDIA_TTL)
 
     def get_media_by_id(self, media_id: int) -> dict:
         url = f'{self.base_url}/rest/Media/{media_id}'
-        res = self._session.get(url=url, headers=self._headers, timeout=DEFAULT_TIMEOUT)
+        key = self._cache_key('media', media_id, self._metadata_cache.media_generation())
+        return self._get_cached_json(key, url, ttl=MEDIA_TTL)
+
+    def update_media_attributes(self, media_id: int, attributes: dict) -> dict:
+        """PATCHes the given attributes onto a media and drops any cached copies of it."""
+        url = f'{self.base_url}/rest/Media/{media_id}'
+        res = self._session.patch(url=url, headers=self._headers, json={'attributes': attributes}, timeout=DEFAULT_TIMEOUT)
         res.raise_for_status()
+        self.invalidate_media(media_id)
         return res.json()
 
+    def invalidate_media(self, media_id: int):
+        """
+        Drops every cached copy of the media (whichever token fetched it) and every cached media list, since any of
+        them may include this media.
+        """
+        self._metadata_cache.bump_media_generation()
+
     def get_substrates(self, project_id: int, section_ids: list[int] = None, media_list: list[dict] = None) -> list[dict]:
         """Returns substrates grouped by media ID, sorted by timestamp."""
         if section_ids is None and media_list is None:
             raise ValueError('Must provide either section_ids or media_ids')
         if media_list is None:
             media_list = self.get_medias_for_sections(project_id, section_ids)
-        states = self._get_states(project_id, [media['id'] for media in media_list])
+        states = self.get_states(project_id, [media['id'] for media in media_list])
+        return self._group_substrates(states, media_list)
+
+    @classmethod
+    def _group_substrates(cls, states: list[dict], media_list: list[dict]) -> list[dict]:
         grouped: dict[int, list] = {}
         fps_map = {media['id']: media['fps'] for media in media_list}
         for state in states:
@@ -95,7 +196,7 @@ class TatorRestClient:
                 grouped.setdefault(media_id, []).append(
                     {
                         **state['attributes'],
-                        'timestamp': self._format_timestamp(state['frame'] / fps_map[media_id]) if media_id in fps_map else None,
+                        'timestamp': cls._format_timestamp(state['frame'] / fps_map[media_id]) if media_id in fps_map else None,
                         'frame': state['frame'],
                     }
                 )
@@ -103,7 +204,7 @@ class TatorRestClient:
             entries.sort(key=lambda entry: (entry['timestamp'] is None, entry['timestamp']))
         return [{'media_id': media_id, 'substrates': entries} for media_id, entries in grouped.items()]
 
-    def _get_states(self, project_id: int, media_ids: list[int]):
+    def get_states(self, project_id: int, media_ids: list[int]) -> list[dict]:
         states_url = f'{self.base_url}/rest/States/{project_id}?media_id={",".join([str(m) for m in media_ids])}'
         states_res = self._session.get(url=states_url, headers=self._headers, timeout=DEFAULT_TIMEOUT)
         states_res.raise_for_status()
@@ -111,26 +212,61 @@ class TatorRestClient:
 
     def get_user(self, user_id: int) -> dict:
         url = f'{self.base_url}/rest/User/{user_id}'
-        res = self._session.get(url=url, headers=self._headers, timeout=DEFAULT_TIMEOUT)
+        return self._get_cached_json(self._cache_key('user', user_id), url, ttl=USER_TTL)
+
+    def _cache_key(self, kind: str, *parts) -> str:
+        """Metadata cache key, scoped to this client's token so one token never reads what only another may see."""
+        return ':'.join((kind, self.base_url, self._token_hash, *(str(part) for part in parts)))
+
+    def _get_cached_json(self, key: str, url: str, ttl: int):
+        """
+        GETs url through the metadata cache. Fresh entries cost no request; stale entries are revalidated with a
+        conditional request when Tator gave us an ETag/Last-Modified, and refetched otherwise.
+        """
+        entry = self._metadata_cache.get(key)
+        if entry is not None and TatorMetadataCache.is_fresh(entry, ttl):
+            return entry['body']
+        headers = self._headers
+        if entry is not None:
+            headers = {**self._headers, **TatorMetadataCache.validators(entry)}
+        res = self._session.get(url=url, headers=headers, timeout=DEFAULT_TIMEOUT)
+        if entry is not None and res.status_code == 304:
+            self._metadata_cache.touch(key, entry)
+            return entry['body']
         res.raise_for_status()
-        return res.json()
+        body = res.json()
+        self._metadata_cache.set(
+            key,
+            body,
+            etag=res.headers.get('ETag'),
+            last_modified=res.headers.get('Last-Modified'),
+        )
+        return body
 
     def get_frame(self, media_id: int, frame: int = None, quality: int = None) -> bytes:
+        return self.stream_frame(media_id, frame=frame, quality=quality).content
+
+    def stream_frame(self, media_id: int, frame: int = None, quality: int = None) -> requests.Response:
+        """Opens a GetFrame request without reading the body, so callers can relay it with iter_content()."""
         url = f'{self.base_url}/rest/GetFrame/{media_id}'
         params = {}
         if frame is not None:
             params['frames'] = frame
         if quality is not None:
             params['quality'] = quality
-        res = self._session.get(url=url, headers=self._headers, params=params, timeout=DEFAULT_TIMEOUT)
+        res = self._session.get(url=url, headers=self._headers, params=params, timeout=DEFAULT_TIMEOUT, stream=True)
         res.raise_for_status()
-        return res.content
+        return res
 
     def get_localization_graphic(self, localization_id: int) -> bytes:
+        return self.stream_localization_graphic(localization_id).content
+
+    def stream_localization_graphic(self, localization_id: int) -> requests.Response:
+        """Opens a LocalizationGraphic request without reading the body, so callers can relay it with iter_content()."""
         url = f'{self.base_url}/rest/LocalizationGraphic/{localization_id}'
-        res = self._session.get(url=url, headers=self._headers, timeout=DEFAULT_TIMEOUT)
+        res = self._session.get(url=url, headers=self._headers, timeout=DEFAULT_TIMEOUT, stream=True)
         res.raise_for_status()
-        return res.content
+        return res
 
     @staticmethod
     def _format_timestamp(seconds: float) -> str:
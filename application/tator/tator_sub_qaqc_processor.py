@@ -1,5 +1,8 @@
+from application.tator.substrate_timeline import SubstrateTimeline
 from application.tator.tator_base_qaqc_processor import TatorBaseQaqcProcessor
+from application.tator.tator_qaqc_checks import MissingAncillaryDataCheck, MissingUponCheck, QaqcCheck, SuspiciousHostCheck
 from application.tator.tator_type import TatorLocalizationType
+from application.util.constants import TERM_NORMAL, TERM_YELLOW
 
 
 class TatorSubQaqcProcessor(TatorBaseQaqcProcessor):
@@ -19,6 +22,14 @@ class TatorSubQaqcProcessor(TatorBaseQaqcProcessor):
             media_list=media_list,
         )
 
+    def checklist_checks(self, no_match_records: set) -> list[QaqcCheck]:
+        return [
+            *super().checklist_checks(no_match_records),
+            MissingAncillaryDataCheck(),
+            MissingUponCheck(),
+            SuspiciousHostCheck(),
+        ]
+
     def check_missing_ancillary_data(self):
         """
         Finds records that are missing ancillary data attributes:
@@ -27,29 +38,13 @@ class TatorSubQaqcProcessor(TatorBaseQaqcProcessor):
         * Lat/long (position)
         * Temperature (do_temp_c)
         """
-        self.process_records()
-        actual_final_records = []
-        for record in self.final_records:
-            if (not record.get('depth_m')
-                    or not record.get('lat')
-                    or not record.get('long')
-                    or not record.get('do_temp_c')):
-                actual_final_records.append(record)
-        self.final_records = actual_final_records
+        self._apply_check(MissingAncillaryDataCheck())
 
     def check_missing_upon_and_not_fish(self):
         """
         Finds records that are missing the "upon" attribute and are not a fish.
         """
-        self.process_records()
-        actual_final_records = []
-        for record in self.final_records:
-            if (not record.get('upon')
-                    or record['upon'] in {'--', '-', ''}
-                    or ('water' in record['upon'].lower() and record.get('phylum') != 'Chordata')):
-                record['problems'] = 'Upon'
-                actual_final_records.append(record)
-        self.final_records = actual_final_records
+        self._apply_check(MissingUponCheck())
 
     def check_upons_are_current_substrate_or_previous_animal(self):
         """
@@ -58,75 +53,79 @@ class TatorSubQaqcProcessor(TatorBaseQaqcProcessor):
         media (skips upons with "water").
         """
         self.process_records()
-        media_substrates = self.tator_client.get_substrates(
+        timelines = SubstrateTimeline.for_media(self.tator_client.get_substrates(
             project_id=self.project_id,
             section_ids=[section.section_id for section in self.sections],
             media_list=self.media_list,
-        )
-        substrates = {
-            substrate['media_id']: substrate['substrates'] for substrate in media_substrates
-        }
-        for media_id, substrate_entries in substrates.items():
+        ))
+        for media_id, timeline in timelines.items():
             print(f'Substrates for media {media_id}:')
-            for substrate in substrate_entries:
+            for substrate in timeline.entries:
                 print(f'  Frame {substrate["frame"]}: { {k: v for k, v in substrate.items() if k not in ("frame", "timestamp")} }')
         self.final_records.sort(key=lambda _record: (_record['media_id'], _record['frame']))
+        substrate_indices = self._substrate_indices(self.final_records, timelines)
         actual_final_records = []
         seen_animals: dict[int, set] = {}  # media_id -> set of scientific names seen so far in that media
-        for record in self.final_records:
+        for record, substrate_index in zip(self.final_records, substrate_indices):
             media_id = record['media_id']
             frame = record['frame']
             upon = record.get('upon')
             if upon and 'water' not in upon.lower():
-                is_upon_in_current_substrate = self._upon_matches_substrate(
-                    substrate_entries=substrates.get(media_id, []),
-                    localization=record,
-                )
+                timeline = timelines.get(media_id)
+                if timeline is None or substrate_index < 0:
+                    print(f'{TERM_YELLOW}No substrate state found for "{record["scientific_name"]}" '
+                          f'(media ID {media_id}){TERM_NORMAL}')
+                    matching_value = None
+                else:
+                    matching_value = timeline.matching_value(substrate_index, upon)
+                    if matching_value:
+                        print(f'Matched upon "{upon}" for record at frame {frame} to current {matching_value[0]} "{matching_value[1]}"')
                 is_upon_is_previous_animal = upon in seen_animals.get(media_id, set())
                 if is_upon_is_previous_animal:
                     print(f'Matched upon "{upon}" for record at frame {frame} to previously seen animal')
-                if not is_upon_in_current_substrate and not is_upon_is_previous_animal:
+                if not matching_value and not is_upon_is_previous_animal:
                     print(f'No match found for upon "{upon}" for record at frame {frame}')
                     record['problems'] = 'Upon'
-                    record['substrate'] = self._get_substrate_for_frame(
-                        substrate_entries=substrates.get(media_id, []),
-                        localization=record,
-                    )
+                    record['substrate'] = timeline.entries[substrate_index] if timeline and substrate_index >= 0 else None
                     actual_final_records.append(record)
             seen_animals.setdefault(media_id, set()).add(record['scientific_name'])
         self.final_records = actual_final_records
 
+    @staticmethod
+    def _substrate_indices(records: list[dict], timelines: dict[int, SubstrateTimeline]) -> list[int]:
+        """
+        Index of the substrate state in effect for each record in its media's timeline (-1 if there is none), found
+        with one searchsorted per media.
+        """
+        substrate_indices = [-1] * len(records)
+        media_rows = {}  # {media_id: [row]}
+        for i, record in enumerate(records):
+            media_rows.setdefault(record['media_id'], []).append(i)
+        for media_id, rows in media_rows.items():
+            if media_id not in timelines:
+                continue
+            for i, substrate_index in zip(rows, timelines[media_id].indices_at([records[i]['frame'] for i in rows])):
+                substrate_indices[i] = int(substrate_index)
+        return substrate_indices
+
     @staticmethod
     def _upon_matches_substrate(substrate_entries: list[dict], localization: dict) -> bool:
         """
         Returns True if upon is a substring of any substrate value in the current substrate state at the given frame.
         """
-        invalid_values = {'--', '-', '', 'Not Set', 'None'}
-        current_substrate = TatorSubQaqcProcessor._get_substrate_for_frame(
-            substrate_entries=substrate_entries,
-            localization=localization,
-        )
-        if current_substrate is None:
+        timeline = SubstrateTimeline(substrate_entries)
+        substrate_index = int(timeline.indices_at([localization['frame']])[0])
+        if substrate_index < 0:
+            print(f'{TERM_YELLOW}No substrate state found for "{localization["scientific_name"]}" '
+                  f'(media ID {localization["media_id"]}){TERM_NORMAL}')
             return False
-        for key, val in current_substrate.items():
-            if key in ('frame', 'timestamp'):
-                continue
-            if val not in invalid_values and localization["upon"].lower() in val.lower():
-                print(f'Matched upon "{localization["upon"]}" for record at frame {localization["frame"]} to current {key} "{val}"')
-                return True
-        return False
+        return timeline.matching_value(substrate_index, localization['upon']) is not None
 
     def get_suspicious_records(self):
         """
         Finds records where the "upon" attribute is suspicious, i.e. the same as the scientific name.
         """
-        self.process_records()
-        actual_final_records = []
-        for record in self.final_records:
-            if record['scientific_name'] == record.get('upon'):
-                record['problems'] = 'Scientific Name,Upon'
-                actual_final_records.append(record)
-        self.final_records = actual_final_records
+        self._apply_check(SuspiciousHostCheck())
 
     def find_long_host_associate_time_diff(self):
         """
@@ -224,13 +223,9 @@ class TatorSubQaqcProcessor(TatorBaseQaqcProcessor):
         self.final_records = unique_taxa
 
     def get_summary(self):
-        substrates = {
-            substrate['media_id']: substrate['substrates']
-            for substrate in
-            self.tator_client.get_substrates(
-                project_id=self.project_id,
-                section_ids=[section.section_id for section in self.sections],
-                media_list=self.media_list,
-            )
-        }
-        self.process_records(sub_media_substrates=substrates, get_timestamp=True)
+        timelines = SubstrateTimeline.for_media(self.tator_client.get_substrates(
+            project_id=self.project_id,
+            section_ids=[section.section_id for section in self.sections],
+            media_list=self.media_list,
+        ))
+        self.process_records(sub_media_substrates=timelines, get_timestamp=True)
@@ -0,0 +1,135 @@
+import sys
+from collections.abc import MutableMapping
+
+
+class CompactRecord(MutableMapping):
+    """
+    A dict-compatible record for the (often 100k+) records a processor holds in final_records.
+
+    A plain dict spends a hash table entry on each of its ~30 keys, for every record. Subclasses declare FIELDS once
+    instead; a record keeps a bitmask of which fields it has and a tuple of just those values, in FIELDS order, so
+    unset optional fields cost nothing. String values of INTERNED_FIELDS (taxonomy, names, etc. that repeat across
+    thousands of records) are interned so every record shares one copy.
+
+    Records behave like the dicts they replace: keys iterate in insertion order (keys set after construction, or that
+    aren't in FIELDS, go to a small overflow dict after the compact ones), ``repr`` is the dict's repr so templates
+    render them the same, and to_dict() gives back a plain dict for JSON serialization.
+    """
+
+    __slots__ = ('_mask', '_values', '_extra')
+
+    FIELDS: tuple[str, ...] = ()
+    INTERNED_FIELDS: frozenset[str] = frozenset()
+    _field_indices: dict[str, int] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._field_indices = {field: index for index, field in enumerate(cls.FIELDS)}
+
+    def __init__(self, values: dict = None):
+        self._mask = 0
+        self._values = ()
+        self._extra = None
+        if not values:
+            return
+        compact_values = []
+        last_index = -1
+        for key, val in values.items():
+            index = self._field_indices.get(key, -1)
+            if index > last_index and self._extra is None:  # still in FIELDS order, store compactly
+                if key in self.INTERNED_FIELDS and type(val) is str:
+                    val = sys.intern(val)
+                self._mask |= 1 << index
+                compact_values.append(val)
+                last_index = index
+            else:  # unknown or out-of-order key, it and everything after it go to _extra to keep the dict's order
+                if self._extra is None:
+                    self._extra = {}
+                self._extra[key] = val
+        self._values = tuple(compact_values)
+
+    @classmethod
+    def from_values(cls, values, present) -> 'CompactRecord':
+        """Builds a record from one value per field in FIELDS order, keeping only those whose present flag is set."""
+        record = cls.__new__(cls)
+        record._mask = 0
+        record._extra = None
+        compact_values = []
+        for index, (field, val, is_present) in enumerate(zip(cls.FIELDS, values, present)):
+            if not is_present:
+                continue
+            if field in cls.INTERNED_FIELDS and type(val) is str:
+                val = sys.intern(val)
+            record._mask |= 1 << index
+            compact_values.append(val)
+        record._values = tuple(compact_values)
+        return record
+
+    def _position(self, key) -> int:
+        """Index of key's value in _values, or -1 if it isn't stored compactly."""
+        index = self._field_indices.get(key)
+        if index is None or not (self._mask >> index) & 1:
+            return -1
+        return (self._mask & ((1 << index) - 1)).bit_count()
+
+    def __getitem__(self, key):
+        position = self._position(key)
+        if position >= 0:
+            return self._values[position]
+        if self._extra is not None:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        position = self._position(key)
+        if position >= 0:
+            return self._values[position]
+        if self._extra is not None:
+            return self._extra.get(key, default)
+        return default
+
+    def __contains__(self, key) -> bool:
+        return self._position(key) >= 0 or (self._extra is not None and key in self._extra)
+
+    def __setitem__(self, key, val):
+        position = self._position(key)
+        if position >= 0:
+            self._values = (*self._values[:position], val, *self._values[position + 1:])
+            return
+        if self._extra is None:
+            self._extra = {}
+        self._extra[key] = val
+
+    def __delitem__(self, key):
+        position = self._position(key)
+        if position >= 0:
+            self._mask &= ~(1 << self._field_indices[key])
+            self._values = (*self._values[:position], *self._values[position + 1:])
+            return
+        if self._extra is None:
+            raise KeyError(key)
+        del self._extra[key]
+
+    def __iter__(self):
+        mask = self._mask
+        for field in self.FIELDS:
+            if not mask:
+                break
+            if mask & 1:
+                yield field
+            mask >>= 1
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return self._mask.bit_count() + (len(self._extra) if self._extra is not None else 0)
+
+    def to_dict(self) -> dict:
+        """The plain dict this record stands in for, e.g. for json.dumps."""
+        record = dict(zip(self, self._values))
+        if self._extra is not None:
+            record.update(self._extra)
+        return record
+
+    def __repr__(self) -> str:
+        return repr(self.to_dict())
@@ -0,0 +1,272 @@
+import re
+import threading
+from time import perf_counter
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)  # seconds
+SIZE_BUCKETS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)  # bytes
+OTHER_SERVICE = 'other'  # service label for every host that isn't registered with add_service
+OTHER_ENDPOINT = '*'
+UPSTREAM_POOL_MAXSIZE = 16  # keep-alive connections per host for upstream_session, enough for prefetch_vars' workers
+
+# path templates for segments that carry free-form names (numeric IDs and UUIDs are templated automatically). checked
+# in order, so fixed paths must come before templates that would also match them (e.g. /reviewer/all, /reviewer/{name})
+ENDPOINT_TEMPLATES = {
+    'vars_kb': ['/phylogeny/up/{concept}'],
+    'vampire_squid': ['/videos/videosequence/name/{sequence}'],
+    'charybdis': ['/query/dive/{sequence}'],
+    'worms': ['/AphiaIDByName/{name}', '/AphiaRecordsByName/{name}'],
+    'darc_review': [
+        '/attracted/{concept}',
+        '/comment/sequence/{sequence}',
+        '/comment/reviewer/{reviewer}',
+        '/comment/reviewers/{uuid}',
+        '/dropcam-fieldbook/{section}',
+        '/image-reference/refresh/{id}',
+        '/qaqc-checklist/tator-dropcam/{deployments}',
+        '/qaqc-checklist/tator-sub/{ids}',
+        '/qaqc-checklist/vars/{sequences}',
+        '/reviewer/all',
+        '/reviewer/{name}',
+    ],
+}
+
+_NUMERIC_SEGMENT = re.compile(r'^\d+$')
+_UUID_SEGMENT = re.compile(r'^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$')
+
+
+class _EndpointStats:
+    def __init__(self):
+        self.statuses = {}  # {status: count}
+        self.latency_buckets = [0] * len(LATENCY_BUCKETS)
+        self.latency_sum = 0.0
+        self.size_buckets = [0] * len(SIZE_BUCKETS)
+        self.size_sum = 0
+        self.count = 0
+        self.retries = 0
+
+
+class HttpMetrics:
+    """
+    Collects latency, response size, status code and retry counts for every outgoing HTTP request, grouped by upstream
+    service (Tator, VARS, WoRMS, DARC review server...) and endpoint template, e.g. ``GET tator /rest/Section/{id}``.
+
+    Requests are observed by MetricsHTTPAdapter, which the app's sessions are mounted with: TatorRestClient's,
+    WormsRestClient's, and upstream_session for everything else (VARS, the DARC review server...). Requests sent
+    with the module-level ``requests.get(...)`` helpers aren't counted. Retries made by a session's urllib3 Retry
+    policy happen inside a single send, so they are counted from the response's retry history. Requests to hosts
+    that weren't registered with add_service are all counted under one ``other`` service and endpoint.
+    """
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self):
+        self._services: list[tuple[str, str, str, list[re.Pattern]]] = []  # (host, path prefix, name, templates)
+        self._endpoints: dict[tuple[str, str, str], _EndpointStats] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def default(cls) -> 'HttpMetrics':
+        """Process-wide metrics that MetricsHTTPAdapter records into and /metrics reports."""
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    def add_service(self, name: str, base_url: str):
+        """Attributes requests under base_url to the service called name."""
+        if not base_url:
+            return
+        parts = urlsplit(base_url)
+        templates = [
+            (template, re.compile('^' + re.sub(r'\\{\w+\\}', '[^/]+', re.escape(template)) + '$'))
+            for template in ENDPOINT_TEMPLATES.get(name, [])
+        ]
+        with self._lock:
+            self._services = [service for service in self._services if service[2] != name]
+            self._services.append((parts.netloc, parts.path.rstrip('/'), name, templates))
+            # longest prefix first, since several VARS services share a host
+            self._services.sort(key=lambda service: len(service[1]), reverse=True)
+
+    def resolve(self, url: str) -> tuple[str, str]:
+        """
+        Returns (service, endpoint template) for url. Query strings are dropped. URLs outside every registered service
+        (e.g. a redirect to a media store) resolve to (OTHER_SERVICE, OTHER_ENDPOINT), so they can't add labels.
+        """
+        parts = urlsplit(url)
+        for host, prefix, name, templates in self._services:
+            if parts.netloc == host and (parts.path == prefix or parts.path.startswith(prefix + '/')):
+                path = parts.path[len(prefix):] or '/'
+                for template, pattern in templates:
+                    if pattern.match(path):
+                        return name, template
+                return name, self._generic_template(path)
+        return OTHER_SERVICE, OTHER_ENDPOINT
+
+    @staticmethod
+    def _generic_template(path: str) -> str:
+        segments = []
+        for segment in path.split('/'):
+            if _NUMERIC_SEGMENT.match(segment):
+                segment = '{id}'
+            elif _UUID_SEGMENT.match(segment):
+                segment = '{uuid}'
+            segments.append(segment)
+        return '/'.join(segments)
+
+    def record(self, method: str, url: str, status: int | str, seconds: float, size: int = None, retries: int = 0):
+        service, endpoint = self.resolve(url)
+        with self._lock:
+            stats = self._endpoints.get((service, method, endpoint))
+            if stats is None:
+                stats = self._endpoints[(service, method, endpoint)] = _EndpointStats()
+            stats.statuses[str(status)] = stats.statuses.get(str(status), 0) + 1
+            stats.count += 1
+            stats.latency_sum += seconds
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    stats.latency_buckets[i] += 1
+                    break
+            if size is not None:
+                stats.size_sum += size
+                for i, bound in enumerate(SIZE_BUCKETS):
+                    if size <= bound:
+                        stats.size_buckets[i] += 1
+                        break
+            stats.retries += retries
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+    def snapshot(self) -> list[dict]:
+        """JSON-friendly copy of every endpoint's metrics. Histogram buckets are cumulative, as in Prometheus."""
+        with self._lock:
+            return [
+                {
+                    'service': service,
+                    'method': method,
+                    'endpoint': endpoint,
+                    'requests': stats.count,
+                    'statuses': dict(stats.statuses),
+                    'retries': stats.retries,
+                    'latency_seconds': {
+                        'sum': stats.latency_sum,
+                        'buckets': self._cumulative(LATENCY_BUCKETS, stats.latency_buckets, stats.count),
+                    },
+                    'response_bytes': {
+                        'sum': stats.size_sum,
+                        'buckets': self._cumulative(SIZE_BUCKETS, stats.size_buckets, sum(stats.size_buckets)),
+                    },
+                }
+                for (service, method, endpoint), stats in sorted(self._endpoints.items())
+            ]
+
+    @staticmethod
+    def _cumulative(bounds: tuple, counts: list[int], total: int) -> dict[str, int]:
+        buckets = {}
+        running = 0
+        for bound, count in zip(bounds, counts):
+            running += count
+            buckets[str(bound)] = running
+        buckets['+Inf'] = total
+        return buckets
+
+    def prometheus(self) -> str:
+        """Renders the metrics in the Prometheus text exposition format."""
+        requests_lines = []
+        retries_lines = []
+        latency_lines = []
+        size_lines = []
+        for endpoint in self.snapshot():
+            labels = _labels(service=endpoint['service'], method=endpoint['method'], endpoint=endpoint['endpoint'])
+            for status, count in sorted(endpoint['statuses'].items()):
+                requests_lines.append(f'upstream_http_requests_total{{{labels},status="{status}"}} {count}')
+            retries_lines.append(f'upstream_http_retries_total{{{labels}}} {endpoint["retries"]}')
+            for name, histogram, lines in (
+                ('upstream_http_request_duration_seconds', endpoint['latency_seconds'], latency_lines),
+                ('upstream_http_response_size_bytes', endpoint['response_bytes'], size_lines),
+            ):
+                for bound, count in histogram['buckets'].items():
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'{name}_sum{{{labels}}} {histogram["sum"]}')
+                lines.append(f'{name}_count{{{labels}}} {histogram["buckets"]["+Inf"]}')
+        return '\n'.join([
+            '# HELP upstream_http_requests_total Outgoing HTTP requests by upstream service, endpoint and status.',
+            '# TYPE upstream_http_requests_total counter',
+            *requests_lines,
+            '# HELP upstream_http_retries_total Retries made by urllib3 before the final response.',
+            '# TYPE upstream_http_retries_total counter',
+            *retries_lines,
+            '# HELP upstream_http_request_duration_seconds Time from sending a request to receiving the response.',
+            '# TYPE upstream_http_request_duration_seconds histogram',
+            *latency_lines,
+            '# HELP upstream_http_response_size_bytes Response body size.',
+            '# TYPE upstream_http_response_size_bytes histogram',
+            *size_lines,
+        ]) + '\n'
+
+
+def _labels(**labels) -> str:
+    def escape(value: str) -> str:
+        return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{key}="{escape(str(value))}"' for key, value in labels.items())
+
+
+class MetricsHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that records every request it sends (and urllib3's retries of it) in HttpMetrics.default()."""
+
+    def send(self, request: requests.PreparedRequest, stream: bool = False, **kwargs) -> requests.Response:
+        start = perf_counter()
+        try:
+            res = super().send(request, stream=stream, **kwargs)
+        except requests.exceptions.RequestException:
+            HttpMetrics.default().record(request.method, request.url, 'error', perf_counter() - start)
+            raise
+        seconds = perf_counter() - start
+        if stream:
+            # don't read a streamed body just to measure it
+            size = int(res.headers['Content-Length']) if res.headers.get('Content-Length', '').isdigit() else None
+        else:
+            size = len(res.content)
+        retry_history = getattr(getattr(res.raw, 'retries', None), 'history', None) or ()
+        HttpMetrics.default().record(request.method, request.url, res.status_code, seconds, size, len(retry_history))
+        return res
+
+
+def metered_session(pool_maxsize: int = UPSTREAM_POOL_MAXSIZE) -> requests.Session:
+    """New session that sends its requests through a MetricsHTTPAdapter."""
+    session = requests.Session()
+    adapter = MetricsHTTPAdapter(pool_maxsize=pool_maxsize)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+# requests to VARS, the DARC review server and WoRMS that don't go through a client with a session of its own
+upstream_session = metered_session()
+
+
+def install_http_metrics(app):
+    """
+    Registers the app's upstream services with the process-wide HttpMetrics, so requests sent through a
+    MetricsHTTPAdapter are labelled by service and endpoint. Safe to call more than once (e.g. once per create_app in
+    tests).
+    """
+    from application.util.worms_rest_client import WORMS_REST_URL
+
+    metrics = HttpMetrics.default()
+    for name, base_url in (
+        ('tator', app.config.get('TATOR_URL')),
+        ('annosaurus', app.config.get('VARS_ANNOSAURUS_URL')),
+        ('vars_kb', app.config.get('VARS_KNOWLEDGE_BASE_URL')),
+        ('vampire_squid', app.config.get('VARS_VAMPIRE_SQUID_URL')),
+        ('charybdis', app.config.get('VARS_CHARYBDIS_URL')),
+        ('darc_review', app.config.get('DARC_REVIEW_URL')),
+        ('worms', WORMS_REST_URL),
+    ):
+        metrics.add_service(name, base_url)
@@ -1,85 +1,300 @@
-import json
-import os
+from collections.abc import MutableMapping
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable
 
 import requests
+from flask import current_app, has_app_context
 
 from application.util.constants import TERM_RED, TERM_YELLOW, TERM_NORMAL
 from application.util.functions import flatten_taxa_tree
+from application.util.http_metrics import upstream_session
+from application.util.phylogeny_store import NO_MATCH_TTL, PhylogenyStore
+from application.util.worms_rest_client import DEFAULT_TIMEOUT, MAX_NAMES_PER_REQUEST, WORMS_REST_URL, WormsRestClient
 
-CACHE_PATH = os.path.join('cache', 'phylogeny.json')
-WORMS_REST_URL = 'https://www.marinespecies.org/rest'
+WORMS_FETCH_WORKERS = 4  # classifications fetched concurrently by fetch_worms_many
+VARS_KB_FETCH_WORKERS = 8  # concepts fetched concurrently by prefetch_vars
+
+
+class PhylogenyData(MutableMapping):
+    """
+    PhylogenyCache.data: {name: phylogeny}, read from the PhylogenyStore a name at a time as names are looked up.
+    Names that are set (or whose phylogeny dict is filled in after being set) are written back by flush(), and only
+    those.
+    """
+
+    def __init__(self, store: PhylogenyStore):
+        self._store = store
+        self._entries = {}  # {name: phylogeny, or None if it isn't in the store}, for every name looked up or set
+        self._changed = set()
+
+    def __getitem__(self, name):
+        if name not in self._entries:
+            self._entries[name] = self._store.get(name)
+        if self._entries[name] is None:
+            raise KeyError(name)
+        return self._entries[name]
+
+    def __setitem__(self, name, phylogeny):
+        self._entries[name] = phylogeny
+        self._changed.add(name)
+
+    def __delitem__(self, name):
+        self[name]  # raises KeyError if missing
+        self._store.delete(name)
+        self._entries[name] = None
+        self._changed.discard(name)
+
+    def __iter__(self):
+        names = dict.fromkeys(self._store.names())
+        names.update(dict.fromkeys(name for name, phylogeny in self._entries.items() if phylogeny is not None))
+        return iter(names)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def flush(self):
+        """Writes the names set since the last flush to the store."""
+        if not self._changed:
+            return
+        changed = self._changed
+        self._changed = set()
+        self._store.upsert((name, self._entries[name]) for name in changed)
 
 
 class PhylogenyCache:
-    def __init__(self):
+    _store = None
+    _worms_client = None
+    no_match_ttl = NO_MATCH_TTL  # seconds a name a source has no match for is skipped (PHYLOGENY_NO_MATCH_TTL)
+
+    def __init__(self, store: PhylogenyStore = None, worms_client: WormsRestClient = None):
+        self._store = store
+        self._worms_client = worms_client
+        if has_app_context():  # read here, since fetches may run on worker threads without one
+            self.no_match_ttl = current_app.config.get('PHYLOGENY_NO_MATCH_TTL', NO_MATCH_TTL)
         self.data = {}
         self.load()
 
+    @property
+    def store(self) -> PhylogenyStore:
+        return self._store or PhylogenyStore.default()
+
+    @property
+    def worms_client(self) -> WormsRestClient:
+        return self._worms_client or WormsRestClient.default()
+
     def load(self):
-        try:
-            with open(CACHE_PATH, 'r') as f:
-                self.data = json.load(f)
-        except FileNotFoundError:
-            self.data = {'Animalia': {}}
+        self.data = PhylogenyData(self.store)
 
     def save(self):
-        try:
-            with open(CACHE_PATH, 'w') as f:
-                json.dump(self.data, f, indent=2)
-        except FileNotFoundError:
-            os.makedirs('cache')
-            with open(CACHE_PATH, 'w') as f:
-                json.dump(self.data, f, indent=2)
+        self.data.flush()
+
+    def _add_no_match(self, source: str, name: str):
+        """Remembers that source has no match for name for no_match_ttl seconds."""
+        self.store.add_no_matches(source, [name], self.no_match_ttl)
 
     def fetch_vars(self, concept_name: str, vars_kb_url: str, no_match_records: set):
         """
-        Fetches phylogeny for a given concept from the VARS knowledge base.
+        Fetches phylogeny for a given concept from the VARS knowledge base. Concepts the knowledge base recently had no
+        phylogeny for are added to no_match_records without a request.
         """
+        if self.store.no_matches(PhylogenyStore.VARS_KB, [concept_name]):
+            no_match_records.add(concept_name)
+            return
+        self._add_vars_tree(concept_name, self._get_vars_tree(concept_name, vars_kb_url), no_match_records)
+
+    @staticmethod
+    def _get_vars_tree(concept_name: str, vars_kb_url: str) -> dict | None:
+        """GETs a concept's tree from the VARS knowledge base, or None if the request failed. Safe to run on any thread."""
         print(f'Fetching phylogeny for "{concept_name}" from VARS')
-        vars_tax_res = requests.get(url=f'{vars_kb_url}/phylogeny/up/{concept_name.replace("/", "%2F")}')
-        if vars_tax_res.status_code == 200:
-            try:
-                # this gets us to phylum
-                vars_tree = vars_tax_res.json()['children'][0]['children'][0]['children'][0]['children'][0]['children'][0]
-                self.data[concept_name] = {}
-            except KeyError:
-                if concept_name not in no_match_records:
-                    no_match_records.add(concept_name)
-                    print(f'{TERM_YELLOW}WARNING: Could not find phylogeny for concept "{concept_name}" in VARS knowledge base{TERM_NORMAL}')
-                vars_tree = {}
-            while 'children' in vars_tree.keys():
-                if 'rank' in vars_tree.keys():  # sometimes it's not
-                    self.data[concept_name][vars_tree['rank']] = vars_tree['name']
-                vars_tree = vars_tree['children'][0]
-            if 'rank' in vars_tree.keys():
-                self.data[concept_name][vars_tree['rank']] = vars_tree['name']
-        else:
+        vars_tax_res = upstream_session.get(
+            url=f'{vars_kb_url}/phylogeny/up/{concept_name.replace("/", "%2F")}',
+            timeout=DEFAULT_TIMEOUT,
+        )
+        if vars_tax_res.status_code != 200:
             print(f'\n{TERM_RED}Unable to find record for {concept_name}{TERM_NORMAL}')
+            return None
+        return vars_tax_res.json()
+
+    def _add_vars_tree(self, concept_name: str, vars_tax: dict | None, no_match_records: set):
+        """Adds the phylogeny in a tree from _get_vars_tree to data, or remembers that the concept has none."""
+        if vars_tax is None:
+            return
+        try:
+            # this gets us to phylum
+            vars_tree = vars_tax['children'][0]['children'][0]['children'][0]['children'][0]['children'][0]
+        except KeyError:
+            if concept_name not in no_match_records:
+                no_match_records.add(concept_name)
+                self._add_no_match(PhylogenyStore.VARS_KB, concept_name)
+                print(f'{TERM_YELLOW}WARNING: Could not find phylogeny for concept "{concept_name}" in VARS knowledge base{TERM_NORMAL}')
+            return
+        phylogeny = {}
+        while 'children' in vars_tree.keys():
+            if 'rank' in vars_tree.keys():  # sometimes it's not
+                phylogeny[vars_tree['rank']] = vars_tree['name']
+            vars_tree = vars_tree['children'][0]
+        if 'rank' in vars_tree.keys():
+            phylogeny[vars_tree['rank']] = vars_tree['name']
+        self.data[concept_name] = phylogeny
+
+    def prefetch_vars(
+        self,
+        concept_names: Iterable[str],
+        vars_kb_url: str,
+        no_match_records: set = None,
+        max_workers: int = VARS_KB_FETCH_WORKERS,
+    ) -> set[str]:
+        """
+        Fetches phylogeny from the VARS knowledge base for every distinct concept that isn't cached yet, up to max_workers
+        concepts at a time, so callers only need in-memory lookups afterward. Concepts in no_match_records, and concepts
+        the knowledge base recently had no phylogeny for, aren't requested. Returns the concepts the knowledge base has
+        no phylogeny for, which are also added to no_match_records.
+        """
+        if no_match_records is None:
+            no_match_records = set()
+        missing_concepts = [
+            concept_name for concept_name in dict.fromkeys(concept_names)
+            if concept_name not in no_match_records and self.data.get(concept_name) is None
+        ]
+        if not missing_concepts:
+            return set()
+        unmatched_concepts = self.store.no_matches(PhylogenyStore.VARS_KB, missing_concepts)
+        missing_concepts = [concept_name for concept_name in missing_concepts if concept_name not in unmatched_concepts]
+        if missing_concepts:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(missing_concepts)))) as executor:
+                # workers only fetch, data and the store are written here on the calling thread
+                vars_trees = executor.map(
+                    lambda concept_name: self._get_vars_tree(concept_name, vars_kb_url),
+                    missing_concepts,
+                )
+                for concept_name, vars_tax in zip(missing_concepts, vars_trees):
+                    self._add_vars_tree(concept_name, vars_tax, no_match_records)
+            unmatched_concepts.update(concept_name for concept_name in missing_concepts if concept_name in no_match_records)
+        no_match_records.update(unmatched_concepts)
+        return unmatched_concepts
+
+    def prefetch_worms(
+        self,
+        names: Iterable[str],
+        no_match_records: set = None,
+        require_aphia_id: bool = False,
+        max_workers: int = WORMS_FETCH_WORKERS,
+    ) -> set[str]:
+        """
+        Fetches phylogeny from WoRMS for every distinct name that isn't cached yet (see fetch_worms_many), so callers
+        only need in-memory lookups afterward. Names in no_match_records are skipped, and names WoRMS recently had
+        no record for aren't requested again. Returns the names WoRMS has no record for, which are also added to
+        no_match_records.
+
+        :param require_aphia_id: Also refetch names that are cached without an aphia_id (e.g. phylogeny from VARS).
+        """
+        if no_match_records is None:
+            no_match_records = set()
+        missing_names = [
+            name for name in dict.fromkeys(names)
+            if name and name not in no_match_records
+            and (self.data.get(name) is None or (require_aphia_id and 'aphia_id' not in self.data[name]))
+        ]
+        if not missing_names:
+            return set()
+        unmatched_names = self.store.no_matches(PhylogenyStore.WORMS, missing_names)
+        missing_names = [name for name in missing_names if name not in unmatched_names]
+        if missing_names:
+            unmatched_names.update(self.fetch_worms_many(missing_names, max_workers=max_workers))
+        no_match_records.update(unmatched_names)
+        return unmatched_names
+
+    def fetch_worms_many(self, names: Iterable[str], max_workers: int = WORMS_FETCH_WORKERS) -> set[str]:
+        """
+        Fetches phylogeny from WoRMS for names in a handful of requests rather than two or three per name: the records
+        for up to MAX_NAMES_PER_REQUEST names come from one AphiaRecordsByNames request, then the classification of
+        each distinct record is fetched, max_workers at a time. Requests go through the rate-limited WormsRestClient.
+        A name's record is picked the way fetch_worms picks it: its only record, or else its first accepted one.
+        Returns the names WoRMS has no records for, which are remembered like fetch_worms remembers them. Names whose
+        request failed, or that only have unaccepted records, get no phylogeny but aren't returned.
+        """
+        names = [name for name in dict.fromkeys(names) if name]  # boxes/dots without a name have nothing to look up
+        aphia_ids = {}  # {name: aphia_id}
+        no_record_names = []
+        for i in range(0, len(names), MAX_NAMES_PER_REQUEST):
+            batch = names[i:i + MAX_NAMES_PER_REQUEST]
+            print(f'Fetching WoRMS records for {len(batch)} names')
+            try:
+                batch_records = self.worms_client.records_by_names(batch)
+            except requests.RequestException as e:
+                print(f'{TERM_RED}Unable to fetch WoRMS records: {e}{TERM_NORMAL}')
+                continue
+            for name, records in zip(batch, batch_records):
+                accepted = [record for record in records if record['status'] == 'accepted']
+                if len(records) == 1 or accepted:
+                    aphia_ids[name] = records[0]['AphiaID'] if len(records) == 1 else accepted[0]['AphiaID']
+                else:
+                    print(f'{TERM_RED}No accepted record found for concept name "{name}"{TERM_NORMAL}')
+                    if not records:
+                        no_record_names.append(name)
+        if no_record_names:
+            self.store.add_no_matches(PhylogenyStore.WORMS, no_record_names, self.no_match_ttl)
+
+        def fetch_classification(aphia_id: int) -> dict | None:
+            try:
+                return self.worms_client.classification(aphia_id)
+            except requests.RequestException as e:
+                print(f'{TERM_RED}Unable to fetch WoRMS classification for AphiaID {aphia_id}: {e}{TERM_NORMAL}')
+                return None
+
+        distinct_ids = list(dict.fromkeys(aphia_ids.values()))
+        trees = {}  # {aphia_id: classification, or None if it couldn't be fetched}
+        if distinct_ids:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(distinct_ids)))) as executor:
+                trees = dict(zip(distinct_ids, executor.map(fetch_classification, distinct_ids)))
+            for name, aphia_id in aphia_ids.items():
+                if trees[aphia_id] is not None:
+                    self.data[name] = flatten_taxa_tree(trees[aphia_id], {})
+                    self.data[name]['aphia_id'] = aphia_id
+        return set(no_record_names)
 
     def fetch_worms(self, scientific_name: str) -> bool:
         """
-        Fetches phylogeny for a given scientific name from WoRMS. Returns True if successful, False otherwise.
+        Fetches phylogeny for a given scientific name from WoRMS. Returns True if successful, False otherwise. A name
+        WoRMS answers with no records for is remembered (see PhylogenyStore.add_no_matches) and isn't requested again
+        until that expires.
         """
+        if self.store.no_matches(PhylogenyStore.WORMS, [scientific_name]):
+            return False
         print(f'Fetching phylogeny for "{scientific_name}" from WoRMS')
-        worms_id_res = requests.get(url=f'{WORMS_REST_URL}/AphiaIDByName/{scientific_name}?marine_only=true')
+        worms_id_res = upstream_session.get(
+            url=f'{WORMS_REST_URL}/AphiaIDByName/{scientific_name}?marine_only=true',
+            timeout=DEFAULT_TIMEOUT,
+        )
         if worms_id_res.status_code == 200 and worms_id_res.json() != -999:  # -999 means more than one matching record
             aphia_id = worms_id_res.json()
-            worms_tree_res = requests.get(url=f'{WORMS_REST_URL}/AphiaClassificationByAphiaID/{aphia_id}')
+            worms_tree_res = upstream_session.get(
+                url=f'{WORMS_REST_URL}/AphiaClassificationByAphiaID/{aphia_id}',
+                timeout=DEFAULT_TIMEOUT,
+            )
             if worms_tree_res.status_code == 200:
                 self.data[scientific_name] = flatten_taxa_tree(worms_tree_res.json(), {})
                 self.data[scientific_name]['aphia_id'] = aphia_id
         else:
-            worms_name_res = requests.get(url=f'{WORMS_REST_URL}/AphiaRecordsByName/{scientific_name}?like=false&marine_only=true&offset=1')
+            worms_name_res = upstream_session.get(
+                url=f'{WORMS_REST_URL}/AphiaRecordsByName/{scientific_name}?like=false&marine_only=true&offset=1',
+                timeout=DEFAULT_TIMEOUT,
+            )
             if worms_name_res.status_code == 200 and len(worms_name_res.json()) > 0:
                 # just take the first accepted record
                 for record in worms_name_res.json():
                     if record['status'] == 'accepted':
-                        worms_tree_res_2 = requests.get(url=f'{WORMS_REST_URL}/AphiaClassificationByAphiaID/{record["AphiaID"]}')
+                        worms_tree_res_2 = upstream_session.get(
+                            url=f'{WORMS_REST_URL}/AphiaClassificationByAphiaID/{record["AphiaID"]}',
+                            timeout=DEFAULT_TIMEOUT,
+                        )
                         if worms_tree_res_2.status_code == 200:
                             self.data[scientific_name] = flatten_taxa_tree(worms_tree_res_2.json(), {})
                             self.data[scientific_name]['aphia_id'] = record['AphiaID']
                         break
             else:
                 print(f'{TERM_RED}No accepted record found for concept name "{scientific_name}"{TERM_NORMAL}')
+                if worms_name_res.status_code in (200, 204):  # WoRMS answered, it just has no record (not an outage)
+                    self._add_no_match(PhylogenyStore.WORMS, scientific_name)
                 return False
         return True
@@ -0,0 +1,176 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Iterable
+
+DB_PATH = os.path.join('cache', 'phylogeny.sqlite3')
+JSON_PATH = os.path.join('cache', 'phylogeny.json')  # the old cache file, imported into a new database
+SCHEMA_VERSION = 2
+BUSY_TIMEOUT = 30  # seconds to wait for another process's write to finish
+NO_MATCH_TTL = 7 * 24 * 60 * 60  # seconds a name with no match is skipped before it's looked up again
+
+
+class PhylogenyStore:
+    """
+    Phylogeny for every name resolved so far (from WoRMS or the VARS knowledge base), one row per name, so looking up a
+    name is an indexed read and saving a newly resolved name writes just that row instead of the whole cache.
+
+    The store is shared by every request in a process (see default()) and keeps the names it has read in memory, so a
+    name fetched by one request is a dict lookup for the next. Other processes (e.g. gunicorn workers) write to the
+    same database: the in-memory copy is dropped whenever another connection has committed since it was read, and
+    writes are per-name upserts in a locked transaction, so concurrent writers merge their names instead of replacing
+    each other's. A new database imports the old cache/phylogeny.json if there is one.
+
+    Names a source has no match for are kept too (see add_no_matches), with an expiry, so a name that isn't in WoRMS
+    or the knowledge base isn't looked up again on every page load until it expires or is purged.
+    """
+
+    WORMS = 'worms'
+    VARS_KB = 'vars_kb'
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, db_path: str = DB_PATH, json_path: str = JSON_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._entries = {}  # {name: phylogeny, or None if it isn't stored}, as of _data_version
+        self._data_version = None
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        # one connection shared by the request threads of this process, serialized by _lock. Writes take the database
+        # write lock up front (BEGIN IMMEDIATE), waiting up to BUSY_TIMEOUT for another process to finish
+        self._connection = sqlite3.connect(
+            db_path,
+            timeout=BUSY_TIMEOUT,
+            isolation_level='IMMEDIATE',
+            check_same_thread=False,
+        )
+        self._connection.execute('PRAGMA journal_mode=WAL')  # readers don't wait on a writer
+        self._migrate(json_path)
+
+    @classmethod
+    def default(cls) -> 'PhylogenyStore':
+        """Process-wide store at cache/phylogeny.sqlite3."""
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    def _migrate(self, json_path: str):
+        with self._lock, self._connection:
+            self._connection.execute('BEGIN IMMEDIATE')  # so only one process creates and imports
+            version = self._connection.execute('PRAGMA user_version').fetchone()[0]
+            if version >= SCHEMA_VERSION:
+                return
+            if version < 1:
+                self._connection.execute(
+                    'CREATE TABLE IF NOT EXISTS phylogeny (name TEXT PRIMARY KEY, phylogeny TEXT NOT NULL)',
+                )
+                try:
+                    with open(json_path, 'r') as f:
+                        entries = json.load(f)
+                    print(f'Importing {len(entries)} names from {json_path}')
+                except FileNotFoundError:
+                    entries = {'Animalia': {}}
+                self._connection.executemany(
+                    'INSERT OR IGNORE INTO phylogeny (name, phylogeny) VALUES (?, ?)',
+                    ((name, json.dumps(phylogeny)) for name, phylogeny in entries.items()),
+                )
+            if version < 2:
+                self._connection.execute(
+                    'CREATE TABLE IF NOT EXISTS no_match '
+                    '(source TEXT NOT NULL, name TEXT NOT NULL, expires_at REAL NOT NULL, PRIMARY KEY (source, name))',
+                )
+            self._connection.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def _check_data_version(self):
+        """Drops the names read so far if another connection has committed since (call with _lock held)."""
+        data_version = self._connection.execute('PRAGMA data_version').fetchone()[0]
+        if data_version != self._data_version:
+            self._entries.clear()
+            self._data_version = data_version
+
+    def get(self, name: str) -> dict | None:
+        with self._lock:
+            self._check_data_version()
+            if name not in self._entries:
+                row = self._connection.execute('SELECT phylogeny FROM phylogeny WHERE name = ?', (name,)).fetchone()
+                self._entries[name] = json.loads(row[0]) if row else None
+            phylogeny = self._entries[name]
+        return dict(phylogeny) if phylogeny is not None else None  # callers may modify it
+
+    def names(self) -> list[str]:
+        with self._lock:
+            return [row[0] for row in self._connection.execute('SELECT name FROM phylogeny')]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM phylogeny').fetchone()[0]
+
+    def upsert(self, entries: Iterable[tuple[str, dict]]):
+        """
+        Inserts or replaces the phylogeny of each (name, phylogeny), in one transaction. Names other processes wrote in
+        the meantime are left alone.
+        """
+        entries = {name: dict(phylogeny) for name, phylogeny in entries}
+        with self._lock:
+            self._check_data_version()
+            with self._connection:
+                self._connection.executemany(
+                    'INSERT INTO phylogeny (name, phylogeny) VALUES (?, ?) '
+                    'ON CONFLICT(name) DO UPDATE SET phylogeny = excluded.phylogeny',
+                    ((name, json.dumps(phylogeny)) for name, phylogeny in entries.items()),
+                )
+            self._entries.update(entries)  # our own commits don't change data_version
+
+    def delete(self, name: str):
+        with self._lock:
+            with self._connection:
+                self._connection.execute('DELETE FROM phylogeny WHERE name = ?', (name,))
+            self._entries[name] = None
+
+    def clear(self):
+        with self._lock:
+            with self._connection:
+                self._connection.execute('DELETE FROM phylogeny')
+            self._entries.clear()
+
+    def no_matches(self, source: str, names: Iterable[str]) -> set[str]:
+        """Which of names the source had no match for, as of less than the TTL they were added with ago."""
+        names = list(dict.fromkeys(names))
+        if not names:
+            return set()
+        now = time.time()
+        matches = set()
+        with self._lock:
+            for i in range(0, len(names), 500):  # stay under SQLite's bound parameter limit
+                batch = names[i:i + 500]
+                matches.update(row[0] for row in self._connection.execute(
+                    f'SELECT name FROM no_match WHERE source = ? AND expires_at > ? '
+                    f'AND name IN ({", ".join("?" * len(batch))})',
+                    (source, now, *batch),
+                ))
+        return matches
+
+    def add_no_matches(self, source: str, names: Iterable[str], ttl: float = NO_MATCH_TTL):
+        """Records that the source has no match for names, until ttl seconds from now. Expired rows are dropped."""
+        now = time.time()
+        with self._lock:
+            with self._connection:
+                self._connection.execute('DELETE FROM no_match WHERE expires_at <= ?', (now,))
+                self._connection.executemany(
+                    'INSERT INTO no_match (source, name, expires_at) VALUES (?, ?, ?) '
+                    'ON CONFLICT(source, name) DO UPDATE SET expires_at = excluded.expires_at',
+                    ((source, name, now + ttl) for name in dict.fromkeys(names)),
+                )
+
+    def purge_no_matches(self, name: str = None) -> int:
+        """Forgets the no-matches for name (from every source), or all of them. Returns the number of rows removed."""
+        with self._lock:
+            with self._connection:
+                if name is None:
+                    return self._connection.execute('DELETE FROM no_match').rowcount
+                return self._connection.execute('DELETE FROM no_match WHERE name = ?', (name,)).rowcount
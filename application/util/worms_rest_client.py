@@ -0,0 +1,137 @@
+import threading
+import time
+from collections.abc import Sequence
+from email.utils import parsedate_to_datetime
+
+import requests
+
+from application.util.constants import TERM_NORMAL, TERM_YELLOW
+from application.util.http_metrics import MetricsHTTPAdapter
+
+WORMS_REST_URL = 'https://www.marinespecies.org/rest'
+DEFAULT_TIMEOUT = (10, 30)  # (connect, read) seconds
+REQUESTS_PER_SECOND = 10  # client-side cap on requests to WoRMS from this process
+MAX_RETRIES = 4
+BACKOFF_FACTOR = 1  # seconds before the first retry when WoRMS doesn't send Retry-After, doubled for each retry after
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+MAX_NAMES_PER_REQUEST = 50  # names per AphiaRecordsByNames request (WoRMS allows 500, but the names go in the URL)
+
+
+class WormsRestClient:
+    """
+    Client for the WoRMS REST API, shared by every request in a process (see default()) so they share one rate limit.
+
+    Requests are started no faster than requests_per_second, whichever thread sends them. A request that fails with a
+    retryable status or a connection error is retried after the server's Retry-After (or an exponential backoff), and
+    the other threads' requests wait out that delay too, so a throttled WoRMS isn't hit by the rest of a thread pool.
+    """
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(
+            self,
+            base_url: str = WORMS_REST_URL,
+            requests_per_second: float = REQUESTS_PER_SECOND,
+            max_retries: int = MAX_RETRIES,
+            backoff_factor: float = BACKOFF_FACTOR,
+            timeout: tuple[float, float] = DEFAULT_TIMEOUT,
+    ):
+        self.base_url = base_url
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.timeout = timeout
+        self._interval = 1 / requests_per_second
+        self._lock = threading.Lock()
+        self._next_request_at = 0.0  # time.monotonic() before which no request may start
+        self._session = requests.Session()
+        adapter = MetricsHTTPAdapter(pool_maxsize=16)
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+
+    @classmethod
+    def default(cls) -> 'WormsRestClient':
+        """Process-wide client for www.marinespecies.org."""
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    def _wait_turn(self):
+        """Blocks until this thread may start a request."""
+        with self._lock:
+            now = time.monotonic()
+            start_at = max(now, self._next_request_at)
+            self._next_request_at = start_at + self._interval
+        if start_at > now:
+            time.sleep(start_at - now)
+
+    def _hold_off(self, seconds: float):
+        """Holds every thread's next request for at least seconds."""
+        with self._lock:
+            self._next_request_at = max(self._next_request_at, time.monotonic() + seconds)
+
+    @staticmethod
+    def _retry_after(res: requests.Response) -> float | None:
+        """Seconds to wait from the response's Retry-After header (delay-seconds or HTTP date), if it has one."""
+        value = res.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def get(self, path: str, params: dict = None) -> requests.Response:
+        """
+        GET base_url + path under the rate limit, retrying retryable statuses and connection errors. Returns the first
+        response that isn't retryable, or the last one once retries run out. Raises the connection error if every
+        attempt failed to connect.
+        """
+        for attempt in range(self.max_retries + 1):
+            self._wait_turn()
+            try:
+                res = self._session.get(url=f'{self.base_url}{path}', params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff_factor * 2 ** attempt
+                reason = type(e).__name__
+            else:
+                if res.status_code not in RETRYABLE_STATUS_CODES or attempt == self.max_retries:
+                    return res
+                delay = self._retry_after(res)
+                if delay is None:
+                    delay = self.backoff_factor * 2 ** attempt
+                reason = res.status_code
+            print(f'{TERM_YELLOW}WARNING: WoRMS request for {path} failed ({reason}), retrying in {delay:.1f}s{TERM_NORMAL}')
+            self._hold_off(delay)
+
+    def records_by_names(self, names: Sequence[str]) -> list[list[dict]]:
+        """
+        Marine records exactly matching each name (up to MAX_NAMES_PER_REQUEST names), in the order of names. A name
+        with no records gets an empty list. Raises HTTPError if WoRMS couldn't answer, or if it didn't answer for every
+        name (e.g. a None name, which requests leaves out of the query).
+        """
+        res = self.get('/AphiaRecordsByNames', params={
+            'scientificnames[]': list(names),
+            'like': 'false',
+            'marine_only': 'true',
+        })
+        if res.status_code == 204:  # none of the names have records
+            return [[] for _ in names]
+        res.raise_for_status()
+        records = res.json()
+        if len(records) != len(names):
+            raise requests.HTTPError(f'WoRMS answered for {len(records)} of {len(names)} names', response=res)
+        return [name_records or [] for name_records in records]
+
+    def classification(self, aphia_id: int) -> dict:
+        """Nested classification tree for a record. Raises HTTPError if WoRMS couldn't answer."""
+        res = self.get(f'/AphiaClassificationByAphiaID/{aphia_id}')
+        res.raise_for_status()
+        return res.json()
@@ -1,6 +1,7 @@
-import requests
 import json
 
+from application.util.http_metrics import upstream_session
+
 
 class AuthenticationError(Exception):
     """
@@ -42,7 +43,7 @@ class JWTAuthentication(object):
         """
 
         url = f'{self.base_url}/auth'
-        res = requests.post(
+        res = upstream_session.post(
             url=url,
             headers={'Authorization': f'APIKEY {client_secret}'},
         )
@@ -82,7 +83,7 @@ class Annosaurus(JWTAuthentication):
             association["link_value"] = "nil"
         if "to_concept" not in association or association["to_concept"] is None:
             association["to_concept"] = "self"
-        res = requests.post(
+        res = upstream_session.post(
             url=f'{self.base_url}/associations',
             data=association,
             headers=self._auth_header(jwt),
@@ -98,7 +99,7 @@ class Annosaurus(JWTAuthentication):
                            jwt: str = None) -> dict:
 
         jwt = self.authorize(client_secret, jwt)
-        res = requests.put(
+        res = upstream_session.put(
             url=f'{self.base_url}/associations/{association_uuid}',
             data=association,
             headers=self._auth_header(jwt),
@@ -111,7 +112,7 @@ class Annosaurus(JWTAuthentication):
                            jwt: str = None) -> dict:
 
         jwt = self.authorize(client_secret, jwt)
-        res = requests.delete(
+        res = upstream_session.delete(
             url=f'{self.base_url}/associations/{association_uuid}',
             headers=self._auth_header(jwt),
         )
@@ -124,7 +125,7 @@ class Annosaurus(JWTAuthentication):
                             jwt: str = None) -> dict:
 
         jwt = self.authorize(client_secret, jwt)
-        res = requests.put(
+        res = upstream_session.put(
             url=f'{self.base_url}/annotations/{observation_uuid}',
             data={'concept': concept},
             headers=self._auth_header(jwt),
@@ -137,7 +138,7 @@ class Annosaurus(JWTAuthentication):
                                   client_secret: str = None,
                                   jwt: str = None) -> dict:
         jwt = self.authorize(client_secret, jwt)
-        res = requests.get(url=f'{self.base_url}/observations/{observation_uuid}')
+        res = upstream_session.get(url=f'{self.base_url}/observations/{observation_uuid}')
         if res.status_code != 200:
             print(f'Unable to find annotation with observation uuid of {observation_uuid}')
             return {'status': res.status_code, 'json': res.json()}
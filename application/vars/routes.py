@@ -16,6 +16,7 @@ import requests
 from flask import current_app, request, send_file
 
 from . import vars_bp
+from application.image_review.review_record_cache import ReviewRecordCache
 from application.vars.annosaurus import Annosaurus
 
 
@@ -37,6 +38,7 @@ def update_annotation():
         concept=request.values.get('concept'),
         client_secret=current_app.config.get('ANNOSAURUS_CLIENT_SECRET'),
     )
+    ReviewRecordCache.default().invalidate()
     return updated_response['json'], updated_response['status']
 
 
@@ -56,6 +58,7 @@ def create_association():
     )
     if created_response['status'] == 200:
         created_response['status'] = 201
+    ReviewRecordCache.default().invalidate()
     return created_response['json'], created_response['status']
 
 
@@ -73,6 +76,7 @@ def update_association(uuid):
         association=updated_association,
         client_secret=current_app.config.get('ANNOSAURUS_CLIENT_SECRET'),
     )
+    ReviewRecordCache.default().invalidate()
     return updated_response['json'], updated_response['status']
 
 
@@ -84,6 +88,7 @@ def delete_association(uuid):
         association_uuid=uuid,
         client_secret=current_app.config.get('ANNOSAURUS_CLIENT_SECRET'),
     )
+    ReviewRecordCache.default().invalidate()
     return deleted['json'], deleted['status']
 
 
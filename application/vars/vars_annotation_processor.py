@@ -1,11 +1,12 @@
 import datetime
 
 import pandas as pd
-import requests
 import sys
 
+from application.util.compact_record import CompactRecord
 from application.util.constants import TERM_YELLOW, TERM_NORMAL
 from application.util.functions import format_annotator, parse_datetime
+from application.util.http_metrics import upstream_session
 from application.util.phylogeny_cache import PhylogenyCache
 
 
@@ -46,7 +47,7 @@ class VarsAnnotationProcessor:
         """
         Fetches all annotations that have images and all video uris/start times from VARS.
         """
-        div_res = requests.get(url=f'{self.vars_charybdis_url}/query/dive/{sequence_name.replace(" ", "%20")}')
+        div_res = upstream_session.get(url=f'{self.vars_charybdis_url}/query/dive/{sequence_name.replace(" ", "%20")}')
 
         if div_res.status_code != 200:
             print(f'{TERM_YELLOW}WARNING: Unable to fetch annotations for sequence {sequence_name} from VARS{TERM_NORMAL}')
@@ -86,7 +87,7 @@ class VarsAnnotationProcessor:
         """
         if not self.vars_vam_url:
             return []
-        res = requests.get(url=f'{self.vars_vam_url}/videos/videosequence/name/{sequence_name.replace(" ", "%20")}')
+        res = upstream_session.get(url=f'{self.vars_vam_url}/videos/videosequence/name/{sequence_name.replace(" ", "%20")}')
         if res.status_code != 200:
             print(f'{TERM_YELLOW}WARNING: Unable to fetch videos for sequence {sequence_name} from VAM{TERM_NORMAL}')
             return []
@@ -142,21 +143,29 @@ class VarsAnnotationProcessor:
             'sequence_name': matching_video['sequence_name'],
         }
 
+    def prefetch_phylogeny(self, no_match_records: set = None) -> set[str]:
+        """
+        Fetches phylogeny from the VARS knowledge base for every distinct concept in the working records that isn't
+        cached yet, concurrently (see PhylogenyCache.prefetch_vars). Returns the concepts with no phylogeny.
+        """
+        return self.phylogeny.prefetch_vars(
+            (record['concept'] for record in self.working_records if record['concept'] != 'none'),
+            self.vars_kb_url,
+            no_match_records,
+        )
+
     def process_working_records(self):
         """
         Cleans and formats the working records into a list of dicts.
         """
         formatted_records = []
-        no_match_records = set()
+        self.prefetch_phylogeny()
 
         for record in self.working_records:
             concept_name = record['concept']
             identity_reference = None
             depth = None
 
-            if concept_name not in self.phylogeny.data and concept_name != 'none' and concept_name not in no_match_records:
-                self.phylogeny.fetch_vars(concept_name, self.vars_kb_url, no_match_records)
-
             video = self.get_video(record)
 
             if not video and self.vars_vam_url:
@@ -271,7 +280,7 @@ class VarsAnnotationProcessor:
         annotation_df = annotation_df.replace({float('nan'): None})
 
         for index, row in annotation_df.iterrows():
-            self.final_records.append({
+            self.final_records.append(VarsAnnotationRecord({
                 'observation_uuid': row['observation_uuid'],
                 'concept': row['concept'],
                 'associations': row['associations'],
@@ -289,4 +298,20 @@ class VarsAnnotationProcessor:
                 'video_url': row['video_url'],
                 'recorded_timestamp': parse_datetime(row['recorded_timestamp']).strftime('%d %b %y %H:%M:%S UTC'),
                 'video_sequence_name': row['video_sequence_name'],
-            })
+            }))
+
+
+class VarsAnnotationRecord(CompactRecord):
+    """One annotation in VarsAnnotationProcessor.final_records."""
+
+    __slots__ = ()
+
+    FIELDS = (
+        'observation_uuid', 'concept', 'associations', 'activity', 'annotator', 'depth', 'phylum', 'class', 'order',
+        'family', 'genus', 'species', 'identity_reference', 'image_url', 'video_url', 'recorded_timestamp',
+        'video_sequence_name',
+    )
+    INTERNED_FIELDS = frozenset((
+        'concept', 'activity', 'annotator', 'phylum', 'class', 'order', 'family', 'genus', 'species',
+        'video_sequence_name',
+    ))
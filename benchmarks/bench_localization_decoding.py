@@ -0,0 +1,117 @@
+"""
+Compares decoding a large Tator localization response with ``res.json()`` (full dicts) against the streaming,
+field-selective decoder used by ``TatorRestClient.iter_localizations(fields=...)``.
+
+Usage (from the repo root):
+
+    python -m benchmarks.bench_localization_decoding [--count 200000]
+"""
+
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+import uuid
+
+from application.tator.tator_json_stream import iter_json_array, select_fields
+from application.tator.tator_localization_processor import TatorLocalizationProcessor
+from application.tator.tator_rest_client import JSON_CHUNK_SIZE
+
+SCIENTIFIC_NAMES = ['Pomacentridae', 'Hydroidolina', 'Ctenophora', 'Actiniaria', 'Munidopsis', 'Chaceon', 'Hexactinellida']
+
+
+def synthetic_localization(localization_id: int) -> dict:
+    """Roughly the shape (and key count) of a localization from Tator's Localizations endpoint."""
+    return {
+        'id': localization_id,
+        'elemental_id': str(uuid.uuid4()),
+        'version': 45,
+        'type': random.choice([48, 49]),
+        'media': random.randint(20_000_000, 20_000_100),
+        'master_section': 22831,
+        'frame': random.randint(0, 50_000),
+        'frame_state': None,
+        'x': random.random(),
+        'y': random.random(),
+        'u': None,
+        'v': None,
+        'width': random.random(),
+        'height': random.random(),
+        'points': None,
+        'parent': None,
+        'mark': 0,
+        'latest_mark': 0,
+        'color': None,
+        'is_exemplar': None,
+        'variant_deleted': False,
+        'thumbnail_image': None,
+        'created_by': 123,
+        'modified_by': 123,
+        'created_datetime': '2025-06-01T12:34:56.789012Z',
+        'modified_datetime': '2025-06-02T12:34:56.789012Z',
+        'project': 26,
+        'attributes': {
+            'Scientific Name': random.choice(SCIENTIFIC_NAMES),
+            'Qualifier': 'stet.',
+            'Reason': 'Non-target taxon',
+            'Tentative ID': '',
+            'IdentificationRemarks': '',
+            'Morphospecies': '',
+            'Identified By': '',
+            'Notes': '',
+            'Attracted': 'Not attracted',
+            'Categorical Abundance': '--',
+            'Good Image': False,
+            'Depth': 454.157,
+            'DO Temperature (celsius)': 10.217,
+            'DO Concentration Salin Comp (mol per L)': 125.679,
+            'Position': [-178.1, -17.9],
+        },
+    }
+
+
+def measure(label: str, decode, payload: bytes):
+    # time without tracemalloc (it slows allocation-heavy code several-fold), then measure memory in a second run
+    gc.collect()
+    start = time.perf_counter()
+    result = decode(payload)
+    elapsed = time.perf_counter() - start
+    del result
+    gc.collect()
+    tracemalloc.start()
+    result = decode(payload)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    print(f'{label:<32} {elapsed:6.2f} s {peak / 2 ** 20:8.1f} MiB peak {retained / 2 ** 20:8.1f} MiB retained')
+
+
+def decode_full(payload: bytes) -> list[dict]:
+    return json.loads(payload)
+
+
+def decode_compact(payload: bytes) -> list[dict]:
+    chunks = (payload[i:i + JSON_CHUNK_SIZE] for i in range(0, len(payload), JSON_CHUNK_SIZE))
+    return [
+        select_fields(localization, TatorLocalizationProcessor.LOCALIZATION_FIELDS)
+        for localization in iter_json_array(chunks)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=200_000)
+    args = parser.parse_args()
+
+    random.seed(0)
+    payload = json.dumps([synthetic_localization(i) for i in range(args.count)]).encode()
+    print(f'{args.count} localizations, {len(payload) / 2 ** 20:.1f} MiB of JSON\n')
+
+    measure('res.json() (full dicts)', decode_full, payload)
+    measure('streaming + LOCALIZATION_FIELDS', decode_compact, payload)
+
+
+if __name__ == '__main__':
+    main()
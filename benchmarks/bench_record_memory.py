@@ -0,0 +1,115 @@
+"""
+Compares the memory held by process_records output stored as plain dicts against the same records stored as
+``TatorRecord`` (slotted, sparse, with interned taxonomy strings).
+
+Usage (from the repo root):
+
+    python -m benchmarks.bench_record_memory [--count 100000]
+"""
+
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+import uuid
+
+from application.tator.tator_localization_processor import TatorRecord
+
+SCIENTIFIC_NAMES = ['Pomacentridae', 'Hydroidolina', 'Ctenophora', 'Actiniaria', 'Munidopsis', 'Chaceon', 'Hexactinellida']
+PHYLOGENY = {
+    'phylum': 'Cnidaria',
+    'class': 'Anthozoa',
+    'subclass': 'Hexacorallia',
+    'order': 'Actiniaria',
+    'family': 'Actiniidae',
+    'aphia_id': 1360.0,
+}
+
+
+def synthetic_record(record_id: int) -> dict:
+    """Roughly the shape of a dropcam record from process_records(get_timestamp=True, get_dropcam_fieldbook_data=True)."""
+    elemental_id = str(uuid.uuid4())
+    media_id = random.randint(20_000_000, 20_000_100)
+    frame = random.randint(0, 50_000)
+    record = {
+        'observation_uuid': elemental_id,
+        'timestamp': '2025-06-01 12:34:56Z',
+        'camera_seafloor_arrival': '2025-06-01 12:00:00Z',
+        'animal_arrival': '0:34:56',
+        'all_localizations': [{
+            'id': record_id,
+            'elemental_id': elemental_id,
+            'version': 45,
+            'type': 48,
+            'points': [round(random.random(), 5), round(random.random(), 5)],
+            'dimensions': [random.random(), random.random()],
+        }],
+        'media_id': media_id,
+        'frame': frame,
+        'frame_url': f'/tator/frame/{media_id}/{frame}',
+        'annotator': 'Joe Dirt',
+        'type': 48,
+        'scientific_name': random.choice(SCIENTIFIC_NAMES),
+        'section_id': '22831',
+        'video_sequence_name': 'DOEX0087_NIU-dscm-02',
+        'count': 0,
+        'attracted': 'Not Attracted',
+        'qualifier': 'stet.',
+        'reason': 'Non-target taxon',
+        'good_image': False,
+        'lat': 21.5,
+        'long': -158.5,
+        'depth_m': 454.157,
+        'bait_type': 'fish',
+        'primary_substrate': 'sand',
+        **PHYLOGENY,
+    }
+    if random.random() < 0.2:
+        record['tentative_id'] = random.choice(SCIENTIFIC_NAMES)
+    if random.random() < 0.1:
+        record['notes'] = 'check ID'
+    return record
+
+
+def measure(label: str, build, payload: bytes):
+    # time without tracemalloc (it slows allocation-heavy code several-fold), then measure memory in a second run
+    gc.collect()
+    start = time.perf_counter()
+    result = build(payload)
+    elapsed = time.perf_counter() - start
+    del result
+    gc.collect()
+    tracemalloc.start()
+    result = build(payload)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    print(f'{label:<32} {elapsed:6.2f} s {peak / 2 ** 20:8.1f} MiB peak {retained / 2 ** 20:8.1f} MiB retained')
+
+
+def build_dicts(payload: bytes) -> list[dict]:
+    # decoding gives every record its own copy of every string, like records built from decoded localizations
+    return json.loads(payload)
+
+
+def build_records(payload: bytes) -> list[TatorRecord]:
+    return [TatorRecord(record) for record in json.loads(payload)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=100_000)
+    args = parser.parse_args()
+
+    random.seed(0)
+    payload = json.dumps([synthetic_record(i) for i in range(args.count)]).encode()
+    print(f'{args.count} records\n')
+
+    measure('dicts', build_dicts, payload)
+    measure('TatorRecord', build_records, payload)
+
+
+if __name__ == '__main__':
+    main()
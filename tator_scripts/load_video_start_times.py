@@ -24,6 +24,8 @@ import xml.etree.ElementTree as ET
 import sys
 import dotenv
 
+from tator_script_helper_functions import get_tator_client
+
 
 def get_tator_media_ids(project_id, section_id, deployment_name, tator_token) -> int:
     if not tator_token:
@@ -107,19 +109,11 @@ def change_names(folder_path):
 
 
 def set_video_start_time(media_id, start_time, tator_token):
-    data = {
-        'attributes': {
-            'Start Time': start_time,
-        },
-    }
-    res = requests.patch(
-        f'https://cloud.tator.io/rest/Media/{media_id}',
-        headers={
-            'Content-Type': 'application/json',
-            'Authorization': f'Token {tator_token}',
-        },
-        json=data)
-    print(res.json())
+    # through the app's client, so the app's cached copy of the media is dropped too
+    try:
+        print(get_tator_client(tator_token).update_media_attributes(media_id, {'Start Time': start_time}))
+    except requests.HTTPError as e:
+        print(e.response.json())
 
 
 if len(sys.argv) not in [4, 5]:
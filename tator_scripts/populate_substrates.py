@@ -16,7 +16,7 @@ import os
 import requests
 import sys
 
-from tator_script_helper_functions import get_deployment_section_id_map, print_progress_bar
+from tator_script_helper_functions import get_deployment_section_id_map, get_tator_client, print_progress_bar
 
 if len(sys.argv) != 2:
     print('Usage: python populate_substrates.py <substrates csv file>')
@@ -27,6 +27,7 @@ dotenv.load_dotenv()
 CSV_FILE = sys.argv[1]
 
 deployment_section_id_map = get_deployment_section_id_map()
+tator_client = get_tator_client(os.getenv('TATOR_TOKEN'))
 
 with open(CSV_FILE, newline='') as file:
     next(file)
@@ -75,18 +76,10 @@ with open(CSV_FILE, newline='') as file:
         print_progress_bar(0, len(media_ids), prefix=f'  0 / {len(media_ids)}', suffix='Complete')
         for index, media_id in enumerate(media_ids):
             sys.stdout.flush()
-            req = requests.patch(
-                f'https://cloud.tator.io/rest/Media/{media_id}',
-                headers={
-                    'Content-Type': 'application/json',
-                    'Authorization': f'Token {os.getenv("TATOR_TOKEN")}',
-                },
-                json={
-                    'attributes': attributes,
-                }
-            )
-            if req.status_code != 200:
-                print(f'Error updating media id {media_id}: {req.text}')
+            try:
+                tator_client.update_media_attributes(media_id, attributes)
+            except requests.HTTPError as e:
+                print(f'Error updating media id {media_id}: {e.response.text}')
                 exit(1)
             print_progress_bar(index + 1, len(media_ids), prefix=f'  {index} / {len(media_ids)}', suffix='Complete')
 
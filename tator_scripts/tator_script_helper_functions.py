@@ -4,9 +4,24 @@ import sys
 import requests
 import tator
 
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(REPO_ROOT)  # so scripts can use the app's Tator client
+
+from application.tator.tator_metadata_cache import CACHE_DIR, TatorMetadataCache  # noqa: E402
+from application.tator.tator_rest_client import TatorRestClient  # noqa: E402
+
 TATOR_URL = 'https://cloud.tator.io'
 
 
+def get_tator_client(tator_token: str) -> TatorRestClient:
+    """
+    Tator client that shares the image review app's metadata cache, so media updated with update_media_attributes()
+    aren't served stale by the app afterwards.
+    """
+    metadata_cache = TatorMetadataCache(cache_dir=os.path.join(REPO_ROOT, CACHE_DIR))
+    return TatorRestClient(TATOR_URL, tator_token, metadata_cache=metadata_cache)
+
+
 def get_deployment_section_id_map() -> dict:
     deployment_section_id_map = {}
 
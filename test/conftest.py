@@ -1,7 +1,18 @@
 from unittest.mock import patch
 
 import pytest
+from cachelib import SimpleCache
+
 from application import create_app
+from application.image_review.review_record_cache import ReviewRecordCache
+from application.tator.dropcam_fieldbook_cache import DropcamFieldbookCache
+from application.tator.tator_annotator_cache import TatorAnnotatorCache
+from application.tator.tator_client_registry import TatorClientRegistry
+from application.tator.tator_image_cache import TatorImageCache
+from application.tator.tator_localization_store import TatorLocalizationStore
+from application.tator.tator_metadata_cache import TatorMetadataCache
+from application.tator.tator_record_cache import TatorRecordCache
+from application.util.phylogeny_store import PhylogenyStore
 
 
 @pytest.fixture
@@ -20,10 +31,32 @@ def client(app):
 @pytest.fixture
 def mock_phylogeny_cache():
     """
-    PhylogenyCache reads/writes cache/phylogeny.json on the real filesystem. Without this, tests would read
-    whatever a developer happens to have cached locally (making assertions non-deterministic and dependent on
-    machine state) and would overwrite that real cache file with test data.
+    PhylogenyCache reads phylogeny from, and saves it to, the SQLite PhylogenyStore (cache/phylogeny.sqlite3). This
+    gives each cache an in-memory {'Animalia': {}} instead and makes save() a no-op, so assertions don't depend on
+    what's stored and tests never write to the store.
     """
     with patch('application.util.phylogeny_cache.PhylogenyCache.load', lambda self: setattr(self, 'data', {'Animalia': {}})), \
          patch('application.util.phylogeny_cache.PhylogenyCache.save', lambda self: None):
         yield
+
+
+@pytest.fixture(autouse=True)
+def isolated_tator_clients(tmp_path, tmp_path_factory):
+    """
+    Swaps every process-wide cache, store and client registry for a fresh in-memory (or tmp_path) one, so nothing is
+    read from or written to the real cache/ directory, and nothing mocked in one test is served to another.
+    """
+    phylogeny_dir = tmp_path_factory.mktemp('phylogeny')  # outside tmp_path, which some tests expect to be empty
+    with patch.object(TatorMetadataCache, '_default', TatorMetadataCache(SimpleCache(default_timeout=0))), \
+            patch.object(TatorImageCache, '_default', TatorImageCache(cache_dir=tmp_path / 'tator_images')), \
+            patch.object(TatorLocalizationStore, '_default', TatorLocalizationStore(SimpleCache(default_timeout=0))), \
+            patch.object(TatorAnnotatorCache, '_default', TatorAnnotatorCache(SimpleCache(default_timeout=0))), \
+            patch.object(TatorRecordCache, '_default', TatorRecordCache(SimpleCache(default_timeout=0))), \
+            patch.object(DropcamFieldbookCache, '_default', DropcamFieldbookCache(SimpleCache(default_timeout=0))), \
+            patch.object(ReviewRecordCache, '_default', ReviewRecordCache(SimpleCache(default_timeout=0))), \
+            patch.object(TatorClientRegistry, '_default', TatorClientRegistry()), \
+            patch.object(PhylogenyStore, '_default', PhylogenyStore(
+                str(phylogeny_dir / 'phylogeny.sqlite3'),
+                json_path=str(phylogeny_dir / 'phylogeny.json'),
+            )):
+        yield
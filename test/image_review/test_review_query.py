@@ -0,0 +1,198 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+from werkzeug.datastructures import MultiDict
+
+from application.image_review.review_query import (
+    decode_cursor, encode_cursor, filter_records, flatten_associations, review_page, sort_records,
+)
+from application.image_review.review_record_cache import ReviewRecordCache
+from application.util.http_metrics import upstream_session
+from test.tator.conftest import FakeApiException, fake_tator_openapi  # noqa: F401 (fixture)
+
+
+def record(uuid: str, **fields) -> dict:
+    return {'observation_uuid': uuid, **fields}
+
+
+@pytest.fixture
+def records():
+    return [
+        record('a', phylum='Cnidaria', **{'class': 'Anthozoa'}, genus='Zoanthus', depth=300, frame=5, media_id=2),
+        record('b', phylum='Porifera', **{'class': 'Hexactinellida'}, notes='Temperature and oxygen data collected', frame=1, media_id=2),
+        record('c', phylum='Cnidaria', **{'class': 'Hydrozoa'}, depth=40, frame=9, media_id=1),
+        record('d', scientific_name='Unknown', frame=3, media_id=1),
+    ]
+
+
+class TestFilterRecords:
+    def test_substring_and_exact_matches(self, records):
+        assert [r['observation_uuid'] for r in filter_records(records, {'class': 'zoa'})] == ['a', 'c']
+        assert [r['observation_uuid'] for r in filter_records(records, {'class': '%22anthozoa%22'})] == ['a']
+
+    def test_every_filter_must_match(self, records):
+        assert [r['observation_uuid'] for r in filter_records(records, {'phylum': 'cnidaria', 'genus': 'zoan'})] == ['a']
+
+    def test_localization_type(self):
+        box = record('a', all_localizations=[{'type': 48}])
+        dot = record('b', all_localizations=[{'type': 795}])
+        assert filter_records([box, dot], {'localization_type': 'Dot'}) == [dot]
+
+
+class TestSortRecords:
+    def test_taxon_sort_breaks_ties_by_lower_ranks_and_puts_missing_last(self, records):
+        assert [r['observation_uuid'] for r in sort_records(records, 'Phylum')] == ['a', 'c', 'b', 'd']
+
+    def test_numeric_sort(self, records):
+        assert [r['observation_uuid'] for r in sort_records(records, 'Depth')] == ['c', 'a', 'b', 'd']
+
+    def test_timestamp_sorts_localizations_by_media_and_frame(self, records):
+        assert [r['observation_uuid'] for r in sort_records(records, 'Timestamp')] == ['d', 'c', 'b', 'a']
+
+    def test_default_keeps_order(self, records):
+        assert sort_records(records, 'Default') == records
+
+
+def test_flatten_associations():
+    annotation = flatten_associations(record('a', associations=[
+        {'link_name': 'guide-photo', 'to_concept': '1 best', 'link_value': 'nil'},
+        {'link_name': 'identity-reference', 'to_concept': 'self', 'link_value': '12'},
+    ]))
+    assert annotation['guide_photo'] == '1 best'
+    assert annotation['identity_reference'] == '12'
+
+
+class TestReviewPage:
+    def test_pages_by_cursor(self, records):
+        record_set = {'annotations': records, 'comments': {'c': {'unread': True}}}
+        first = review_page(record_set, MultiDict({'limit': '2'}))
+        assert [r['observation_uuid'] for r in first['annotations']] == ['a', 'b']
+        assert first['total'] == 4 and first['page_count'] == 2 and first['prev_cursor'] is None
+        second = review_page(record_set, MultiDict({'limit': '2', 'cursor': first['next_cursor']}))
+        assert [r['observation_uuid'] for r in second['annotations']] == ['c', 'd']
+        assert second['page'] == 2 and second['next_cursor'] is None
+        assert second['comments'] == {'c': {'unread': True}}  # only the comments for the page
+        assert 'meta' not in second
+
+    def test_cursor_resumes_after_its_record_when_earlier_records_are_removed(self, records):
+        cursor = encode_cursor(records, 2)
+        assert decode_cursor(records[1:], cursor) == 1
+
+    def test_bad_cursor(self, records):
+        with pytest.raises(ValueError):
+            review_page({'annotations': records}, MultiDict({'cursor': 'nope'}))
+
+    def test_nan_is_sent_as_null(self):
+        page = review_page({'annotations': [record('a', depth=float('nan'))]}, MultiDict())
+        assert page['annotations'] == [{'observation_uuid': 'a', 'depth': None}]
+
+
+class TestVarsImageReviewRoutes:
+    SEQUENCE = 'Deep Discoverer 23060001'
+
+    @pytest.fixture
+    def vars_client(self, client):
+        with client.session_transaction() as session:
+            session['vars_video_sequences'] = [self.SEQUENCE]
+        return client
+
+    def test_shell_page_does_not_embed_annotations(self, vars_client):
+        with patch('application.image_review.vars.routes.VarsAnnotationProcessor') as mock_processor:
+            res = vars_client.get('/image-review/vars', query_string={'sequence': self.SEQUENCE})
+        assert res.status_code == 200
+        assert b"const annotationsUrl = '/image-review/vars/annotations'" in res.data
+        mock_processor.assert_not_called()
+
+    def test_unknown_sequence(self, vars_client):
+        res = vars_client.get('/image-review/vars/annotations', query_string={'sequence': 'Nope 1'})
+        assert res.status_code == 404
+
+    def test_records_are_built_once_across_pages(self, vars_client):
+        processor = MagicMock(vessel_name='Deep Discoverer', highest_id_ref=3, final_records=[
+            record(str(i), concept='Pomacentridae', associations=[]) for i in range(30)
+        ])
+        with patch('application.image_review.vars.routes.VarsAnnotationProcessor', return_value=processor) as mock_processor, \
+                patch('application.image_review.vars.routes.requests.get') as mock_get:
+            mock_get.return_value.__enter__.return_value.json.return_value = {}
+            args = {'sequence': self.SEQUENCE, 'limit': 25}
+            first = vars_client.get('/image-review/vars/annotations', query_string={**args, 'meta': 'true'}).json
+            second = vars_client.get('/image-review/vars/annotations', query_string={**args, 'cursor': first['next_cursor']}).json
+            vars_client.get('/image-review/vars/annotations', query_string={**args, 'refresh': 'true'})
+        assert first['meta']['title'] == 'Deep Discoverer'
+        assert len(first['annotations']) == 25
+        assert [r['observation_uuid'] for r in second['annotations']] == ['25', '26', '27', '28', '29']
+        assert mock_processor.call_count == 2  # once for the first page, once for the refresh
+
+    def build_counts(self, vars_client, *requests_between):
+        """How many times the record set is built for two annotation requests with requests_between in between."""
+        processor = MagicMock(vessel_name='Deep Discoverer', highest_id_ref=3, final_records=[record('1', associations=[])])
+        with patch('application.image_review.vars.routes.VarsAnnotationProcessor', return_value=processor) as mock_processor, \
+                patch('application.image_review.vars.routes.requests.get') as mock_get:
+            mock_get.return_value.__enter__.return_value.json.return_value = {}
+            vars_client.get('/image-review/vars/annotations', query_string={'sequence': self.SEQUENCE})
+            for make_request in requests_between:
+                make_request()
+            vars_client.get('/image-review/vars/annotations', query_string={'sequence': self.SEQUENCE})
+        return mock_processor.call_count
+
+    def test_page_load_rebuilds_records(self, vars_client):
+        assert self.build_counts(
+            vars_client,
+            lambda: vars_client.get('/image-review/vars', query_string={'sequence': self.SEQUENCE}),
+        ) == 2
+
+    def test_edit_routes_invalidate_records(self, vars_client):
+        with patch('application.vars.routes.Annosaurus') as mock_annosaurus:
+            mock_annosaurus.return_value.delete_association.return_value = {'json': {}, 'status': 204}
+            assert self.build_counts(vars_client, lambda: vars_client.delete('/vars/association/abc')) == 2
+
+
+class TestTatorImageReviewRoutes:
+    ARGS = {'project': 26, 'section': 1, 'meta': 'true'}
+
+    @pytest.fixture
+    def tator_client(self, client):
+        with client.session_transaction() as session:
+            session['tator_token'] = 'token-a'
+        return client
+
+    def test_unreachable_review_server_is_flagged(self, tator_client):
+        processor = MagicMock(
+            sections=[SimpleNamespace(deployment_name='PLW-dscm-01', expedition_name='DOEX0087_Palau')],
+            final_records=[record('1')],
+        )
+        with patch('application.image_review.tator.routes.TatorLocalizationProcessor', return_value=processor), \
+                patch('application.image_review.tator.routes.tator.get_api'), \
+                patch.object(upstream_session, 'get', side_effect=requests.exceptions.ConnectionError('down')):
+            res = tator_client.get('/image-review/tator/annotations', query_string=self.ARGS)
+        assert res.status_code == 200
+        assert res.json['total'] == 1
+        assert res.json['meta']['comments_unavailable'] is True
+
+    def test_tator_error_message(self, tator_client, fake_tator_openapi):
+        error = FakeApiException(status=403, body='{"message": "No access"}')
+        with patch('application.image_review.tator.routes.TatorLocalizationProcessor', side_effect=error), \
+                patch('application.image_review.tator.routes.tator.get_api'):
+            res = tator_client.get('/image-review/tator/annotations', query_string=self.ARGS)
+        assert res.status_code == 400
+        assert res.json == {'error': 'No access'}
+
+
+class TestReviewRecordCache:
+    def test_key_is_scoped(self):
+        cache = ReviewRecordCache.default()
+        args = MultiDict({'project': '1', 'section': '2'})
+        assert cache.key('tator', args, ('project', 'section'), 'token-a') != cache.key('tator', args, ('project', 'section'), 'token-b')
+
+    def test_invalidate_changes_every_key(self):
+        cache = ReviewRecordCache.default()
+        args = MultiDict({'sequence': 'Deep Discoverer 23060001'})
+        key = cache.key('vars', args, ('sequence',))
+        cache.set(key, {'annotations': []})
+
+        cache.invalidate()
+
+        assert cache.key('vars', args, ('sequence',)) != key
+        assert cache.get(cache.key('vars', args, ('sequence',))) is None
@@ -1,7 +1,9 @@
 from datetime import datetime, timedelta
+from types import SimpleNamespace
 from unittest.mock import patch
 
 import pytest
+import tator
 
 from application.tator.tator_localization_processor import TatorLocalizationProcessor
 from application.tator.tator_rest_client import TatorRestClient
@@ -38,6 +40,7 @@ def make_localization(*,
                       y=0.5,
                       width=None,
                       height=None,
+                      modified_datetime='2025-01-01T00:00:00+00:00',
                       attributes=None):
     # only the fields process_records() actually reads
     return {
@@ -52,6 +55,7 @@ def make_localization(*,
         'y': y,
         'width': width,
         'height': height,
+        'modified_datetime': modified_datetime,
         'attributes': attributes or {},
     }
 
@@ -82,7 +86,7 @@ class FakeSession(dict):
 def fake_session():
     # flask.session is a werkzeug LocalProxy; unittest.mock.patch() can't auto-create a replacement for it
     # outside a request context, so we patch in a real dict-like stand-in and keep the patch active for
-    # the whole test, since methods beyond __init__ (e.g. _get_annotator_name) also read/write session.
+    # the whole test, since methods beyond __init__ (e.g. process_records) also read/write session.
     # Patched in every module that imports `session` directly, since each import is its own reference.
     session = FakeSession({'tator_token': 'fake-token'})
     with patch('application.tator.tator_localization_processor.session', new=session), \
@@ -104,6 +108,31 @@ def stub_annotator():
 @pytest.fixture
 def stub_worms_match():
     # most process_records() tests don't care about phylogeny resolution.
-    # tests that need specific behavior should patch fetch_worms themselves instead of requesting this fixture.
-    with patch('application.util.phylogeny_cache.PhylogenyCache.fetch_worms', return_value=True):
+    # tests that need specific behavior should patch fetch_worms_many themselves instead of requesting this fixture.
+    with patch('application.util.phylogeny_cache.PhylogenyCache.fetch_worms_many', return_value=set()):
+        yield
+
+
+def fetch_worms_many_with(fetch_worms):
+    """
+    Stand-in for PhylogenyCache.fetch_worms_many that resolves each name with fetch_worms(cache, name), which fills in
+    cache.data and returns whether the name matched.
+    """
+    def fetch_worms_many(self, names, max_workers=None):
+        return {name for name in names if not fetch_worms(self, name)}
+    return fetch_worms_many
+
+
+class FakeApiException(Exception):
+    def __init__(self, status=400, body=''):
+        super().__init__(body)
+        self.status = status
+        self.body = body
+
+
+@pytest.fixture
+def fake_tator_openapi():
+    # tator.openapi.tator_openapi is only importable once a real schema has been loaded, so stand in for exceptions
+    fake = SimpleNamespace(exceptions=SimpleNamespace(ApiException=FakeApiException))
+    with patch.dict(tator.openapi.__dict__, {'tator_openapi': fake}):
         yield
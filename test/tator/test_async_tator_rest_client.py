@@ -0,0 +1,172 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+import requests
+from cachelib import SimpleCache
+
+from application.tator.async_tator_rest_client import AsyncTatorRestClient, SyncTatorRestClient
+from application.tator.tator_metadata_cache import TatorMetadataCache
+from application.tator.tator_type import TatorStateType
+from application.util.http_metrics import HttpMetrics
+
+TATOR_URL = 'https://whats.tator.precious'
+TOKEN = 'test-token'
+
+
+def sync_client(handler, **kwargs) -> SyncTatorRestClient:
+    return SyncTatorRestClient(
+        TATOR_URL,
+        TOKEN,
+        metadata_cache=TatorMetadataCache(backend=SimpleCache()),
+        transport=httpx.MockTransport(handler),
+        **kwargs,
+    )
+
+
+@pytest.fixture
+def no_backoff():
+    with patch('application.tator.async_tator_rest_client.asyncio.sleep', new_callable=AsyncMock) as mock_sleep:
+        yield mock_sleep
+
+
+class TestAsyncTatorRestClient:
+    def test_get_section_sends_token_and_caches(self):
+        requests_seen = []
+
+        def handler(request):
+            requests_seen.append(request)
+            return httpx.Response(200, json={'id': 123, 'name': 'Test Section'})
+
+        client = sync_client(handler)
+        assert client.get_section_by_id(123) == {'id': 123, 'name': 'Test Section'}
+        assert client.get_section_by_id(123) == {'id': 123, 'name': 'Test Section'}
+        assert len(requests_seen) == 1
+        assert str(requests_seen[0].url) == f'{TATOR_URL}/rest/Section/123'
+        assert requests_seen[0].headers['Authorization'] == f'Token {TOKEN}'
+        client.close()
+
+    def test_iter_localizations_walks_pages_with_after_cursor(self):
+        pages = iter([
+            [{'id': 1, 'type': 48, 'modified_by': 7}, {'id': 2, 'type': 49}],
+            [{'id': 5, 'type': 48, 'attributes': {}}],
+        ])
+        params_seen = []
+
+        def handler(request):
+            params_seen.append(dict(request.url.params))
+            return httpx.Response(200, content=json.dumps(next(pages)).encode())
+
+        client = sync_client(handler)
+
+        async def collect():
+            return [
+                page async for page in
+                client.async_client.iter_localizations(project_id=1, section_id=123, page_size=2, fields=('type',))
+            ]
+
+        assert client.run(collect()) == [[{'id': 1, 'type': 48}, {'id': 2, 'type': 49}], [{'id': 5, 'type': 48}]]
+        assert params_seen == [
+            {'section': '123', 'stop': '2'},
+            {'section': '123', 'stop': '2', 'after': '2'},
+        ]
+
+    def test_get_substrates(self):
+        def handler(request):
+            if request.url.path == '/rest/Medias/1':
+                return httpx.Response(200, json=[{'id': 10, 'fps': 30}])
+            return httpx.Response(200, json=[
+                {'type': TatorStateType.SUBSTRATE, 'media': [10], 'frame': 90, 'attributes': {'Relief': 'Low'}},
+                {'type': TatorStateType.SUBSTRATE, 'media': [10], 'frame': 30, 'attributes': {'Relief': 'Flat'}},
+            ])
+
+        assert sync_client(handler).get_substrates(1, section_ids=[123]) == [{
+            'media_id': 10,
+            'substrates': [
+                {'Relief': 'Flat', 'timestamp': '00:01', 'frame': 30},
+                {'Relief': 'Low', 'timestamp': '00:03', 'frame': 90},
+            ],
+        }]
+
+    def test_retries_5xx_with_urllib3_backoff(self, no_backoff):
+        statuses = iter([503, 502, 500, 200])
+
+        def handler(_):
+            return httpx.Response(next(statuses), content=b'fake-frame')
+
+        assert sync_client(handler).get_frame(10, frame=5) == b'fake-frame'
+        assert [call.args[0] for call in no_backoff.await_args_list] == [0, 2, 4]
+
+    def test_retries_exhausted_raises_retry_error(self, no_backoff):
+        client = sync_client(lambda _: httpx.Response(500))
+        with pytest.raises(requests.exceptions.RetryError):
+            client.get_localization_graphic(99)
+        assert no_backoff.await_count == 3
+
+    def test_honors_retry_after(self, no_backoff):
+        statuses = iter([httpx.Response(503, headers={'Retry-After': '7'}), httpx.Response(200, content=b'graphic')])
+        assert sync_client(lambda _: next(statuses)).get_localization_graphic(99) == b'graphic'
+        no_backoff.assert_awaited_once_with(7.0)
+
+    def test_connection_errors_are_retried_then_raised_as_requests_errors(self, no_backoff):
+        def handler(request):
+            raise httpx.ConnectError('refused', request=request)
+
+        with pytest.raises(requests.exceptions.ConnectionError):
+            sync_client(handler).get_user(42)
+        assert no_backoff.await_count == 3
+
+    def test_client_error_raises_http_error_without_retrying(self, no_backoff):
+        client = sync_client(lambda _: httpx.Response(404, json={'message': 'Not found'}))
+        with pytest.raises(requests.exceptions.HTTPError) as exc_info:
+            client.get_media_by_id(10)
+        assert exc_info.value.response.status_code == 404
+        assert exc_info.value.response.json() == {'message': 'Not found'}
+        no_backoff.assert_not_awaited()
+
+    def test_gather_caps_concurrency(self):
+        in_flight = 0
+        most_in_flight = 0
+
+        async def handler(request):
+            nonlocal in_flight, most_in_flight
+            in_flight += 1
+            most_in_flight = max(most_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return httpx.Response(200, json={'id': int(request.url.path.rsplit('/', 1)[1])})
+
+        client = sync_client(handler, max_concurrency=3)
+        users = client.gather(*(client.async_client.get_user(user_id) for user_id in range(20)))
+        assert [user['id'] for user in users] == list(range(20))
+        assert most_in_flight == 3
+
+    def test_requests_are_recorded_in_http_metrics(self, no_backoff):
+        statuses = iter([502, 200])
+        metrics = HttpMetrics()
+        metrics.add_service('tator', TATOR_URL)
+        with patch.object(HttpMetrics, '_default', metrics):
+            sync_client(lambda _: httpx.Response(next(statuses), json=[])).get_states(1, [10])
+        [endpoint] = metrics.snapshot()
+        assert (endpoint['service'], endpoint['method'], endpoint['endpoint']) == ('tator', 'GET', '/rest/States/{id}')
+        assert endpoint['statuses'] == {'200': 1}
+        assert endpoint['retries'] == 1
+
+    def test_run_works_inside_a_running_event_loop(self):
+        client = sync_client(lambda _: httpx.Response(200, json={'id': 42}))
+
+        async def route_in_event_loop():
+            return client.get_user(42)
+
+        assert asyncio.run(route_in_event_loop()) == {'id': 42}
+
+    def test_no_args_raises(self):
+        with pytest.raises(ValueError):
+            sync_client(lambda _: httpx.Response(200, json=[])).get_localizations(project_id=1)
+
+    def test_backoff_matches_urllib3_retry(self):
+        assert AsyncTatorRestClient._retry_delay(1, None) == 0
+        assert AsyncTatorRestClient._retry_delay(2, None) == 2
+        assert AsyncTatorRestClient._retry_delay(3, None) == 4
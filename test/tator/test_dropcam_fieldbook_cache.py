@@ -0,0 +1,67 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from application.tator.dropcam_fieldbook_cache import DropcamFieldbookCache
+from application.util.http_metrics import upstream_session
+from test.tator.conftest import DARC_REVIEW_URL
+
+DEPLOYMENT = {'deployment_name': 'DOEX0087_NIU_dscm_02', 'lat': 21.5, 'long': -158.5, 'bait_type': 'fish', 'depth_m': 999}
+
+
+def fieldbook_response(status_code=200, deployments=None):
+    res = MagicMock(status_code=status_code, text='server error')
+    res.json.return_value = {'deployments': deployments or [DEPLOYMENT]}
+    return res
+
+
+@pytest.fixture
+def fieldbook_cache():
+    return DropcamFieldbookCache.default()  # fresh per test, see isolated_tator_clients
+
+
+class TestDropcamFieldbookCache:
+    def test_indexes_deployments_by_normalized_name(self, fieldbook_cache):
+        with patch.object(upstream_session, 'get', return_value=fieldbook_response()) as mock_get:
+            fieldbooks = fieldbook_cache.get_deployments(DARC_REVIEW_URL, ['1'])
+        assert fieldbooks == {'1': {'DOEX0087_NIU_dscm_02': DEPLOYMENT}}
+        assert mock_get.call_args.kwargs['url'] == f'{DARC_REVIEW_URL}/dropcam-fieldbook/1'
+
+    def test_reuses_cached_fieldbook_across_calls(self, fieldbook_cache):
+        with patch.object(upstream_session, 'get', return_value=fieldbook_response()) as mock_get:
+            fieldbook_cache.get_deployments(DARC_REVIEW_URL, ['1'])
+            fieldbook_cache.get_deployments(DARC_REVIEW_URL, ['1', '1'])
+        assert mock_get.call_count == 1
+
+    def test_failed_fetch_is_left_out_and_not_cached(self, fieldbook_cache):
+        with patch.object(upstream_session, 'get', return_value=fieldbook_response(status_code=500)) as mock_get:
+            assert fieldbook_cache.get_deployments(DARC_REVIEW_URL, ['1']) == {}
+            assert fieldbook_cache.get_deployments(DARC_REVIEW_URL, ['1']) == {}
+        assert mock_get.call_count == 2
+
+    def test_fetches_sections_concurrently(self, fieldbook_cache):
+        barrier = threading.Barrier(3, timeout=5)
+
+        def fake_get(url, headers):
+            barrier.wait()  # only passes if all three sections are fetched at once
+            return fieldbook_response()
+
+        with patch.object(upstream_session, 'get', side_effect=fake_get):
+            fieldbooks = fieldbook_cache.get_deployments(DARC_REVIEW_URL, ['1', '2', '3'], max_workers=3)
+        assert set(fieldbooks.keys()) == {'1', '2', '3'}
+
+    def test_refresh_one_section(self, fieldbook_cache):
+        with patch.object(upstream_session, 'get', return_value=fieldbook_response()) as mock_get:
+            fieldbook_cache.get_deployments(DARC_REVIEW_URL, ['1', '2'])
+            fieldbook_cache.refresh(DARC_REVIEW_URL, '1')
+            fieldbook_cache.get_deployments(DARC_REVIEW_URL, ['1', '2'])
+        assert [call.kwargs['url'] for call in mock_get.call_args_list].count(f'{DARC_REVIEW_URL}/dropcam-fieldbook/1') == 2
+        assert mock_get.call_count == 3
+
+    def test_refresh_route_clears_everything(self, client, fieldbook_cache):
+        with patch.object(upstream_session, 'get', return_value=fieldbook_response()) as mock_get:
+            fieldbook_cache.get_deployments(DARC_REVIEW_URL, ['1'])
+            assert client.delete('/tator/dropcam-fieldbook-cache').status_code == 200
+            fieldbook_cache.get_deployments(DARC_REVIEW_URL, ['1'])
+        assert mock_get.call_count == 2
@@ -0,0 +1,42 @@
+from application.tator.substrate_timeline import SubstrateTimeline
+
+ENTRIES = [
+    {'frame': 100, 'timestamp': '00:00:03', 'Primary Substrate': 'Boulder', 'Secondary Substrate': '--'},
+    {'frame': 0, 'timestamp': '00:00:00', 'Primary Substrate': 'sand', 'Secondary Substrate': 'Not Set'},
+    {'frame': 100, 'timestamp': '00:00:03', 'Primary Substrate': 'cobble', 'Relief': 'Low'},
+]
+
+
+class TestSubstrateTimeline:
+    def test_sorts_entries_by_frame_keeping_same_frame_order(self):
+        timeline = SubstrateTimeline(ENTRIES)
+        assert [entry['Primary Substrate'] for entry in timeline.entries] == ['sand', 'Boulder', 'cobble']
+
+    def test_indices_at_picks_last_state_at_or_before_each_frame(self):
+        timeline = SubstrateTimeline(ENTRIES[1:2] + [{'frame': 50, 'Relief': 'flat'}])
+        assert timeline.indices_at([-1, 0, 49, 50, 1000]).tolist() == [-1, 0, 0, 1, 1]
+
+    def test_same_frame_states_resolve_to_the_last_one(self):
+        assert SubstrateTimeline(ENTRIES).substrate_at(100)['Primary Substrate'] == 'cobble'
+
+    def test_substrate_at_before_first_state(self):
+        assert SubstrateTimeline([{'frame': 10, 'Relief': 'flat'}]).substrate_at(5) is None
+        assert SubstrateTimeline([]).substrate_at(5) is None
+
+    def test_matching_value_is_case_insensitive_substring(self):
+        timeline = SubstrateTimeline(ENTRIES)
+        assert timeline.matching_value(1, 'boulder') == ('Primary Substrate', 'Boulder')
+        assert timeline.matching_value(0, 'SAN') == ('Primary Substrate', 'sand')
+        assert timeline.matching_value(2, 'low') == ('Relief', 'Low')
+
+    def test_matching_value_ignores_unset_values_and_missing_state(self):
+        timeline = SubstrateTimeline(ENTRIES)
+        assert timeline.matching_value(0, 'Not Set') is None
+        assert timeline.matching_value(1, '--') is None
+        assert timeline.matching_value(0, '00:00') is None  # timestamp isn't a substrate value
+        assert timeline.matching_value(-1, 'sand') is None
+
+    def test_for_media(self):
+        timelines = SubstrateTimeline.for_media([{'media_id': 7, 'substrates': ENTRIES}])
+        assert list(timelines.keys()) == [7]
+        assert len(timelines[7]) == 3
@@ -0,0 +1,56 @@
+import threading
+from unittest.mock import patch
+
+import pytest
+import requests
+
+from application.tator.tator_annotator_cache import TatorAnnotatorCache
+from application.tator.tator_rest_client import TatorRestClient
+from test.tator.conftest import TATOR_URL
+
+USERS = {1: {'first_name': 'Joe', 'last_name': 'Dirt'}, 2: {'first_name': 'Michael', 'last_name': 'Scott'}}
+
+
+@pytest.fixture
+def annotator_cache():
+    return TatorAnnotatorCache.default()  # fresh per test, see isolated_tator_clients
+
+
+@pytest.fixture
+def tator_client():
+    return TatorRestClient(TATOR_URL, 'fake-token')
+
+
+class TestTatorAnnotatorCache:
+    def test_resolves_each_distinct_user_once(self, annotator_cache, tator_client):
+        with patch.object(TatorRestClient, 'get_user', side_effect=lambda user_id: USERS[user_id]) as mock_get_user:
+            names = annotator_cache.get_names(tator_client, [1, 2, 1, 1])
+        assert names == {1: 'Joe Dirt', 2: 'Michael Scott'}
+        assert mock_get_user.call_count == 2
+
+    def test_reuses_cached_names_across_calls_and_clients(self, annotator_cache, tator_client):
+        with patch.object(TatorRestClient, 'get_user', side_effect=lambda user_id: USERS[user_id]) as mock_get_user:
+            annotator_cache.get_names(tator_client, [1])
+            assert annotator_cache.get_name(TatorRestClient(TATOR_URL, 'other-token'), 1) == 'Joe Dirt'
+        assert mock_get_user.call_count == 1
+
+    def test_unknown_user_is_not_cached(self, annotator_cache, tator_client):
+        with patch.object(TatorRestClient, 'get_user', return_value={}) as mock_get_user:  # no 'first_name'
+            assert annotator_cache.get_name(tator_client, 99) == 'Unknown annotator (#99)'
+            assert annotator_cache.get_name(tator_client, 99) == 'Unknown annotator (#99)'
+        assert mock_get_user.call_count == 2
+
+    def test_failed_request_is_unknown(self, annotator_cache, tator_client):
+        with patch.object(TatorRestClient, 'get_user', side_effect=requests.HTTPError('404')):
+            assert annotator_cache.get_names(tator_client, [5]) == {5: 'Unknown annotator (#5)'}
+
+    def test_fetches_missing_users_concurrently(self, annotator_cache, tator_client):
+        barrier = threading.Barrier(3, timeout=5)
+
+        def fake_get_user(user_id):
+            barrier.wait()  # only passes if all three users are fetched at once
+            return {'first_name': 'User', 'last_name': str(user_id)}
+
+        with patch.object(TatorRestClient, 'get_user', side_effect=fake_get_user):
+            names = annotator_cache.get_names(tator_client, [1, 2, 3], max_workers=3)
+        assert names == {1: 'User 1', 2: 'User 2', 3: 'User 3'}
@@ -1,11 +1,11 @@
-from unittest.mock import call, patch
+from unittest.mock import Mock, call, patch
 
 import pytest
 
 from application.tator.tator_base_qaqc_processor import TatorBaseQaqcProcessor
 from application.tator.tator_rest_client import TatorRestClient
 from application.tator.tator_type import TatorLocalizationType
-from test.tator.conftest import TATOR_URL, make_localization, mock_get_section_by_id
+from test.tator.conftest import TATOR_URL, fetch_worms_many_with, make_localization, mock_get_section_by_id
 
 
 class ConcreteQaqcProcessor(TatorBaseQaqcProcessor):
@@ -53,10 +53,11 @@ class TestTatorBaseQaqcProcessor:
             ),
         ]
 
+        mock_fetch_worms = Mock(side_effect=fake_fetch_worms)
         with patch(
-                'application.util.phylogeny_cache.PhylogenyCache.fetch_worms',
-                side_effect=fake_fetch_worms,
-        ) as mock_fetch_worms:
+                'application.util.phylogeny_cache.PhylogenyCache.fetch_worms_many',
+                fetch_worms_many_with(lambda _, scientific_name: mock_fetch_worms(scientific_name)),
+        ):
             tator_qaqc_processor.check_names_accepted()
 
         assert len(tator_qaqc_processor.final_records) == 2
@@ -112,10 +113,11 @@ class TestTatorBaseQaqcProcessor:
             ),
         ]
 
+        mock_fetch_worms = Mock(side_effect=fake_fetch_worms)
         with patch(
-                'application.util.phylogeny_cache.PhylogenyCache.fetch_worms',
-                side_effect=fake_fetch_worms,
-        ) as mock_fetch_worms:
+                'application.util.phylogeny_cache.PhylogenyCache.fetch_worms_many',
+                fetch_worms_many_with(lambda _, scientific_name: mock_fetch_worms(scientific_name)),
+        ):
             tator_qaqc_processor.check_names_accepted()
 
         assert len(tator_qaqc_processor.final_records) == 2
@@ -149,7 +151,7 @@ class TestTatorBaseQaqcProcessor:
             ),
         ]
 
-        with patch('application.util.phylogeny_cache.PhylogenyCache.fetch_worms', fake_fetch_worms):
+        with patch('application.util.phylogeny_cache.PhylogenyCache.fetch_worms_many', fetch_worms_many_with(fake_fetch_worms)):
             tator_qaqc_processor.check_missing_qualifier()
 
         if expected_flagged:
@@ -286,7 +288,7 @@ class TestTatorBaseQaqcProcessor:
             ),
         ]
 
-        with patch('application.util.phylogeny_cache.PhylogenyCache.fetch_worms', fake_fetch_worms):
+        with patch('application.util.phylogeny_cache.PhylogenyCache.fetch_worms_many', fetch_worms_many_with(fake_fetch_worms)):
             tator_qaqc_processor.get_all_tentative_ids_and_morphospecies()
 
         assert len(tator_qaqc_processor.final_records) == 5
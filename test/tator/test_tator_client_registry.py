@@ -0,0 +1,57 @@
+from unittest.mock import patch
+
+from application.tator.tator_client_registry import TatorClientRegistry, get_tator_client
+from application.tator.tator_rest_client import TatorRestClient
+
+TATOR_URL = 'https://whats.tator.precious'
+
+
+class TestTatorClientRegistry:
+    def test_same_token_reuses_client(self):
+        registry = TatorClientRegistry()
+        assert registry.get(TATOR_URL, 'token-a') is registry.get(TATOR_URL, 'token-a')
+        assert len(registry) == 1
+
+    def test_different_tokens_get_different_clients(self):
+        registry = TatorClientRegistry()
+        client_a = registry.get(TATOR_URL, 'token-a')
+        client_b = registry.get(TATOR_URL, 'token-b')
+        assert client_a is not client_b
+        assert client_b._headers['Authorization'] == 'Token token-b'
+
+    def test_least_recently_used_client_is_evicted_and_closed(self):
+        registry = TatorClientRegistry(max_clients=2)
+        client_a = registry.get(TATOR_URL, 'token-a')
+        registry.get(TATOR_URL, 'token-b')
+        registry.get(TATOR_URL, 'token-a')  # token-b is now least recently used
+        with patch.object(TatorRestClient, 'close') as mock_close:
+            registry.get(TATOR_URL, 'token-c')
+        mock_close.assert_called_once()
+        assert len(registry) == 2
+        assert registry.get(TATOR_URL, 'token-a') is client_a
+
+    def test_evict_closes_client_for_token(self):
+        registry = TatorClientRegistry()
+        client_a = registry.get(TATOR_URL, 'token-a')
+        with patch.object(TatorRestClient, 'close') as mock_close:
+            registry.evict('token-a')
+        mock_close.assert_called_once()
+        assert len(registry) == 0
+        assert registry.get(TATOR_URL, 'token-a') is not client_a
+
+    def test_evict_unknown_token_is_noop(self):
+        registry = TatorClientRegistry()
+        registry.get(TATOR_URL, 'token-a')
+        registry.evict('token-z')
+        assert len(registry) == 1
+
+    def test_get_tator_client_uses_process_wide_registry(self):
+        assert get_tator_client(TATOR_URL, 'token-a') is TatorClientRegistry.default().get(TATOR_URL, 'token-a')
+
+    def test_logout_evicts_client(self, client):
+        with client.session_transaction() as flask_session:
+            flask_session['tator_token'] = 'token-a'
+        tator_client = get_tator_client('https://cloud.tator.io', 'token-a')
+        res = client.get('/tator/logout')
+        assert res.status_code == 200
+        assert get_tator_client('https://cloud.tator.io', 'token-a') is not tator_client
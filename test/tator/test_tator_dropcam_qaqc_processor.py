@@ -5,6 +5,7 @@ import pytest
 from application.tator.tator_dropcam_qaqc_processor import TatorDropcamQaqcProcessor
 from application.tator.tator_rest_client import TatorRestClient
 from application.tator.tator_type import TatorLocalizationType
+from application.util.http_metrics import upstream_session
 from test.tator.conftest import (
     DARC_REVIEW_URL,
     DEFAULT_MEDIA_START_TIME,
@@ -399,7 +400,7 @@ class TestTatorDropcamQaqcProcessor:
             tator_qaqc_processor.get_unique_taxa()
 
         assert list(tator_qaqc_processor.final_records.keys()) == ['Squalus::']
-        taxa = tator_qaqc_processor.final_records['Squalus::']
+        taxa = tator_qaqc_processor.format_times(tator_qaqc_processor.final_records)['Squalus::']
         assert taxa['scientific_name'] == 'Squalus'
         assert taxa['box_count'] == 2
         assert taxa['dot_count'] == 1
@@ -503,7 +504,7 @@ class TestTatorDropcamQaqcProcessor:
         fieldbook_response = MagicMock(status_code=200)
         fieldbook_response.json.return_value = {'deployments': []}
 
-        with patch('application.tator.tator_localization_processor.requests.get', return_value=fieldbook_response):
+        with patch.object(upstream_session, 'get', return_value=fieldbook_response):
             tator_qaqc_processor.get_max_n()
 
         assert tator_qaqc_processor.final_records['unique_taxa'] == ['Squalus']
@@ -570,7 +571,7 @@ class TestTatorDropcamQaqcProcessor:
         fieldbook_response.json.return_value = {'deployments': []}
 
         with patch.object(TatorRestClient, 'get_medias_for_sections', return_value=[media]), \
-                patch('application.tator.tator_localization_processor.requests.get', return_value=fieldbook_response):
+                patch.object(upstream_session, 'get', return_value=fieldbook_response):
             tator_qaqc_processor.get_tofa()
 
         assert tator_qaqc_processor.final_records['unique_taxa'] == ['Goldeen', 'Magikarp']
@@ -623,7 +624,7 @@ class TestTatorDropcamQaqcProcessor:
 
         with patch.object(TatorRestClient, 'get_medias_for_sections',
                           return_value=[default_media, default_media_minus_one_hour]), \
-                patch('application.tator.tator_localization_processor.requests.get', return_value=fieldbook_response):
+                patch.object(upstream_session, 'get', return_value=fieldbook_response):
             tator_qaqc_processor.get_tofa()
 
         tofa_dict = tator_qaqc_processor.final_records['deployments']['Section_1']['tofa_dict']
@@ -657,7 +658,7 @@ class TestTatorDropcamQaqcProcessor:
         fieldbook_response.json.return_value = {'deployments': []}
 
         with patch.object(TatorRestClient, 'get_medias_for_sections', return_value=[media]), \
-                patch('application.tator.tator_localization_processor.requests.get', return_value=fieldbook_response):
+                patch.object(upstream_session, 'get', return_value=fieldbook_response):
             tator_qaqc_processor.get_tofa()
 
         assert tator_qaqc_processor.final_records == {
@@ -693,10 +694,10 @@ class TestTatorDropcamQaqcProcessor:
         fieldbook_response.json.return_value = {'deployments': []}
 
         with patch.object(TatorRestClient, 'get_medias_for_sections', return_value=[media]), \
-                patch('application.tator.tator_localization_processor.requests.get', return_value=fieldbook_response):
+                patch.object(upstream_session, 'get', return_value=fieldbook_response):
             tator_qaqc_processor.get_summary()
 
-        record = tator_qaqc_processor.final_records[0]
+        record = tator_qaqc_processor.format_times(tator_qaqc_processor.final_records)[0]
         assert record['timestamp'] == formatted_start_time(plus_seconds=1)  # get_timestamp
         assert record['primary_substrate'] == 'sand'  # get_dropcam_substrates
         assert record['secondary_substrate'] == 'mud'
@@ -0,0 +1,137 @@
+import os
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from application.tator.tator_image_cache import TatorImageCache
+from application.tator.tator_rest_client import TatorRestClient, token_hash
+
+TOKEN_A = token_hash('token-a')
+
+
+def fill(image_cache: TatorImageCache, key: tuple, content: bytes):
+    for _ in image_cache.write_through(key, [content]):
+        pass
+
+
+class TestTatorImageCache:
+    def test_miss_returns_none(self, tmp_path):
+        assert TatorImageCache(cache_dir=tmp_path).get(('frame', 1, 2, None)) is None
+
+    def test_write_through_yields_chunks_and_caches(self, tmp_path):
+        image_cache = TatorImageCache(cache_dir=tmp_path)
+        key = ('frame', 1, 2, None)
+        assert list(image_cache.write_through(key, [b'ab', b'cd'])) == [b'ab', b'cd']
+        assert image_cache.get(key).read_bytes() == b'abcd'
+
+    def test_abandoned_stream_is_not_cached(self, tmp_path):
+        image_cache = TatorImageCache(cache_dir=tmp_path)
+        key = ('frame', 1, 2, None)
+        stream = image_cache.write_through(key, [b'ab', b'cd'])
+        next(stream)
+        stream.close()
+        assert image_cache.get(key) is None
+        assert list(tmp_path.iterdir()) == []
+
+    def test_keys_are_distinct(self, tmp_path):
+        image_cache = TatorImageCache(cache_dir=tmp_path)
+        fill(image_cache, ('frame', 1, 2, None), b'full')
+        fill(image_cache, ('frame', 1, 2, 650), b'preview')
+        assert image_cache.get(('frame', 1, 2, None)).read_bytes() == b'full'
+        assert image_cache.get(('frame', 1, 2, 650)).read_bytes() == b'preview'
+        assert image_cache.etag(('frame', 1, 2, None)) != image_cache.etag(('frame', 1, 2, 650))
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        image_cache = TatorImageCache(cache_dir=tmp_path, max_bytes=10)
+        fill(image_cache, ('a',), b'1234')
+        fill(image_cache, ('b',), b'1234')
+        os.utime(image_cache.path(('a',)), (1, 1))
+        os.utime(image_cache.path(('b',)), (2, 2))
+        fill(image_cache, ('c',), b'1234')
+        assert image_cache.get(('a',)) is None
+        assert image_cache.get(('b',)) is not None
+        assert image_cache.get(('c',)) is not None
+
+    def test_hit_marks_entry_recently_used(self, tmp_path):
+        image_cache = TatorImageCache(cache_dir=tmp_path)
+        fill(image_cache, ('a',), b'1234')
+        os.utime(image_cache.path(('a',)), (1, 1))
+        image_cache.get(('a',))
+        assert image_cache.path(('a',)).stat().st_mtime > 1
+
+
+class TestTatorImageRoutes:
+    @pytest.fixture
+    def upstream(self):
+        res = MagicMock()
+        res.iter_content.return_value = iter([b'fake-', b'frame'])
+        return res
+
+    def test_frame_miss_streams_and_caches(self, client, upstream):
+        with client.session_transaction() as flask_session:
+            flask_session['tator_token'] = 'token-a'
+        with patch.object(TatorRestClient, 'stream_frame', return_value=upstream) as mock_stream:
+            res = client.get('/tator/frame/10/5')
+        assert res.status_code == 200
+        assert res.data == b'fake-frame'
+        assert res.headers['ETag'] == f'"{TatorImageCache.etag(("frame", TOKEN_A, 10, 5, None))}"'
+        assert 'max-age' in res.headers['Cache-Control']
+        assert 'private' in res.headers['Cache-Control']
+        mock_stream.assert_called_once_with(10, frame=5, quality=None)
+        res.close()
+        upstream.close.assert_called_once()
+        assert TatorImageCache.default().get(('frame', TOKEN_A, 10, 5, None)).read_bytes() == b'fake-frame'
+
+    def test_frame_hit_skips_tator(self, client):
+        fill(TatorImageCache.default(), ('frame', TOKEN_A, 10, 5, 650), b'cached')
+        with client.session_transaction() as flask_session:
+            flask_session['tator_token'] = 'token-a'
+        with patch.object(TatorRestClient, 'stream_frame') as mock_stream:
+            res = client.get('/tator/frame/10/5?preview=true')
+        assert res.status_code == 200
+        assert res.data == b'cached'
+        mock_stream.assert_not_called()
+
+    def test_matching_etag_returns_304(self, client):
+        etag = TatorImageCache.etag(('localization', TOKEN_A, 99, '2', '0.1,0.2,0.3,0.4'))
+        with patch.object(TatorRestClient, 'stream_localization_graphic') as mock_stream:
+            res = client.get(
+                '/tator/localization-image/99?version=2&box=0.1,0.2,0.3,0.4&token=token-a',
+                headers={'If-None-Match': f'"{etag}"'},
+            )
+        assert res.status_code == 304
+        mock_stream.assert_not_called()
+
+    def test_moved_box_gets_a_new_crop(self, client, upstream):
+        fill(TatorImageCache.default(), ('localization', TOKEN_A, 99, '2', '0.1,0.2,0.3,0.4'), b'old-crop')
+        with client.session_transaction() as flask_session:
+            flask_session['tator_token'] = 'token-a'
+        with patch.object(TatorRestClient, 'stream_localization_graphic', return_value=upstream) as mock_stream:
+            res = client.get('/tator/localization-image/99?version=2&box=0.15,0.2,0.3,0.4')
+        assert res.data == b'fake-frame'
+        mock_stream.assert_called_once_with(99)
+        res.close()
+
+    def test_other_token_goes_to_tator(self, client, upstream):
+        fill(TatorImageCache.default(), ('frame', TOKEN_A, 10, 5, None), b'cached')
+        etag = TatorImageCache.etag(('frame', TOKEN_A, 10, 5, None))
+        with patch.object(TatorRestClient, 'stream_frame', return_value=upstream) as mock_stream:
+            res = client.get('/tator/frame/10/5?token=token-b', headers={'If-None-Match': f'"{etag}"'})
+        assert res.status_code == 200
+        assert res.data == b'fake-frame'
+        mock_stream.assert_called_once()
+        res.close()
+
+    def test_entry_evicted_after_lookup_goes_to_tator(self, client, upstream):
+        with client.session_transaction() as flask_session:
+            flask_session['tator_token'] = 'token-a'
+        with patch.object(TatorImageCache, 'get', return_value=TatorImageCache.default().path(('gone',))), \
+                patch.object(TatorRestClient, 'stream_frame', return_value=upstream) as mock_stream:
+            res = client.get('/tator/frame/10/5')
+        assert res.status_code == 200
+        assert res.data == b'fake-frame'
+        mock_stream.assert_called_once()
+        res.close()
+
+    def test_missing_token(self, client):
+        assert client.get('/tator/frame/10/5').status_code == 400
@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+from application.tator.tator_json_stream import iter_json_array, select_fields
+
+LOCALIZATIONS = [
+    {'id': 1, 'type': 48, 'x': 0.5, 'attributes': {'Scientific Name': 'Pomacentridae', 'Notes': 'ünïcødé'}},
+    {'id': 2, 'type': 49, 'x': 0.25, 'attributes': {'Scientific Name': 'Pomacentridae'}},
+    {'id': 3, 'type': 48, 'x': 1, 'attributes': {}},
+]
+
+
+def chunked(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestIterJsonArray:
+    @pytest.mark.parametrize('chunk_size', [1, 2, 7, 64, 100000])
+    def test_matches_json_loads_for_any_chunking(self, chunk_size):
+        data = json.dumps(LOCALIZATIONS, ensure_ascii=False, indent=2).encode()
+        assert list(iter_json_array(chunked(data, chunk_size))) == LOCALIZATIONS
+
+    def test_numbers_split_across_chunks(self):
+        assert list(iter_json_array([b'[12', b'34, 5', b'6]'])) == [1234, 56]
+
+    def test_empty_array(self):
+        assert list(iter_json_array([b' [ ] '])) == []
+
+    def test_not_an_array(self):
+        with pytest.raises(json.JSONDecodeError):
+            list(iter_json_array([b'{"id": 1}']))
+
+    def test_truncated_array(self):
+        with pytest.raises(json.JSONDecodeError):
+            list(iter_json_array([b'[{"id": 1}, {"id": ']))
+
+    def test_is_lazy(self):
+        def chunks():
+            yield b'[{"id": 1},'
+            raise AssertionError('read past the first element')
+        assert next(iter_json_array(chunks())) == {'id': 1}
+
+
+class TestSelectFields:
+    def test_keeps_only_requested_fields(self):
+        assert select_fields(LOCALIZATIONS[0], ('id', 'attributes', 'missing')) == {
+            'id': 1,
+            'attributes': {'Scientific Name': 'Pomacentridae', 'Notes': 'ünïcødé'},
+        }
+
+    def test_interns_attribute_strings(self):
+        first, second = (json.loads(json.dumps(loco)) for loco in LOCALIZATIONS[:2])
+        assert first['attributes']['Scientific Name'] is not second['attributes']['Scientific Name']
+        first = select_fields(first, ('attributes',))
+        second = select_fields(second, ('attributes',))
+        assert first['attributes']['Scientific Name'] is second['attributes']['Scientific Name']
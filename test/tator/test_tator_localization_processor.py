@@ -1,12 +1,18 @@
+import copy
+import threading
+import time
+from datetime import datetime, timedelta
 from unittest.mock import MagicMock, patch
 
 import pytest
 
+from application.tator.tator_json_stream import select_fields
 from application.tator.tator_localization_processor import TatorLocalizationProcessor
 from application.tator.tator_rest_client import TatorRestClient
 from application.tator.tator_type import TatorLocalizationType
+from application.util.http_metrics import upstream_session
 from test.data.tator_responses import fji_2025_dscm_03_localizations, fji_2025_dscm_03_section
-from test.tator.conftest import DARC_REVIEW_URL, TATOR_URL, make_localization, mock_get_section_by_id
+from test.tator.conftest import DARC_REVIEW_URL, TATOR_URL, fetch_worms_many_with, make_localization, mock_get_section_by_id
 
 
 @pytest.mark.usefixtures('mock_phylogeny_cache')
@@ -32,12 +38,12 @@ class TestTatorLocalizationProcessor:
 
     @patch.object(TatorRestClient, 'get_section_by_id', mock_get_section_by_id)
     def test_fetch_localizations_by_section(self, fake_session):
-        def fake_get_localizations(project_id, section_id, media_ids=None):
+        def fake_iter_localizations(project_id, section_id, media_ids=None):
             assert project_id == 1
             assert media_ids is None
-            return [{'id': section_id * 10}]
+            return iter([[{'id': section_id * 10}], [{'id': section_id * 10 + 1}]])  # two pages
 
-        with patch.object(TatorRestClient, 'get_localizations', side_effect=fake_get_localizations):
+        with patch.object(TatorRestClient, 'iter_localizations', side_effect=fake_iter_localizations):
             tator_localization_processor = TatorLocalizationProcessor(
                 project_id=1,
                 section_ids=['1', '2'],
@@ -45,8 +51,8 @@ class TestTatorLocalizationProcessor:
             )
             tator_localization_processor.fetch_localizations()
 
-        assert tator_localization_processor.sections[0].localizations == [{'id': 10}]
-        assert tator_localization_processor.sections[1].localizations == [{'id': 20}]
+        assert tator_localization_processor.sections[0].localizations == [{'id': 10}, {'id': 11}]
+        assert tator_localization_processor.sections[1].localizations == [{'id': 20}, {'id': 21}]
 
     @patch.object(TatorRestClient, 'get_section_by_id', mock_get_section_by_id)
     def test_fetch_localizations_by_media_list_routes_by_master_section(self, fake_session):
@@ -55,9 +61,9 @@ class TestTatorLocalizationProcessor:
         localization_for_section_2 = {'id': 2, 'master_section': 2}
 
         with patch.object(
-                TatorRestClient, 'get_localizations',
-                return_value=[localization_for_section_1, localization_for_section_2],
-        ) as mock_get_localizations:
+                TatorRestClient, 'iter_localizations',
+                return_value=iter([[localization_for_section_1], [localization_for_section_2]]),
+        ) as mock_iter_localizations:
             tator_localization_processor = TatorLocalizationProcessor(
                 project_id=1,
                 section_ids=['1', '2'],
@@ -66,17 +72,33 @@ class TestTatorLocalizationProcessor:
             )
             tator_localization_processor.fetch_localizations()
 
-        mock_get_localizations.assert_called_once_with(1, media_ids=[100, 200])
+        mock_iter_localizations.assert_called_once_with(1, media_ids=[100, 200])
         sections_by_id = {section.section_id: section for section in tator_localization_processor.sections}
         assert sections_by_id['1'].localizations == [localization_for_section_1]
         assert sections_by_id['2'].localizations == [localization_for_section_2]
 
+    @patch.object(TatorRestClient, 'get_section_by_id', mock_get_section_by_id)
+    def test_fetch_localizations_compact_requests_only_processed_fields(self, fake_session):
+        with patch.object(TatorRestClient, 'iter_localizations', return_value=iter([[{'id': 1}]])) as mock_iter_localizations:
+            tator_localization_processor = TatorLocalizationProcessor(
+                project_id=1,
+                section_ids=['1'],
+                tator_url=TATOR_URL,
+            )
+            tator_localization_processor.fetch_localizations(compact=True)
+
+        mock_iter_localizations.assert_called_once_with(
+            1,
+            section_id=1,
+            fields=TatorLocalizationProcessor.LOCALIZATION_FIELDS,
+        )
+
     @patch.object(TatorRestClient, 'get_section_by_id', mock_get_section_by_id)
     def test_fetch_localizations_raises_on_unrecognized_master_section(self, fake_session):
         media_list = [{'id': 100}]
         localizations = [{'id': 3, 'master_section': 999}]  # not among the requested sections (1, 2)
 
-        with patch.object(TatorRestClient, 'get_localizations', return_value=localizations):
+        with patch.object(TatorRestClient, 'iter_localizations', return_value=iter([localizations])):
             tator_localization_processor = TatorLocalizationProcessor(
                 project_id=1,
                 section_ids=['1', '2'],
@@ -90,7 +112,7 @@ class TestTatorLocalizationProcessor:
     def test_fetch_localizations_batches_media_ids_by_50(self, fake_session):
         media_list = [{'id': i} for i in range(1, 121)]  # 120 media -> batches of 50, 50, 20
 
-        with patch.object(TatorRestClient, 'get_localizations', return_value=[]) as mock_get_localizations:
+        with patch.object(TatorRestClient, 'iter_localizations', return_value=iter([])) as mock_iter_localizations:
             tator_localization_processor = TatorLocalizationProcessor(
                 project_id=1,
                 section_ids=['1'],
@@ -99,9 +121,53 @@ class TestTatorLocalizationProcessor:
             )
             tator_localization_processor.fetch_localizations()
 
-        batches = [call.kwargs['media_ids'] for call in mock_get_localizations.call_args_list]
+        batches = [call.kwargs['media_ids'] for call in mock_iter_localizations.call_args_list]
         assert [len(batch) for batch in batches] == [50, 50, 20]
 
+    @patch.object(TatorRestClient, 'get_section_by_id', mock_get_section_by_id)
+    def test_fetch_localizations_concurrent_sections_keep_order(self, fake_session):
+        barrier = threading.Barrier(3, timeout=5)  # only passes if all three sections are in flight at once
+
+        def fake_iter_localizations(project_id, section_id, media_ids=None):
+            barrier.wait()
+            time.sleep(0.01 * (3 - section_id))  # later sections finish first
+            return iter([[{'id': section_id * 10}]])
+
+        with patch.object(TatorRestClient, 'iter_localizations', side_effect=fake_iter_localizations):
+            tator_localization_processor = TatorLocalizationProcessor(
+                project_id=1,
+                section_ids=['1', '2', '3'],
+                tator_url=TATOR_URL,
+            )
+            tator_localization_processor.fetch_localizations(max_workers=3)
+
+        assert [section.localizations for section in tator_localization_processor.sections] == [
+            [{'id': 10}], [{'id': 20}], [{'id': 30}],
+        ]
+
+    @patch.object(TatorRestClient, 'get_section_by_id', mock_get_section_by_id)
+    def test_fetch_localizations_concurrent_media_batches_merge_in_batch_order(self, fake_session):
+        media_list = [{'id': i} for i in range(1, 101)]  # 2 batches
+
+        def fake_iter_localizations(project_id, media_ids=None):
+            first_media_id = media_ids[0]
+            time.sleep(0.02 if first_media_id == 1 else 0)  # first batch finishes last
+            return iter([[{'id': first_media_id, 'master_section': 1}]])
+
+        with patch.object(TatorRestClient, 'iter_localizations', side_effect=fake_iter_localizations):
+            tator_localization_processor = TatorLocalizationProcessor(
+                project_id=1,
+                section_ids=['1'],
+                tator_url=TATOR_URL,
+                media_list=media_list,
+            )
+            tator_localization_processor.fetch_localizations(max_workers=2)
+
+        assert tator_localization_processor.sections[0].localizations == [
+            {'id': 1, 'master_section': 1},
+            {'id': 51, 'master_section': 1},
+        ]
+
     @patch.object(TatorRestClient, 'get_section_by_id', mock_get_section_by_id)
     def test_get_media_id_map_uses_media_list_when_present(self, fake_session):
         media_list = [{'id': '10', 'name': 'a'}, {'id': 20, 'name': 'b'}]
@@ -131,33 +197,6 @@ class TestTatorLocalizationProcessor:
         mock_get_medias.assert_called_once_with(project_id=1, section_ids=[1, 2])
         assert result == {5: fetched_media[0]}
 
-    @patch.object(TatorRestClient, 'get_section_by_id', mock_get_section_by_id)
-    def test_get_annotator_name_fetches_and_caches(self, fake_session, stub_annotator):
-        tator_localization_processor = TatorLocalizationProcessor(
-            project_id=1,
-            section_ids=['1'],
-            tator_url=TATOR_URL,
-        )
-        first = tator_localization_processor._get_annotator_name(42)
-        second = tator_localization_processor._get_annotator_name(42)
-
-        assert first == 'Joe Dirt'
-        assert second == 'Joe Dirt'
-        assert stub_annotator.call_count == 1  # second call was served from the session cache
-        assert fake_session['tator_usernames'] == {42: 'Joe Dirt'}
-
-    @patch.object(TatorRestClient, 'get_section_by_id', mock_get_section_by_id)
-    def test_get_annotator_name_unknown_user(self, fake_session):
-        with patch.object(TatorRestClient, 'get_user', return_value={}):  # no 'first_name' in the response
-            tator_localization_processor = TatorLocalizationProcessor(
-                project_id=1,
-                section_ids=['1'],
-                tator_url=TATOR_URL,
-            )
-            name = tator_localization_processor._get_annotator_name(99)
-
-        assert name == 'Unknown annotator (#99)'
-
     def test_load_substrates_maps_fields(self):
         localization_dict = {}
 
@@ -210,7 +249,7 @@ class TestTatorLocalizationProcessor:
 
         with patch.object(TatorRestClient, 'get_section_by_id', return_value=fji_2025_dscm_03_section), \
                 patch.object(TatorRestClient, 'get_user', return_value={'first_name': 'Michael', 'last_name': 'Scott'}), \
-                patch('application.util.phylogeny_cache.PhylogenyCache.fetch_worms', fake_fetch_worms):
+                patch('application.util.phylogeny_cache.PhylogenyCache.fetch_worms_many', fetch_worms_many_with(fake_fetch_worms)):
             tator_localization_processor = TatorLocalizationProcessor(
                 project_id=26,
                 section_ids=['22831'],
@@ -291,6 +330,30 @@ class TestTatorLocalizationProcessor:
             'aphia_id': 106896,
         }
 
+    def test_process_records_same_for_compact_localizations(self, fake_session):
+        def fake_fetch_worms(self, scientific_name):
+            self.data[scientific_name] = {'phylum': 'Ctenophora', 'aphia_id': 106896}
+            return True
+
+        final_records = []
+        with patch.object(TatorRestClient, 'get_section_by_id', return_value=fji_2025_dscm_03_section), \
+                patch.object(TatorRestClient, 'get_user', return_value={'first_name': 'Michael', 'last_name': 'Scott'}), \
+                patch('application.util.phylogeny_cache.PhylogenyCache.fetch_worms_many', fetch_worms_many_with(fake_fetch_worms)):
+            for localizations in (
+                fji_2025_dscm_03_localizations,
+                [select_fields(loco, TatorLocalizationProcessor.LOCALIZATION_FIELDS) for loco in fji_2025_dscm_03_localizations],
+            ):
+                tator_localization_processor = TatorLocalizationProcessor(
+                    project_id=26,
+                    section_ids=['22831'],
+                    tator_url=TATOR_URL,
+                )
+                tator_localization_processor.sections[0].localizations = copy.deepcopy(localizations)
+                tator_localization_processor.process_records()
+                final_records.append(tator_localization_processor.final_records)
+
+        assert final_records[0] == final_records[1]
+
     def test_process_records_no_localizations(self, fake_session):
         with patch.object(TatorRestClient, 'get_section_by_id', return_value=fji_2025_dscm_03_section):
             tator_localization_processor = TatorLocalizationProcessor(
@@ -407,10 +470,44 @@ class TestTatorLocalizationProcessor:
             tator_localization_processor.process_records(get_timestamp=True)
 
         record = tator_localization_processor.final_records[0]
+        assert record['timestamp'] == datetime(2025, 1, 1, 0, 0, 20)
+        assert record['camera_seafloor_arrival'] == datetime(2025, 1, 1, 0, 0, 10)
+        assert record['animal_arrival'] == timedelta(seconds=10)
+        record = tator_localization_processor.format_times(tator_localization_processor.final_records)[0]
         assert record['timestamp'] == '2025-01-01 00:00:20Z'
         assert record['camera_seafloor_arrival'] == '2025-01-01 00:00:10Z'
         assert record['animal_arrival'] == '0:00:10'
 
+    @patch.object(TatorRestClient, 'get_section_by_id', mock_get_section_by_id)
+    def test_process_records_computes_timestamps_per_media(self, fake_session, stub_annotator, stub_worms_match):
+        fake_session['media_timestamps'] = {100: '2025-01-01T00:00:00+00:00', 101: '2025-01-01T01:00:00+00:00'}
+        tator_localization_processor = TatorLocalizationProcessor(
+            project_id=1,
+            section_ids=['1'],
+            tator_url=TATOR_URL,
+        )
+        tator_localization_processor.sections[0].bottom_time = '2025-01-01 00:00:10Z'
+        tator_localization_processor.sections[0].localizations = [
+            make_localization(elemental_id=1, media=100, frame=15, attributes={'Scientific Name': 'A'}),  # 0.5s
+            make_localization(elemental_id=2, media=101, frame=20, attributes={'Scientific Name': 'B'}),  # 1s at 20fps
+            make_localization(elemental_id=3, media=100, frame=899, attributes={'Scientific Name': 'C'}),  # 29.97s
+        ]
+        medias = [{'id': 100, 'fps': 30}, {'id': 101, 'fps': 20}]
+
+        with patch.object(TatorRestClient, 'get_medias_for_sections', return_value=medias):
+            tator_localization_processor.process_records(get_timestamp=True)
+
+        records = {record['scientific_name']: record for record in tator_localization_processor.final_records}
+        assert records['A']['timestamp'] == datetime(2025, 1, 1, 0, 0, 0)  # floored to the second
+        assert records['B']['timestamp'] == datetime(2025, 1, 1, 1, 0, 1)
+        assert records['C']['timestamp'] == datetime(2025, 1, 1, 0, 0, 29)
+        assert records['A']['animal_arrival'] == timedelta(0)  # before the camera reached the seafloor
+        assert records['C']['animal_arrival'] == timedelta(seconds=19, microseconds=966667)
+        formatted = {record['scientific_name']: record for record in tator_localization_processor.format_times(records.values())}
+        assert formatted['A']['animal_arrival'] == '00:00:00'
+        assert formatted['C']['animal_arrival'] == '0:00:19'
+        assert records['C']['animal_arrival'] == timedelta(seconds=19, microseconds=966667)  # records aren't modified
+
     @patch.object(TatorRestClient, 'get_section_by_id', mock_get_section_by_id)
     def test_process_records_skips_timestamp_population_for_dropcam_when_no_bottom_time(
             self, fake_session, stub_annotator, stub_worms_match
@@ -467,7 +564,7 @@ class TestTatorLocalizationProcessor:
         tator_localization_processor.process_records(get_timestamp=True)
 
         record = tator_localization_processor.final_records[0]
-        assert record['timestamp'] == '2025-01-01 00:00:02Z'  # frame 60 / 30fps = 2s after Start Time
+        assert record['timestamp'] == datetime(2025, 1, 1, 0, 0, 2)  # frame 60 / 30fps = 2s after Start Time
         assert 'camera_seafloor_arrival' not in record  # only the dropcam should set this
 
     @patch.object(TatorRestClient, 'get_section_by_id', mock_get_section_by_id)
@@ -529,7 +626,7 @@ class TestTatorLocalizationProcessor:
             ]
         }
 
-        with patch('application.tator.tator_localization_processor.requests.get', return_value=fieldbook_response):
+        with patch.object(upstream_session, 'get', return_value=fieldbook_response):
             tator_localization_processor.process_records(get_dropcam_fieldbook_data=True)
 
         record = tator_localization_processor.final_records[0]
@@ -553,7 +650,7 @@ class TestTatorLocalizationProcessor:
         ]
         fieldbook_response = MagicMock(status_code=500, text='server error')
 
-        with patch('application.tator.tator_localization_processor.requests.get', return_value=fieldbook_response):
+        with patch.object(upstream_session, 'get', return_value=fieldbook_response):
             with pytest.raises(ValueError):
                 tator_localization_processor.process_records(get_dropcam_fieldbook_data=True)
 
@@ -619,7 +716,7 @@ class TestTatorLocalizationProcessor:
     def test_process_records_tracks_unmatched_scientific_names(self, fake_session, stub_annotator):
         no_match_records = set()
 
-        with patch('application.util.phylogeny_cache.PhylogenyCache.fetch_worms', return_value=False):
+        with patch('application.util.phylogeny_cache.PhylogenyCache.fetch_worms_many', side_effect=lambda names, **kwargs: set(names)):
             tator_localization_processor = TatorLocalizationProcessor(
                 project_id=1,
                 section_ids=['1'],
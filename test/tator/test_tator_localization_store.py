@@ -0,0 +1,112 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+from cachelib import SimpleCache
+
+from application.tator.tator_localization_processor import TatorLocalizationProcessor
+from application.tator.tator_localization_store import MAX_SYNC_AGE, TatorLocalizationStore
+from application.tator.tator_rest_client import TatorRestClient
+from test.tator.conftest import TATOR_URL, mock_get_section_by_id
+
+
+def localization(id_, elemental_id, modified, version=1, deleted=False, **extra):
+    return {
+        'id': id_,
+        'elemental_id': elemental_id,
+        'version': version,
+        'modified_datetime': modified,
+        'variant_deleted': deleted,
+        **extra,
+    }
+
+
+@pytest.fixture
+def store():
+    return TatorLocalizationStore(SimpleCache(default_timeout=0))
+
+
+@pytest.fixture
+def tator_client():
+    client = MagicMock()
+    client.base_url = TATOR_URL
+    return client
+
+
+class TestTatorLocalizationStore:
+    def test_first_sync_downloads_everything(self, store, tator_client):
+        tator_client.iter_localizations.return_value = iter([[
+            localization(2, 'b', '2025-06-01T00:00:02Z'),
+            localization(1, 'a', '2025-06-01T00:00:01Z'),
+        ]])
+        result = store.sync_section(tator_client, 26, 123)
+        assert [loco['id'] for loco in result] == [1, 2]
+        tator_client.iter_localizations.assert_called_once_with(26, section_id=123, fields=None)
+
+    def test_next_sync_only_asks_for_changes_since_watermark(self, store, tator_client):
+        tator_client.iter_localizations.return_value = iter([[
+            localization(1, 'a', '2025-06-01T00:00:01Z', notes='old'),
+            localization(2, 'b', '2025-06-01T00:00:05Z'),
+            localization(3, 'c', '2025-06-01T00:00:03Z'),
+        ]])
+        store.sync_section(tator_client, 26, 123)
+
+        tator_client.iter_localizations.reset_mock()
+        tator_client.iter_localizations.return_value = iter([[
+            localization(4, 'a', '2025-06-02T00:00:00Z', notes='new'),  # edited: new mark of the same elemental ID
+            localization(3, 'c', '2025-06-02T00:00:01Z', deleted=True),
+        ]])
+        result = store.sync_section(tator_client, 26, 123)
+
+        tator_client.iter_localizations.assert_called_once_with(
+            26,
+            section_id=123,
+            fields=None,
+            modified_since='2025-06-01T00:00:05Z',
+        )
+        assert [(loco['id'], loco.get('notes')) for loco in result] == [(2, None), (4, 'new')]
+
+        tator_client.iter_localizations.reset_mock()
+        tator_client.iter_localizations.return_value = iter([])
+        store.sync_section(tator_client, 26, 123)
+        assert tator_client.iter_localizations.call_args.kwargs['modified_since'] == '2025-06-02T00:00:01Z'
+
+    def test_same_elemental_id_in_other_version_is_kept_separately(self, store, tator_client):
+        tator_client.iter_localizations.return_value = iter([[
+            localization(1, 'a', '2025-06-01T00:00:01Z', version=1),
+            localization(2, 'a', '2025-06-01T00:00:01Z', version=2),
+        ]])
+        assert len(store.sync_section(tator_client, 26, 123)) == 2
+
+    def test_old_sync_falls_back_to_full_refresh(self, store, tator_client):
+        tator_client.iter_localizations.return_value = iter([[localization(1, 'a', '2025-06-01T00:00:01Z')]])
+        with patch('application.tator.tator_localization_store.time', return_value=1_000):
+            store.sync_section(tator_client, 26, 123)
+        tator_client.iter_localizations.reset_mock()
+        tator_client.iter_localizations.return_value = iter([[localization(2, 'b', '2025-06-03T00:00:00Z')]])
+        with patch('application.tator.tator_localization_store.time', return_value=1_000 + MAX_SYNC_AGE + 1):
+            result = store.sync_section(tator_client, 26, 123)
+        assert 'modified_since' not in tator_client.iter_localizations.call_args.kwargs
+        assert [loco['id'] for loco in result] == [2]  # nothing carried over from the stale copy
+
+    def test_changing_fields_forces_full_refresh(self, store, tator_client):
+        tator_client.iter_localizations.return_value = iter([[localization(1, 'a', '2025-06-01T00:00:01Z')]])
+        store.sync_section(tator_client, 26, 123, fields=('id', 'type'))
+        tator_client.iter_localizations.return_value = iter([[localization(1, 'a', '2025-06-01T00:00:01Z')]])
+        store.sync_section(tator_client, 26, 123, fields=('id', 'attributes'))
+        kwargs = tator_client.iter_localizations.call_args.kwargs
+        assert 'modified_since' not in kwargs
+        assert kwargs['fields'] == ('id', 'attributes', 'elemental_id', 'version', 'modified_datetime', 'variant_deleted')
+
+    def test_returned_localizations_can_be_mutated(self, store, tator_client):
+        tator_client.iter_localizations.return_value = iter([[localization(1, 'a', '2025-06-01T00:00:01Z')]])
+        store.sync_section(tator_client, 26, 123)[0]['problems'] = 'Scientific Name'
+        tator_client.iter_localizations.return_value = iter([])
+        assert 'problems' not in store.sync_section(tator_client, 26, 123)[0]
+
+    @patch.object(TatorRestClient, 'get_section_by_id', mock_get_section_by_id)
+    def test_processor_incremental_fetch_uses_store(self, fake_session):
+        with patch.object(TatorLocalizationStore, 'sync_section', return_value=[{'id': 1}]) as mock_sync_section:
+            processor = TatorLocalizationProcessor(project_id=26, section_ids=['123'], tator_url=TATOR_URL)
+            processor.fetch_localizations(incremental=True)
+        assert processor.sections[0].localizations == [{'id': 1}]
+        mock_sync_section.assert_called_once_with(processor.tator_client, 26, 123)
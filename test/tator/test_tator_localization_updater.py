@@ -0,0 +1,103 @@
+import json
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from application.tator.tator_localization_updater import update_localizations
+from application.tator.tator_record_cache import TatorRecordCache
+from test.tator.conftest import FakeApiException
+
+
+class TestUpdateLocalizations:
+    def test_single_bulk_request(self, fake_tator_openapi):
+        api = MagicMock()
+        api.update_localization_list.return_value = {'message': 'Successfully updated 3 localizations!'}
+        update_localizations(api, 26, '2', ['a', 'b', 'c'], {'Good Image': True})
+        api.update_localization_list.assert_called_once()
+        kwargs = api.update_localization_list.call_args.kwargs
+        assert kwargs['project'] == 26
+        assert kwargs['version'] == [2]
+        assert kwargs['localization_bulk_update'].elemental_ids == ['a', 'b', 'c']
+        assert kwargs['localization_bulk_update'].attributes == {'Good Image': True}
+        api.update_localization_by_elemental_id.assert_not_called()
+
+    def test_no_elemental_ids_is_noop(self, fake_tator_openapi):
+        api = MagicMock()
+        update_localizations(api, 26, 1, [], {'Good Image': True})
+        api.update_localization_list.assert_not_called()
+        api.update_localization_by_elemental_id.assert_not_called()
+
+    def test_falls_back_to_per_item_when_bulk_rejected(self, fake_tator_openapi):
+        api = MagicMock()
+        api.update_localization_list.side_effect = FakeApiException(status=400)
+        update_localizations(api, 26, 1, ['a', 'b', 'c'], {'Notes': 'hi'}, max_workers=2)
+        assert api.update_localization_by_elemental_id.call_count == 3
+        updated = {call.kwargs['elemental_id'] for call in api.update_localization_by_elemental_id.call_args_list}
+        assert updated == {'a', 'b', 'c'}
+        for call in api.update_localization_by_elemental_id.call_args_list:
+            assert call.kwargs['version'] == 1
+            assert call.kwargs['localization_update'].attributes == {'Notes': 'hi'}
+
+    def test_accepted_bulk_request_is_not_repeated(self, fake_tator_openapi):
+        api = MagicMock()
+        api.update_localization_list.return_value = SimpleNamespace(message='Successfully updated 1 localizations!')
+        update_localizations(api, 26, 1, ['a', 'b'], {'Notes': 'hi'})
+        api.update_localization_by_elemental_id.assert_not_called()
+
+    def test_unknown_project_patches_each(self, fake_tator_openapi):
+        api = MagicMock()
+        update_localizations(api, None, 1, ['a', 'b'], {'Notes': 'hi'})
+        api.update_localization_list.assert_not_called()
+        assert api.update_localization_by_elemental_id.call_count == 2
+
+    def test_fallback_error_propagates(self, fake_tator_openapi):
+        api = MagicMock()
+        api.update_localization_list.side_effect = FakeApiException(status=400)
+        api.update_localization_by_elemental_id.side_effect = FakeApiException(status=404)
+        with pytest.raises(FakeApiException):
+            update_localizations(api, 26, 1, ['a'], {'Notes': 'hi'})
+
+    def test_good_image_route_sends_one_bulk_request(self, client, fake_tator_openapi):
+        api = MagicMock()
+        api.update_localization_list.return_value = {'message': 'Successfully updated 2 localizations!'}
+        with patch('tator.get_api', return_value=api) as mock_get_api:
+            res = client.patch('/tator/localization/good-image', data={
+                'project': '31',
+                'version': '1',
+                'localization_elemental_ids': ['a', 'b'],
+                'good_image': 'true',
+            })
+        assert res.status_code == 200
+        mock_get_api.assert_called_once()
+        api.update_localization_list.assert_called_once()
+        assert api.update_localization_list.call_args.kwargs['project'] == 31
+        assert api.update_localization_list.call_args.kwargs['localization_bulk_update'].elemental_ids == ['a', 'b']
+        assert TatorRecordCache.default().generation() == 1  # processed records from before the edit are dropped
+
+    def test_localization_route_groups_boxes_and_dots(self, client, fake_tator_openapi):
+        api = MagicMock()
+        api.update_localization_list.return_value = {'message': 'Successfully updated'}
+        localization_id_types = [
+            {'type': 48, 'version': 1, 'elemental_id': 'box-1'},
+            {'type': 48, 'version': 1, 'elemental_id': 'box-2'},
+            {'type': 49, 'version': 1, 'elemental_id': 'dot-1'},
+        ]
+        with patch('tator.get_api', return_value=api) as mock_get_api, \
+                patch('application.tator.routes.TatorLocalizationType.is_dot', side_effect=lambda t: t == 49):
+            res = client.patch('/tator/localization', data={
+                'project': '31',
+                'localization_id_types': json.dumps(localization_id_types),
+                'scientific_name': 'Foo bar',
+                'categorical_abundance': '20-49',
+            })
+        assert res.status_code == 200
+        mock_get_api.assert_called_once()
+        assert api.update_localization_list.call_count == 2
+        bodies = {
+            tuple(call.kwargs['localization_bulk_update'].elemental_ids): call.kwargs['localization_bulk_update'].attributes
+            for call in api.update_localization_list.call_args_list
+        }
+        assert 'Categorical Abundance' not in bodies[('box-1', 'box-2')]
+        assert bodies[('dot-1',)]['Categorical Abundance'] == '20-49'
+
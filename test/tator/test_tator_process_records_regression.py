@@ -0,0 +1,147 @@
+import json
+import random
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from application.tator.tator_localization_processor import TatorLocalizationProcessor
+from application.tator.tator_rest_client import TatorRestClient
+from application.tator.tator_type import TatorLocalizationType
+from application.util.http_metrics import upstream_session
+from test.tator.conftest import DARC_REVIEW_URL, TATOR_URL, make_localization, make_media, mock_get_section_by_id
+
+# final_records produced by the original row-by-row process_records (dict per localization -> DataFrame ->
+# groupby with Python aggregators -> iterrows) for the scenarios below. the columnar implementation must match it
+EXPECTED_PATH = Path(__file__).parent.parent / 'data' / 'process_records_regression.json'
+
+PHYLOGENY = {
+    'Pomacentridae': {
+        'kingdom': 'Animalia',
+        'Phylum (Division)': 'Chordata',
+        'class': 'Teleostei',
+        'order': 'Ovalentaria incertae sedis',
+        'family': 'Pomacentridae',
+        'aphia_id': 125591,
+    },
+    'Chromis': {
+        'kingdom': 'Animalia',
+        'phylum': 'Chordata',
+        'class': 'Teleostei',
+        'family': 'Pomacentridae',
+        'genus': 'Chromis',
+        'aphia_id': 126007,
+    },
+    'Stylasteridae': {'phylum': 'Cnidaria', 'class': 'Hydrozoa', 'order': 'Anthoathecata', 'family': 'Stylasteridae'},
+}
+SCIENTIFIC_NAMES = [*PHYLOGENY.keys(), 'Unmatchable', '']
+USERS = {1: {'first_name': 'Joe', 'last_name': 'Dirt'}, 2: {'first_name': 'Ann', 'last_name': 'Otator'}, 3: {}}
+
+
+def maybe(rng: random.Random, *values, p=0.5):
+    return rng.choice(values) if rng.random() < p else None
+
+
+def make_localizations(rng: random.Random, types: tuple[int, int], media_ids: list[int], count: int) -> list[dict]:
+    localizations = []
+    for i in range(count):
+        localization_type = rng.choice(types[:1] + types[1:] * 3)  # mostly dots, which get merged
+        is_box = TatorLocalizationType.is_box(localization_type)
+        attributes = {
+            'Scientific Name': rng.choice(SCIENTIFIC_NAMES[:2] * 3 + SCIENTIFIC_NAMES),
+            'Attracted': maybe(rng, 'Attracted', 'Not Attracted'),
+            'Upon': maybe(rng, 'sed', 'sed', 'rock', p=0.9),
+            'Size': maybe(rng, 'small', 'large', p=0.3),
+            'Categorical Abundance': maybe(rng, '--', '1-19', '20-49', '50-99', '100-999', '1000+', 'lots', p=0.3),
+            'IdentificationRemarks': maybe(rng, 'fuzzy', p=0.2),
+            'Identified By': maybe(rng, 'Joe', 'Ann', p=0.4),
+            'Notes': maybe(rng, 'note', 'other note', p=0.3),
+            'Qualifier': maybe(rng, 'cf.', 'sp.', p=0.3),
+            'Reason': maybe(rng, 'blurry', p=0.2),
+            'Morphospecies': maybe(rng, 'morph 1', p=0.1),
+            'Tentative ID': maybe(rng, 'Chromis', 'Pomacentridae', p=0.15),
+            'Good Image': rng.random() < 0.2,
+        }
+        if rng.random() < 0.5:
+            attributes['Depth'] = rng.choice([1200, 455.5])
+        if rng.random() < 0.3:
+            attributes['Position'] = [rng.uniform(-180, 180), rng.uniform(-90, 90)]
+        if rng.random() < 0.3:
+            attributes['DO Temperature (celsius)'] = 4.25
+            attributes['DO Concentration Salin Comp (mol per L)'] = 0.0002
+        localization = make_localization(
+            localization_id=1000 + i,
+            elemental_id=f'elemental-{i}',
+            version=rng.choice([1, 2]),
+            localization_type=localization_type,
+            media=rng.choice(media_ids),
+            frame=rng.choice([30, 30, 30, 1500]),
+            created_by=rng.choice(list(USERS.keys())),
+            x=rng.random(),
+            y=rng.random(),
+            width=rng.random() if is_box else None,
+            height=rng.random() if is_box else None,
+            attributes={key: value for key, value in attributes.items() if value is not None},
+        )
+        if rng.random() < 0.1:
+            localization['problems'] = 'Scientific Name'
+        localizations.append(localization)
+    return localizations
+
+
+def run_scenario(scenario: str, session) -> list[dict]:
+    rng = random.Random(scenario)
+    section_ids = ['1', '2']
+    media_list = [
+        make_media(media_id=media_id, fps=rng.choice([30, None]), name=f'media-{media_id}')
+        for media_id in (101, 102, 201, 202)
+    ]
+    media_list[-1]['attributes'] = {'Primary Substrate': 'sand', 'Relief': 'flat'}  # no start time
+    media_list[0]['attributes'].update({'Primary Substrate': 'rock', 'Bedforms': 'ripples'})
+    session['media_timestamps'] = {media['id']: '2025-01-01T00:00:00+00:00' for media in media_list}
+    types = (TatorLocalizationType.SUB_BOX, TatorLocalizationType.SUB_DOT) if scenario == 'sub' \
+        else (TatorLocalizationType.BOX, TatorLocalizationType.DOT)
+    fieldbook_response = MagicMock(status_code=200)
+    fieldbook_response.json.return_value = {
+        'deployments': [{'deployment_name': 'Section_1', 'lat': 21.5, 'long': -158.5, 'bait_type': 'fish', 'depth_m': 999}],
+    }
+
+    with patch.object(TatorRestClient, 'get_section_by_id', mock_get_section_by_id), \
+            patch.object(TatorRestClient, 'get_user', side_effect=lambda user_id: USERS[user_id]), \
+            patch.object(TatorRestClient, 'get_medias_for_sections', return_value=media_list), \
+            patch.object(upstream_session, 'get', return_value=fieldbook_response), \
+            patch('application.util.phylogeny_cache.PhylogenyCache.fetch_worms_many', side_effect=lambda names, **kwargs: set(names)):
+        processor = TatorLocalizationProcessor(
+            project_id=1,
+            section_ids=section_ids,
+            tator_url=TATOR_URL,
+            darc_review_url=DARC_REVIEW_URL,
+            media_list=media_list if scenario == 'sub' else None,
+        )
+        processor.phylogeny.data = json.loads(json.dumps(PHYLOGENY))
+        processor.sections[0].bottom_time = '2025-01-01 00:00:01Z'  # sections[1] has no arrival time
+        processor.sections[0].localizations = make_localizations(rng, types, [101, 102], 50)
+        processor.sections[1].localizations = make_localizations(rng, types, [201, 202], 30)
+        processor.sections[1].localizations.append(make_localization(localization_type=0))  # not a box or dot
+        if scenario == 'dropcam':
+            processor.process_records(get_timestamp=True, get_dropcam_fieldbook_data=True, get_dropcam_substrates=True)
+        elif scenario == 'sub':
+            processor.process_records(
+                get_timestamp=True,
+                sub_media_substrates={
+                    101: [{'frame': 40, 'Relief': 'flat'}, {'frame': 1000, 'Relief': 'high', 'Substrate Notes': 'wall'}],
+                    201: [{'frame': 0, 'Primary Substrate': 'mud'}],
+                },
+            )
+        else:
+            processor.process_records()
+    # json.dumps also fails loudly if any numpy scalar leaks into the records
+    return json.loads(json.dumps(processor.format_times(processor.final_records)))
+
+
+@pytest.mark.usefixtures('mock_phylogeny_cache')
+class TestProcessRecordsRegression:
+    @pytest.mark.parametrize('scenario', ['plain', 'dropcam', 'sub'])
+    def test_matches_row_by_row_output(self, fake_session, scenario):
+        expected = json.loads(EXPECTED_PATH.read_text())[scenario]
+        assert run_scenario(scenario, fake_session) == expected
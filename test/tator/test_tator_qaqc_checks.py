@@ -0,0 +1,208 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+
+from application.tator.tator_qaqc_checks import (
+    MissingGoodImageCheck,
+    MissingQualifierCheck,
+    MissingUponCheck,
+    NamesAcceptedCheck,
+    NotesAndRemarksCheck,
+    QaqcCheck,
+    ReExaminedCheck,
+    SameNameQualifierCheck,
+    StetReasonCheck,
+    TatorQaqcCheckEngine,
+)
+from application.tator.tator_dropcam_qaqc_processor import TatorDropcamQaqcProcessor
+from application.tator.tator_rest_client import TatorRestClient
+from application.tator.tator_sub_qaqc_processor import TatorSubQaqcProcessor
+from application.tator.tator_type import TatorLocalizationType
+from application.util.http_metrics import upstream_session
+from test.tator.conftest import TATOR_URL, FakeApiException, make_localization, mock_get_section_by_id
+
+
+class TestTatorQaqcCheckEngine:
+    def test_run_evaluates_every_check_in_one_pass_without_modifying_localizations(self):
+        localizations = [
+            make_localization(elemental_id=1, frame=1, attributes={'Scientific Name': 'Bad', 'Qualifier': 'stet.'}),
+            make_localization(elemental_id=2, frame=2, attributes={'Scientific Name': 'Good', 'Reason': 'To be re-examined'}),
+            make_localization(elemental_id=3, frame=3, attributes={'Scientific Name': 'Good', 'Notes': 'hmm'}),
+        ]
+        engine = TatorQaqcCheckEngine([
+            NamesAcceptedCheck({'Bad'}),
+            StetReasonCheck(),
+            ReExaminedCheck(),
+            NotesAndRemarksCheck(),
+        ])
+
+        results = engine.run(localizations)
+
+        assert results['names-accepted'].flagged == [(0, 'Scientific Name')]
+        assert results['stet-missing-reason'].flagged == [(0, 'Qualifier, Reason')]
+        assert results['re-examined'].flagged == [(1, None)]
+        assert results['notes-and-remarks'].flagged == [(2, 'Notes')]
+        assert {name: result.count for name, result in results.items()} == {
+            'names-accepted': 1,
+            'stet-missing-reason': 1,
+            're-examined': 1,
+            'notes-and-remarks': 1,
+        }
+        assert all('problems' not in localization for localization in localizations)
+
+    def test_items_returns_copies_with_problems(self):
+        localizations = [make_localization(elemental_id=1, attributes={'Qualifier': 'stet.'})]
+
+        result = TatorQaqcCheckEngine([StetReasonCheck()]).run(localizations)['stet-missing-reason']
+
+        assert result.items(localizations) == [{**localizations[0], 'problems': 'Qualifier, Reason'}]
+        assert 'problems' not in localizations[0]
+
+    def test_count_is_records_not_localizations(self):
+        # three dots that process_records merges into one record, and a dot in another frame
+        localizations = [
+            make_localization(elemental_id=1, frame=1, attributes={'Scientific Name': 'Bad'}),
+            make_localization(elemental_id=2, frame=1, attributes={'Scientific Name': 'Bad'}),
+            make_localization(elemental_id=3, frame=1, attributes={'Scientific Name': 'Bad'}),
+            make_localization(elemental_id=4, frame=2, attributes={'Scientific Name': 'Bad'}),
+        ]
+
+        result = TatorQaqcCheckEngine([NamesAcceptedCheck({'Bad'})]).run(localizations)['names-accepted']
+
+        assert len(result.flagged) == 4
+        assert result.count == 2
+
+    def test_aggregating_checks_see_every_localization_before_flagging(self):
+        localizations = [
+            make_localization(elemental_id=1, frame=1, attributes={'Scientific Name': 'A', 'Qualifier': 'cf.'}),
+            make_localization(elemental_id=2, frame=2, attributes={'Scientific Name': 'B'}),
+            make_localization(elemental_id=3, frame=3, localization_type=TatorLocalizationType.BOX, attributes={'Scientific Name': 'B'}),
+            make_localization(elemental_id=4, frame=4, attributes={'Scientific Name': 'A', 'Qualifier': 'sp.'}),
+            make_localization(elemental_id=5, frame=5, localization_type=TatorLocalizationType.BOX, attributes={'Scientific Name': 'A'}),
+            make_localization(elemental_id=6, frame=6, attributes={'Scientific Name': 'A', 'Good Image': True}),
+        ]
+
+        results = TatorQaqcCheckEngine([SameNameQualifierCheck(), MissingGoodImageCheck()]).run(localizations)
+
+        assert [index for index, _ in results['same-name-qualifier'].flagged] == [0, 3, 4, 5]
+        assert results['missing-good-image'].flagged == [(2, None)]  # A has a good image, only boxes are flagged
+
+    def test_record_checks_run_over_records(self):
+        records = [
+            {'scientific_name': 'A', 'species': 'a', 'qualifier': '--', 'upon': 'sed'},
+            {'scientific_name': 'B', 'qualifier': '--', 'upon': '--'},
+        ]
+        engine = TatorQaqcCheckEngine([MissingQualifierCheck(), MissingUponCheck(), ReExaminedCheck()])
+
+        assert engine.needs_records
+        results = engine.run([], records)
+
+        assert results['missing-qualifier'].flagged == [(1, 'Scientific Name, Qualifier')]
+        assert results['missing-upon'].flagged == [(1, 'Upon')]
+        assert results['missing-upon'].count == 1
+        assert results['re-examined'].count == 0
+
+    def test_check_must_be_implemented(self):
+        class NoCheck(QaqcCheck):
+            name = 'no-check'
+
+        with pytest.raises(TypeError):
+            NoCheck()
+
+
+@pytest.mark.usefixtures('mock_phylogeny_cache')
+class TestChecklistCounts:
+    @patch.object(TatorRestClient, 'get_section_by_id', mock_get_section_by_id)
+    def test_checklist_counts_processes_once(self, fake_session, stub_annotator, stub_worms_match):
+        tator_qaqc_processor = TatorSubQaqcProcessor(
+            project_id=1,
+            section_ids=['1'],
+            tator_url=TATOR_URL,
+        )
+        tator_qaqc_processor.sections[0].localizations = [
+            make_localization(
+                elemental_id=1,
+                frame=1,
+                localization_type=TatorLocalizationType.SUB_BOX,
+                attributes={'Scientific Name': 'Animalia', 'Qualifier': 'stet.', 'Upon': 'Animalia'},
+            ),
+            make_localization(
+                elemental_id=2,
+                frame=2,
+                localization_type=TatorLocalizationType.SUB_DOT,
+                attributes={'Scientific Name': 'Animalia', 'Upon': 'sed', 'Reason': 'To be re-examined'},
+            ),
+        ]
+
+        with patch.object(
+                TatorSubQaqcProcessor,
+                'process_records',
+                autospec=True,
+                side_effect=TatorSubQaqcProcessor.process_records,
+        ) as mock_process_records:
+            counts = tator_qaqc_processor.checklist_counts()
+
+        assert mock_process_records.call_count == 1
+        assert counts == {
+            'names-accepted': 0,
+            'missing-qualifier': 1,
+            'stet-missing-reason': 1,
+            'all-tentative-ids': 0,
+            'notes-and-remarks': 0,
+            're-examined': 1,
+            'missing-good-image': 1,
+            'missing-ancillary-data': 2,
+            'missing-upon': 0,
+            'suspicious-hosts': 1,
+        }
+        # the checks leave the localizations as fetched, so any check can still run on them
+        assert len(tator_qaqc_processor.sections[0].localizations) == 2
+        assert all('problems' not in localization for localization in tator_qaqc_processor.sections[0].localizations)
+
+
+class TestCheckCountsRoutes:
+    @pytest.fixture
+    def tator_client(self, client):
+        with client.session_transaction() as flask_session:
+            flask_session['tator_token'] = 'token-a'
+        return client
+
+    def test_dropcam_attracted_list_unavailable(self, tator_client):
+        with patch('application.qaqc.tator.dropcam.routes.get_image_refs', return_value={}), \
+                patch.object(upstream_session, 'get', side_effect=requests.ConnectionError('down')):
+            res = tator_client.get('/qaqc/tator/dropcam/check-counts?project=26&section=1')
+        assert res.status_code == 400
+        assert res.json == {'error': 'down'}
+
+    def test_dropcam_tator_error(self, tator_client, fake_tator_openapi):
+        with patch('application.qaqc.tator.dropcam.routes.get_image_refs', return_value={}), \
+                patch.object(upstream_session, 'get') as mock_get, \
+                patch.object(TatorRestClient, 'get_section_by_id', mock_get_section_by_id), \
+                patch.object(TatorDropcamQaqcProcessor, 'fetch_localizations', side_effect=FakeApiException(body='{"message": "No access"}')):
+            res = tator_client.get('/qaqc/tator/dropcam/check-counts?project=26&section=1')
+        assert res.status_code == 400
+        assert res.json == {'error': 'No access'}
+        assert mock_get.call_args.kwargs['headers'] == tator_client.application.config.get('DARC_REVIEW_HEADERS')
+
+    def test_dropcam_fetches_image_refs_without_comments(self, tator_client):
+        image_ref_res = MagicMock(status_code=200)
+        image_ref_res.json.return_value = {}
+        with patch.object(upstream_session, 'get', side_effect=[image_ref_res, requests.ConnectionError('down')]) as mock_get:
+            tator_client.get('/qaqc/tator/dropcam/check-counts?project=26&section=1')
+        assert mock_get.call_args_list[0].args[0].endswith('/image-reference/quick')
+        assert not any('/comment/' in str(call) for call in mock_get.call_args_list)
+
+    def test_sub_tator_http_error(self, tator_client):
+        response = MagicMock()
+        response.json.return_value = {'message': 'Media 5 not found'}
+        with patch.object(TatorRestClient, 'get_media_by_id', side_effect=requests.HTTPError(response=response)):
+            res = tator_client.get('/qaqc/tator/sub/check-counts?project=26&section=1&media_id=5')
+        assert res.status_code == 400
+        assert res.json == {'error': 'Media 5 not found'}
+
+    def test_sub_tator_error(self, tator_client, fake_tator_openapi):
+        with patch.object(TatorRestClient, 'get_media_by_id', side_effect=FakeApiException(body='{"message": "No access"}')):
+            res = tator_client.get('/qaqc/tator/sub/check-counts?project=26&section=1&media_id=5')
+        assert res.status_code == 400
+        assert res.json == {'error': 'No access'}
@@ -0,0 +1,73 @@
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+
+from application.tator.tator_localization_processor import TatorLocalizationProcessor
+from application.tator.tator_record_cache import TatorRecordCache
+from application.tator.tator_rest_client import TatorRestClient
+from test.tator.conftest import TATOR_URL, make_localization, mock_get_section_by_id
+
+
+def processed_records(localizations: list[dict]) -> list[dict]:
+    processor = TatorLocalizationProcessor(project_id=1, section_ids=['1'], tator_url=TATOR_URL)
+    processor.sections[0].localizations = localizations
+    processor.process_records()
+    return processor.final_records
+
+
+@pytest.fixture
+def localizations():
+    return [
+        make_localization(elemental_id=1, frame=1, attributes={'Scientific Name': 'Squalus'}),
+        make_localization(elemental_id=2, frame=2, attributes={'Scientific Name': 'Chromis'}),
+    ]
+
+
+@pytest.mark.usefixtures('mock_phylogeny_cache', 'fake_session', 'stub_worms_match')
+@patch.object(TatorRestClient, 'get_section_by_id', mock_get_section_by_id)
+class TestTatorRecordCache:
+    def test_same_inputs_are_processed_once(self, stub_annotator, localizations):
+        first = processed_records(localizations)
+        with patch('application.tator.tator_localization_processor.pd.DataFrame') as mock_data_frame:
+            second = processed_records(localizations)
+        assert second == first
+        mock_data_frame.assert_not_called()
+        assert stub_annotator.call_count == 1
+
+    def test_cached_records_are_copies(self, stub_annotator, localizations):
+        processed_records(localizations)[0]['problems'] = 'Qualifier'  # e.g. a check flagging the record
+        assert 'problems' not in processed_records(localizations)[0]
+
+    def test_edited_localization_misses(self, stub_annotator, localizations):
+        processed_records(localizations)
+        localizations[0]['attributes']['Scientific Name'] = 'Carcharhinus'
+        localizations[0]['modified_datetime'] = '2025-01-02T00:00:00+00:00'
+        assert {record['scientific_name'] for record in processed_records(localizations)} == {'Carcharhinus', 'Chromis'}
+
+    def test_hit_skips_worms_prefetch(self, stub_annotator, localizations):
+        processed_records(localizations)
+        with patch('application.util.phylogeny_cache.PhylogenyCache.prefetch_worms') as mock_prefetch:
+            processed_records(localizations)
+        mock_prefetch.assert_not_called()
+
+    def test_media_start_times_are_part_of_the_key(self, localizations, fake_session):
+        processor = TatorLocalizationProcessor(project_id=1, section_ids=['1'], tator_url=TATOR_URL)
+        processor.sections[0].localizations = localizations
+        inputs = {'flags': (True, False, False), 'media_id_map': {100: {'fps': 30}}, 'sub_media_timelines': {}, 'fieldbooks': {}}
+        before = processor._record_fingerprint(**inputs).hexdigest()
+        fake_session['media_timestamps'] = {100: '2025-01-01T00:00:00Z'}
+        assert processor._record_fingerprint(**inputs).hexdigest() != before
+
+    def test_problems_attached_by_a_check_are_part_of_the_key(self, stub_annotator, localizations):
+        processed_records(localizations)
+        localizations[1]['problems'] = 'Scientific Name'
+        records = {record['scientific_name']: record for record in processed_records(localizations)}
+        assert records['Chromis']['problems'] == 'Scientific Name'
+
+    def test_invalidate_drops_everything(self, stub_annotator, localizations):
+        processed_records(localizations)
+        TatorRecordCache.default().invalidate()
+        with patch('application.tator.tator_localization_processor.pd.DataFrame', wraps=pd.DataFrame) as mock_data_frame:
+            processed_records(localizations)
+        mock_data_frame.assert_called_once()
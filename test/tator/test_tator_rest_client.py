@@ -1,8 +1,12 @@
+import json
+from time import time
 from unittest.mock import patch
 
 import pytest
 import requests
+from cachelib import SimpleCache
 
+from application.tator.tator_metadata_cache import MEDIA_TTL, USER_TTL, TatorMetadataCache
 from application.tator.tator_rest_client import DEFAULT_TIMEOUT, TatorRestClient
 from application.tator.tator_type import TatorStateType
 
@@ -11,14 +15,22 @@ TOKEN = 'test-token'
 
 
 class MockResponse:
-    def __init__(self, status_code=200, json_data=None, content=b''):
+    def __init__(self, status_code=200, json_data=None, content=b'', headers=None):
         self.status_code = status_code
         self._json_data = json_data if json_data is not None else {}
         self.content = content
+        self.headers = headers or {}
 
     def json(self):
         return self._json_data
 
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+    def close(self):
+        pass
+
     def raise_for_status(self):
         if self.status_code >= 400:
             raise requests.exceptions.HTTPError()
@@ -117,6 +129,68 @@ class TestTatorRestClient:
         with pytest.raises(ValueError):
             client.get_localizations(project_id=1)
 
+    def test_iter_localizations_walks_pages_with_after_cursor(self):
+        pages = [
+            MockResponse(json_data=[{'id': 1}, {'id': 2}]),
+            MockResponse(json_data=[{'id': 5}, {'id': 7}]),
+            MockResponse(json_data=[{'id': 9}]),
+        ]
+        with patch('requests.Session.get', side_effect=pages) as mock_get:
+            client = TatorRestClient(TATOR_URL, TOKEN)
+            result = list(client.iter_localizations(project_id=1, section_id=123, page_size=2))
+        assert result == [[{'id': 1}, {'id': 2}], [{'id': 5}, {'id': 7}], [{'id': 9}]]
+        assert [call.kwargs['params'] for call in mock_get.call_args_list] == [
+            {'stop': 2},
+            {'stop': 2, 'after': 2},
+            {'stop': 2, 'after': 7},
+        ]
+        assert all(call.kwargs['url'] == f'{TATOR_URL}/rest/Localizations/1?section=123' for call in mock_get.call_args_list)
+
+    def test_iter_localizations_stops_on_empty_page(self):
+        pages = [
+            MockResponse(json_data=[{'id': 1}, {'id': 2}]),
+            MockResponse(json_data=[]),
+        ]
+        with patch('requests.Session.get', side_effect=pages) as mock_get:
+            client = TatorRestClient(TATOR_URL, TOKEN)
+            result = list(client.iter_localizations(project_id=1, media_ids=[10], page_size=2))
+        assert result == [[{'id': 1}, {'id': 2}]]  # empty trailing page is not yielded
+        assert mock_get.call_count == 2
+
+    def test_iter_localizations_is_lazy(self):
+        with patch('requests.Session.get', return_value=MockResponse(json_data=[{'id': 1}])) as mock_get:
+            client = TatorRestClient(TATOR_URL, TOKEN)
+            pages = client.iter_localizations(project_id=1, section_id=123)
+            assert mock_get.call_count == 0
+            next(pages)
+            assert mock_get.call_count == 1
+
+    def test_iter_localizations_modified_since_filters_and_includes_deleted(self):
+        with patch('requests.Session.get', return_value=MockResponse(json_data=[{'id': 1}])) as mock_get:
+            client = TatorRestClient(TATOR_URL, TOKEN)
+            list(client.iter_localizations(project_id=1, section_id=123, modified_since='2025-06-01T00:00:00Z'))
+        assert mock_get.call_args.kwargs['params'] == {
+            'stop': 5000,
+            'attribute_gte': '$modified_datetime::2025-06-01T00:00:00Z',
+            'show_deleted': 1,
+        }
+
+    def test_iter_localizations_with_fields_streams_compact_pages(self):
+        raw_pages = [
+            [{'id': 1, 'type': 48, 'modified_by': 7, 'attributes': {'Notes': 'a'}}, {'id': 2, 'type': 49, 'attributes': {}}],
+            [{'id': 3, 'type': 48, 'thumbnail_image': None, 'attributes': {}}],
+        ]
+        pages = [MockResponse(content=json.dumps(page).encode()) for page in raw_pages]
+        with patch('requests.Session.get', side_effect=pages) as mock_get:
+            client = TatorRestClient(TATOR_URL, TOKEN)
+            result = list(client.iter_localizations(project_id=1, section_id=123, page_size=2, fields=('type', 'attributes')))
+        assert result == [
+            [{'id': 1, 'type': 48, 'attributes': {'Notes': 'a'}}, {'id': 2, 'type': 49, 'attributes': {}}],
+            [{'id': 3, 'type': 48, 'attributes': {}}],
+        ]
+        assert all(call.kwargs['stream'] is True for call in mock_get.call_args_list)
+        assert mock_get.call_args_list[1].kwargs['params'] == {'stop': 2, 'after': 2}
+
     @patch('requests.Session.get', side_effect=mocked_requests_get)
     def test_get_section_by_id(self, _):
         client = TatorRestClient(TATOR_URL, TOKEN)
@@ -172,6 +246,20 @@ class TestTatorRestClient:
         result = client.get_localization_graphic(localization_id=99)
         assert result == b'fake-graphic-bytes'
 
+    @patch('requests.Session.get', side_effect=mocked_requests_get)
+    def test_stream_frame_does_not_read_body(self, mock_get):
+        client = TatorRestClient(TATOR_URL, TOKEN)
+        res = client.stream_frame(media_id=10, frame=5, quality=650)
+        assert b''.join(res.iter_content(chunk_size=4)) == b'fake-frame-bytes'
+        assert mock_get.call_args.kwargs['stream'] is True
+        assert mock_get.call_args.kwargs['params'] == {'frames': 5, 'quality': 650}
+
+    @patch('requests.Session.get', side_effect=mocked_requests_get)
+    def test_stream_localization_graphic_raises_on_error(self, _):
+        client = TatorRestClient(TATOR_URL, TOKEN)
+        with pytest.raises(requests.exceptions.HTTPError):
+            client.stream_localization_graphic(localization_id=100)
+
     def test_format_timestamp_zero(self):
         assert TatorRestClient._format_timestamp(0) == '00:00'
 
@@ -180,3 +268,79 @@ class TestTatorRestClient:
 
     def test_format_timestamp_rounds(self):
         assert TatorRestClient._format_timestamp(61.4) == '01:01'
+
+
+class TestTatorRestClientMetadataCache:
+    @pytest.fixture
+    def metadata_cache(self):
+        return TatorMetadataCache(SimpleCache(default_timeout=0))
+
+    def test_fresh_entry_costs_no_request(self, metadata_cache):
+        with patch('requests.Session.get', side_effect=mocked_requests_get) as mock_get:
+            client = TatorRestClient(TATOR_URL, TOKEN, metadata_cache=metadata_cache)
+            first = client.get_section_by_id(123)
+            # a brand-new client (e.g. the next page load) shares the cache
+            second = TatorRestClient(TATOR_URL, TOKEN, metadata_cache=metadata_cache).get_section_by_id(123)
+        assert first == second == {'id': 123, 'name': 'Test Section'}
+        assert mock_get.call_count == 1
+
+    def test_stale_entry_with_etag_is_revalidated(self, metadata_cache):
+        responses = [
+            MockResponse(json_data={'id': 42, 'first_name': 'Joe'}, headers={'ETag': '"v1"'}),
+            MockResponse(status_code=304),
+        ]
+        with patch('requests.Session.get', side_effect=responses) as mock_get:
+            client = TatorRestClient(TATOR_URL, TOKEN, metadata_cache=metadata_cache)
+            client.get_user(42)
+            with patch('application.tator.tator_metadata_cache.time', return_value=time() + USER_TTL + 1):
+                result = client.get_user(42)
+        assert result == {'id': 42, 'first_name': 'Joe'}
+        assert mock_get.call_args_list[1].kwargs['headers']['If-None-Match'] == '"v1"'
+
+    def test_stale_entry_without_validators_is_refetched(self, metadata_cache):
+        responses = [
+            MockResponse(json_data={'id': 10, 'name': 'old'}),
+            MockResponse(json_data={'id': 10, 'name': 'new'}),
+        ]
+        with patch('requests.Session.get', side_effect=responses) as mock_get:
+            client = TatorRestClient(TATOR_URL, TOKEN, metadata_cache=metadata_cache)
+            client.get_media_by_id(10)
+            with patch('application.tator.tator_metadata_cache.time', return_value=time() + MEDIA_TTL + 1):
+                result = client.get_media_by_id(10)
+        assert result == {'id': 10, 'name': 'new'}
+        assert 'If-None-Match' not in mock_get.call_args_list[1].kwargs['headers']
+
+    def test_errors_are_not_cached(self, metadata_cache):
+        with patch('requests.Session.get', return_value=MockResponse(status_code=404)) as mock_get:
+            client = TatorRestClient(TATOR_URL, TOKEN, metadata_cache=metadata_cache)
+            for _ in range(2):
+                with pytest.raises(requests.exceptions.HTTPError):
+                    client.get_section_by_id(1)
+        assert mock_get.call_count == 2
+
+    def test_update_media_attributes_invalidates_media_and_media_lists(self, metadata_cache):
+        with patch('requests.Session.get', side_effect=mocked_requests_get) as mock_get, \
+                patch('requests.Session.patch', return_value=MockResponse(json_data={'message': 'ok'})) as mock_patch:
+            client = TatorRestClient(TATOR_URL, TOKEN, metadata_cache=metadata_cache)
+            client.get_media_by_id(10)
+            client.get_medias_for_sections(project_id=1, section_ids=[123])
+            client.update_media_attributes(10, {'Arrival': '1234'})
+            client.get_media_by_id(10)
+            client.get_medias_for_sections(project_id=1, section_ids=[123])
+        assert mock_patch.call_args.kwargs['url'] == f'{TATOR_URL}/rest/Media/10'
+        assert mock_patch.call_args.kwargs['json'] == {'attributes': {'Arrival': '1234'}}
+        assert mock_get.call_count == 4  # both lookups went back to Tator after the PATCH
+
+    def test_entries_are_scoped_to_the_token(self, metadata_cache):
+        with patch('requests.Session.get', side_effect=mocked_requests_get) as mock_get:
+            TatorRestClient(TATOR_URL, TOKEN, metadata_cache=metadata_cache).get_section_by_id(123)
+            TatorRestClient(TATOR_URL, 'other-token', metadata_cache=metadata_cache).get_section_by_id(123)
+        assert mock_get.call_count == 2  # the second token had to get it from Tator itself
+
+    def test_invalidate_media_drops_copies_cached_for_other_tokens(self, metadata_cache):
+        with patch('requests.Session.get', side_effect=mocked_requests_get) as mock_get:
+            reviewer = TatorRestClient(TATOR_URL, TOKEN, metadata_cache=metadata_cache)
+            reviewer.get_media_by_id(10)
+            TatorRestClient(TATOR_URL, 'script-token', metadata_cache=metadata_cache).invalidate_media(10)
+            reviewer.get_media_by_id(10)
+        assert mock_get.call_count == 2
@@ -5,7 +5,14 @@ import pytest
 from application.tator.tator_rest_client import TatorRestClient
 from application.tator.tator_sub_qaqc_processor import TatorSubQaqcProcessor
 from application.tator.tator_type import TatorLocalizationType
-from test.tator.conftest import TATOR_URL, formatted_start_time, make_localization, make_media, mock_get_section_by_id
+from test.tator.conftest import (
+    TATOR_URL,
+    fetch_worms_many_with,
+    formatted_start_time,
+    make_localization,
+    make_media,
+    mock_get_section_by_id,
+)
 
 
 @pytest.mark.usefixtures('mock_phylogeny_cache')
@@ -126,7 +133,7 @@ class TestTatorSubQaqcProcessor:
             ),
         ]
 
-        with patch('application.util.phylogeny_cache.PhylogenyCache.fetch_worms', fake_fetch_worms):
+        with patch('application.util.phylogeny_cache.PhylogenyCache.fetch_worms_many', fetch_worms_many_with(fake_fetch_worms)):
             tator_qaqc_processor.check_missing_upon_and_not_fish()
 
         flagged_ids = {record['observation_uuid'] for record in tator_qaqc_processor.final_records}
@@ -458,6 +465,6 @@ class TestTatorSubQaqcProcessor:
                 patch.object(TatorRestClient, 'get_medias_for_sections', return_value=[media]):
             tator_qaqc_processor.get_summary()
 
-        record = tator_qaqc_processor.final_records[0]
+        record = tator_qaqc_processor.format_times(tator_qaqc_processor.final_records)[0]
         assert record['timestamp'] == formatted_start_time(plus_seconds=1)
         assert record['relief'] == 'flat'
@@ -5,6 +5,7 @@ from unittest.mock import patch
 import requests
 
 from application.main import server_error
+from application.util.phylogeny_store import PhylogenyStore
 
 
 class MockMainResponse:
@@ -55,6 +56,15 @@ class TestMain:
         assert response.status_code == 404
         assert b'Page not found' in response.data
 
+    def test_purge_phylogeny_no_matches(self, client):
+        PhylogenyStore.default().add_no_matches(PhylogenyStore.WORMS, ['Fakeconcept', 'Othername'])
+
+        response = client.delete('/phylogeny/no-match?name=Fakeconcept')
+
+        assert response.status_code == 200
+        assert response.json == {'purged': 1}
+        assert client.delete('/phylogeny/no-match').json == {'purged': 1}
+
     def test_server_error_renders_500_and_skips_webhook_outside_production(self, app):
         app.config['ENV'] = 'development'
         with app.test_request_context('/'), patch('requests.post') as mock_post:
@@ -0,0 +1,88 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+
+class WormsStandIn:
+    """
+    Local stand-in for the WoRMS REST endpoints WormsRestClient uses, answering every request after latency seconds.
+    Responses queued in failures (status, headers) are sent, in order, instead of the answers to the next requests
+    whose path starts with failure_path.
+    """
+
+    def __init__(self):
+        self.url = None
+        self.records = {}  # {name: [record]}
+        self.classifications = {}  # {aphia_id: tree}
+        self.latency = 0.0
+        self.failures = []
+        self.failure_path = '/'
+        self.requests = []  # (path, time.monotonic()) for every request received
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def add_taxon(self, name: str, aphia_id: int, status: str = 'accepted'):
+        self.records.setdefault(name, []).append({'AphiaID': aphia_id, 'scientificname': name, 'status': status})
+        self.classifications[aphia_id] = {
+            'rank': 'Kingdom',
+            'scientificname': 'Animalia',
+            'child': {'rank': 'Species', 'scientificname': name, 'child': None},
+        }
+
+    def paths(self, prefix: str) -> list[str]:
+        return [path for path, _ in self.requests if path.startswith(prefix)]
+
+    def respond(self, path: str, query: dict) -> tuple[int, dict, object]:
+        with self._lock:
+            self.requests.append((path, time.monotonic()))
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+            failure = self.failures.pop(0) if self.failures and path.startswith(self.failure_path) else None
+        try:
+            time.sleep(self.latency)
+            if failure:
+                return failure[0], failure[1], None
+            if path == '/AphiaRecordsByNames':
+                records = [self.records.get(name, []) for name in query.get('scientificnames[]', [])]
+                return (200, {}, records) if any(records) else (204, {}, None)
+            if path.startswith('/AphiaClassificationByAphiaID/'):
+                tree = self.classifications.get(int(path.rsplit('/', 1)[1]))
+                return (200, {}, tree) if tree else (204, {}, None)
+            return 404, {}, None
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+
+@pytest.fixture
+def worms_stand_in():
+    stand_in = WormsStandIn()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlsplit(self.path)
+            status, headers, body = stand_in.respond(url.path, parse_qs(url.query, keep_blank_values=True))
+            content = json.dumps(body).encode() if body is not None else b''
+            self.send_response(status)
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    stand_in.url = f'http://127.0.0.1:{server.server_port}'
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield stand_in
+    server.shutdown()
+    server.server_close()
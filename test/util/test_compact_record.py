@@ -0,0 +1,66 @@
+import copy
+import json
+import pickle
+
+import pandas as pd
+
+from application.util.compact_record import CompactRecord
+
+
+class Record(CompactRecord):
+    __slots__ = ()
+
+    FIELDS = ('observation_uuid', 'scientific_name', 'class', 'tentative_id', 'problems')
+    INTERNED_FIELDS = frozenset(('scientific_name', 'class'))
+
+
+class TestCompactRecord:
+    def test_behaves_like_the_dict_it_was_built_from(self):
+        values = {'observation_uuid': 'abc', 'scientific_name': 'Squalus', 'tentative_id': None}
+        record = Record(values)
+        assert record == values
+        assert values == record
+        assert list(record.items()) == list(values.items())
+        assert repr(record) == repr(values)
+        assert len(record) == 3
+        assert record['tentative_id'] is None
+        assert 'tentative_id' in record
+        assert 'class' not in record
+        assert record.get('class', '--') == '--'
+
+    def test_unset_fields_are_not_stored(self):
+        record = Record({'observation_uuid': 'abc', 'problems': 'Notes'})
+        assert record._values == ('abc', 'Notes')
+        assert record._extra is None
+
+    def test_interns_taxonomy_strings(self):
+        first = Record({'scientific_name': ''.join(['Squa', 'lus'])})
+        second = Record({'scientific_name': ''.join(['Squ', 'alus'])})
+        assert first['scientific_name'] is second['scientific_name']
+
+    def test_keeps_dict_insertion_order_for_new_and_unknown_keys(self):
+        values = {'observation_uuid': 'abc', 'status': 'Accepted', 'scientific_name': 'Squalus'}
+        record = Record(values)
+        for mapping in (record, values):
+            mapping['problems'] = 'Scientific Name'
+            mapping['scientific_name'] = 'Chromis'
+        assert json.dumps(record.to_dict()) == json.dumps(values)
+
+    def test_delete(self):
+        record = Record({'observation_uuid': 'abc', 'scientific_name': 'Squalus', 'status': 'Accepted'})
+        del record['scientific_name']
+        del record['status']
+        assert record == {'observation_uuid': 'abc'}
+
+    def test_from_values(self):
+        record = Record.from_values(['abc', 'Squalus', None, None, 'Notes'], [True, True, False, True, True])
+        assert record.to_dict() == {'observation_uuid': 'abc', 'scientific_name': 'Squalus', 'tentative_id': None, 'problems': 'Notes'}
+
+    def test_pickles_and_copies(self):
+        record = Record({'observation_uuid': 'abc', 'status': 'Accepted'})
+        assert pickle.loads(pickle.dumps(record)) == record
+        assert copy.deepcopy(record) == record
+
+    def test_data_frame(self):
+        df = pd.DataFrame([Record({'observation_uuid': 'abc', 'class': 'Anthozoa'}), Record({'observation_uuid': 'def'})])
+        assert df['observation_uuid'].tolist() == ['abc', 'def']
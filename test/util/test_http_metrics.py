@@ -0,0 +1,140 @@
+import json
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+from cachelib import SimpleCache
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+from application.tator.dropcam_fieldbook_cache import DropcamFieldbookCache
+from application.tator.tator_rest_client import TatorRestClient
+from application.util.http_metrics import HttpMetrics, MetricsHTTPAdapter
+from application.util.phylogeny_cache import PhylogenyCache
+from test.data.vars_responses import pomacentridae
+
+TATOR_URL = 'https://whats.tator.precious'
+KB_URL = 'https://hurl.stor/kb/v1'
+ANNOSAURUS_URL = 'https://hurl.stor/anno/v1'
+DARC_REVIEW_URL = 'https://darc.review'
+
+
+def fake_response(request, status_code=200, content=b'{}', retries=0) -> requests.Response:
+    res = requests.Response()
+    res.status_code = status_code
+    res._content = content
+    res.headers['Content-Length'] = str(len(content))
+    res.url = request.url
+    res.request = request
+    res.raw = SimpleNamespace(retries=SimpleNamespace(history=(None,) * retries))
+    return res
+
+
+@pytest.fixture
+def metrics():
+    metrics = HttpMetrics()
+    metrics.add_service('tator', TATOR_URL)
+    metrics.add_service('vars_kb', KB_URL)
+    metrics.add_service('annosaurus', ANNOSAURUS_URL)
+    metrics.add_service('darc_review', DARC_REVIEW_URL)
+    with patch.object(HttpMetrics, '_default', metrics):
+        yield metrics
+
+
+def session_with(adapter: BaseAdapter) -> requests.Session:
+    session = requests.Session()
+    session.mount('https://', adapter)
+    return session
+
+
+def send_with(*args, **kwargs):
+    """Stands in for HTTPAdapter.send (what MetricsHTTPAdapter wraps), answering with fake_response(*args, **kwargs)."""
+    return lambda adapter, request, **send_kwargs: fake_response(request, *args, **kwargs)
+
+
+class TestHttpMetrics:
+    def test_resolve_templates_numeric_ids(self, metrics):
+        assert metrics.resolve(f'{TATOR_URL}/rest/Localizations/26?section=123') == ('tator', '/rest/Localizations/{id}')
+
+    def test_resolve_templates_uuids(self, metrics):
+        url = f'{ANNOSAURUS_URL}/observations/b36a3114-4121-4a8f-aaf1-f99b42fd6f94'
+        assert metrics.resolve(url) == ('annosaurus', '/observations/{uuid}')
+
+    def test_resolve_uses_declared_templates_for_names(self, metrics):
+        assert metrics.resolve(f'{KB_URL}/phylogeny/up/Pomacentridae') == ('vars_kb', '/phylogeny/up/{concept}')
+
+    def test_resolve_picks_longest_prefix_on_shared_host(self, metrics):
+        assert metrics.resolve(f'{ANNOSAURUS_URL}/associations')[0] == 'annosaurus'
+        assert metrics.resolve(f'{KB_URL}/concept')[0] == 'vars_kb'
+
+    def test_resolve_unknown_host(self, metrics):
+        assert metrics.resolve('https://some.where/things/42') == ('other', '*')
+        assert metrics.resolve('https://else.where/media/abc.mp4') == ('other', '*')
+
+    def test_record_and_snapshot(self, metrics):
+        metrics.record('GET', f'{TATOR_URL}/rest/Section/1', 200, 0.2, size=500, retries=1)
+        metrics.record('GET', f'{TATOR_URL}/rest/Section/2', 404, 3, size=50_000)
+        snapshot, = metrics.snapshot()
+        assert snapshot['service'] == 'tator'
+        assert snapshot['endpoint'] == '/rest/Section/{id}'
+        assert snapshot['requests'] == 2
+        assert snapshot['statuses'] == {'200': 1, '404': 1}
+        assert snapshot['retries'] == 1
+        assert snapshot['latency_seconds']['sum'] == pytest.approx(3.2)
+        assert snapshot['latency_seconds']['buckets']['0.25'] == 1
+        assert snapshot['latency_seconds']['buckets']['5'] == 2
+        assert snapshot['latency_seconds']['buckets']['+Inf'] == 2
+        assert snapshot['response_bytes']['buckets']['1000'] == 1
+        assert snapshot['response_bytes']['buckets']['100000'] == 2
+
+    def test_prometheus_format(self, metrics):
+        metrics.record('GET', f'{TATOR_URL}/rest/Section/1', 200, 0.2, size=500, retries=2)
+        text = metrics.prometheus()
+        labels = 'service="tator",method="GET",endpoint="/rest/Section/{id}"'
+        assert '# TYPE upstream_http_requests_total counter' in text
+        assert f'upstream_http_requests_total{{{labels},status="200"}} 1' in text
+        assert f'upstream_http_retries_total{{{labels}}} 2' in text
+        assert f'upstream_http_request_duration_seconds_bucket{{{labels},le="0.25"}} 1' in text
+        assert f'upstream_http_request_duration_seconds_count{{{labels}}} 1' in text
+        assert f'upstream_http_response_size_bytes_sum{{{labels}}} 500' in text
+
+    def test_adapter_records_requests(self, metrics):
+        with patch.object(HTTPAdapter, 'send', send_with(content=b'12345', retries=2)):
+            session_with(MetricsHTTPAdapter()).get(f'{TATOR_URL}/rest/Media/7')
+        snapshot, = metrics.snapshot()
+        assert (snapshot['service'], snapshot['method'], snapshot['endpoint']) == ('tator', 'GET', '/rest/Media/{id}')
+        assert snapshot['statuses'] == {'200': 1}
+        assert snapshot['retries'] == 2
+        assert snapshot['response_bytes']['sum'] == 5
+
+    def test_adapter_records_errors(self, metrics):
+        with patch.object(HTTPAdapter, 'send', side_effect=requests.exceptions.ConnectionError()), \
+                pytest.raises(requests.exceptions.ConnectionError):
+            session_with(MetricsHTTPAdapter()).get(f'{TATOR_URL}/rest/Media/7')
+        assert metrics.snapshot()[0]['statuses'] == {'error': 1}
+
+    def test_only_app_sessions_are_observed(self, metrics):
+        with patch.object(HTTPAdapter, 'send', send_with()):
+            session_with(HTTPAdapter()).get(f'{TATOR_URL}/rest/Media/7')
+            TatorRestClient(TATOR_URL, 'token', metadata_cache=MagicMock())._session.get(f'{TATOR_URL}/rest/Media/8')
+        snapshot, = metrics.snapshot()
+        assert snapshot['requests'] == 1
+
+    def test_vars_and_darc_review_requests_are_observed(self, metrics):
+        with patch.object(HTTPAdapter, 'send', send_with(content=json.dumps(pomacentridae).encode())):
+            PhylogenyCache().fetch_vars('Pomacentridae', KB_URL, set())
+        with patch.object(HTTPAdapter, 'send', send_with(content=b'{"deployments": []}')):
+            DropcamFieldbookCache(backend=SimpleCache()).get_deployments(DARC_REVIEW_URL, ['123'])
+        assert {(endpoint['service'], endpoint['endpoint']) for endpoint in metrics.snapshot()} == {
+            ('vars_kb', '/phylogeny/up/{concept}'),
+            ('darc_review', '/dropcam-fieldbook/{section}'),
+        }
+
+    def test_metrics_routes(self, client, metrics):
+        metrics.record('POST', f'{ANNOSAURUS_URL}/associations', 201, 0.1, size=10)
+        res = client.get('/metrics')
+        assert res.status_code == 200
+        assert res.content_type.startswith('text/plain')
+        assert 'upstream_http_requests_total{service="annosaurus",method="POST",endpoint="/associations",status="201"} 1' in res.text
+        res = client.get('/metrics/json')
+        assert res.json['endpoints'][0]['statuses'] == {'201': 1}
@@ -1,19 +1,15 @@
-import json
-from unittest.mock import mock_open, patch
-
-import pytest
-
-from application.util.phylogeny_cache import CACHE_PATH, PhylogenyCache, WORMS_REST_URL
+import threading
+import time
+from unittest.mock import patch
+
+from application.util.http_metrics import upstream_session
+from application.util.phylogeny_cache import WORMS_FETCH_WORKERS, PhylogenyCache, WORMS_REST_URL
+from application.util.phylogeny_store import PhylogenyStore
+from application.util.worms_rest_client import DEFAULT_TIMEOUT, WormsRestClient
 from test.data.vars_responses import pomacentridae
 from test.data.worms_responses import clownfish, clownfish_tree
 
 
-@pytest.fixture
-def mock_open_file():
-    with patch('builtins.open', mock_open()) as m:
-        yield m
-
-
 class MockResponse:
     def __init__(self, status_code=200, json_data=None):
         self.status_code = status_code
@@ -30,36 +26,27 @@ def route_urls(routes: dict):
 
 
 class TestPhylogenyCache:
-    def test_load_existing_file(self, mock_open_file):
-        cached = {'Pomacentridae': {'family': 'Pomacentridae'}}
-        mock_open_file.return_value.read.return_value = json.dumps(cached)
-        cache = PhylogenyCache()
-        mock_open_file.assert_called_once_with(CACHE_PATH, 'r')
-        assert cache.data == cached
-
-    def test_load_missing_file_defaults(self, mock_open_file):
-        mock_open_file.side_effect = FileNotFoundError
-        cache = PhylogenyCache()
-        assert cache.data == {'Animalia': {}}
-
-    def test_save_writes_data(self, mock_open_file):
-        cache = PhylogenyCache.__new__(PhylogenyCache)
-        cache.data = {'Pomacentridae': {'family': 'Pomacentridae'}}
-        cache.save()
-        mock_open_file.assert_called_once_with(CACHE_PATH, 'w')
-        written = ''.join(call.args[0] for call in mock_open_file().write.call_args_list)
-        assert json.loads(written) == cache.data
-
-    def test_save_creates_missing_cache_directory(self, mock_open_file):
-        cache = PhylogenyCache.__new__(PhylogenyCache)
-        cache.data = {'Pomacentridae': {'family': 'Pomacentridae'}}
-        mock_open_file.side_effect = [FileNotFoundError, mock_open_file.return_value]
-        with patch('os.makedirs') as mock_makedirs:
+    def test_load_reads_names_from_store(self, tmp_path):
+        store = PhylogenyStore(str(tmp_path / 'phylogeny.sqlite3'), json_path=str(tmp_path / 'missing.json'))
+        store.upsert([('Pomacentridae', {'family': 'Pomacentridae'})])
+        cache = PhylogenyCache(store)
+        assert cache.data['Pomacentridae'] == {'family': 'Pomacentridae'}
+        assert 'Unknown' not in cache.data
+        assert cache.data.get('Unknown') is None
+        assert dict(cache.data) == {'Animalia': {}, 'Pomacentridae': {'family': 'Pomacentridae'}}
+
+    def test_save_writes_only_changed_names(self, tmp_path):
+        store = PhylogenyStore(str(tmp_path / 'phylogeny.sqlite3'), json_path=str(tmp_path / 'missing.json'))
+        cache = PhylogenyCache(store)
+        cache.data['Pomacentridae'] = {}
+        cache.data['Pomacentridae']['family'] = 'Pomacentridae'  # filled in after being set, as fetch_vars does
+        with patch.object(store, 'upsert', wraps=store.upsert) as mock_upsert:
             cache.save()
-        mock_makedirs.assert_called_once_with('cache')
-        assert mock_open_file.call_count == 2
+            cache.save()  # nothing changed since the last save
+        assert mock_upsert.call_count == 1
+        assert PhylogenyCache(store).data['Pomacentridae'] == {'family': 'Pomacentridae'}
 
-    @patch('requests.get')
+    @patch.object(upstream_session, 'get')
     def test_fetch_vars_success(self, mock_get):
         mock_get.return_value = MockResponse(json_data=pomacentridae)
         cache = PhylogenyCache.__new__(PhylogenyCache)
@@ -72,7 +59,7 @@ class TestPhylogenyCache:
             no_match_records=no_match_records,
         )
 
-        mock_get.assert_called_once_with(url='https://all.the.knowledge/phylogeny/up/Pomacentridae')
+        mock_get.assert_called_once_with(url='https://all.the.knowledge/phylogeny/up/Pomacentridae', timeout=DEFAULT_TIMEOUT)
         assert cache.data['Pomacentridae'] == {
             'phylum': 'Chordata',
             'subphylum': 'Vertebrata',
@@ -83,7 +70,7 @@ class TestPhylogenyCache:
         }
         assert len(no_match_records) == 0
 
-    @patch('requests.get')
+    @patch.object(upstream_session, 'get')
     def test_fetch_vars_not_found_in_kb(self, mock_get):
         mock_get.return_value = MockResponse(json_data={})  # no 'children' - can't walk the tree
         cache = PhylogenyCache.__new__(PhylogenyCache)
@@ -99,7 +86,13 @@ class TestPhylogenyCache:
         assert cache.data == {}
         assert no_match_records == {'MadeUpConcept'}
 
-    @patch('requests.get')
+        mock_get.reset_mock()
+        no_match_records = set()
+        cache.fetch_vars('MadeUpConcept', 'https://all.the.knowledge', no_match_records)
+        mock_get.assert_not_called()
+        assert no_match_records == {'MadeUpConcept'}
+
+    @patch.object(upstream_session, 'get')
     def test_fetch_vars_http_error(self, mock_get):
         mock_get.return_value = MockResponse(status_code=404)
         cache = PhylogenyCache.__new__(PhylogenyCache)
@@ -109,7 +102,7 @@ class TestPhylogenyCache:
 
         assert cache.data == {}
 
-    @patch('requests.get')
+    @patch.object(upstream_session, 'get')
     def test_fetch_worms_direct_match(self, mock_get):
         mock_get.side_effect = route_urls({
             f'{WORMS_REST_URL}/AphiaIDByName/Amphiprioninae?marine_only=true': MockResponse(json_data=714652),
@@ -137,7 +130,7 @@ class TestPhylogenyCache:
             'aphia_id': 714652,
         }
 
-    @patch('requests.get')
+    @patch.object(upstream_session, 'get')
     def test_fetch_worms_ambiguous_name_falls_back_to_records_by_name(self, mock_get):
         mock_get.side_effect = route_urls({
             # more than one matching record
@@ -154,7 +147,7 @@ class TestPhylogenyCache:
         assert cache.data['Amphiprioninae']['aphia_id'] == 714652
         assert cache.data['Amphiprioninae']['family'] == 'Pomacentridae'
 
-    @patch('requests.get')
+    @patch.object(upstream_session, 'get')
     def test_fetch_worms_no_match_found(self, mock_get):
         mock_get.side_effect = route_urls({
             f'{WORMS_REST_URL}/AphiaIDByName/Fakeconcept?marine_only=true': MockResponse(json_data=-999),
@@ -167,3 +160,208 @@ class TestPhylogenyCache:
 
         assert result is False
         assert cache.data == {}
+        assert PhylogenyStore.default().no_matches(PhylogenyStore.WORMS, ['Fakeconcept']) == {'Fakeconcept'}
+
+        mock_get.reset_mock()
+        assert cache.fetch_worms('Fakeconcept') is False
+        mock_get.assert_not_called()  # remembered until the no-match expires
+
+    @patch.object(upstream_session, 'get')
+    def test_fetch_worms_http_error_is_not_remembered(self, mock_get):
+        mock_get.return_value = MockResponse(status_code=503)
+        cache = PhylogenyCache.__new__(PhylogenyCache)
+        cache.data = {}
+
+        assert cache.fetch_worms('Fakeconcept') is False
+        assert PhylogenyStore.default().no_matches(PhylogenyStore.WORMS, ['Fakeconcept']) == set()
+
+    def test_prefetch_vars_fetches_each_missing_concept_once(self):
+        PhylogenyStore.default().add_no_matches(PhylogenyStore.VARS_KB, ['Remembered bad'])
+        cache = PhylogenyCache.__new__(PhylogenyCache)
+        cache.data = {'Cached': {}}
+        no_match_records = {'Known bad'}
+
+        def get_vars_tree(concept_name, vars_kb_url):
+            return {} if concept_name == 'Bad' else pomacentridae
+
+        with patch.object(PhylogenyCache, '_get_vars_tree', side_effect=get_vars_tree) as mock_get_vars_tree:
+            unmatched = cache.prefetch_vars(
+                ['New', 'Bad', 'New', 'Cached', 'Known bad', 'Remembered bad'],
+                'https://all.the.knowledge',
+                no_match_records,
+            )
+
+        assert sorted(call.args[0] for call in mock_get_vars_tree.call_args_list) == ['Bad', 'New']
+        assert unmatched == {'Bad', 'Remembered bad'}
+        assert no_match_records == {'Known bad', 'Bad', 'Remembered bad'}
+        assert cache.data['New']['family'] == 'Pomacentridae'
+
+    def test_prefetch_vars_runs_concurrently(self):
+        cache = PhylogenyCache.__new__(PhylogenyCache)
+        cache.data = {}
+        barrier = threading.Barrier(3, timeout=5)
+
+        def get_vars_tree(concept_name, vars_kb_url):
+            barrier.wait()  # only passes if three fetches are in flight at once
+            return pomacentridae
+
+        with patch.object(PhylogenyCache, '_get_vars_tree', side_effect=get_vars_tree):
+            assert cache.prefetch_vars(['A', 'B', 'C'], 'https://all.the.knowledge', max_workers=3) == set()
+        assert set(cache.data) == {'A', 'B', 'C'}
+
+    def test_prefetch_vars_writes_data_on_the_calling_thread(self):
+        writers = set()
+
+        class RecordingData(dict):
+            def __setitem__(self, name, phylogeny):
+                writers.add(threading.current_thread())
+                super().__setitem__(name, phylogeny)
+
+        cache = PhylogenyCache.__new__(PhylogenyCache)
+        cache.data = RecordingData()
+        with patch.object(upstream_session, 'get', return_value=MockResponse(json_data=pomacentridae)):
+            cache.prefetch_vars([f'Concept {i}' for i in range(20)], 'https://all.the.knowledge', max_workers=8)
+        assert len(cache.data) == 20
+        assert writers == {threading.current_thread()}
+
+    def test_prefetch_worms_fetches_each_missing_name_once(self):
+        cache = PhylogenyCache.__new__(PhylogenyCache)
+        cache.data = {'Cached': {'aphia_id': 1}, 'From VARS': {'family': 'Pomacentridae'}}
+        no_match_records = {'Known bad'}
+
+        with patch.object(
+                PhylogenyCache,
+                'fetch_worms_many',
+                side_effect=lambda names, max_workers: {'Bad'} & set(names),
+        ) as mock_fetch_worms_many:
+            unmatched = cache.prefetch_worms(
+                ['New', 'Bad', 'New', 'Cached', 'From VARS', 'Known bad'],
+                no_match_records=no_match_records,
+            )
+
+        mock_fetch_worms_many.assert_called_once_with(['New', 'Bad'], max_workers=WORMS_FETCH_WORKERS)
+        assert unmatched == {'Bad'}
+        assert no_match_records == {'Known bad', 'Bad'}
+
+    def test_prefetch_worms_skips_remembered_no_matches(self):
+        PhylogenyStore.default().add_no_matches(PhylogenyStore.WORMS, ['Bad'])
+        cache = PhylogenyCache.__new__(PhylogenyCache)
+        cache.data = {}
+        no_match_records = set()
+
+        with patch.object(PhylogenyCache, 'fetch_worms_many', return_value=set()) as mock_fetch_worms_many:
+            unmatched = cache.prefetch_worms(['New', 'Bad'], no_match_records=no_match_records)
+
+        mock_fetch_worms_many.assert_called_once_with(['New'], max_workers=WORMS_FETCH_WORKERS)
+        assert unmatched == {'Bad'}  # still reported, e.g. for the names-accepted check
+        assert no_match_records == {'Bad'}
+
+    def test_no_match_ttl_is_read_from_config(self, app, tmp_path):
+        store = PhylogenyStore(str(tmp_path / 'phylogeny.sqlite3'), json_path=str(tmp_path / 'missing.json'))
+        app.config['PHYLOGENY_NO_MATCH_TTL'] = 60
+        with app.app_context():
+            cache = PhylogenyCache(store)
+
+        with patch('time.time', return_value=1000):
+            cache._add_no_match(PhylogenyStore.WORMS, 'Fakeconcept')
+        with patch('time.time', return_value=1061):
+            assert store.no_matches(PhylogenyStore.WORMS, ['Fakeconcept']) == set()
+
+    def test_prefetch_worms_require_aphia_id_refetches_vars_phylogeny(self):
+        cache = PhylogenyCache.__new__(PhylogenyCache)
+        cache.data = {'Cached': {'aphia_id': 1}, 'From VARS': {'family': 'Pomacentridae'}}
+
+        with patch.object(PhylogenyCache, 'fetch_worms_many', return_value=set()) as mock_fetch_worms_many:
+            cache.prefetch_worms(['Cached', 'From VARS'], require_aphia_id=True)
+
+        mock_fetch_worms_many.assert_called_once_with(['From VARS'], max_workers=WORMS_FETCH_WORKERS)
+
+
+class TestFetchWormsMany:
+    @staticmethod
+    def make_cache(worms_stand_in) -> PhylogenyCache:
+        return PhylogenyCache(worms_client=WormsRestClient(base_url=worms_stand_in.url, requests_per_second=1000))
+
+    def test_resolves_names_in_batches(self, worms_stand_in):
+        names = [f'Taxon {i}' for i in range(110)]
+        for i, name in enumerate(names):
+            worms_stand_in.add_taxon(name, 1000 + i)
+        unknown_names = [f'Unknown {i}' for i in range(10)]
+        cache = self.make_cache(worms_stand_in)
+
+        unmatched = cache.fetch_worms_many(names + unknown_names)
+
+        assert len(worms_stand_in.paths('/AphiaRecordsByNames')) == 3  # 120 names, 50 per request
+        assert len(worms_stand_in.paths('/AphiaClassificationByAphiaID/')) == 110
+        assert unmatched == set(unknown_names)
+        assert cache.data['Taxon 7'] == {'kingdom': 'Animalia', 'species': 'Taxon 7', 'aphia_id': 1007}
+        assert PhylogenyStore.default().no_matches(PhylogenyStore.WORMS, unknown_names) == set(unknown_names)
+
+    def test_picks_records_like_fetch_worms(self, worms_stand_in):
+        worms_stand_in.add_taxon('Ambiguous', 1, status='unaccepted')
+        worms_stand_in.add_taxon('Ambiguous', 2)
+        worms_stand_in.add_taxon('Synonym', 3, status='unaccepted')
+        worms_stand_in.add_taxon('Nothing accepted', 4, status='unaccepted')
+        worms_stand_in.add_taxon('Nothing accepted', 5, status='unaccepted')
+        cache = self.make_cache(worms_stand_in)
+
+        unmatched = cache.fetch_worms_many(['Ambiguous', 'Synonym', 'Nothing accepted'])
+
+        assert cache.data['Ambiguous']['aphia_id'] == 2  # first accepted record
+        assert cache.data['Synonym']['aphia_id'] == 3  # only record
+        assert 'Nothing accepted' not in cache.data
+        assert unmatched == set()  # WoRMS has records for it, so it isn't reported as having none
+        # WoRMS has records for it, so it isn't remembered as a name with no match
+        assert PhylogenyStore.default().no_matches(PhylogenyStore.WORMS, ['Nothing accepted']) == set()
+
+    def test_skips_missing_names(self, worms_stand_in):
+        worms_stand_in.add_taxon('Chromis', 1)
+        worms_stand_in.add_taxon('Stylasteridae', 2)
+        cache = self.make_cache(worms_stand_in)
+
+        unmatched = cache.fetch_worms_many([None, 'Chromis', '', 'Stylasteridae', 'Fakeconcept'])
+
+        assert cache.data['Chromis']['aphia_id'] == 1
+        assert cache.data['Stylasteridae']['aphia_id'] == 2
+        assert None not in cache.data and '' not in cache.data
+        assert unmatched == {'Fakeconcept'}
+
+    def test_failed_requests_are_not_reported_as_no_match(self, worms_stand_in):
+        worms_stand_in.add_taxon('Chromis', 1)
+        worms_stand_in.add_taxon('Stylasteridae', 2)
+        worms_stand_in.failures = [(503, {}), (503, {})]
+        cache = PhylogenyCache(
+            worms_client=WormsRestClient(base_url=worms_stand_in.url, requests_per_second=1000, max_retries=0),
+        )
+
+        assert cache.fetch_worms_many(['Chromis', 'Fakeconcept']) == set()  # the names request failed
+        worms_stand_in.failure_path = '/AphiaClassificationByAphiaID/'
+        assert cache.fetch_worms_many(['Stylasteridae']) == set()  # the classification request failed
+
+        assert 'Chromis' not in cache.data and 'Stylasteridae' not in cache.data
+        assert PhylogenyStore.default().no_matches(PhylogenyStore.WORMS, ['Chromis', 'Fakeconcept']) == set()
+
+    def test_fetches_classifications_concurrently(self, worms_stand_in):
+        names = [f'Taxon {i}' for i in range(8)]
+        for i, name in enumerate(names):
+            worms_stand_in.add_taxon(name, 1000 + i)
+        worms_stand_in.latency = 0.2
+        cache = self.make_cache(worms_stand_in)
+
+        start = time.monotonic()
+        assert cache.fetch_worms_many(names, max_workers=4) == set()
+
+        assert worms_stand_in.max_in_flight == 4
+        assert time.monotonic() - start < 9 * 0.2  # one names request plus eight classifications, one at a time
+
+    def test_retries_throttled_classification(self, worms_stand_in):
+        worms_stand_in.add_taxon('Amphiprioninae', 714652)
+        cache = self.make_cache(worms_stand_in)
+        worms_stand_in.failures = [(429, {'Retry-After': '0.3'})]
+        worms_stand_in.failure_path = '/AphiaClassificationByAphiaID/'
+
+        start = time.monotonic()
+        assert cache.fetch_worms_many(['Amphiprioninae']) == set()
+        assert cache.data['Amphiprioninae']['aphia_id'] == 714652
+        assert len(worms_stand_in.paths('/AphiaClassificationByAphiaID/')) == 2
+        assert time.monotonic() - start >= 0.3
@@ -0,0 +1,113 @@
+import json
+import sqlite3
+import threading
+from unittest.mock import patch
+
+from application.util.phylogeny_store import PhylogenyStore
+
+
+class TestPhylogenyStore:
+    def test_new_store_imports_json_cache(self, tmp_path):
+        json_path = tmp_path / 'phylogeny.json'
+        json_path.write_text(json.dumps({'Animalia': {}, 'Pomacentridae': {'family': 'Pomacentridae'}}))
+
+        store = PhylogenyStore(str(tmp_path / 'phylogeny.sqlite3'), json_path=str(json_path))
+
+        assert store.count() == 2
+        assert store.get('Pomacentridae') == {'family': 'Pomacentridae'}
+        assert store.get('Unknown') is None
+
+    def test_json_cache_is_only_imported_once(self, tmp_path):
+        json_path = tmp_path / 'phylogeny.json'
+        json_path.write_text(json.dumps({'Pomacentridae': {'family': 'Pomacentridae'}}))
+        store = PhylogenyStore(str(tmp_path / 'phylogeny.sqlite3'), json_path=str(json_path))
+        store.delete('Pomacentridae')
+
+        reopened = PhylogenyStore(str(tmp_path / 'phylogeny.sqlite3'), json_path=str(json_path))
+
+        assert reopened.get('Pomacentridae') is None
+
+    def test_missing_json_cache_starts_with_animalia(self, tmp_path):
+        store = PhylogenyStore(str(tmp_path / 'cache' / 'phylogeny.sqlite3'), json_path=str(tmp_path / 'missing.json'))
+
+        assert store.names() == ['Animalia']
+
+    def test_upsert_inserts_and_replaces_rows(self, tmp_path):
+        store = PhylogenyStore(str(tmp_path / 'phylogeny.sqlite3'), json_path=str(tmp_path / 'missing.json'))
+
+        store.upsert([('Pomacentridae', {'family': 'Pomacentridae'}), ('Hydroidolina', {})])
+        store.upsert([('Hydroidolina', {'subclass': 'Hydroidolina'})])
+
+        assert store.get('Pomacentridae') == {'family': 'Pomacentridae'}
+        assert store.get('Hydroidolina') == {'subclass': 'Hydroidolina'}
+        assert store.count() == 3
+
+    def test_get_returns_a_copy(self, tmp_path):
+        store = PhylogenyStore(str(tmp_path / 'phylogeny.sqlite3'), json_path=str(tmp_path / 'missing.json'))
+        store.upsert([('Pomacentridae', {'family': 'Pomacentridae'})])
+
+        store.get('Pomacentridae')['family'] = 'Changed'
+
+        assert store.get('Pomacentridae') == {'family': 'Pomacentridae'}
+
+    def test_sees_names_written_by_another_process(self, tmp_path):
+        # two stores on one database stand in for two worker processes
+        worker_a = PhylogenyStore(str(tmp_path / 'phylogeny.sqlite3'), json_path=str(tmp_path / 'missing.json'))
+        worker_b = PhylogenyStore(str(tmp_path / 'phylogeny.sqlite3'), json_path=str(tmp_path / 'missing.json'))
+        assert worker_a.get('Pomacentridae') is None  # remembered as missing
+
+        worker_b.upsert([('Pomacentridae', {'family': 'Pomacentridae'})])
+
+        assert worker_a.get('Pomacentridae') == {'family': 'Pomacentridae'}
+
+    def test_concurrent_writers_merge_names(self, tmp_path):
+        workers = [
+            PhylogenyStore(str(tmp_path / 'phylogeny.sqlite3'), json_path=str(tmp_path / 'missing.json'))
+            for _ in range(4)
+        ]
+
+        def write_names(worker_index):
+            for i in range(25):
+                workers[worker_index].upsert([(f'Name {worker_index}-{i}', {'genus': f'Genus {i}'})])
+
+        threads = [threading.Thread(target=write_names, args=(i,)) for i in range(len(workers))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert workers[0].count() == 1 + 4 * 25  # Animalia and every worker's names
+        assert all(worker.get('Name 3-24') == {'genus': 'Genus 24'} for worker in workers)
+
+    def test_no_matches_expire_after_ttl(self, tmp_path):
+        store = PhylogenyStore(str(tmp_path / 'phylogeny.sqlite3'), json_path=str(tmp_path / 'missing.json'))
+        with patch('time.time', return_value=1000):
+            store.add_no_matches(PhylogenyStore.WORMS, ['Fakeconcept', 'Othername'], ttl=60)
+            assert store.no_matches(PhylogenyStore.WORMS, ['Fakeconcept', 'Pomacentridae']) == {'Fakeconcept'}
+            assert store.no_matches(PhylogenyStore.VARS_KB, ['Fakeconcept']) == set()  # per source
+        with patch('time.time', return_value=1061):
+            assert store.no_matches(PhylogenyStore.WORMS, ['Fakeconcept', 'Othername']) == set()
+
+    def test_purge_no_matches(self, tmp_path):
+        store = PhylogenyStore(str(tmp_path / 'phylogeny.sqlite3'), json_path=str(tmp_path / 'missing.json'))
+        store.add_no_matches(PhylogenyStore.WORMS, ['Fakeconcept', 'Othername'])
+        store.add_no_matches(PhylogenyStore.VARS_KB, ['Fakeconcept'])
+
+        assert store.purge_no_matches('Fakeconcept') == 2
+        assert store.no_matches(PhylogenyStore.WORMS, ['Fakeconcept', 'Othername']) == {'Othername'}
+        assert store.purge_no_matches() == 1
+        assert store.no_matches(PhylogenyStore.WORMS, ['Othername']) == set()
+
+    def test_version_1_database_gets_no_match_table(self, tmp_path):
+        db_path = str(tmp_path / 'phylogeny.sqlite3')
+        with sqlite3.connect(db_path) as connection:
+            connection.execute('CREATE TABLE phylogeny (name TEXT PRIMARY KEY, phylogeny TEXT NOT NULL)')
+            connection.execute('INSERT INTO phylogeny VALUES (?, ?)', ('Pomacentridae', '{}'))
+            connection.execute('PRAGMA user_version = 1')
+        connection.close()
+
+        store = PhylogenyStore(db_path, json_path=str(tmp_path / 'missing.json'))
+        store.add_no_matches(PhylogenyStore.WORMS, ['Fakeconcept'])
+
+        assert store.names() == ['Pomacentridae']  # not re-seeded
+        assert store.no_matches(PhylogenyStore.WORMS, ['Fakeconcept']) == {'Fakeconcept'}
@@ -0,0 +1,75 @@
+import threading
+import time
+from unittest.mock import Mock
+
+import pytest
+import requests
+
+from application.util.worms_rest_client import WormsRestClient
+
+
+class TestWormsRestClient:
+    def test_requests_are_rate_limited_across_threads(self, worms_stand_in):
+        client = WormsRestClient(base_url=worms_stand_in.url, requests_per_second=20)
+        threads = [threading.Thread(target=client.get, args=('/AphiaClassificationByAphiaID/1',)) for _ in range(6)]
+
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(worms_stand_in.requests) == 6
+        assert time.monotonic() - start >= 5 / 20  # the first request starts right away, the rest 1/20s apart
+
+    def test_honors_retry_after(self, worms_stand_in):
+        worms_stand_in.add_taxon('Amphiprioninae', 714652)
+        worms_stand_in.failures = [(429, {'Retry-After': '0.5'})]
+        client = WormsRestClient(base_url=worms_stand_in.url, requests_per_second=100)
+
+        tree = client.classification(714652)
+
+        assert tree['child']['scientificname'] == 'Amphiprioninae'
+        (_, first), (_, second) = worms_stand_in.requests
+        assert second - first >= 0.5
+
+    def test_backs_off_exponentially_without_retry_after(self, worms_stand_in):
+        worms_stand_in.failures = [(503, {}), (503, {})]
+        client = WormsRestClient(base_url=worms_stand_in.url, requests_per_second=100, backoff_factor=0.1)
+
+        res = client.get('/AphiaClassificationByAphiaID/1')
+
+        assert res.status_code == 204
+        started = [started_at for _, started_at in worms_stand_in.requests]
+        assert started[1] - started[0] >= 0.1
+        assert started[2] - started[1] >= 0.2
+
+    def test_returns_last_response_when_retries_run_out(self, worms_stand_in):
+        worms_stand_in.failures = [(503, {})] * 3
+        client = WormsRestClient(base_url=worms_stand_in.url, requests_per_second=100, max_retries=2, backoff_factor=0)
+
+        assert client.get('/AphiaClassificationByAphiaID/1').status_code == 503
+        assert len(worms_stand_in.requests) == 3
+
+    def test_records_by_names_keeps_name_order(self, worms_stand_in):
+        worms_stand_in.add_taxon('Amphiprioninae', 714652)
+        worms_stand_in.add_taxon('Pomacentridae', 123)
+        client = WormsRestClient(base_url=worms_stand_in.url, requests_per_second=100)
+
+        records = client.records_by_names(['Pomacentridae', 'Fakeconcept', 'Amphiprioninae'])
+
+        assert [[record['AphiaID'] for record in name_records] for name_records in records] == [[123], [], [714652]]
+        assert client.records_by_names(['Fakeconcept']) == [[]]  # WoRMS answers 204 when nothing matches
+
+    def test_records_by_names_raises_when_a_name_is_left_out(self, worms_stand_in):
+        worms_stand_in.add_taxon('Chromis', 1)
+        client = WormsRestClient(base_url=worms_stand_in.url, requests_per_second=100)
+
+        assert client.records_by_names(['', 'Chromis']) == [[], [{'AphiaID': 1, 'scientificname': 'Chromis', 'status': 'accepted'}]]
+        with pytest.raises(requests.HTTPError):
+            client.records_by_names([None, 'Chromis'])  # requests drops the None from the query
+
+    def test_retry_after_http_date(self):
+        res = Mock(headers={'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'})  # in the past
+        assert WormsRestClient._retry_after(res) == 0.0
+        assert WormsRestClient._retry_after(Mock(headers={})) is None
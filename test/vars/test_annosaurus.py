@@ -5,6 +5,7 @@ import json
 from unittest.mock import patch
 
 from application.vars.annosaurus import Annosaurus, AuthenticationError
+from application.util.http_metrics import upstream_session
 from test.data.vars_responses import ex_23060001
 
 
@@ -158,13 +159,13 @@ class TestAnnosaurus:
         anno = Annosaurus('http://localhost:test/')
         assert anno.authorize(jwt='jwt') == 'jwt'
 
-    @patch('requests.post', side_effect=mocked_requests_post)
+    @patch.object(upstream_session, 'post', side_effect=mocked_requests_post)
     def test_authorize_client_secret(self, mock_post):
         anno = Annosaurus('http://localhost:test/')
         assert anno.authorize(client_secret='valid') == 'jwt'
         assert mock_post.call_args[1]['headers'] == {'Authorization': 'APIKEY valid'}
 
-    @patch('requests.post', side_effect=mocked_requests_post)
+    @patch.object(upstream_session, 'post', side_effect=mocked_requests_post)
     def test_authorize_invalid(self, _):
         anno = Annosaurus('http://localhost:test/')
         with pytest.raises(AuthenticationError):
@@ -179,7 +180,7 @@ class TestAnnosaurus:
         anno = Annosaurus('http://localhost:test/')
         assert anno._auth_header('jwt') == {'Authorization': 'Bearer jwt'}
 
-    @patch('requests.post', side_effect=mocked_requests_post)
+    @patch.object(upstream_session, 'post', side_effect=mocked_requests_post)
     def test_create_association(self, _):
         anno = Annosaurus('http://localhost:test')
         new_association = {'link_name': 'test', 'to_concept': 'test'}
@@ -205,7 +206,7 @@ class TestAnnosaurus:
                 jwt='jwt',
             )
 
-    @patch('requests.put', side_effect=mocked_requests_put)
+    @patch.object(upstream_session, 'put', side_effect=mocked_requests_put)
     def test_update_association(self, _):
         anno = Annosaurus('http://localhost:test')
         updated = anno.update_association(
@@ -220,7 +221,7 @@ class TestAnnosaurus:
             'uuid': 'abc123',
         }
 
-    @patch('requests.delete', side_effect=mocked_requests_delete)
+    @patch.object(upstream_session, 'delete', side_effect=mocked_requests_delete)
     def test_delete_association(self, _):
         anno = Annosaurus('http://localhost:test')
         deleted = anno.delete_association(
@@ -230,7 +231,7 @@ class TestAnnosaurus:
         assert deleted['status'] == 204
         assert deleted['json'] == {}
 
-    @patch('requests.put', side_effect=mocked_requests_put)
+    @patch.object(upstream_session, 'put', side_effect=mocked_requests_put)
     def test_update_concept_name(self, _):
         anno = Annosaurus('http://localhost:test')
         updated = anno.update_concept_name(
@@ -243,7 +244,7 @@ class TestAnnosaurus:
         assert updated['status'] == 200
         assert updated['json'] == old_anno
 
-    @patch('requests.get', side_effect=mocked_requests_get_404)
+    @patch.object(upstream_session, 'get', side_effect=mocked_requests_get_404)
     def test_update_annotation_comment_404(self, _):
         anno = Annosaurus('http://localhost:test')
         updated = anno.update_annotation_comment(
@@ -254,8 +255,8 @@ class TestAnnosaurus:
         assert updated['status'] == 404
         assert updated['json'] == {}
 
-    @patch('requests.get', side_effect=mocked_requests_get)
-    @patch('requests.post', side_effect=mocked_requests_post)
+    @patch.object(upstream_session, 'get', side_effect=mocked_requests_get)
+    @patch.object(upstream_session, 'post', side_effect=mocked_requests_post)
     def test_update_annotation_comment_new_one_reviewer(self, _, __):
         anno = Annosaurus('http://localhost:test')
         created = anno.update_annotation_comment(
@@ -271,8 +272,8 @@ class TestAnnosaurus:
             'uuid': 'new_uuid'
         }
 
-    @patch('requests.get', side_effect=mocked_requests_get)
-    @patch('requests.post', side_effect=mocked_requests_post)
+    @patch.object(upstream_session, 'get', side_effect=mocked_requests_get)
+    @patch.object(upstream_session, 'post', side_effect=mocked_requests_post)
     def test_update_annotation_comment_new_multiple_reviewers(self, _, __):
         anno = Annosaurus('http://localhost:test')
         created = anno.update_annotation_comment(
@@ -288,8 +289,8 @@ class TestAnnosaurus:
             'uuid': 'new_uuid'
         }
 
-    @patch('requests.get', side_effect=mocked_requests_get)
-    @patch('requests.put', side_effect=mocked_requests_put)
+    @patch.object(upstream_session, 'get', side_effect=mocked_requests_get)
+    @patch.object(upstream_session, 'put', side_effect=mocked_requests_put)
     def test_update_annotation_comment_update_no_prev_reviewers(self, _, __):
         anno = Annosaurus('http://localhost:test')
         updated = anno.update_annotation_comment(
@@ -303,8 +304,8 @@ class TestAnnosaurus:
             'uuid': 'c4eaa100-comment'
         }
 
-    @patch('requests.get', side_effect=mocked_requests_get)
-    @patch('requests.put', side_effect=mocked_requests_put)
+    @patch.object(upstream_session, 'get', side_effect=mocked_requests_get)
+    @patch.object(upstream_session, 'put', side_effect=mocked_requests_put)
     def test_update_annotation_comment_update_prev_reviewers_add(self, _, __):
         anno = Annosaurus('http://localhost:test')
         updated = anno.update_annotation_comment(
@@ -318,8 +319,8 @@ class TestAnnosaurus:
             'uuid': 'faf820ac-93fd-4d5a-486a-87775ec1d41e'
         }
 
-    @patch('requests.get', side_effect=mocked_requests_get)
-    @patch('requests.put', side_effect=mocked_requests_put)
+    @patch.object(upstream_session, 'get', side_effect=mocked_requests_get)
+    @patch.object(upstream_session, 'put', side_effect=mocked_requests_put)
     def test_update_annotation_comment_update_prev_reviewers_replace(self, _, __):
         anno = Annosaurus('http://localhost:test')
         updated = anno.update_annotation_comment(
@@ -333,8 +334,8 @@ class TestAnnosaurus:
             'uuid': 'faf820ac-93fd-4d5a-486a-87775ec1d41e'
         }
 
-    @patch('requests.get', side_effect=mocked_requests_get)
-    @patch('requests.delete', side_effect=mocked_requests_delete)
+    @patch.object(upstream_session, 'get', side_effect=mocked_requests_get)
+    @patch.object(upstream_session, 'delete', side_effect=mocked_requests_delete)
     def test_update_annotation_comment_delete_empty(self, _, __):
         anno = Annosaurus('http://localhost:test')
         deleted = anno.update_annotation_comment(
@@ -345,8 +346,8 @@ class TestAnnosaurus:
         assert deleted['status'] == 204
         assert deleted['json'] == {}
 
-    @patch('requests.get', side_effect=mocked_requests_get)
-    @patch('requests.put', side_effect=mocked_requests_put)
+    @patch.object(upstream_session, 'get', side_effect=mocked_requests_get)
+    @patch.object(upstream_session, 'put', side_effect=mocked_requests_put)
     def test_update_annotation_comment_delete_not_empty(self, _, __):
         anno = Annosaurus('http://localhost:test')
         deleted = anno.update_annotation_comment(
@@ -360,8 +361,8 @@ class TestAnnosaurus:
             'uuid': '297d23d7-5979-46e7-6f66-8f1fcf8ed41e'
         }
 
-    @patch('requests.get', side_effect=mocked_requests_get)
-    @patch('requests.post', side_effect=mocked_requests_post_fail)
+    @patch.object(upstream_session, 'get', side_effect=mocked_requests_get)
+    @patch.object(upstream_session, 'post', side_effect=mocked_requests_post_fail)
     def test_update_annotation_comment_create_fails(self, _, __):
         anno = Annosaurus('http://localhost:test')
         created = anno.update_annotation_comment(
@@ -371,8 +372,8 @@ class TestAnnosaurus:
         )
         assert created['status'] == 500
 
-    @patch('requests.get', side_effect=mocked_requests_get)
-    @patch('requests.put', side_effect=mocked_requests_put_fail)
+    @patch.object(upstream_session, 'get', side_effect=mocked_requests_get)
+    @patch.object(upstream_session, 'put', side_effect=mocked_requests_put_fail)
     def test_update_annotation_comment_update_fails(self, _, __):
         anno = Annosaurus('http://localhost:test')
         updated = anno.update_annotation_comment(
@@ -382,8 +383,8 @@ class TestAnnosaurus:
         )
         assert updated['status'] == 500
 
-    @patch('requests.get', side_effect=mocked_requests_get)
-    @patch('requests.delete', side_effect=mocked_requests_delete_fail)
+    @patch.object(upstream_session, 'get', side_effect=mocked_requests_get)
+    @patch.object(upstream_session, 'delete', side_effect=mocked_requests_delete_fail)
     def test_update_annotation_comment_delete_fails(self, _, __):
         anno = Annosaurus('http://localhost:test')
         deleted = anno.update_annotation_comment(
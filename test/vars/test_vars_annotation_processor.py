@@ -2,8 +2,9 @@ from unittest.mock import patch
 
 import pytest
 
-from application.vars.vars_annotation_processor import VarsAnnotationProcessor
 from application.util.functions import parse_datetime
+from application.util.http_metrics import upstream_session
+from application.vars.vars_annotation_processor import VarsAnnotationProcessor
 from test.data.vars_responses import ex_23060001
 from test.util.mock_response import MockResponse
 
@@ -37,7 +38,7 @@ class TestVarsAnnotationProcessor:
         assert annotation_processor.final_records == []
         assert len(annotation_processor.phylogeny.data.keys()) > 0
 
-    @patch('requests.get', side_effect=mocked_requests_get)
+    @patch.object(upstream_session, 'get', side_effect=mocked_requests_get)
     def test_fetch_media(self, mock_get):
         annotation_processor = VarsAnnotationProcessor(
             sequence_names=['Deep Discoverer 23060001'],
@@ -63,7 +64,7 @@ class TestVarsAnnotationProcessor:
         ]
 
     # TODO move to PhylogenyCache test
-    @patch('requests.get', side_effect=mocked_requests_get)
+    @patch.object(upstream_session, 'get', side_effect=mocked_requests_get)
     def test_fetch_vars_phylogeny(self, mock_get):
         annotation_processor = VarsAnnotationProcessor(
             sequence_names=['Deep Discoverer 23060001'],
@@ -84,6 +85,28 @@ class TestVarsAnnotationProcessor:
             'family': 'Pomacentridae',
         }
 
+    def test_prefetch_phylogeny_fetches_distinct_concepts(self):
+        annotation_processor = VarsAnnotationProcessor(
+            sequence_names=['Deep Discoverer 23060001'],
+            vars_charybdis_url=MockResponse.VARS_CHARYBDIS_URL,
+            vars_kb_url=MockResponse.VARS_KB_URL,
+        )
+        annotation_processor.working_records = [
+            {'concept': 'Pomacentridae'},
+            {'concept': 'none'},
+            {'concept': 'Hydroidolina'},
+            {'concept': 'Pomacentridae'},
+        ]
+
+        with patch.object(upstream_session, 'get', side_effect=mocked_requests_get) as mock_get:
+            assert annotation_processor.prefetch_phylogeny() == set()
+
+        assert sorted(call.kwargs['url'] for call in mock_get.call_args_list) == [
+            f'{MockResponse.VARS_KB_URL}/phylogeny/up/Hydroidolina',
+            f'{MockResponse.VARS_KB_URL}/phylogeny/up/Pomacentridae',
+        ]
+        assert annotation_processor.phylogeny.data['Pomacentridae']['family'] == 'Pomacentridae'
+
     def test_get_image_url_only_one(self):  # only one image to choose from
         assert VarsAnnotationProcessor.get_image_url(ex_23060001['annotations'][1]) \
                == 'https://hurlimage.soest.hawaii.edu/SupplementalPhotos/Hphotos/NA138photos/H1920/cam1_20220419064757.png'
@@ -92,7 +115,7 @@ class TestVarsAnnotationProcessor:
         assert VarsAnnotationProcessor.get_image_url(ex_23060001['annotations'][0]) \
                == 'https://hurlimage.soest.hawaii.edu/Hercules/images/1381920/20220418T202402.015Z--542830a8-ec69-4ee5-a57d-9de66a412dba.png'
 
-    @patch('requests.get', side_effect=mocked_requests_get)
+    @patch.object(upstream_session, 'get', side_effect=mocked_requests_get)
     def test_get_video(self, mock_get):
         annotation_processor = VarsAnnotationProcessor(
             sequence_names=['Deep Discoverer 23060001'],
@@ -103,7 +126,7 @@ class TestVarsAnnotationProcessor:
         assert annotation_processor.get_video(ex_23060001['annotations'][0])['uri'] \
                == 'https://hurlvideo.soest.hawaii.edu/D2/2023/EX2306_01/EX2306_01_20230824T183000Z.m4v#t=374'
 
-    @patch('requests.get', side_effect=mocked_requests_get)
+    @patch.object(upstream_session, 'get', side_effect=mocked_requests_get)
     def test_get_video_url_second_media(self, mock_get):
         annotation_processor = VarsAnnotationProcessor(
             sequence_names=['Deep Discoverer 23060001'],
@@ -114,7 +137,7 @@ class TestVarsAnnotationProcessor:
         assert annotation_processor.get_video(ex_23060001['annotations'][1])['uri'] \
                == 'https://hurlvideo.soest.hawaii.edu/D2/2023/EX2306_01/EX2306_01_20230824T203000Z.m4v#t=3505'
 
-    @patch('requests.get', side_effect=mocked_requests_get)
+    @patch.object(upstream_session, 'get', side_effect=mocked_requests_get)
     def test_process_images(self, mock_get):
         annotation_processor = VarsAnnotationProcessor(
             sequence_names=['Deep Discoverer 23060001'],
@@ -182,7 +205,7 @@ class TestVarsAnnotationProcessor:
             },
         ]
 
-    @patch('requests.get', side_effect=mocked_requests_get)
+    @patch.object(upstream_session, 'get', side_effect=mocked_requests_get)
     def test_sort_records(self, mock_get):
         annotation_processor = VarsAnnotationProcessor(
             sequence_names=['Deep Discoverer 23060001'],
@@ -251,7 +274,7 @@ class TestVarsAnnotationProcessor:
 
         ]
 
-    @patch('requests.get', side_effect=mocked_requests_get)
+    @patch.object(upstream_session, 'get', side_effect=mocked_requests_get)
     def test_process_multiple_sequences(self, mock_get):
         annotation_processor = VarsAnnotationProcessor(
             sequence_names=['Deep Discoverer 23060001', 'Deep Discoverer 23060002'],
@@ -264,7 +287,7 @@ class TestVarsAnnotationProcessor:
         assert 'Deep Discoverer 23060001' in sequence_names
         assert 'Deep Discoverer 23060002' in sequence_names
 
-    @patch('requests.get', side_effect=mocked_requests_get)
+    @patch.object(upstream_session, 'get', side_effect=mocked_requests_get)
     def test_find_highest_id_refs(self, mock_get):
         annotation_processor = VarsAnnotationProcessor(
             sequence_names=['Deep Discoverer 23060001'],
@@ -281,7 +304,7 @@ class TestVarsAnnotationProcessor:
             vars_kb_url=MockResponse.VARS_KB_URL,
         )
 
-        with patch('requests.get', return_value=MockJsonResponse(status_code=500)):
+        with patch.object(upstream_session, 'get', return_value=MockJsonResponse(status_code=500)):
             result = annotation_processor.fetch_media_and_annotations('Deep Discoverer 23060001', images_only=True)
 
         assert result == []
@@ -302,7 +325,7 @@ class TestVarsAnnotationProcessor:
             vars_kb_url=MockResponse.VARS_KB_URL,
         )
 
-        with patch('requests.get') as mock_get:
+        with patch.object(upstream_session, 'get') as mock_get:
             result = annotation_processor._fetch_vam_media('Deep Discoverer 23060001')
 
         mock_get.assert_not_called()
@@ -316,7 +339,7 @@ class TestVarsAnnotationProcessor:
             vars_vam_url='https://vam.url',
         )
 
-        with patch('requests.get', return_value=MockJsonResponse(status_code=500)):
+        with patch.object(upstream_session, 'get', return_value=MockJsonResponse(status_code=500)):
             result = annotation_processor._fetch_vam_media('Deep Discoverer 23060001')
 
         assert result == []
@@ -346,7 +369,7 @@ class TestVarsAnnotationProcessor:
             },
         ]
 
-        with patch('requests.get', return_value=MockJsonResponse(json_data=vam_response)) as mock_get:
+        with patch.object(upstream_session, 'get', return_value=MockJsonResponse(json_data=vam_response)) as mock_get:
             result = annotation_processor._fetch_vam_media('Deep Discoverer 23060001')
 
         mock_get.assert_called_once_with(
@@ -391,7 +414,7 @@ class TestVarsAnnotationProcessor:
             }
         ]
 
-        with patch('requests.get', return_value=MockJsonResponse(json_data=vam_response)):
+        with patch.object(upstream_session, 'get', return_value=MockJsonResponse(json_data=vam_response)):
             formatted_records = annotation_processor.process_working_records()
 
         assert annotation_processor.videos[0]['video_reference_uuid'] == 'vam-uuid-1'
@@ -428,7 +451,7 @@ class TestVarsAnnotationProcessor:
             }
         ]
 
-        with patch('requests.get', return_value=MockJsonResponse(json_data=vam_response)) as mock_get:
+        with patch.object(upstream_session, 'get', return_value=MockJsonResponse(json_data=vam_response)) as mock_get:
             formatted_records = annotation_processor.process_working_records()
 
         assert mock_get.call_count == 1
@@ -3,6 +3,7 @@ from unittest.mock import patch
 import pytest
 
 from application.util.functions import parse_datetime
+from application.util.http_metrics import upstream_session
 from application.vars.vars_qaqc_processor import VarsQaqcProcessor
 from test.data.vars_responses import ex_23060001, ex_23060002
 from test.util.mock_response import MockResponse
@@ -56,7 +57,7 @@ class TestVarsQaqcProcessor:
         assert qaqc_processor.final_records == []
         assert len(qaqc_processor.phylogeny.data.keys()) > 0
 
-    @patch('requests.get', side_effect=mocked_requests_get)
+    @patch.object(upstream_session, 'get', side_effect=mocked_requests_get)
     def test_find_duplicate_associations(self, _):
         qaqc_processor_okay = VarsQaqcProcessor(
             sequence_names=['Deep Discoverer 23060001'],
@@ -73,7 +74,7 @@ class TestVarsQaqcProcessor:
         assert qaqc_processor_okay.working_records == []
         assert qaqc_processor_problems.working_records == [ex_23060002['annotations'][0]]
 
-    @patch('requests.get', side_effect=mocked_requests_get)
+    @patch.object(upstream_session, 'get', side_effect=mocked_requests_get)
     def test_find_missing_s1(self, _):
         qaqc_processor_okay = VarsQaqcProcessor(
             sequence_names=['Deep Discoverer 23060001'],
@@ -90,7 +91,7 @@ class TestVarsQaqcProcessor:
         assert qaqc_processor_okay.working_records == []
         assert qaqc_processor_problems.working_records == [ex_23060002['annotations'][1]]
 
-    @patch('requests.get', side_effect=mocked_requests_get)
+    @patch.object(upstream_session, 'get', side_effect=mocked_requests_get)
     def test_find_identical_s1_s2(self, _):
         qaqc_processor_okay = VarsQaqcProcessor(
             sequence_names=['Deep Discoverer 23060001'],
@@ -107,7 +108,7 @@ class TestVarsQaqcProcessor:
         assert qaqc_processor_okay.working_records == []
         assert qaqc_processor_problems.working_records == [ex_23060002['annotations'][2]]
 
-    @patch('requests.get', side_effect=mocked_requests_get)
+    @patch.object(upstream_session, 'get', side_effect=mocked_requests_get)
     def test_find_duplicate_s2(self, _):
         qaqc_processor_okay = VarsQaqcProcessor(
             sequence_names=['Deep Discoverer 23060001'],
@@ -124,7 +125,7 @@ class TestVarsQaqcProcessor:
         assert qaqc_processor_okay.working_records == []
         assert qaqc_processor_problems.working_records == [ex_23060002['annotations'][1]]
 
-    @patch('requests.get', side_effect=mocked_requests_get)
+    @patch.object(upstream_session, 'get', side_effect=mocked_requests_get)
     def test_find_missing_upon_substrate(self, _):
         qaqc_processor_okay = VarsQaqcProcessor(
             sequence_names=['Deep Discoverer 23060001'],
@@ -141,7 +142,7 @@ class TestVarsQaqcProcessor:
         assert qaqc_processor_okay.working_records == []
         assert qaqc_processor_problems.working_records == [ex_23060002['annotations'][0]]
 
-    @patch('requests.get', side_effect=mocked_requests_get)
+    @patch.object(upstream_session, 'get', side_effect=mocked_requests_get)
     def test_find_mismatched_substrates(self, _):
         qaqc_processor_okay = VarsQaqcProcessor(
             sequence_names=['Deep Discoverer 23060001'],
@@ -158,7 +159,7 @@ class TestVarsQaqcProcessor:
         assert qaqc_processor_okay.working_records == []
         assert qaqc_processor_problems.working_records == [ex_23060002['annotations'][3], ex_23060002['annotations'][5]]
 
-    @patch('requests.get', side_effect=mocked_requests_get)
+    @patch.object(upstream_session, 'get', side_effect=mocked_requests_get)
     def test_find_missing_upon(self, _):
         qaqc_processor_okay = VarsQaqcProcessor(
             sequence_names=['Deep Discoverer 23060001'],
@@ -175,7 +176,7 @@ class TestVarsQaqcProcessor:
         assert qaqc_processor_okay.working_records == []
         assert qaqc_processor_problems.working_records == [ex_23060002['annotations'][3]]
 
-    @patch('requests.get', side_effect=mocked_requests_get)
+    @patch.object(upstream_session, 'get', side_effect=mocked_requests_get)
     def test_get_num_records_missing_ancillary_data(self, _):
         qaqc_processor_okay = VarsQaqcProcessor(
             sequence_names=['Deep Discoverer 23060001'],
@@ -190,7 +191,7 @@ class TestVarsQaqcProcessor:
         assert qaqc_processor_okay.get_num_records_missing_ancillary_data() == 0
         assert qaqc_processor_problems.get_num_records_missing_ancillary_data() == 2
 
-    @patch('requests.get', side_effect=mocked_requests_get)
+    @patch.object(upstream_session, 'get', side_effect=mocked_requests_get)
     def test_find_missing_ancillary_data(self, _):
         qaqc_processor_okay = VarsQaqcProcessor(
             sequence_names=['Deep Discoverer 23060001'],
@@ -207,7 +208,7 @@ class TestVarsQaqcProcessor:
         assert qaqc_processor_okay.working_records == []
         assert qaqc_processor_problems.working_records == [ex_23060002['annotations'][2], ex_23060002['annotations'][3]]
 
-    @patch('requests.get', side_effect=mocked_requests_get)
+    @patch.object(upstream_session, 'get', side_effect=mocked_requests_get)
     def test_find_id_refs_different_concept_name(self, _):
         qaqc_processor_okay = VarsQaqcProcessor(
             sequence_names=['Deep Discoverer 23060001'],
@@ -224,7 +225,7 @@ class TestVarsQaqcProcessor:
         assert qaqc_processor_okay.working_records == []
         assert qaqc_processor_problems.working_records == [ex_23060002['annotations'][2], ex_23060002['annotations'][3]]
 
-    @patch('requests.get', side_effect=mocked_requests_get)
+    @patch.object(upstream_session, 'get', side_effect=mocked_requests_get)
     def test_find_id_refs_conflicting_associations(self, _):
         qaqc_processor_okay = VarsQaqcProcessor(
             sequence_names=['Deep Discoverer 23060001'],
@@ -241,7 +242,7 @@ class TestVarsQaqcProcessor:
         assert qaqc_processor_okay.working_records == []
         assert qaqc_processor_problems.working_records == [ex_23060002['annotations'][2], ex_23060002['annotations'][3]]
 
-    @patch('requests.get', side_effect=mocked_requests_get)
+    @patch.object(upstream_session, 'get', side_effect=mocked_requests_get)
     def test_find_blank_associations(self, _):
         qaqc_processor_okay = VarsQaqcProcessor(
             sequence_names=['Deep Discoverer 23060001'],
@@ -258,7 +259,7 @@ class TestVarsQaqcProcessor:
         assert qaqc_processor_okay.working_records == []
         assert qaqc_processor_problems.working_records == [ex_23060002['annotations'][0], ex_23060002['annotations'][1]]
 
-    @patch('requests.get', side_effect=mocked_requests_get)
+    @patch.object(upstream_session, 'get', side_effect=mocked_requests_get)
     def test_find_suspicious_hosts(self, _):
         qaqc_processor_okay = VarsQaqcProcessor(
             sequence_names=['Deep Discoverer 23060001'],
@@ -275,7 +276,7 @@ class TestVarsQaqcProcessor:
         assert qaqc_processor_okay.working_records == []
         assert qaqc_processor_problems.working_records == [ex_23060002['annotations'][1]]
 
-    @patch('requests.get', side_effect=mocked_requests_get)
+    @patch.object(upstream_session, 'get', side_effect=mocked_requests_get)
     def test_find_missing_expected_association(self, _):
         qaqc_processor_okay = VarsQaqcProcessor(
             sequence_names=['Deep Discoverer 23060001'],
@@ -312,7 +313,7 @@ class TestVarsQaqcProcessor:
             }
         ]
 
-    @patch('requests.get', side_effect=mocked_requests_get)
+    @patch.object(upstream_session, 'get', side_effect=mocked_requests_get)
     def test_find_long_host_associate_time_diff(self, _):
         qaqc_processor_okay = VarsQaqcProcessor(
             sequence_names=['Deep Discoverer 23060001'],
@@ -389,7 +390,7 @@ class TestVarsQaqcProcessor:
             },
         ]
 
-    @patch('requests.get', side_effect=mocked_requests_get)
+    @patch.object(upstream_session, 'get', side_effect=mocked_requests_get)
     def test_find_num_bounding_boxes(self, _):
         qaqc_processor = VarsQaqcProcessor(
             sequence_names=['Deep Discoverer 23060001'],
@@ -406,7 +407,7 @@ class TestVarsQaqcProcessor:
             'total_count_boxes': 1,
         }]
 
-    @patch('requests.get', side_effect=mocked_requests_get)
+    @patch.object(upstream_session, 'get', side_effect=mocked_requests_get)
     def test_find_unique_fields(self, _):
         qaqc_processor = VarsQaqcProcessor(
             sequence_names=['Deep Discoverer 23060001'],